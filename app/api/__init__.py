@@ -1,10 +1,17 @@
 # This file marks the api directory as a Python package
 # It can be used to export specific items from the package
+#
+# Routers are imported on first access, so importing one API module does not
+# pull in the dependencies of every other one.
 
-from app.api.authentication import router as auth_router
-from app.api.subscription import router as subscription_router
-from app.api.repository_review import router as review_router
-from app.api.email_communication import router as email_router
+import importlib
+
+_ROUTER_MODULES = {
+    "auth_router": "app.api.authentication",
+    "subscription_router": "app.api.subscription",
+    "review_router": "app.api.repository_review",
+    "email_router": "app.api.email_communication"
+}
 
 __all__ = [
     "auth_router",
@@ -12,3 +19,9 @@ __all__ = [
     "review_router",
     "email_router"
 ]
+
+
+def __getattr__(name):
+    if name not in _ROUTER_MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return importlib.import_module(_ROUTER_MODULES[name]).router
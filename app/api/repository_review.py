@@ -5,3 +5,107 @@
 # - Retrieving review results
 # - Managing review feedback
 # - Exporting review reports
+
+import asyncio
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import BaseModel
+
+from app.api.authentication import get_current_user
+from app.intake.input_validation import InputValidator, ValidationError
+from app.models.repository import Repository
+from app.services.review_job_service import ReviewJob, get_review_job_queue
+
+router = APIRouter(prefix="/reviews", tags=["reviews"])
+
+# Subscription types allowed to review private repositories
+PAID_SUBSCRIPTION_TYPES = {"paid", "premium"}
+
+# Validation failures that are not a malformed request
+VALIDATION_ERROR_STATUSES = {
+    "subscription_required": status.HTTP_403_FORBIDDEN,
+    "rate_limit": status.HTTP_429_TOO_MANY_REQUESTS,
+    "github_api_error": status.HTTP_502_BAD_GATEWAY
+}
+
+class ReviewJobRequest(BaseModel):
+    repo_url: str
+    model: Optional[str] = None
+
+def _account(current_user: Dict[str, Any]) -> Dict[str, Any]:
+    """Unwrap the user record from the authentication response."""
+    return current_user.get("user") or current_user
+
+def _subscription_tier(current_user: Dict[str, Any]) -> str:
+    """Map the user's subscription type to an InputValidator tier."""
+    metadata = _account(current_user).get("user_metadata") or {}
+    return "paid" if metadata.get("subscription_type") in PAID_SUBSCRIPTION_TYPES else "free"
+
+def _job_response(job: ReviewJob, position: Optional[int]) -> Dict[str, Any]:
+    """Describe a job, with its rate-limit wait only while it is running."""
+    response = job.to_dict()
+    rate_limit_wait = response.pop("rate_limit_wait")
+    response["position"] = position
+    response["estimated_wait"] = rate_limit_wait if job.status == "In Progress" else None
+    return response
+
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def enqueue_review(request: ReviewJobRequest, current_user: Dict[str, Any] = Depends(get_current_user)):
+    """
+    Queue a repository review to be run by the review workers.
+    
+    The repository is checked against the user's subscription tier before
+    it is queued, so private repositories need a paid subscription.
+    
+    Args:
+        request (ReviewJobRequest): Repository URL and optional model
+        current_user (dict): Authenticated user
+    
+    Returns:
+        dict: The queued job and its position in the queue
+    """
+    try:
+        # Reuse the repository model's URL validation
+        Repository(repo_id="pending", submission_method="github_url", github_url=request.repo_url)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    validator = InputValidator(_subscription_tier(current_user))
+    try:
+        await asyncio.to_thread(validator.validate_input, request.repo_url)
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=VALIDATION_ERROR_STATUSES.get(e.error_type, status.HTTP_400_BAD_REQUEST),
+            detail=e.message
+        )
+    
+    queue = get_review_job_queue()
+    job = await asyncio.to_thread(
+        queue.enqueue, request.repo_url, request.model, str(_account(current_user)["id"])
+    )
+    position = await asyncio.to_thread(queue.position, job.job_id)
+    return _job_response(job, position)
+
+@router.get("/jobs/{job_id}")
+async def get_review_job(job_id: str, current_user: Dict[str, Any] = Depends(get_current_user)):
+    """
+    Poll the status of a queued review.
+    
+    Args:
+        job_id (str): Job identifier returned when the review was queued
+        current_user (dict): Authenticated user; only the user who queued
+            the job can see it
+    
+    Returns:
+        dict: Job status, its queue position while pending, the seconds its
+        LLM calls are held up by the rate limits while in progress
+        (estimated_wait), and the review id once completed
+    """
+    queue = get_review_job_queue()
+    job = await asyncio.to_thread(queue.get, job_id)
+    # Other users' jobs are reported as missing rather than forbidden
+    if job is None or job.owner_id != str(_account(current_user)["id"]):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Review job not found")
+    position = await asyncio.to_thread(queue.position, job_id)
+    return _job_response(job, position)
@@ -0,0 +1,23 @@
+# This module builds the FastAPI application that serves the API routers
+# Run it with an ASGI server, for example:
+#     uvicorn app.api.server:app
+
+from fastapi import FastAPI
+
+from app.api import auth_router, review_router
+
+
+def create_app() -> FastAPI:
+    """
+    Create the API application with its routers mounted.
+
+    Returns:
+        FastAPI: Application serving authentication and review endpoints
+    """
+    api = FastAPI(title="Code Review API")
+    api.include_router(auth_router, prefix="/auth", tags=["auth"])
+    api.include_router(review_router)
+    return api
+
+
+app = create_app()
@@ -0,0 +1,146 @@
+"""
+Token-aware planning of batch reviews.
+
+Packs files into batches under a token budget instead of fixed groups of ten,
+so batches of large files no longer overflow the context window and batches
+of tiny files no longer waste calls. Files are packed in priority order and
+files from the same directory are kept together where they fit.
+"""
+import os
+import posixpath
+from dataclasses import dataclass, field
+from itertools import groupby
+from typing import Any, Callable, List, Optional, Tuple
+
+from app.intake.path_classifier import PRIORITY_ORDER
+from app.utils.tokens import estimate_tokens
+
+DEFAULT_BATCH_TOKEN_BUDGET = 50000
+
+# "File: <path>" header and separators added around each file in a batch prompt
+FILE_HEADER_TOKENS = 16
+
+
+@dataclass
+class _Bin:
+    """A batch being filled."""
+    items: List[Any] = field(default_factory=list)
+    tokens: int = 0
+
+
+class BatchPlanner:
+    """Packs files into token-bounded review batches."""
+
+    def __init__(self, token_budget: int = DEFAULT_BATCH_TOKEN_BUDGET, max_files: Optional[int] = None):
+        """
+        Initialize the batch planner.
+
+        Args:
+            token_budget: Maximum estimated tokens of file content per batch
+            max_files: Optional cap on the number of files per batch
+        """
+        if token_budget <= 0:
+            raise ValueError("Token budget must be positive")
+        self.token_budget = token_budget
+        self.max_files = max_files
+
+    @classmethod
+    def from_env(cls) -> 'BatchPlanner':
+        """
+        Create a planner configured from environment variables.
+
+        Returns:
+            BatchPlanner: Planner using BATCH_TOKEN_BUDGET and BATCH_MAX_FILES when set
+        """
+        max_files = os.getenv('BATCH_MAX_FILES')
+        return cls(
+            token_budget=int(os.getenv('BATCH_TOKEN_BUDGET', DEFAULT_BATCH_TOKEN_BUDGET)),
+            max_files=int(max_files) if max_files else None
+        )
+
+    @staticmethod
+    def estimate_file_tokens(path: str, content: str) -> int:
+        """
+        Estimate the tokens a file contributes to a batch prompt.
+
+        Args:
+            path: File path
+            content: File content
+
+        Returns:
+            int: Estimated token count including the per-file header
+        """
+        return estimate_tokens(content) + estimate_tokens(path) + FILE_HEADER_TOKENS
+
+    def plan(
+        self,
+        items: List[Any],
+        describe: Optional[Callable[[Any], Tuple[str, str, str]]] = None
+    ) -> List[List[Any]]:
+        """
+        Pack items into batches.
+
+        Items are ordered by priority, then directory, then path. Each
+        directory group is placed whole into the first batch of the current
+        priority tier (or the last batch of the previous tier) with room for
+        it. Groups too large for one batch are placed file by file. A single
+        file over the budget gets a batch of its own.
+
+        Args:
+            items: Files to batch; ExtractedFile objects by default
+            describe: Optional function returning (path, content, priority)
+                for an item, for batching other record types
+
+        Returns:
+            List of batches, each a list of the original items
+        """
+        describe = describe or (lambda f: (f.path, f.content, f.priority))
+
+        entries = []
+        for item in items:
+            path, content, priority = describe(item)
+            entries.append((
+                PRIORITY_ORDER.get(priority, 3),
+                posixpath.dirname(path),
+                path,
+                self.estimate_file_tokens(path, content),
+                item
+            ))
+        entries.sort(key=lambda entry: entry[:3])
+
+        bins: List[_Bin] = []
+        for _, tier in groupby(entries, key=lambda entry: entry[0]):
+            # Lower-priority files may top up the previous tier's last batch
+            first_usable = max(len(bins) - 1, 0)
+            for _, group in groupby(tier, key=lambda entry: entry[1]):
+                group = list(group)
+                group_tokens = sum(entry[3] for entry in group)
+                if self._fits_empty(len(group), group_tokens):
+                    self._place(bins, first_usable, group, group_tokens)
+                else:
+                    for entry in group:
+                        self._place(bins, first_usable, [entry], entry[3])
+
+        return [b.items for b in bins]
+
+    def _fits_empty(self, count: int, tokens: int) -> bool:
+        """Whether a unit fits in an empty batch."""
+        return tokens <= self.token_budget and (self.max_files is None or count <= self.max_files)
+
+    def _fits(self, bin_: _Bin, count: int, tokens: int) -> bool:
+        """Whether a unit fits in a partially filled batch."""
+        if bin_.tokens + tokens > self.token_budget:
+            return False
+        return self.max_files is None or len(bin_.items) + count <= self.max_files
+
+    def _place(self, bins: List[_Bin], first_usable: int, unit: List[tuple], tokens: int) -> None:
+        """Place a unit into the first usable batch with room, or a new batch."""
+        target = next(
+            (b for b in bins[first_usable:] if self._fits(b, len(unit), tokens)),
+            None
+        )
+        if target is None:
+            target = _Bin()
+            bins.append(target)
+        target.items.extend(entry[4] for entry in unit)
+        target.tokens += tokens
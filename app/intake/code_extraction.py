@@ -9,16 +9,44 @@ from typing import List, Optional, Set, Generator, Dict, Any
 import requests
 import os
 import base64
+import hashlib
 import logging
 import re
+import mmap
+import tarfile
+import collections
 import concurrent.futures
 import queue
 import threading
 from functools import partial
+from app.intake.input_validation import InputValidator
+from app.intake.batch_planning import BatchPlanner
+from app.intake.path_classifier import (
+    PathClassifier, PathClassification, DEFAULT_CRITICAL_NAMES,
+    DEFAULT_SKIP_PATTERNS, PRIORITY_ORDER, detect_language
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def git_blob_sha(data: bytes) -> str:
+    """
+    Compute the SHA git assigns to a blob with the given content.
+    
+    Args:
+        data: Raw file bytes
+        
+    Returns:
+        str: Hex-encoded blob SHA
+    """
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+class _MappedFile(mmap.mmap):
+    """Read-only memory map usable as a seekable file object by zipfile."""
+    
+    def seekable(self) -> bool:
+        return True
+
 @dataclass
 class ExtractedFile:
     """Represents a code file extracted from a source."""
@@ -28,6 +56,22 @@ class ExtractedFile:
     size: int
     priority: str = 'Medium'
     repository_hierarchy: Dict[str, Any] = field(default_factory=dict)
+    sha: Optional[str] = None
+
+    @property
+    def blob_sha(self) -> str:
+        """
+        Git blob SHA identifying this file's content.
+        
+        Uses the SHA reported by the source when available, otherwise computes
+        it from the content the same way git does.
+        
+        Returns:
+            str: Hex-encoded blob SHA
+        """
+        if self.sha:
+            return self.sha
+        return git_blob_sha(self.content.encode('utf-8'))
 
     @staticmethod
     def detect_language(file_path: str) -> str:
@@ -40,43 +84,19 @@ class ExtractedFile:
         Returns:
             str: Detected programming language
         """
-        extension = Path(file_path).suffix.lower()
-        language_map = {
-            '.py': 'Python',
-            '.js': 'JavaScript',
-            '.ts': 'TypeScript',
-            '.java': 'Java',
-            '.cpp': 'C++',
-            '.c': 'C',
-            '.cs': 'C#',
-            '.rb': 'Ruby',
-            '.php': 'PHP',
-            '.go': 'Go',
-            '.rs': 'Rust',
-            '.swift': 'Swift',
-            '.kt': 'Kotlin',
-            '.scala': 'Scala',
-            '.html': 'HTML',
-            '.css': 'CSS',
-            '.sql': 'SQL',
-            '.sh': 'Shell',
-            '.yaml': 'YAML',
-            '.yml': 'YAML',
-            '.json': 'JSON',
-            '.xml': 'XML',
-            '.md': 'Markdown'
-        }
-        return language_map.get(extension, 'Unknown')
+        return detect_language(file_path)
 
 class CodeExtractor:
     """Handles extraction of code from various sources with enhanced processing."""
     
-    def __init__(self, max_workers: int = 5):
+    def __init__(self, max_workers: int = 5, use_archive: bool = False):
         """
         Initialize the code extractor with concurrent processing capabilities.
         
         Args:
             max_workers: Maximum number of concurrent workers for file processing
+            use_archive: Extract GitHub repositories from a single tarball
+                download instead of one request per file
         """
         # Existing initialization
         self.code_extensions = {
@@ -86,27 +106,32 @@ class CodeExtractor:
             '.json', '.xml', '.md'
         }
 
-        self.critical_names = {'main.py', 'index.js', 'app.py', 'server.py'}
-        
-        self.skip_patterns = {
-            r'\.gitignore$', r'\.dockerignore$', r'LICENSE.*', r'CHANGELOG.*',
-            r'README.*', r'CONTRIBUTING.*', r'node_modules/.*', r'dist/.*',
-            r'build/.*', r'\.pyc$', r'__pycache__/.*', r'\.egg-info/.*',
-            r'\.tox/.*', r'\.pytest_cache/.*', r'\.coverage$', r'coverage\.xml$',
-            r'\.DS_Store$', r'tests?/fixtures/.*', r'tests?/data/.*',
-            r'tests?/resources/.*', r'\.env\..*', r'\.vscode/.*', r'\.idea/.*',
-            r'\.settings/.*', 
-            # Enhanced test file filtering
-            r'tests?/.*', r'.*_test\..*', r'test_.*', r'.*_spec\..*'
-        }
-
-        self.skip_regex = re.compile('|'.join(self.skip_patterns))
+        self.critical_names = set(DEFAULT_CRITICAL_NAMES)
+        
+        self.skip_patterns = set(DEFAULT_SKIP_PATTERNS)
+        
+        # One precompiled classifier answers skip, priority and language
+        self.classifier = PathClassifier(self.critical_names, DEFAULT_SKIP_PATTERNS)
+        self.skip_regex = self.classifier.skip_regex
         
         # Concurrent processing configuration
         self.max_workers = max_workers
+        self.use_archive = use_archive
         self.file_queue = queue.Queue()
         self.batch_queue = queue.Queue()
         
+    def classify(self, file_path: str) -> PathClassification:
+        """
+        Classify a path for skipping, priority and language in one pass.
+        
+        Args:
+            file_path: Path to the file
+            
+        Returns:
+            PathClassification: Classification of the path
+        """
+        return self.classifier.classify(file_path)
+
     def is_critical_file(self, file_path: str) -> bool:
         """
         Check if a file is critical based on its name.
@@ -117,33 +142,34 @@ class CodeExtractor:
         Returns:
             bool: True if file is critical, False otherwise
         """
-        return Path(file_path).name in self.critical_names
+        return self.classifier.classify(file_path).priority == 'Critical'
 
     def should_skip_file(self, file_path: str) -> bool:
         """
         Check if a file should be skipped based on skip rules.
         
+        Critical files are never skipped.
+        
         Args:
             file_path: Path to the file
             
         Returns:
             bool: True if file should be skipped, False otherwise
         """
-        # Never skip critical files
-        if self.is_critical_file(file_path):
-            return False
-        
-        # Check against skip patterns
-        if self.skip_regex.search(file_path):
-            return True
-        
-        # Additional test file filtering
-        filename = Path(file_path).name.lower()
-        test_indicators = ['test_', '_test', 'spec_', '_spec']
-        if any(indicator in filename for indicator in test_indicators):
-            return True
+        return self.classifier.classify(file_path).skip
+
+    def is_reviewable(self, file_path: str) -> bool:
+        """
+        Check if a file has a code extension and is not skipped.
         
-        return False
+        Args:
+            file_path: Path to the file
+            
+        Returns:
+            bool: True if the file should be extracted for review
+        """
+        classification = self.classifier.classify(file_path)
+        return not classification.skip and classification.extension.lower() in self.code_extensions
 
     def extract_from_github(self, repo_url: str) -> List[ExtractedFile]:
         """
@@ -157,15 +183,15 @@ class CodeExtractor:
         """
         return list(self.stream_github_files(repo_url))
 
-    def stream_github_files(self, repo_url: str) -> Generator[ExtractedFile, None, None]:
+    def _github_request_context(self, repo_url: str):
         """
-        Stream files from a GitHub repository with enhanced processing.
+        Parse a repository URL and build GitHub API headers.
         
         Args:
             repo_url: URL of the GitHub repository
             
-        Yields:
-            ExtractedFile: Extracted and processed files
+        Returns:
+            tuple: (owner, repo, headers)
         """
         # Parse owner/repo from URL
         _, _, _, owner, repo = repo_url.rstrip('/').split('/')
@@ -176,24 +202,79 @@ class CodeExtractor:
             'Authorization': f'token {token}',
             'Accept': 'application/vnd.github.v3+json'
         }
+        return owner, repo, headers
+    
+    def _fetch_reviewable_tree(self, owner: str, repo: str, headers: Dict[str, str]) -> List[Dict[str, Any]]:
+        """
+        Fetch the repository tree and keep only reviewable blobs.
         
-        logger.info(f"Streaming repository: {owner}/{repo}")
+        Args:
+            owner: Repository owner
+            repo: Repository name
+            headers: API request headers
+            
+        Returns:
+            List of GitHub tree items for code files that are not skipped
+        """
         api_url = f'https://api.github.com/repos/{owner}/{repo}/git/trees/main?recursive=1'
+        response = requests.get(api_url, headers=headers)
+        response.raise_for_status()
+        tree = response.json()['tree']
         
+        return [
+            item for item in tree
+            if item['type'] == 'blob' and self.is_reviewable(item['path'])
+        ]
+    
+    def list_github_tree(self, repo_url: str) -> Dict[str, str]:
+        """
+        List reviewable files in a GitHub repository without downloading them.
+        
+        Args:
+            repo_url: URL of the GitHub repository
+            
+        Returns:
+            Dict mapping file path to blob SHA
+        """
+        owner, repo, headers = self._github_request_context(repo_url)
         try:
-            response = requests.get(api_url, headers=headers)
-            response.raise_for_status()
-            tree = response.json()['tree']
+            return {
+                item['path']: item.get('sha')
+                for item in self._fetch_reviewable_tree(owner, repo, headers)
+            }
+        except requests.RequestException as e:
+            logger.error(f"Error listing repository tree: {str(e)}")
+            raise
+
+    def stream_github_files(self, repo_url: str, paths: Optional[Set[str]] = None) -> Generator[ExtractedFile, None, None]:
+        """
+        Stream files from a GitHub repository with enhanced processing.
+        
+        Args:
+            repo_url: URL of the GitHub repository
+            paths: Optional set of paths to restrict extraction to
+            
+        Yields:
+            ExtractedFile: Extracted and processed files
+        """
+        if self.use_archive:
+            yield from self.stream_github_archive(repo_url, paths)
+            return
+        
+        owner, repo, headers = self._github_request_context(repo_url)
+        logger.info(f"Streaming repository: {owner}/{repo}")
+        
+        try:
+            items = self._fetch_reviewable_tree(owner, repo, headers)
+            if paths is not None:
+                items = [item for item in items if item['path'] in paths]
             
             # Concurrent file processing
             with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                file_futures = []
-                for item in tree:
-                    if item['type'] == 'blob':
-                        path = item['path']
-                        if Path(path).suffix.lower() in self.code_extensions and not self.should_skip_file(path):
-                            future = executor.submit(self._process_github_file, item, headers, owner, repo)
-                            file_futures.append(future)
+                file_futures = [
+                    executor.submit(self._process_github_file, item, headers, owner, repo)
+                    for item in items
+                ]
                 
                 for future in concurrent.futures.as_completed(file_futures):
                     extracted_file = future.result()
@@ -204,6 +285,211 @@ class CodeExtractor:
             logger.error(f"Error streaming repository: {str(e)}")
             raise
     
+    def stream_github_archive(self, repo_url: str, paths: Optional[Set[str]] = None) -> Generator[ExtractedFile, None, None]:
+        """
+        Stream files from a GitHub repository using a single tarball download.
+        
+        The archive is decompressed as it arrives and never written to disk.
+        
+        Args:
+            repo_url: URL of the GitHub repository
+            paths: Optional set of paths to restrict extraction to
+            
+        Yields:
+            ExtractedFile: Extracted and processed files
+        """
+        owner, repo, headers = self._github_request_context(repo_url)
+        logger.info(f"Streaming repository archive: {owner}/{repo}")
+        
+        try:
+            archive_url = f'https://api.github.com/repos/{owner}/{repo}/tarball/main'
+            response = requests.get(archive_url, headers=headers, stream=True)
+            response.raise_for_status()
+            try:
+                # GitHub may gzip-encode the transfer on top of the .tar.gz
+                response.raw.decode_content = True
+                yield from self.stream_tar_files(response.raw, owner, repo, paths=paths)
+            finally:
+                response.close()
+                
+        except requests.RequestException as e:
+            logger.error(f"Error streaming repository archive: {str(e)}")
+            raise
+    
+    def stream_tar_files(
+        self,
+        fileobj,
+        owner: str,
+        repo: str,
+        branch: str = 'main',
+        paths: Optional[Set[str]] = None
+    ) -> Generator[ExtractedFile, None, None]:
+        """
+        Stream reviewable files out of a (possibly compressed) tar stream.
+        
+        Members are read sequentially, so the stream does not need to be
+        seekable. The top-level directory GitHub adds to archives
+        (``owner-repo-<sha>/``) is stripped from member paths.
+        
+        Args:
+            fileobj: Readable binary stream containing the tar archive
+            owner: Repository owner
+            repo: Repository name
+            branch: Branch the archive was taken from
+            paths: Optional set of paths to restrict extraction to
+            
+        Yields:
+            ExtractedFile: Extracted and processed files
+        """
+        with tarfile.open(fileobj=fileobj, mode='r|*') as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                
+                # Strip the archive's top-level directory
+                parts = member.name.split('/', 1)
+                if len(parts) < 2:
+                    continue
+                path = parts[1]
+                
+                if paths is not None and path not in paths:
+                    continue
+                if not self.is_reviewable(path):
+                    continue
+                
+                data = archive.extractfile(member).read()
+                yield self._build_extracted_file(
+                    path,
+                    data.decode('utf-8', errors='replace'),
+                    self._github_hierarchy(owner, repo, path, branch),
+                    sha=git_blob_sha(data)
+                )
+    
+    def stream_zip_files(self, zip_path: str, validator: Optional[InputValidator] = None) -> Generator[ExtractedFile, None, None]:
+        """
+        Stream reviewable files from an uploaded ZIP archive with bounded memory.
+        
+        The archive is memory-mapped rather than read into memory, and members
+        are decompressed lazily by a thread pool. At most ``2 * max_workers``
+        decompressed members are held at once; files are yielded in archive
+        order.
+        
+        When a validator is given, validation happens in the same pass: member
+        headers are checked up front from the central directory, and CRC, size
+        and compression-ratio limits are enforced while each member is
+        decompressed, aborting the stream on the first violation.
+        
+        Args:
+            zip_path: Path to the ZIP file
+            validator: Optional InputValidator enforcing upload limits
+            
+        Yields:
+            ExtractedFile: Extracted and processed files
+            
+        Raises:
+            ValidationError: If the archive violates a validator limit
+        """
+        archive_name = Path(zip_path).name
+        logger.info(f"Streaming ZIP archive: {archive_name}")
+        
+        with open(zip_path, 'rb') as f, \
+                _MappedFile(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+                zipfile.ZipFile(mapped) as archive:
+            infos = archive.infolist()
+            if validator is not None:
+                infos = validator.check_zip_entries(infos)
+            members = [
+                info for info in infos
+                if not info.is_dir() and self.is_reviewable(info.filename)
+            ]
+            
+            window = max(1, self.max_workers * 2)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                pending = collections.deque()
+                for info in members:
+                    pending.append(executor.submit(self._read_zip_member, archive, info, archive_name, validator))
+                    if len(pending) >= window:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+    
+    def _read_zip_member(
+        self,
+        archive: zipfile.ZipFile,
+        info: zipfile.ZipInfo,
+        archive_name: str,
+        validator: Optional[InputValidator] = None
+    ) -> ExtractedFile:
+        """
+        Decompress a single ZIP member into an ExtractedFile.
+        
+        Args:
+            archive: Open ZIP archive
+            info: Member to read
+            archive_name: File name of the uploaded archive
+            validator: Optional InputValidator enforcing limits while reading
+            
+        Returns:
+            ExtractedFile: Extracted file
+        """
+        if validator is not None:
+            data = validator.read_zip_member(archive, info)
+        else:
+            with archive.open(info) as member:
+                data = member.read()
+        
+        return self._build_extracted_file(
+            info.filename,
+            data.decode('utf-8', errors='replace'),
+            {
+                'archive': archive_name,
+                'full_path': info.filename
+            },
+            sha=git_blob_sha(data)
+        )
+    
+    def _github_hierarchy(self, owner: str, repo: str, path: str, branch: str = 'main') -> Dict[str, Any]:
+        """Build repository hierarchy metadata for a GitHub file."""
+        return {
+            'owner': owner,
+            'repo': repo,
+            'branch': branch,
+            'full_path': path
+        }
+    
+    def _build_extracted_file(
+        self,
+        path: str,
+        content: str,
+        repository_hierarchy: Dict[str, Any],
+        sha: Optional[str] = None
+    ) -> ExtractedFile:
+        """
+        Build an ExtractedFile with priority, language and hierarchy metadata.
+        
+        Args:
+            path: File path within the repository
+            content: Decoded file content
+            repository_hierarchy: Source metadata for the file
+            sha: Git blob SHA of the content, if known
+            
+        Returns:
+            ExtractedFile: Extracted file
+        """
+        # Determine priority and language
+        classification = self.classifier.classify(path)
+        
+        # Create extracted file with repository hierarchy
+        return ExtractedFile(
+            path=path,
+            content=content,
+            language=classification.language,
+            size=len(content),
+            priority=classification.priority,
+            repository_hierarchy=repository_hierarchy,
+            sha=sha
+        )
+    
     def _process_github_file(self, item: Dict[str, Any], headers: Dict[str, str], owner: str, repo: str) -> Optional[ExtractedFile]:
         """
         Process a single GitHub file with detailed metadata.
@@ -226,26 +512,9 @@ class CodeExtractor:
             content_response.raise_for_status()
             content = content_response.text
             
-            # Determine priority and language
-            priority = self.determine_priority(path)
-            language = ExtractedFile.detect_language(path)
-            
-            # Create extracted file with repository hierarchy
-            extracted_file = ExtractedFile(
-                path=path,
-                content=content,
-                language=language,
-                size=len(content),
-                priority=priority,
-                repository_hierarchy={
-                    'owner': owner,
-                    'repo': repo,
-                    'branch': 'main',
-                    'full_path': path
-                }
+            return self._build_extracted_file(
+                path, content, self._github_hierarchy(owner, repo, path), sha=item.get('sha')
             )
-            
-            return extracted_file
         
         except requests.RequestException as e:
             logger.error(f"Error processing file {path}: {str(e)}")
@@ -261,63 +530,33 @@ class CodeExtractor:
         Returns:
             str: Priority level (Critical, High, Medium, Low, Skip)
         """
-        # Get just the filename without the path
-        filename = Path(file_path).name
-        logger.info(f"Determining priority for file: {filename} (full path: {file_path})")
-
-        # Critical files - these take absolute precedence regardless of location
-        if self.is_critical_file(file_path):
-            logger.info(f"{filename} is Critical (entry point)")
-            return 'Critical'
-
-        # Skip check happens after critical file check
-        if self.should_skip_file(file_path):
-            logger.info(f"{file_path} is Skip (matches skip pattern)")
-            return 'Skip'
-
-        # Convert path to lowercase for case-insensitive comparisons
-        path_lower = file_path.lower()
-        name_lower = filename.lower()
-        
-        # Test files - only check the filename itself
-        if name_lower.startswith('test_') or name_lower.endswith('_test.py'):
-            logger.info(f"{filename} is Low (test file)")
-            return 'Low'
-            
-        # Source files in main directories
-        source_dirs = {'src/', 'lib/', 'core/'}
-        if any(path_lower.startswith(d) for d in source_dirs):
-            logger.info(f"{filename} is High (source file)")
-            return 'High'
-        
-        # Documentation
-        if path_lower.endswith(('.md', '.txt')):
-            logger.info(f"{filename} is Low (documentation)")
-            return 'Low'
-        
-        # Configuration files
-        if path_lower.endswith(('.json', '.yml', '.yaml', '.xml')):
-            logger.info(f"{filename} is Medium (config file)")
-            return 'Medium'
-        
-        # Default to Medium for other code files
-        logger.info(f"{filename} is Medium (default)")
-        return 'Medium'
+        priority = self.classifier.classify(file_path).priority
+        logger.debug(f"{file_path} is {priority}")
+        return priority
     
-    def form_review_batches(self, files: List[ExtractedFile], batch_size: int = 10) -> List[List[ExtractedFile]]:
+    def form_review_batches(
+        self,
+        files: List[ExtractedFile],
+        batch_size: int = 10,
+        token_budget: Optional[int] = None
+    ) -> List[List[ExtractedFile]]:
         """
         Form review batches based on file priority.
         
         Args:
             files: List of extracted files
-            batch_size: Number of files per batch
+            batch_size: Number of files per batch when no token budget is given
+            token_budget: Optional token budget per batch; when given, files are
+                packed by estimated size instead of fixed batch_size groups
             
         Returns:
             List of file batches
         """
+        if token_budget is not None:
+            return BatchPlanner(token_budget=token_budget).plan(files)
+        
         # Sort files by priority: Critical first, then High, Medium, Low
-        priority_order = {'Critical': 0, 'High': 1, 'Medium': 2, 'Low': 3}
-        sorted_files = sorted(files, key=lambda f: priority_order.get(f.priority, 3))
+        sorted_files = sorted(files, key=lambda f: PRIORITY_ORDER.get(f.priority, 3))
         
         batches = []
         current_batch = []
@@ -0,0 +1,392 @@
+"""
+Structural skeletons of source files for compact prompts.
+
+A skeleton keeps what a reviewer needs to see how a file fits into the
+codebase: the module docstring, imports, decorators and class and function
+signatures with the summary line of their docstrings, with bodies longer
+than a threshold replaced by ``...``. Python is parsed with the stdlib
+``ast`` module; JavaScript and TypeScript are scanned with a small lexer
+that understands strings, comments, template literals and regular
+expressions well enough to match braces.
+
+Parsing thousands of files is CPU-bound, so SkeletonExtractor runs it in a
+process pool and memoizes results for the rest of the run. Runs sharing a
+process share the pool but keep separate memos (see start_run).
+"""
+import ast
+import asyncio
+import contextvars
+import hashlib
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bodies with more lines than this are elided
+DEFAULT_MAX_BODY_LINES = 3
+
+# Files sent to a worker process per task
+CHUNK_SIZE = 32
+
+SKELETON_LANGUAGES = frozenset({'Python', 'JavaScript', 'TypeScript'})
+
+_ELLIPSIS = "..."
+
+
+def _python_skeleton(content: str, max_body_lines: int) -> str:
+    """Skeleton of Python source; raises SyntaxError if it does not parse."""
+    tree = ast.parse(content)
+    lines = content.splitlines()
+    out: List[str] = []
+
+    def segment(start: int, end: int) -> None:
+        out.extend(lines[start - 1:end])
+
+    def placeholder(node: ast.AST) -> None:
+        line = lines[node.lineno - 1]
+        out.append(line[:len(line) - len(line.lstrip())] + _ELLIPSIS)
+
+    def is_docstring(node: ast.AST) -> bool:
+        return (
+            isinstance(node, ast.Expr)
+            and isinstance(node.value, ast.Constant)
+            and isinstance(node.value.value, str)
+        )
+
+    def emit(nodes: List[ast.stmt]) -> None:
+        for index, node in enumerate(nodes):
+            span = node.end_lineno - node.lineno + 1
+            if isinstance(node, (ast.Import, ast.ImportFrom)) or index == 0 and is_docstring(node):
+                segment(node.lineno, node.end_lineno)
+            elif isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+                emit_definition(node)
+            elif span <= max_body_lines:
+                segment(node.lineno, node.end_lineno)
+            elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+                # Long constants: keep the name, drop the value
+                target = node.targets[0] if isinstance(node, ast.Assign) else node.target
+                line = lines[node.lineno - 1]
+                indent = line[:len(line) - len(line.lstrip())]
+                out.append(f"{indent}{ast.get_source_segment(content, target)} = {_ELLIPSIS}")
+            else:
+                out.append(lines[node.lineno - 1])
+                out.append(" " * (node.col_offset + 4) + _ELLIPSIS)
+
+    def emit_definition(node) -> None:
+        start = node.decorator_list[0].lineno if node.decorator_list else node.lineno
+        body = node.body
+        if body[0].lineno == node.lineno:
+            # One-liner such as ``def f(): pass``
+            segment(start, node.end_lineno)
+            return
+        segment(start, body[0].lineno - 1)
+        if is_docstring(body[0]):
+            # Only the summary line of a definition's docstring
+            line = lines[body[0].lineno - 1]
+            summary = (ast.get_docstring(node) or "").strip().split("\n")[0]
+            out.append(f'{line[:len(line) - len(line.lstrip())]}"""{summary}"""')
+            body = body[1:]
+        if not body:
+            return
+        if isinstance(node, ast.ClassDef):
+            emit(body)
+        elif node.end_lineno - body[0].lineno + 1 <= max_body_lines:
+            segment(body[0].lineno, node.end_lineno)
+        else:
+            placeholder(body[0])
+
+    emit(tree.body)
+    return "\n".join(out)
+
+
+# Brace blocks opened after these keywords hold declarations and are kept
+_CONTAINER = re.compile(r'\b(?:class|interface|enum|namespace|module|declare)\b')
+
+# A '/' after one of these starts a regular expression rather than a division
+_REGEX_PRECEDERS = frozenset('(,=:[!&|?{};+-*%~^')
+
+
+def _skip_string(text: str, index: int) -> int:
+    """Index just past the quoted string starting at index."""
+    quote = text[index]
+    index += 1
+    while index < len(text):
+        char = text[index]
+        if char == '\\':
+            index += 2
+            continue
+        if char == quote or char == '\n':
+            return index + 1
+        index += 1
+    return len(text)
+
+
+def _skip_template(text: str, index: int) -> int:
+    """Index just past the template literal starting at index, including ${...} expressions."""
+    index += 1
+    depth = 0
+    while index < len(text):
+        char = text[index]
+        if char == '\\':
+            index += 2
+            continue
+        if depth == 0 and char == '`':
+            return index + 1
+        if char == '$' and text.startswith('{', index + 1):
+            depth += 1
+            index += 2
+            continue
+        if depth:
+            if char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+            elif char in '"\'':
+                index = _skip_string(text, index)
+                continue
+            elif char == '`':
+                index = _skip_template(text, index)
+                continue
+        index += 1
+    return len(text)
+
+
+def _skip_regex(text: str, index: int) -> int:
+    """Index just past the regular expression literal starting at index."""
+    index += 1
+    in_class = False
+    while index < len(text):
+        char = text[index]
+        if char == '\\':
+            index += 2
+            continue
+        if char == '\n':
+            return index
+        if char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+        elif char == '/' and not in_class:
+            return index + 1
+        index += 1
+    return len(text)
+
+
+def _script_skeleton(content: str, max_body_lines: int) -> str:
+    """Skeleton of JavaScript or TypeScript source."""
+    elided: List[Tuple[int, int]] = []
+    # (index of '{', whether the block holds declarations)
+    stack: List[Tuple[int, bool]] = []
+    statement_start = 0
+    previous = ''
+    index, length = 0, len(content)
+    while index < length:
+        char = content[index]
+        if char in '"\'':
+            index = _skip_string(content, index)
+            previous = char
+            continue
+        if char == '`':
+            index = _skip_template(content, index)
+            previous = char
+            continue
+        if char == '/' and content.startswith('/', index + 1):
+            end = content.find('\n', index)
+            index = length if end == -1 else end
+            continue
+        if char == '/' and content.startswith('*', index + 1):
+            end = content.find('*/', index + 2)
+            index = length if end == -1 else end + 2
+            continue
+        if char == '/' and (not previous or previous in _REGEX_PRECEDERS):
+            index = _skip_regex(content, index)
+            previous = '/'
+            continue
+        if char == '{':
+            stack.append((index, bool(_CONTAINER.search(content, statement_start, index))))
+            statement_start = index + 1
+        elif char == '}':
+            if stack:
+                start, container = stack.pop()
+                if not container and content.count('\n', start, index) - 1 > max_body_lines:
+                    elided.append((start, index))
+            statement_start = index + 1
+        elif char == ';':
+            statement_start = index + 1
+        if not char.isspace():
+            previous = char
+        index += 1
+
+    pieces, copied_to = [], 0
+    for start, end in sorted(elided):
+        if start < copied_to:
+            # Inside a block that is already elided
+            continue
+        pieces.append(content[copied_to:start + 1])
+        pieces.append(f" {_ELLIPSIS} ")
+        copied_to = end
+    pieces.append(content[copied_to:])
+    return "".join(pieces)
+
+
+def extract_skeleton(content: str, language: str, max_body_lines: int = DEFAULT_MAX_BODY_LINES) -> Optional[str]:
+    """
+    Extract the structural skeleton of a source file.
+
+    Args:
+        content: File content
+        language: Language name as detected at intake
+        max_body_lines: Bodies with more lines than this are elided
+
+    Returns:
+        Optional[str]: The skeleton, or None if the language is not
+        supported or the file does not parse
+    """
+    try:
+        if language == 'Python':
+            return _python_skeleton(content, max_body_lines)
+        if language in ('JavaScript', 'TypeScript'):
+            return _script_skeleton(content, max_body_lines)
+    except (SyntaxError, ValueError, RecursionError):
+        return None
+    return None
+
+
+def _extract_chunk(items: List[Tuple[str, str]], max_body_lines: int) -> List[Optional[str]]:
+    """Worker process entry point: skeletons of (content, language) pairs."""
+    return [extract_skeleton(content, language, max_body_lines) for content, language in items]
+
+
+class SkeletonExtractor:
+    """Extracts skeletons in a process pool and remembers them by content."""
+
+    def __init__(self, max_workers: Optional[int] = None, max_body_lines: int = DEFAULT_MAX_BODY_LINES):
+        """
+        Initialize the extractor.
+
+        Args:
+            max_workers: Worker processes; defaults to the CPU count
+            max_body_lines: Bodies with more lines than this are elided
+        """
+        self.max_workers = max_workers
+        self.max_body_lines = max_body_lines
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # Memo used outside a run; runs started with start_run get their own
+        self._default_skeletons: Dict[str, Optional[str]] = {}
+        self._run_skeletons: contextvars.ContextVar[Optional[Dict[str, Optional[str]]]] = (
+            contextvars.ContextVar(f"skeletons_{id(self)}", default=None)
+        )
+
+    @classmethod
+    def from_env(cls) -> 'SkeletonExtractor':
+        """
+        Create an extractor configured from environment variables.
+
+        Returns:
+            SkeletonExtractor: Extractor using SKELETON_WORKERS and
+            SKELETON_MAX_BODY_LINES when set
+        """
+        workers = os.getenv('SKELETON_WORKERS')
+        return cls(
+            max_workers=int(workers) if workers else None,
+            max_body_lines=int(os.getenv('SKELETON_MAX_BODY_LINES', DEFAULT_MAX_BODY_LINES))
+        )
+
+    @property
+    def _skeletons(self) -> Dict[str, Optional[str]]:
+        """Memo of the current run, or the extractor's own outside a run."""
+        skeletons = self._run_skeletons.get()
+        return self._default_skeletons if skeletons is None else skeletons
+
+    def start_run(self) -> None:
+        """
+        Give the current run its own memo.
+
+        The memo follows the calling task and the tasks it starts, so runs
+        sharing this extractor in other tasks neither see nor clear it.
+        """
+        self._run_skeletons.set({})
+
+    @staticmethod
+    def _key(content: str, language: str) -> str:
+        return hashlib.sha1(f"{language}\0{content}".encode('utf-8', 'surrogatepass')).hexdigest()
+
+    def get(self, content: str, language: str) -> Optional[str]:
+        """
+        Get a file's skeleton, extracting it in this process if not prefetched.
+
+        Args:
+            content: File content
+            language: Language name as detected at intake
+
+        Returns:
+            Optional[str]: The skeleton, or None if unavailable
+        """
+        if language not in SKELETON_LANGUAGES:
+            return None
+        key = self._key(content, language)
+        if key not in self._skeletons:
+            self._skeletons[key] = extract_skeleton(content, language, self.max_body_lines)
+        return self._skeletons[key]
+
+    async def prefetch(self, files: Iterable[Tuple[str, str]]) -> None:
+        """
+        Extract skeletons in the process pool ahead of ``get`` calls.
+
+        Args:
+            files: (content, language) pairs; unsupported languages and files
+                already extracted are skipped
+        """
+        pending = {}
+        for content, language in files:
+            if language in SKELETON_LANGUAGES:
+                key = self._key(content, language)
+                if key not in self._skeletons:
+                    pending[key] = (content, language)
+        if not pending:
+            return
+        keys, items = list(pending), list(pending.values())
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        loop = asyncio.get_running_loop()
+        chunks = await asyncio.gather(*(
+            loop.run_in_executor(self._pool, _extract_chunk, items[start:start + CHUNK_SIZE], self.max_body_lines)
+            for start in range(0, len(items), CHUNK_SIZE)
+        ))
+        self._skeletons.update(zip(keys, (skeleton for chunk in chunks for skeleton in chunk)))
+        logger.info(f"Extracted {len(items)} code skeletons in {len(chunks)} worker tasks")
+
+    def clear(self) -> None:
+        """Forget the skeletons the current run extracted, keeping the worker processes."""
+        self._skeletons.clear()
+
+    def close(self) -> None:
+        """Shut down the worker processes."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+_shared_extractor: Optional[SkeletonExtractor] = None
+
+
+def get_skeleton_extractor() -> SkeletonExtractor:
+    """
+    Get the process-wide shared skeleton extractor.
+
+    Returns:
+        SkeletonExtractor: Shared extractor, created from the environment on first use
+    """
+    global _shared_extractor
+    if _shared_extractor is None:
+        _shared_extractor = SkeletonExtractor.from_env()
+    return _shared_extractor
+
+
+def close_skeleton_extractor() -> None:
+    """Shut down the shared extractor's worker processes if it has been created."""
+    if _shared_extractor is not None:
+        _shared_extractor.close()
@@ -0,0 +1,255 @@
+"""
+Detection of duplicate and near-duplicate files ahead of review.
+
+Monorepos carry many copies of the same file: vendored libraries, generated
+clients, copy-pasted configuration. Only one representative of each group
+is reviewed and its review is reused for the copies.
+
+Files are matched in two steps. Identical content (same language and blob
+SHA) is found with a dict lookup. Other files are compared by MinHash over
+shingles of consecutive tokens, so reformatting does not hide a copy, with
+locality-sensitive hashing (LSH) over bands of the signature to find
+candidates without comparing every pair. Signatures use one permutation
+hashing: every shingle is hashed once and kept as the minimum of one of the
+signature's bins, instead of being hashed once per signature slot.
+
+Detection is incremental: each file is matched against the representatives
+seen before it, so it works on files as they stream in from extraction and
+every copy is directly similar to the file whose review it reuses.
+"""
+import logging
+import os
+import re
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.intake.code_extraction import ExtractedFile
+
+logger = logging.getLogger(__name__)
+
+# Estimated similarity at or above which a file reuses another's review
+DEFAULT_THRESHOLD = 0.9
+
+# Signature bins and LSH bands; 16 bands of 8 rows make pairs near the
+# threshold almost certain candidates and pairs below 0.5 rare ones
+NUM_HASHES = 128
+BANDS = 16
+
+# Tokens per shingle, and fewest tokens for near-duplicate matching; tiny
+# files share too much boilerplate to be told apart by similarity
+SHINGLE_SIZE = 5
+MIN_TOKENS = 50
+
+DEDUP_MODES = ('near', 'exact', 'off')
+
+_TOKEN = re.compile(r'\w+|[^\w\s]')
+# Value of a bin no shingle fell into, above any 64-bit shingle hash
+_EMPTY = 1 << 64
+
+
+def minhash_signature(
+    content: str,
+    num_hashes: int = NUM_HASHES,
+    shingle_size: int = SHINGLE_SIZE,
+    min_tokens: int = MIN_TOKENS
+) -> Optional[Tuple[int, ...]]:
+    """
+    Compute the MinHash signature of a file's token shingles.
+
+    Args:
+        content: File content
+        num_hashes: Signature length
+        shingle_size: Consecutive tokens per shingle
+        min_tokens: Fewest tokens a file needs to get a signature
+
+    Returns:
+        Optional[Tuple[int, ...]]: The signature, or None for files too
+        small to compare
+    """
+    tokens = _TOKEN.findall(content)
+    if len(tokens) < max(min_tokens, shingle_size):
+        return None
+    # Tokens repeat heavily, so each distinct token is hashed once; tuples of
+    # ints hash the same in every process, unlike strings
+    ids = {token: zlib.crc32(token.encode('utf-8', 'surrogatepass')) for token in set(tokens)}
+    values = list(map(ids.__getitem__, tokens))
+    shingles = set(map(hash, zip(*(values[offset:] for offset in range(shingle_size)))))
+
+    # Written in descending order, so each bin ends up holding its minimum
+    bins = {shingle % num_hashes: shingle for shingle in sorted(shingles, reverse=True)}
+    return tuple(bins.get(slot, _EMPTY) for slot in range(num_hashes))
+
+
+def estimate_similarity(first: Tuple[int, ...], second: Tuple[int, ...]) -> float:
+    """
+    Estimate the Jaccard similarity of two files' shingle sets.
+
+    Args:
+        first: Signature of one file
+        second: Signature of the other, of the same length
+
+    Returns:
+        float: Share of bins, among those either file uses, holding the same minimum
+    """
+    used = equal = 0
+    for a, b in zip(first, second):
+        if a != _EMPTY or b != _EMPTY:
+            used += 1
+            equal += a == b
+    return equal / used if used else 0.0
+
+
+@dataclass(frozen=True)
+class DuplicateMatch:
+    """The reviewed file another file duplicates."""
+    original: str
+    similarity: float
+    exact: bool
+
+
+class DuplicateDetector:
+    """Picks one representative per group of duplicate files."""
+
+    def __init__(
+        self,
+        mode: str = 'near',
+        threshold: float = DEFAULT_THRESHOLD,
+        num_hashes: int = NUM_HASHES,
+        bands: int = BANDS,
+        shingle_size: int = SHINGLE_SIZE,
+        min_tokens: int = MIN_TOKENS
+    ):
+        """
+        Initialize the detector.
+
+        Args:
+            mode: "near" for exact and near-duplicates, "exact" for identical
+                content only, "off" to review every file
+            threshold: Estimated similarity at or above which files are near-duplicates
+            num_hashes: Signature length
+            bands: LSH bands; must divide num_hashes
+            shingle_size: Consecutive tokens per shingle
+            min_tokens: Fewest tokens for near-duplicate matching
+
+        Raises:
+            ValueError: If the mode, threshold or band layout is invalid
+        """
+        if mode not in DEDUP_MODES:
+            raise ValueError(f"DEDUP_MODE must be one of {', '.join(DEDUP_MODES)}, got {mode!r}")
+        if not 0 < threshold <= 1:
+            raise ValueError(f"Duplicate similarity threshold must be in (0, 1], got {threshold}")
+        if bands <= 0 or num_hashes % bands:
+            raise ValueError(f"{bands} LSH bands do not divide {num_hashes} hashes")
+        self.mode = mode
+        self.threshold = threshold
+        self.num_hashes = num_hashes
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self.min_tokens = min_tokens
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+        # (language, blob SHA) -> file reviewed for that content
+        self._by_content: Dict[Tuple[str, str], DuplicateMatch] = {}
+        self._signatures: Dict[str, Tuple[int, ...]] = {}
+        # (language, band, band values) -> representatives in that bucket
+        self._buckets: Dict[tuple, List[str]] = defaultdict(list)
+
+    @classmethod
+    def from_env(cls) -> 'DuplicateDetector':
+        """
+        Create a detector configured from environment variables.
+
+        Returns:
+            DuplicateDetector: Detector using DEDUP_MODE and DEDUP_SIMILARITY when set
+
+        Raises:
+            ValueError: If the configuration is invalid
+        """
+        return cls(
+            mode=os.getenv('DEDUP_MODE', 'near').lower(),
+            threshold=float(os.getenv('DEDUP_SIMILARITY', DEFAULT_THRESHOLD))
+        )
+
+    def _bands(self, language: str, signature: Tuple[int, ...]) -> List[tuple]:
+        """LSH bucket keys of a signature, leaving out bands with no shingles."""
+        rows = self.num_hashes // self.bands
+        keys = []
+        for band in range(self.bands):
+            values = signature[band * rows:(band + 1) * rows]
+            if any(value != _EMPTY for value in values):
+                keys.append((language, band, values))
+        return keys
+
+    def match(self, file: ExtractedFile) -> Optional[DuplicateMatch]:
+        """
+        Match a file against the representatives seen so far.
+
+        A file that matches none becomes a representative itself.
+
+        Args:
+            file: Extracted file
+
+        Returns:
+            Optional[DuplicateMatch]: The representative whose review the file
+            can reuse, or None if the file must be reviewed
+        """
+        if self.mode == 'off':
+            return None
+        content_key = (file.language, file.blob_sha)
+        known = self._by_content.get(content_key)
+        if known is not None:
+            self.exact_duplicates += known.exact
+            self.near_duplicates += not known.exact
+            return known
+
+        signature = None
+        if self.mode == 'near':
+            signature = minhash_signature(file.content, self.num_hashes, self.shingle_size, self.min_tokens)
+        if signature is not None:
+            keys = self._bands(file.language, signature)
+            candidates = dict.fromkeys(path for key in keys for path in self._buckets.get(key, ()))
+            best = max(
+                ((estimate_similarity(signature, self._signatures[path]), path) for path in candidates),
+                default=None
+            )
+            if best is not None and best[0] >= self.threshold:
+                match = DuplicateMatch(best[1], round(best[0], 3), False)
+                self._by_content[content_key] = match
+                self.near_duplicates += 1
+                return match
+            self._signatures[file.path] = signature
+            for key in keys:
+                self._buckets[key].append(file.path)
+
+        self._by_content[content_key] = DuplicateMatch(file.path, 1.0, True)
+        return None
+
+    def partition(
+        self,
+        files: Iterable[ExtractedFile]
+    ) -> Tuple[List[ExtractedFile], Dict[str, List[Tuple[ExtractedFile, DuplicateMatch]]]]:
+        """
+        Split files into the ones to review and the duplicates of each.
+
+        Args:
+            files: Extracted files, in the order representatives are preferred
+
+        Returns:
+            tuple: (files to review, duplicates by the path of the file they duplicate)
+        """
+        representatives = []
+        duplicates: Dict[str, List[Tuple[ExtractedFile, DuplicateMatch]]] = defaultdict(list)
+        for file in files:
+            match = self.match(file)
+            if match is None:
+                representatives.append(file)
+            else:
+                duplicates[match.original].append((file, match))
+        if duplicates:
+            logger.info(
+                f"Reviewing {len(representatives)} files; {self.exact_duplicates} exact and "
+                f"{self.near_duplicates} near-duplicates reuse their reviews"
+            )
+        return representatives, dict(duplicates)
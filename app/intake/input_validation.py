@@ -20,6 +20,9 @@ class InputValidator:
     MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
     MAX_FREE_TIER_FILES = 50
     MAX_PAID_TIER_FILES = 200
+    MAX_COMPRESSION_RATIO = 100  # Zip-bomb guard: uncompressed / compressed size
+    COMPRESSION_RATIO_MIN_SIZE = 1024 * 1024  # Ratio only applies above 1MB uncompressed
+    ZIP_READ_CHUNK_SIZE = 64 * 1024
     GITHUB_API_BASE = "https://api.github.com"
     
     def __init__(self, subscription_tier):
@@ -142,7 +145,14 @@ class InputValidator:
     
     def _validate_zip_submission(self, zip_path):
         """
-        Validate ZIP file submission
+        Validate ZIP file submission from its central directory
+        
+        Member headers are checked first so oversized or suspicious archives
+        are rejected before anything is decompressed. Each member is then
+        streamed through read_zip_member, which verifies its CRC under the
+        same size and ratio limits. Extraction does not go through here; it
+        runs the same two checks in a single pass (see
+        CodeExtractor.stream_zip_files).
         
         Args:
             zip_path: Path to ZIP file
@@ -155,37 +165,15 @@ class InputValidator:
         """
         try:
             with zipfile.ZipFile(zip_path, 'r') as zf:
-                # Check ZIP integrity
-                bad_file = zf.testzip()
-                if bad_file:
-                    raise ValidationError("corrupt_zip", 
-                                       f"Invalid input: Corrupted ZIP file: {bad_file}")
-                
-                # Get file list
-                files = [f for f in zf.namelist() if not f.endswith('/')]
-                
-                # Check number of files
-                if len(files) > self.max_files:
-                    raise ValidationError("too_many_files",
-                                       f"Invalid input: ZIP contains too many files (max {self.max_files})")
-                
-                # Check for path traversal
-                for file_path in files:
-                    if os.path.isabs(file_path) or '..' in file_path:
-                        raise ValidationError("path_traversal",
-                                           "Invalid input: Detected potential path traversal attempt")
-                
-                # Check file sizes
-                for file_info in zf.infolist():
-                    if file_info.file_size > self.MAX_FILE_SIZE:
-                        raise ValidationError("file_size_exceeded",
-                                           f"File size exceeded: {file_info.filename} exceeds size limit")
+                members = self.check_zip_entries(zf.infolist())
+                for info in members:
+                    self.read_zip_member(zf, info)
                 
                 return {
                     'is_valid': True,
                     'type': 'zip',
-                    'files': files,
-                    'total_size': sum(f.file_size for f in zf.infolist())
+                    'files': [info.filename for info in members],
+                    'total_size': sum(info.file_size for info in members)
                 }
                 
         except zipfile.BadZipFile:
@@ -195,3 +183,93 @@ class InputValidator:
                 raise ValidationError("zip_processing_error", 
                                    f"Invalid input: Error processing ZIP file: {str(e)}")
             raise
+    
+    def check_zip_entries(self, infos):
+        """
+        Check ZIP member headers against count, path and size limits
+        
+        Args:
+            infos: List of zipfile.ZipInfo from the archive's central directory
+            
+        Returns:
+            list: ZipInfo entries for files (directories excluded)
+            
+        Raises:
+            ValidationError: If any limit is violated
+        """
+        members = [info for info in infos if not info.is_dir()]
+        
+        # Check number of files
+        if len(members) > self.max_files:
+            raise ValidationError("too_many_files",
+                               f"Invalid input: ZIP contains too many files (max {self.max_files})")
+        
+        for info in members:
+            # Check for path traversal
+            if os.path.isabs(info.filename) or '..' in info.filename:
+                raise ValidationError("path_traversal",
+                                   "Invalid input: Detected potential path traversal attempt")
+            
+            # Check declared file sizes
+            if info.file_size > self.MAX_FILE_SIZE:
+                raise ValidationError("file_size_exceeded",
+                                   f"File size exceeded: {info.filename} exceeds size limit")
+            
+            self._check_compression_ratio(info.filename, info.file_size, info.compress_size)
+        
+        return members
+    
+    def read_zip_member(self, archive, info):
+        """
+        Decompress a ZIP member while enforcing limits on the actual bytes
+        
+        Headers can lie, so the decompressed size and compression ratio are
+        re-checked chunk by chunk and reading aborts as soon as a limit is
+        crossed. The CRC is verified by zipfile once the member is fully read.
+        
+        Args:
+            archive: Open zipfile.ZipFile
+            info: zipfile.ZipInfo of the member to read
+            
+        Returns:
+            bytes: Decompressed member content
+            
+        Raises:
+            ValidationError: If the member is corrupt or exceeds a limit
+        """
+        chunks = []
+        total = 0
+        try:
+            with archive.open(info) as member:
+                while True:
+                    chunk = member.read(self.ZIP_READ_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    total += len(chunk)
+                    if total > self.MAX_FILE_SIZE:
+                        raise ValidationError("file_size_exceeded",
+                                           f"File size exceeded: {info.filename} exceeds size limit")
+                    self._check_compression_ratio(info.filename, total, info.compress_size)
+                    chunks.append(chunk)
+        except zipfile.BadZipFile:
+            raise ValidationError("corrupt_zip", 
+                               f"Invalid input: Corrupted ZIP file: {info.filename}")
+        
+        return b''.join(chunks)
+    
+    def _check_compression_ratio(self, filename, uncompressed_size, compressed_size):
+        """
+        Reject members whose compression ratio indicates a zip bomb
+        
+        Small files are exempt: repetitive source (generated tables, fixtures,
+        blank-padded data) legitimately compresses far beyond the ratio, and
+        below COMPRESSION_RATIO_MIN_SIZE it cannot expand into anything large.
+        
+        Raises:
+            ValidationError: If the ratio exceeds MAX_COMPRESSION_RATIO
+        """
+        if uncompressed_size <= self.COMPRESSION_RATIO_MIN_SIZE:
+            return
+        if uncompressed_size > self.MAX_COMPRESSION_RATIO * max(compressed_size, 1):
+            raise ValidationError("zip_bomb",
+                               f"Invalid input: Suspicious compression ratio for {filename}")
@@ -0,0 +1,173 @@
+"""
+Precompiled path classifier shared by extraction and batching.
+
+Classifies a repository path into (skip, priority, language) in a single pass
+over the path string, replacing repeated Path() construction, per-call regex
+alternation and per-branch logging in the hot extraction loop.
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+LANGUAGE_MAP: Dict[str, str] = {
+    '.py': 'Python',
+    '.js': 'JavaScript',
+    '.ts': 'TypeScript',
+    '.java': 'Java',
+    '.cpp': 'C++',
+    '.c': 'C',
+    '.cs': 'C#',
+    '.rb': 'Ruby',
+    '.php': 'PHP',
+    '.go': 'Go',
+    '.rs': 'Rust',
+    '.swift': 'Swift',
+    '.kt': 'Kotlin',
+    '.scala': 'Scala',
+    '.html': 'HTML',
+    '.css': 'CSS',
+    '.sql': 'SQL',
+    '.sh': 'Shell',
+    '.yaml': 'YAML',
+    '.yml': 'YAML',
+    '.json': 'JSON',
+    '.xml': 'XML',
+    '.md': 'Markdown'
+}
+
+DEFAULT_CRITICAL_NAMES = frozenset({'main.py', 'index.js', 'app.py', 'server.py'})
+
+# Ordered so the compiled alternation is identical on every run
+DEFAULT_SKIP_PATTERNS = (
+    r'\.gitignore$', r'\.dockerignore$', r'LICENSE.*', r'CHANGELOG.*',
+    r'README.*', r'CONTRIBUTING.*', r'node_modules/.*', r'dist/.*',
+    r'build/.*', r'\.pyc$', r'__pycache__/.*', r'\.egg-info/.*',
+    r'\.tox/.*', r'\.pytest_cache/.*', r'\.coverage$', r'coverage\.xml$',
+    r'\.DS_Store$', r'tests?/fixtures/.*', r'tests?/data/.*',
+    r'tests?/resources/.*', r'\.env\..*', r'\.vscode/.*', r'\.idea/.*',
+    r'\.settings/.*',
+    # Enhanced test file filtering
+    r'tests?/.*', r'.*_test\..*', r'test_.*', r'.*_spec\..*'
+)
+
+PRIORITY_ORDER: Dict[str, int] = {'Critical': 0, 'High': 1, 'Medium': 2, 'Low': 3}
+
+_TEST_INDICATORS = ('test_', '_test', 'spec_', '_spec')
+_SOURCE_DIRS = ('src/', 'lib/', 'core/')
+_DOC_SUFFIXES = ('.md', '.txt')
+
+
+@dataclass(frozen=True)
+class PathClassification:
+    """Result of classifying a single repository path."""
+    skip: bool
+    priority: str
+    language: str
+    extension: str
+
+
+def path_suffix(name: str) -> str:
+    """
+    Return the suffix of a file name with pathlib semantics.
+
+    Args:
+        name: File name (last path component)
+
+    Returns:
+        str: Suffix including the dot, or an empty string
+    """
+    i = name.rfind('.')
+    if 0 < i < len(name) - 1:
+        return name[i:]
+    return ''
+
+
+def _search_form(pattern: str) -> str:
+    """
+    Drop leading and trailing ``.*`` from a pattern used with ``search``.
+
+    Under ``re.search`` on single-line paths these wildcards never change
+    whether a pattern matches, but they force the engine to scan to the end
+    of the string for every candidate position.
+    """
+    while pattern.startswith('.*'):
+        pattern = pattern[2:]
+    while pattern.endswith('.*') and not pattern.endswith('\\.*'):
+        pattern = pattern[:-2]
+    return f'(?:{pattern})'
+
+
+def detect_language(file_path: str) -> str:
+    """
+    Detect programming language from file extension.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        str: Detected programming language
+    """
+    name = file_path.rstrip('/').rsplit('/', 1)[-1]
+    return LANGUAGE_MAP.get(path_suffix(name).lower(), 'Unknown')
+
+
+class PathClassifier:
+    """Classifies repository paths for skipping, priority and language."""
+
+    def __init__(
+        self,
+        critical_names: Optional[Iterable[str]] = None,
+        skip_patterns: Optional[Iterable[str]] = None
+    ):
+        """
+        Initialize the classifier and compile its skip rules.
+
+        Args:
+            critical_names: File names that are never skipped
+            skip_patterns: Regex patterns searched against the full path
+        """
+        self.critical_names = frozenset(
+            DEFAULT_CRITICAL_NAMES if critical_names is None else critical_names
+        )
+        patterns = DEFAULT_SKIP_PATTERNS if skip_patterns is None else skip_patterns
+        # Sets have no stable order; sort so the alternation is deterministic
+        if not isinstance(patterns, (list, tuple)):
+            patterns = sorted(patterns)
+        self.skip_regex = re.compile('|'.join(_search_form(p) for p in patterns))
+
+    def classify(self, file_path: str) -> PathClassification:
+        """
+        Classify a path in a single pass.
+
+        Args:
+            file_path: Path to the file, relative to the repository root
+
+        Returns:
+            PathClassification: Skip flag, priority, language and extension
+        """
+        name = file_path.rstrip('/').rsplit('/', 1)[-1]
+        extension = path_suffix(name)
+        language = LANGUAGE_MAP.get(extension.lower(), 'Unknown')
+
+        # Critical files take absolute precedence regardless of location
+        if name in self.critical_names:
+            return PathClassification(False, 'Critical', language, extension)
+
+        name_lower = name.lower()
+        if self.skip_regex.search(file_path) or any(
+            indicator in name_lower for indicator in _TEST_INDICATORS
+        ):
+            return PathClassification(True, 'Skip', language, extension)
+
+        path_lower = file_path.lower()
+        if name_lower.startswith('test_') or name_lower.endswith('_test.py'):
+            priority = 'Low'
+        elif path_lower.startswith(_SOURCE_DIRS):
+            priority = 'High'
+        elif path_lower.endswith(_DOC_SUFFIXES):
+            priority = 'Low'
+        else:
+            # Configuration files and other code files
+            priority = 'Medium'
+
+        return PathClassification(False, priority, language, extension)
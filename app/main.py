@@ -1,14 +1,34 @@
 import os
+import argparse
 import logging
 import asyncio
-import aiohttp
 import re
+import json
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
 from anthropic import Anthropic
 from app.intake.code_extraction import CodeExtractor
+from app.intake.batch_planning import BatchPlanner
+from app.intake.code_skeleton import get_skeleton_extractor, close_skeleton_extractor
+from app.intake.duplicate_detection import DuplicateDetector
+from app.models.llm_client import get_llm_client, close_llm_client, message_params
+from app.models.message_batches import MessageBatchClient
 from app.models.review import Review
+from app.review.review_cache import ReviewCache
+from app.review.incremental import plan_incremental_review, batches_to_recompute
+from app.review.checkpoint import Checkpoint, CheckpointStore, STAGES
+from app.review.resilience import ResilientExecutor, RetryPolicy
+from app.review.response_parsing import (
+    IncrementalJSONScanner, ResponseParseError, normalize_response, parse_review
+)
+from app.review.chunked_review import (
+    ChunkingPolicy, chunk_outline, chunk_section, reduce_reviews, review_chunks, split_into_chunks
+)
+from app.review.tree_merge import check_fan_in, merge_fan_in, tree_reduce
+from app.review.file_digest import clear_digest_sections, digest_section, start_digest_run, use_digests
+from app.models.registry import get_registry
+from app.models.providers import get_adapter
 from rich.console import Console
 
 # Configure logging
@@ -45,36 +65,158 @@ async def get_github_url() -> str:
     
     return url
 
-async def async_create_message(prompt, model):
-    """Async wrapper for Anthropic API calls"""
-    async with aiohttp.ClientSession() as session:
-        async with session.post(
-            "https://api.anthropic.com/v1/messages",
-            headers={
-                "x-api-key": os.getenv("ANTHROPIC_API_KEY"),
-                "anthropic-version": "2023-06-01",
-                "content-type": "application/json"
-            },
-            json={
-                "model": model,
-                "max_tokens": 4000,
-                "messages": [{"role": "user", "content": prompt}]
-            }
-        ) as response:
-            result = await response.json()
-            return result['content'][0]['text']
-
-async def process_single_file(file, model, initial_prompt, timestamp):
-    """Process a single file review"""
-    logger.info(f"Reviewing file: {file.path}")
-    
-    # Prepare the prompt with file content
-    prompt = f"{initial_prompt}\n\nFILE TO REVIEW:\n{file.content}"
+def model_provider(model):
+    """Provider serving a configured model; unconfigured models go to Anthropic"""
+    try:
+        return get_registry().model_provider(model)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read model configuration: {str(e)}")
+        return "anthropic"
+
+async def stream_message(prompt, model, system=None, stage=None):
+    """
+    Stream a response from the provider serving model, checking it as it arrives.
     
-    # Get LLM review asynchronously
-    review_text = await async_create_message(prompt, model)
+    Yields text chunks until the response's JSON object is complete and
+    decodes, then stops the generation. A response that does not start with
+    JSON or has mismatched brackets is cancelled as soon as that shows,
+    instead of paying for the rest of its output tokens, and one that ends
+    without any JSON object is rejected so the call is retried.
+    
+    Raises:
+        ResponseParseError: If the response is off-format
+    """
+    scanner = IncrementalJSONScanner()
+    stream = get_adapter(model_provider(model)).stream(prompt, model, system=system, stage=stage)
+    try:
+        async for chunk in stream:
+            complete = scanner.feed(chunk)
+            yield chunk
+            if complete:
+                break
+    finally:
+        await stream.aclose()
+    if not scanner.started:
+        raise ResponseParseError("Invalid review format: no JSON object in response")
+
+async def async_create_message(prompt, model, system=None, stage=None, on_text=None):
+    """
+    Send a prompt to the provider serving model over the shared pooled client.
+    
+    system is a static instruction block sent as a cacheable prefix, and
+    stage names the pipeline stage token usage is reported under. The
+    response is streamed; on_text, if given, is called with each chunk as
+    it arrives.
+    """
+    chunks = []
+    async for chunk in stream_message(prompt, model, system=system, stage=stage):
+        chunks.append(chunk)
+        if on_text is not None:
+            on_text(chunk)
+    return "".join(chunks)
+
+def review_executor(model):
+    """
+    Build the retrying executor for per-file calls.
+    
+    Calls fail over from model to the configured backup model for that call only.
+    """
+    models = [model]
+    try:
+        _, backup = get_registry().models()
+        models.append(backup.name)
+    except (OSError, ValueError) as e:
+        logger.warning(f"No backup model available: {str(e)}")
+    return ResilientExecutor(models, RetryPolicy.from_env())
+
+def collect_file_reviews(outcomes):
+    """
+    Keep the file reviews that succeeded and report the ones that did not.
+    
+    Raises:
+        Exception: The first error if no file could be reviewed at all
+    """
+    file_reviews = [outcome.result for outcome in outcomes if outcome.succeeded]
+    failed = [outcome for outcome in outcomes if not outcome.succeeded]
+    for outcome in failed:
+        logger.error(
+            f"Giving up on {outcome.item.path} after {outcome.attempts} attempts: {outcome.error!r}"
+        )
+    if failed:
+        console.print(f"{len(failed)} of {len(outcomes)} files could not be reviewed", style="yellow")
+        if not file_reviews:
+            raise failed[0].error
+    return file_reviews
+
+def validated_response(text, template):
+    """
+    Reduce a response to compact JSON and check it has the shape its stage's prompt asks for
+    
+    Raises:
+        ResponseParseError: If the response holds no JSON or does not match the prompt's output format
+    """
+    review_text = normalize_response(text)
+    parse_review(review_text, template)
+    return review_text
+
+def file_prompt(file):
+    """Per-file part of a Stage 1 prompt; the template is sent as a cacheable prefix"""
+    return f"FILE TO REVIEW:\n{file.content}"
+
+def chunk_prompts(file, policy):
+    """Split an oversized file into chunks and build the Stage 1 prompt of each"""
+    chunks = split_into_chunks(file.content, policy.token_budget, policy.overlap_lines)
+    outline = chunk_outline(file.content, file.language, policy.token_budget)
+    return chunks, [f"FILE TO REVIEW:\n{chunk_section(chunk, outline)}" for chunk in chunks]
+
+def combine_chunk_reviews(file, chunks, texts, initial_prompt):
+    """
+    Reduce the responses for a file's chunks into one file review
+    
+    Chunks without a response (None) or whose response is not a valid file
+    review are left out of the reduction.
+    
+    Raises:
+        ResponseParseError: If no chunk's response is a valid file review
+    """
+    reviews = []
+    for chunk, text in zip(chunks, texts):
+        if text is None:
+            logger.warning(f"No review of {file.path} part {chunk.index}")
+            reviews.append(None)
+            continue
+        try:
+            reviews.append(parse_review(text, initial_prompt))
+        except ResponseParseError as e:
+            logger.warning(f"Dropping review of {file.path} part {chunk.index}: {str(e)}")
+            reviews.append(None)
+    combined = reduce_reviews(reviews, [chunk.tokens for chunk in chunks])
+    if combined is None:
+        raise ResponseParseError(f"No part of {file.path} has a valid review")
+    return validated_response(json.dumps(combined, separators=(',', ':'), ensure_ascii=False), initial_prompt)
+
+async def process_chunked_file(file, model, initial_prompt, policy):
+    """
+    Review an oversized file in concurrent chunks and reduce them into one review
     
-    # Save individual review asynchronously
+    At most policy.max_parallel chunks are in flight at once. Chunks whose
+    call fails or whose response is not a valid file review are left out
+    of the reduction.
+    
+    Raises:
+        ResponseParseError: If no chunk's response is a valid file review
+    """
+    chunks, prompts = chunk_prompts(file, policy)
+    logger.info(f"Reviewing {file.path} in {len(chunks)} chunks")
+    texts = await review_chunks(
+        prompts,
+        lambda prompt: async_create_message(prompt, model, system=initial_prompt, stage="initial_reviews"),
+        policy.max_parallel
+    )
+    return combine_chunk_reviews(file, chunks, texts, initial_prompt)
+
+def record_file_review(file, review_text, timestamp):
+    """Save a file's review to disk and build its file review dictionary"""
     review_dir = Path("tests/initial_reviews")
     review_dir.mkdir(parents=True, exist_ok=True)
     review_path = review_dir / f"review_{timestamp}_{file.path.replace('/', '_')}.txt"
@@ -88,89 +230,469 @@ async def process_single_file(file, model, initial_prompt, timestamp):
         'content': file.content,
         'language': file.language,
         'size': file.size,
+        'priority': file.priority,
+        'sha': file.blob_sha,
         'review': review_text
     }
 
-async def process_initial_reviews(files, model):
-    """Stage 1: Process individual file reviews concurrently"""
+def record_duplicate_review(file, match, original_review, timestamp):
+    """Reuse the review of the file another file duplicates, noting which file that is"""
+    result = record_file_review(file, original_review['review'], timestamp)
+    result['duplicate_of'] = match.original
+    result['similarity'] = match.similarity
+    return result
+
+def fan_out_duplicates(file_reviews, duplicates, timestamp, on_file_review=None):
+    """Build the file reviews of every duplicate whose original was reviewed"""
+    results = []
+    for review in file_reviews:
+        for file, match in duplicates.get(review['path'], ()):
+            result = record_duplicate_review(file, match, review, timestamp)
+            if on_file_review is not None:
+                on_file_review(result)
+            results.append(result)
+    return results
+
+async def process_single_file(file, model, initial_prompt, timestamp, cache=None, on_text=None):
+    """
+    Process a single file review, reusing a cached review when available
+    
+    on_text is called with each chunk of a fresh review as it streams in;
+    files over the chunk token budget are reviewed in chunks without it.
+    """
+    cache_key = (file.blob_sha, ReviewCache.prompt_hash(initial_prompt), model)
+    review_text = cache.get(*cache_key) if cache is not None else None
+    
+    if review_text is None:
+        logger.info(f"Reviewing file: {file.path}")
+        
+        policy = ChunkingPolicy.from_env()
+        if policy.needs_chunking(file.content):
+            review_text = await process_chunked_file(file, model, initial_prompt, policy)
+        else:
+            # Get LLM review asynchronously
+            review_text = validated_response(
+                await async_create_message(
+                    file_prompt(file), model, system=initial_prompt, stage="initial_reviews", on_text=on_text
+                ),
+                initial_prompt
+            )
+        if cache is not None:
+            cache.set(*cache_key, review_text)
+    else:
+        logger.info(f"Using cached review for file: {file.path}")
+    
+    # Save individual review
+    return record_file_review(file, review_text, timestamp)
+
+async def process_bulk_file_reviews(files, model, initial_prompt, cache=None):
+    """
+    Review every uncached file in offline provider batch jobs.
+    
+    Trades latency for cost: the jobs are priced below real-time calls and
+    do not draw on the real-time rate limits. Oversized files are sent as
+    chunks and reduced like in real time. Only Anthropic models are
+    supported; other providers get an empty result and are reviewed in
+    real time, as are files whose batch request failed or timed out.
+    
+    Returns:
+        dict: Review text by file path for the files the batch jobs reviewed
+    """
+    if model_provider(model) != "anthropic":
+        logger.warning(f"Bulk mode is not available for {model}; reviewing in real time")
+        return {}
+    
+    prompt_hash = ReviewCache.prompt_hash(initial_prompt)
+    policy = ChunkingPolicy.from_env()
+    # Custom ids are limited to letters, digits, '_' and '-', so files are numbered
+    pending = {}
+    chunked = {}
+    requests = {}
+    for index, file in enumerate(files):
+        if cache is not None and cache.get(file.blob_sha, prompt_hash, model) is not None:
+            continue
+        custom_id = f"file-{index}"
+        pending[custom_id] = file
+        if policy.needs_chunking(file.content):
+            chunks, prompts = chunk_prompts(file, policy)
+            chunked[custom_id] = chunks
+            for chunk, prompt in zip(chunks, prompts):
+                requests[f"{custom_id}-part-{chunk.index}"] = message_params(prompt, model, system=initial_prompt)
+        else:
+            requests[custom_id] = message_params(file_prompt(file), model, system=initial_prompt)
+    if not pending:
+        return {}
+    
+    console.print(f"Submitting {len(pending)} file reviews as batch jobs...")
+    try:
+        results = await MessageBatchClient.from_env().run(requests, stage="initial_reviews")
+    except Exception as e:
+        logger.warning(f"Batch review failed ({e!r}); reviewing every file in real time")
+        return {}
+    
+    reviews = {}
+    for custom_id, file in pending.items():
+        try:
+            if custom_id in chunked:
+                chunks = chunked[custom_id]
+                texts = [results[f"{custom_id}-part-{chunk.index}"].text for chunk in chunks]
+                reviews[file.path] = combine_chunk_reviews(file, chunks, texts, initial_prompt)
+            else:
+                result = results[custom_id]
+                if not result.succeeded:
+                    logger.warning(f"Batch review of {file.path} failed ({result.error}); reviewing it in real time")
+                    continue
+                reviews[file.path] = validated_response(result.text, initial_prompt)
+        except ResponseParseError as e:
+            logger.warning(f"Batch review of {file.path} is invalid ({str(e)}); reviewing it in real time")
+            continue
+        if cache is not None:
+            cache.set(file.blob_sha, prompt_hash, model, reviews[file.path])
+    return reviews
+
+async def process_initial_reviews(files, model, cache=None, on_file_review=None, bulk=False):
+    """
+    Stage 1: Process individual file reviews concurrently.
+    
+    Each file is retried and failed over on its own; files that still fail
+    are left out so later stages continue with the reviews that succeeded.
+    on_file_review, if given, is called with each file review as it completes.
+    With bulk, files are first reviewed in offline batch jobs and only
+    the ones they could not review are sent in real time. Only one file of
+    each group of duplicates is reviewed; the others reuse its review.
+    """
     logger.info("Starting initial file reviews...")
     
     # Load initial review prompt
-    with open(Path("app/prompts/initial_review.txt"), "r") as f:
-        initial_prompt = f.read()
+    initial_prompt = get_registry().prompt("initial_review")
     
     # Generate timestamp for this review session
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     
-    # Process all files concurrently with semaphore to control concurrency
-    sem = asyncio.Semaphore(10)  # Limit concurrent API calls
-    
-    async def process_with_semaphore(file):
-        async with sem:
-            return await process_single_file(file, model, initial_prompt, timestamp)
+    files, duplicates = DuplicateDetector.from_env().partition(files)
+    bulk_reviews = await process_bulk_file_reviews(files, model, initial_prompt, cache) if bulk else {}
+    
+    # Process all files concurrently; the shared LLM client's adaptive
+    # limiter controls how many API calls are actually in flight
+    async def review_file(file, model_name):
+        if file.path in bulk_reviews:
+            result = record_file_review(file, bulk_reviews[file.path], timestamp)
+        else:
+            result = await process_single_file(file, model_name, initial_prompt, timestamp, cache)
+        if on_file_review is not None:
+            on_file_review(result)
+        return result
+    
+    outcomes = await review_executor(model).gather(files, review_file)
+    file_reviews = collect_file_reviews(outcomes)
+    return file_reviews + fan_out_duplicates(file_reviews, duplicates, timestamp, on_file_review)
+
+async def process_single_batch(batch, index, model, batch_prompt, timestamp):
+    """Process a single batch review"""
+    # Prepare batch content
+    batch_content = "\n\n".join([batch_section(review) for review in batch])
+    prompt = f"BATCH TO REVIEW:\n{batch_content}"
+    
+    # Get LLM review asynchronously, with the shared template as a cacheable prefix
+    review_text = validated_response(
+        await async_create_message(prompt, model, system=batch_prompt, stage="batch_reviews"), batch_prompt
+    )
+    
+    # Save batch review
+    review_dir = Path("tests/batch_reviews")
+    review_dir.mkdir(parents=True, exist_ok=True)
+    review_path = review_dir / f"batch_review_{timestamp}_batch_{index}.txt"
+    with open(review_path, 'w') as f:
+        f.write(review_text)
     
-    tasks = [process_with_semaphore(file) for file in files]
-    file_reviews = await asyncio.gather(*tasks)
+    return review_text
+
+def batch_section(review):
+    """
+    Part of a Stage 2 prompt standing for one reviewed file.
     
-    return file_reviews
+    By default this is the file's digest: imports, signatures and its Stage 1
+    scores and notes, with the source only where the digest cannot stand in
+    for it. BATCH_PROMPT_MODE=full sends every file's source instead.
+    A duplicate only names the file it duplicates, which is in the batches too.
+    """
+    if review.get('duplicate_of'):
+        return f"File: {review['path']}\nDuplicate of: {review['duplicate_of']} ({review['similarity']:.0%} similar)"
+    if not use_digests():
+        return f"File: {review['path']}\n{review['content']}"
+    return digest_section(
+        review['path'], review['content'], review.get('language') or 'Unknown', review.get('review'), review.get('sha')
+    )
+
+async def prefetch_skeletons(file_reviews):
+    """Parse the code skeletons used by digests in worker processes, off the event loop"""
+    if use_digests():
+        await get_skeleton_extractor().prefetch(
+            (review['content'], review.get('language') or 'Unknown')
+            for review in file_reviews if not review.get('duplicate_of')
+        )
 
-async def process_batch_reviews(file_reviews, model):
-    """Stage 2: Process batch reviews (groups of 10) concurrently"""
+def start_review_memos():
+    """Give the current run its own digests and skeletons, apart from other runs in this process"""
+    start_digest_run()
+    get_skeleton_extractor().start_run()
+
+def clear_review_memos():
+    """Drop the digests and skeletons kept for the current run once Stage 2 no longer needs them"""
+    clear_digest_sections()
+    get_skeleton_extractor().clear()
+
+def describe_file_review(review):
+    """Describe a file review as (path, prompt section, priority) for batch planning"""
+    return review['path'], batch_section(review), review.get('priority', 'Medium')
+
+def group_into_batches(file_reviews, planner=None):
+    """Pack file reviews into token-budgeted batches, in priority and directory order"""
+    planner = planner or BatchPlanner.from_env()
+    return planner.plan(file_reviews, describe=describe_file_review)
+
+async def process_batch_reviews(file_reviews, model, previous_batches=None, changed_paths=None):
+    """
+    Stage 2: Process token-budgeted batch reviews concurrently.
+    
+    When previous_batches (tuple of batch paths -> batch review) is given, a
+    batch whose membership is unchanged and which contains none of
+    changed_paths reuses its previous review instead of calling the model.
+    """
     logger.info("Starting batch reviews...")
     
     # Load batch review prompt
-    with open(Path("app/prompts/batch_review.txt"), "r") as f:
-        batch_prompt = f.read()
+    batch_prompt = get_registry().prompt("batch_review")
     
-    # Create batch reviews directory
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    review_dir = Path("tests/batch_reviews")
-    review_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Group files into batches of 10
-    batch_size = 10
-    batches = [file_reviews[i:i + batch_size] for i in range(0, len(file_reviews), batch_size)]
     
-    async def process_batch(batch, index):
-        # Prepare batch content
-        batch_content = "\n\n".join([f"File: {review['path']}\n{review['content']}" for review in batch])
-        prompt = f"{batch_prompt}\n\nBATCH TO REVIEW:\n{batch_content}"
-        
-        # Get LLM review asynchronously
-        review_text = await async_create_message(prompt, model)
-        
-        # Save batch review
-        review_path = review_dir / f"batch_review_{timestamp}_batch_{index}.txt"
-        with open(review_path, 'w') as f:
-            f.write(review_text)
-        
-        return review_text
+    # Pack files into batches under the token budget
+    await prefetch_skeletons(file_reviews)
+    batches = group_into_batches(file_reviews)
+    batch_paths = [tuple(review['path'] for review in batch) for batch in batches]
+    if previous_batches is None:
+        recompute = [True] * len(batches)
+    else:
+        recompute = batches_to_recompute(batch_paths, previous_batches, changed_paths or set())
+        logger.info(f"Recomputing {sum(recompute)} of {len(batches)} batch reviews")
+    
+    async def run_batch(batch, index):
+        if recompute[index - 1]:
+            return await process_single_batch(batch, index, model, batch_prompt, timestamp)
+        return previous_batches[batch_paths[index - 1]]
     
     # Process all batches concurrently
-    tasks = [process_batch(batch, i) for i, batch in enumerate(batches, 1)]
+    tasks = [run_batch(batch, i) for i, batch in enumerate(batches, 1)]
     batch_reviews = await asyncio.gather(*tasks)
     
     return batch_reviews
 
-async def process_merged_review(batch_reviews, model):
-    """Stage 3: Process merged batch review"""
+async def iterate_in_thread(iterable):
+    """
+    Consume a blocking iterator from a worker thread as an async iterator.
+    
+    Each ``next()`` call runs in the default executor so that a generator doing
+    network I/O (such as ``CodeExtractor.stream_github_files``) never blocks the
+    event loop while reviews are in flight.
+    """
+    loop = asyncio.get_running_loop()
+    iterator = iter(iterable)
+    done = object()
+    while True:
+        item = await loop.run_in_executor(None, next, iterator, done)
+        if item is done:
+            break
+        yield item
+
+async def process_streaming_reviews(files, model, batch_size=10, cache=None, on_file_review=None):
+    """
+    Stages 1 and 2 overlapped: review files as they stream in from extraction
+    and start a batch review as soon as ``batch_size`` file reviews complete,
+    or earlier if the next file would push the batch over the token budget.
+    Files duplicating one already streamed in wait for its review and reuse it.
+    
+    Args:
+        files: Iterable of ExtractedFile, typically the live extraction generator
+        model: Model name
+        batch_size: Maximum number of completed file reviews per batch
+        cache: Optional ReviewCache consulted before each file review
+        on_file_review: Optional callback called with each completed file review
+        
+    Returns:
+        tuple: (file_reviews, batch_reviews, batch_files) in completion order,
+        with batch_files listing the paths in each batch review
+    """
+    logger.info("Starting streaming file and batch reviews...")
+    
+    initial_prompt = get_registry().prompt("initial_review")
+    batch_prompt = get_registry().prompt("batch_review")
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    executor = review_executor(model)
+    detector = DuplicateDetector.from_env()
+    completed = asyncio.Queue()
+    review_tasks = []
+    tasks_by_path = {}
+    batch_tasks = []
+    batch_files = []
+    outcomes = []
+    
+    async def review_file(file):
+        outcome = await executor.run(
+            file, lambda model_name: process_single_file(file, model_name, initial_prompt, timestamp, cache)
+        )
+        outcomes.append(outcome)
+        if outcome.succeeded:
+            if on_file_review is not None:
+                on_file_review(outcome.result)
+            await completed.put(outcome.result)
+            return outcome.result
+        return None
+    
+    async def review_duplicate(file, match, original_task):
+        original_review = await original_task
+        if original_review is not None:
+            result = record_duplicate_review(file, match, original_review, timestamp)
+            if on_file_review is not None:
+                on_file_review(result)
+            await completed.put(result)
+    
+    async def produce():
+        try:
+            async for file in iterate_in_thread(files):
+                # Signatures are CPU work, kept off the event loop; files are matched in order
+                match = await asyncio.to_thread(detector.match, file)
+                if match is None:
+                    task = tasks_by_path[file.path] = asyncio.create_task(review_file(file))
+                else:
+                    task = asyncio.create_task(review_duplicate(file, match, tasks_by_path[match.original]))
+                review_tasks.append(task)
+            await asyncio.gather(*review_tasks)
+        finally:
+            await completed.put(None)
+    
+    def start_batch(batch):
+        index = len(batch_tasks) + 1
+        batch_files.append([file_review['path'] for file_review in batch])
+        batch_tasks.append(asyncio.create_task(
+            process_single_batch(batch, index, model, batch_prompt, timestamp)
+        ))
+    
+    planner = BatchPlanner.from_env()
+    producer = asyncio.create_task(produce())
+    file_reviews = []
+    pending_batch = []
+    pending_tokens = 0
+    try:
+        unplanned = []
+        while True:
+            result = await completed.get()
+            if result is not None:
+                file_reviews.append(result)
+                unplanned.append(result)
+                # Wait until the reviews could fill a batch, so their skeletons
+                # are parsed in one round-trip to the worker pool
+                if len(pending_batch) + len(unplanned) < batch_size:
+                    continue
+            if unplanned:
+                await prefetch_skeletons(unplanned)
+            for review in unplanned:
+                tokens = planner.estimate_file_tokens(review['path'], batch_section(review))
+                if pending_batch and pending_tokens + tokens > planner.token_budget:
+                    start_batch(pending_batch)
+                    pending_batch, pending_tokens = [], 0
+                pending_batch.append(review)
+                pending_tokens += tokens
+                if len(pending_batch) == batch_size:
+                    start_batch(pending_batch)
+                    pending_batch, pending_tokens = [], 0
+            unplanned = []
+            if result is None:
+                break
+        
+        # Surface any extraction failure, or every file failing, before finishing batches
+        await producer
+        collect_file_reviews(outcomes)
+        if pending_batch:
+            start_batch(pending_batch)
+        batch_reviews = await asyncio.gather(*batch_tasks)
+    except BaseException:
+        for task in [producer, *review_tasks, *batch_tasks]:
+            task.cancel()
+        raise
+    
+    return file_reviews, list(batch_reviews), batch_files
+
+async def process_incremental_reviews(extractor, repo_url, previous_review, model, cache=None, on_file_review=None, bulk=False):
+    """
+    Stages 1 and 2 for a repository that was reviewed before.
+    
+    Only files added or modified since previous_review are extracted and
+    reviewed; stored reviews are carried over for unchanged paths, and only
+    batches containing changed files are re-reviewed.
+    
+    Returns:
+        tuple: (file_reviews, batch_reviews, batch_files) with file reviews
+        sorted by path so batch membership is stable between runs
+    """
+    current_tree = await asyncio.to_thread(extractor.list_github_tree, repo_url)
+    plan = plan_incremental_review(previous_review.file_tree, previous_review.file_reviews, current_tree)
+    diff = plan.diff
+    logger.info(
+        f"Incremental review: {len(diff.added)} added, {len(diff.modified)} modified, "
+        f"{len(diff.removed)} removed, {len(plan.carried_reviews)} carried over"
+    )
+    
+    paths = plan.paths_to_review
+    files = []
+    if paths:
+        files = await asyncio.to_thread(lambda: list(extractor.stream_github_files(repo_url, paths)))
+    new_reviews = await process_initial_reviews(files, model, cache, on_file_review, bulk) if files else []
+    
+    carried_reviews = [{**review, 'sha': current_tree[review['path']]} for review in plan.carried_reviews]
+    file_reviews = sorted(carried_reviews + list(new_reviews), key=lambda review: review['path'])
+    
+    previous_batches = {}
+    if len(previous_review.batch_files) == len(previous_review.batch_reviews):
+        previous_batches = {
+            tuple(paths): batch_review
+            for paths, batch_review in zip(previous_review.batch_files, previous_review.batch_reviews)
+        }
+    batch_reviews = await process_batch_reviews(file_reviews, model, previous_batches, paths)
+    batch_files = [[review['path'] for review in batch] for batch in group_into_batches(file_reviews)]
+    
+    return file_reviews, batch_reviews, batch_files
+
+async def process_merged_review(batch_reviews, model, fan_in=None):
+    """
+    Stage 3: Process merged batch review
+    
+    More batch reviews than the merge fan-in (MERGE_FAN_IN unless fan_in is
+    given) are merged in groups, concurrently and level by level, so the
+    prompt stays within the context window on large repositories.
+    """
     logger.info("Starting merged batch review...")
     
     # Load merged review prompt
-    with open(Path("app/prompts/merged_batch_review.txt"), "r") as f:
-        merged_prompt = f.read()
+    merged_prompt = get_registry().prompt("merged_batch_review")
     
     # Create merged reviews directory
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     review_dir = Path("tests/merged_batch_reviews")
     review_dir.mkdir(parents=True, exist_ok=True)
     
-    # Prepare merged content
-    merged_content = "\n\n".join([f"Batch Review {i+1}:\n{review}" for i, review in enumerate(batch_reviews)])
-    prompt = f"{merged_prompt}\n\nBATCH REVIEWS TO MERGE:\n{merged_content}"
+    async def merge(reviews):
+        # Prepare merged content
+        merged_content = "\n\n".join([f"Batch Review {i+1}:\n{review}" for i, review in enumerate(reviews)])
+        prompt = f"{merged_prompt}\n\nBATCH REVIEWS TO MERGE:\n{merged_content}"
+        
+        # Get LLM review asynchronously
+        return validated_response(await async_create_message(prompt, model, stage="merged_review"), merged_prompt)
     
-    # Get LLM review asynchronously
-    review_text = await async_create_message(prompt, model)
+    if batch_reviews:
+        review_text = await tree_reduce(batch_reviews, merge, check_fan_in(fan_in) if fan_in else merge_fan_in())
+    else:
+        review_text = await merge([])
     
     # Save merged review
     review_path = review_dir / f"merged_review_{timestamp}.txt"
@@ -179,13 +701,16 @@ async def process_merged_review(batch_reviews, model):
     
     return review_text
 
-async def process_final_review(merged_review, model):
-    """Stage 4: Process final review"""
+async def process_final_review(merged_review, model, on_text=None):
+    """
+    Stage 4: Process final review
+    
+    on_text is called with each chunk of the review as it streams in.
+    """
     logger.info("Starting final review...")
     
     # Load final review prompt
-    with open(Path("app/prompts/final_review.txt"), "r") as f:
-        final_prompt = f.read()
+    final_prompt = get_registry().prompt("final_review")
     
     # Create final reviews directory
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -195,7 +720,9 @@ async def process_final_review(merged_review, model):
     prompt = f"{final_prompt}\n\nMERGED REVIEW TO FINALIZE:\n{merged_review}"
     
     # Get LLM review asynchronously
-    review_text = await async_create_message(prompt, model)
+    review_text = validated_response(
+        await async_create_message(prompt, model, stage="final_review", on_text=on_text), final_prompt
+    )
     
     # Save final review
     review_path = review_dir / f"final_review_{timestamp}.txt"
@@ -204,58 +731,252 @@ async def process_final_review(merged_review, model):
     
     return review_text
 
-async def main():
-    try:
-        console.print("Starting code review process...", style="bold green")
-        
-        # Get GitHub URL from user
-        repo_url = await get_github_url()
-        console.print(f"Processing repository: {repo_url}", style="bold blue")
-        
-        # Initialize extractor
-        extractor = CodeExtractor()
+DEFAULT_MODEL = "claude-3-haiku-20240307"
+
+async def process_remaining_reviews(extractor, repo_url, done_reviews, model, cache=None, on_file_review=None, bulk=False):
+    """
+    Finish an interrupted Stage 1 by reviewing only the files not yet reviewed.
+    
+    Checkpointed reviews are kept for paths whose blob is unchanged in the
+    current tree; everything else in the tree is extracted and reviewed.
+    
+    Returns:
+        list: All file reviews sorted by path
+    """
+    current_tree = await asyncio.to_thread(extractor.list_github_tree, repo_url)
+    kept = [review for review in done_reviews if current_tree.get(review['path']) == review.get('sha')]
+    remaining = set(current_tree) - {review['path'] for review in kept}
+    logger.info(f"Resuming file reviews: {len(kept)} done, {len(remaining)} remaining")
+    
+    files = []
+    if remaining:
+        files = await asyncio.to_thread(lambda: list(extractor.stream_github_files(repo_url, remaining)))
+    new_reviews = await process_initial_reviews(files, model, cache, on_file_review, bulk) if files else []
+    return sorted(kept + list(new_reviews), key=lambda review: review['path'])
+
+async def run_review_stages(review, checkpoint, checkpoints, extractor, previous_review=None, bulk=False):
+    """
+    Run the review stages not yet recorded in checkpoint, checkpointing each.
+    
+    Args:
+        review: Review being built
+        checkpoint: Checkpoint describing the stages already completed
+        checkpoints: CheckpointStore receiving progress
+        extractor: CodeExtractor for the repository
+        previous_review: Earlier saved review of the repository, for incremental runs
+        bulk: Review files in an offline provider batch job instead of in real time
         
-        # Extract from repository using stream_github_files
-        console.print("Extracting files from repository...")
-        files = list(extractor.stream_github_files(repo_url))
+    Returns:
+        Review: The saved review
+    """
+    repo_url, model = checkpoint.repo_url, checkpoint.model
+    
+    def save_file_review(file_review):
+        checkpoints.save_file_review(review.review_id, file_review)
+    
+    # Process through review stages
+    cache = ReviewCache.from_env()
+    if checkpoint.reached("batch_reviews"):
+        file_reviews = checkpoint.file_reviews
+        batch_reviews = checkpoint.batch_reviews
+        batch_files = checkpoint.batch_files
+    else:
+        if checkpoint.reached("initial_reviews") or checkpoint.file_reviews:
+            # Stages 1 and 2 after an interruption: finish the remaining files, then batch
+            file_reviews = checkpoint.file_reviews
+            if not checkpoint.reached("initial_reviews"):
+                if previous_review:
+                    # An interrupted incremental run still carries over unchanged files
+                    done = {file_review['path']: file_review for file_review in previous_review.file_reviews}
+                    done.update((file_review['path'], file_review) for file_review in file_reviews)
+                    file_reviews = list(done.values())
+                file_reviews = await process_remaining_reviews(
+                    extractor, repo_url, file_reviews, model, cache, save_file_review, bulk
+                )
+                checkpoints.complete_stage(review.review_id, "initial_reviews", file_reviews=file_reviews)
+            batch_reviews = await process_batch_reviews(file_reviews, model)
+            batch_files = [[file_review['path'] for file_review in batch] for batch in group_into_batches(file_reviews)]
+        elif previous_review and previous_review.file_tree:
+            # Stages 1 and 2: only re-review what changed since the last review
+            console.print("Previous review found, re-reviewing changed files...")
+            file_reviews, batch_reviews, batch_files = await process_incremental_reviews(
+                extractor, repo_url, previous_review, model, cache, save_file_review, bulk
+            )
+        elif bulk:
+            # Stages 1 and 2 in bulk mode: the batch jobs need every file up front
+            console.print("Extracting files from repository for a bulk review...")
+            files = await asyncio.to_thread(lambda: list(extractor.stream_github_files(repo_url)))
+            file_reviews = await process_initial_reviews(files, model, cache, save_file_review, bulk=True)
+            batch_reviews = await process_batch_reviews(file_reviews, model)
+            batch_files = [[file_review['path'] for file_review in batch] for batch in group_into_batches(file_reviews)]
+        else:
+            # Stages 1 and 2: file reviews start while files are still being
+            # extracted, and each batch review starts once its files are done
+            console.print("Extracting and reviewing files from repository...")
+            file_reviews, batch_reviews, batch_files = await process_streaming_reviews(
+                extractor.stream_github_files(repo_url), model, cache=cache, on_file_review=save_file_review
+            )
+        checkpoints.complete_stage(
+            review.review_id, "batch_reviews",
+            file_reviews=file_reviews, batch_reviews=batch_reviews, batch_files=batch_files
+        )
+    clear_review_memos()
+    logger.info(f"Review cache: {cache.hits} hits, {cache.misses} misses")
+    review.file_reviews = file_reviews
+    review.batch_reviews = batch_reviews
+    review.file_tree = {file_review['path']: file_review['sha'] for file_review in file_reviews}
+    review.batch_files = batch_files
+    console.print("Initial file and batch reviews completed.", style="green")
+    
+    # Stage 3: Merged Batch Review
+    if checkpoint.reached("merged_review"):
+        merged_review = checkpoint.merged_review
+    else:
+        merged_review = await process_merged_review(batch_reviews, model)
+        checkpoints.complete_stage(review.review_id, "merged_review", merged_review=merged_review)
+    review.merged_batch_review = merged_review
+    console.print("Merged batch review completed.", style="green")
+    
+    # Stage 4: Final Review
+    final_review = await process_final_review(merged_review, model)
+    review.final_review = final_review
+    console.print("Final review completed.", style="green")
+    
+    # Save the complete review
+    review.save()
+    checkpoints.complete_stage(review.review_id, "completed")
+    console.print("Review saved successfully!", style="bold green")
+    return review
+
+async def run_review(repo_url, model=DEFAULT_MODEL, review_id=None, checkpoints=None, bulk=False):
+    """
+    Run all four review stages for a GitHub repository and save the result.
+    
+    Each file review and the output of every stage is checkpointed as it
+    completes. When review_id names a checkpointed review, completed stages
+    are restored instead of being run again (see resume).
+    
+    Args:
+        repo_url: Validated GitHub repository URL
+        model: Model name
+        review_id: Optional id of a checkpointed review to continue, or the
+            id to start a new review under when it has no checkpoint
+        checkpoints: Optional CheckpointStore; created from the environment if omitted
+        bulk: Review files in an offline provider batch job, for runs where
+            latency does not matter (e.g. nightly re-reviews)
         
-        # Initialize review
+    Returns:
+        Review: The saved review
+    """
+    console.print(f"Processing repository: {repo_url}", style="bold blue")
+    # Review jobs run concurrently in one worker process; keep their memos apart
+    start_review_memos()
+    
+    # Initialize extractor (one tarball download instead of a request per file)
+    extractor = CodeExtractor(use_archive=True)
+    if checkpoints is None:
+        checkpoints = CheckpointStore.from_env()
+    
+    # Initialize review, or pick up a checkpointed one
+    repository_name = '/'.join(repo_url.rstrip('/').split('/')[-2:])
+    checkpoint = checkpoints.load(review_id) if review_id else None
+    if checkpoint is None:
+        checkpoints.prune()
+        previous_review = Review.latest_for_repository(repository_name)
         review = Review.create(
             repo_id=1,  # Test ID
-            file_reviews=[]
+            file_reviews=[],
+            repository_name=repository_name,
+            review_id=review_id
         )
+        previous_review_id = previous_review.review_id if previous_review else None
+        checkpoints.start(review.review_id, repo_url, model, previous_review_id)
+        checkpoint = Checkpoint(review.review_id, repo_url, model, STAGES[0], previous_review_id=previous_review_id)
+    else:
+        previous_review = Review.get(checkpoint.previous_review_id) if checkpoint.previous_review_id else None
+        review = Review(review_id=checkpoint.review_id, repo_id=1, repository_name=repository_name)
+        console.print(f"Resuming review {review.review_id} after stage '{checkpoint.stage}'")
+    
+    try:
+        return await run_review_stages(review, checkpoint, checkpoints, extractor, previous_review, bulk)
+    except Exception:
+        clear_review_memos()
+        # Keep the file reviews that completed before the failure
+        await asyncio.to_thread(checkpoints.flush)
+        logger.error(
+            f"Review {review.review_id} was interrupted; continue it with "
+            f"`python -m app.main --resume {review.review_id}`"
+        )
+        raise
+
+async def resume(review_id, checkpoints=None, bulk=False):
+    """
+    Resume a checkpointed review from its last completed stage.
+    
+    Args:
+        review_id: Id of the interrupted review
+        checkpoints: Optional CheckpointStore; created from the environment if omitted
+        bulk: Review remaining files in an offline provider batch job
         
-        # Process through review stages
-        model = "claude-3-haiku-20240307"  # Using specified model
-        
-        # Stage 1: Initial Reviews (concurrent)
-        file_reviews = await process_initial_reviews(files, model)
-        review.file_reviews = file_reviews
-        console.print("Initial file reviews completed.", style="green")
-        
-        # Stage 2: Batch Reviews (concurrent)
-        batch_reviews = await process_batch_reviews(file_reviews, model)
-        review.batch_reviews = batch_reviews
-        console.print("Batch reviews completed.", style="green")
-        
-        # Stage 3: Merged Batch Review
-        merged_review = await process_merged_review(batch_reviews, model)
-        review.merged_batch_review = merged_review
-        console.print("Merged batch review completed.", style="green")
+    Returns:
+        Review: The saved review
         
-        # Stage 4: Final Review
-        final_review = await process_final_review(merged_review, model)
-        review.final_review = final_review
-        console.print("Final review completed.", style="green")
+    Raises:
+        ValueError: If there is no checkpoint for review_id or it already completed
+    """
+    if checkpoints is None:
+        checkpoints = CheckpointStore.from_env()
+    checkpoint = checkpoints.load(review_id)
+    if checkpoint is None:
+        raise ValueError(f"No checkpoint found for review {review_id}")
+    if checkpoint.reached("completed"):
+        raise ValueError(f"Review {review_id} already completed")
+    return await run_review(checkpoint.repo_url, checkpoint.model, review_id=review_id, checkpoints=checkpoints, bulk=bulk)
+
+def log_llm_stats():
+    """Log connection reuse and concurrency statistics of the shared LLM client"""
+    client = get_llm_client()
+    stats = client.stats
+    logger.info(
+        f"LLM connections: {stats.new_connections} new, "
+        f"{stats.reused_connections} reused over {stats.requests} requests"
+    )
+    concurrency = client.limiter.stats
+    logger.info(
+        f"LLM concurrency: limit {concurrency.limit} (peak {concurrency.peak_limit}), "
+        f"{concurrency.decreases} back-offs, {concurrency.throttled} throttled responses"
+    )
+    for stage, usage in client.usage.items():
+        logger.info(
+            f"LLM tokens ({stage}): {usage.input_tokens} input, {usage.output_tokens} output, "
+            f"{usage.cache_read_input_tokens} cache read, {usage.cache_creation_input_tokens} cache write "
+            f"({usage.cache_hit_rate:.0%} of prompt tokens from cache) over {usage.requests} requests"
+        )
+
+async def main(resume_id=None, bulk=False):
+    try:
+        console.print("Starting code review process...", style="bold green")
         
-        # Save the complete review
-        review.save()
-        console.print("Review saved successfully!", style="bold green")
+        if resume_id:
+            await resume(resume_id, bulk=bulk)
+        else:
+            # Get GitHub URL from user
+            repo_url = await get_github_url()
+            await run_review(repo_url, bulk=bulk)
+        log_llm_stats()
         
     except Exception as e:
         logger.error(f"Error during review process: {str(e)}")
         console.print(f"Error: {str(e)}", style="bold red")
         raise
+    finally:
+        await close_llm_client()
+        close_skeleton_extractor()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Review a GitHub repository")
+    parser.add_argument("--resume", metavar="REVIEW_ID", help="resume an interrupted review")
+    parser.add_argument("--bulk", action="store_true",
+                        help="review files in an offline batch job (cheaper, can take hours)")
+    args = parser.parse_args()
+    asyncio.run(main(resume_id=args.resume, bulk=args.bulk))
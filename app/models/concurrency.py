@@ -0,0 +1,325 @@
+"""
+Adaptive concurrency control for LLM calls.
+
+A single limiter is shared by every review stage. It probes upwards while
+latency stays flat and backs off multiplicatively on 429/529 responses or
+rising latency (AIMD), so the pipeline settles near the provider's real
+throughput ceiling without hand-tuned semaphores.
+
+Latency is measured to the response headers, which for a streamed call is
+the time to first byte and leaves generation out. Non-streamed responses
+only send headers once the output is complete, so each kind of call (model
+and stage) is compared against its own baseline rather than one shared by
+short and long generations.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Provider responses that signal the caller is sending too much
+OVERLOAD_STATUSES = frozenset({429, 529})
+
+# Fraction of the gap a slower sample moves the latency baseline upwards
+BASELINE_DRIFT = 0.01
+
+
+@dataclass
+class ConcurrencyStats:
+    """Gauges and counters describing the limiter's behaviour."""
+    limit: int = 0
+    in_flight: int = 0
+    peak_limit: int = 0
+    increases: int = 0
+    decreases: int = 0
+    throttled: int = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        """Convert stats to dictionary."""
+        return asdict(self)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a ``retry-after`` header.
+
+    Args:
+        value: Header value, either delay seconds or an HTTP date
+
+    Returns:
+        Optional[float]: Seconds to wait, or None if absent or unparseable
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class ConcurrencyPermit:
+    """
+    A slot held for one LLM call.
+
+    Leaving the ``async with`` block normally records a success with the
+    latency up to ``responded``, or up to leaving if it was never called.
+    Call ``throttled`` before leaving to report an overload response instead.
+    Exceptions release the slot without adjusting the limit.
+    """
+
+    def __init__(self, limiter: 'AdaptiveConcurrencyLimiter', key: Optional[str] = None):
+        self._limiter = limiter
+        self._key = key
+        self._started = 0.0
+        self._responded: Optional[float] = None
+        self._throttled = False
+        self._retry_after: Optional[float] = None
+
+    def responded(self) -> None:
+        """Mark the arrival of the response headers, ending the latency measurement."""
+        if self._responded is None:
+            self._responded = time.monotonic()
+
+    def throttled(self, retry_after: Optional[float] = None) -> None:
+        """
+        Mark this call as rejected for overload.
+
+        Args:
+            retry_after: Seconds the provider asked callers to wait
+        """
+        self._throttled = True
+        self._retry_after = retry_after
+
+    async def __aenter__(self) -> 'ConcurrencyPermit':
+        self._started = await self._limiter.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self._throttled:
+            self._limiter.release(self._started, overloaded=True, retry_after=self._retry_after)
+        elif exc_type is None:
+            latency = (self._responded or time.monotonic()) - self._started
+            self._limiter.release(self._started, latency=latency, key=self._key)
+        else:
+            self._limiter.release(self._started)
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD concurrency limiter driven by overload responses and latency."""
+
+    def __init__(
+        self,
+        initial_limit: int = 10,
+        min_limit: int = 1,
+        max_limit: int = 100,
+        backoff_factor: float = 0.5,
+        latency_tolerance: float = 2.0,
+        smoothing: float = 0.2
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            initial_limit: Concurrent calls allowed before any feedback
+            min_limit: Lower bound for the limit
+            max_limit: Upper bound for the limit
+            backoff_factor: Multiplier applied to the limit on overload
+            latency_tolerance: Smoothed latency above this multiple of the
+                best observed latency of the same kind of call counts as
+                congestion
+            smoothing: Weight of each new sample in the latency average
+        """
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError("Limits must satisfy 1 <= min_limit <= initial_limit <= max_limit")
+        if not 0 < backoff_factor < 1:
+            raise ValueError("Backoff factor must be between 0 and 1")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_factor = backoff_factor
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+        self.stats = ConcurrencyStats(limit=initial_limit, peak_limit=initial_limit)
+
+        self._limit = initial_limit
+        self._in_flight = 0
+        self._successes = 0
+        self._waiters: deque = deque()
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        # Smoothed and baseline latency per kind of call
+        self._latency: Dict[Optional[str], float] = {}
+        self._baseline_latency: Dict[Optional[str], float] = {}
+
+    @classmethod
+    def from_env(cls, max_limit: int = 100, shares: int = 1) -> 'AdaptiveConcurrencyLimiter':
+        """
+        Create a limiter configured from environment variables.
+
+        Args:
+            max_limit: Upper bound used when LLM_CONCURRENCY_MAX is not set
+            shares: Number of processes calling the same provider; the
+                initial and maximum limits are split between them
+
+        Returns:
+            AdaptiveConcurrencyLimiter: Limiter using LLM_CONCURRENCY_INITIAL,
+            LLM_CONCURRENCY_MIN and LLM_CONCURRENCY_MAX when set
+        """
+        min_limit = int(os.getenv('LLM_CONCURRENCY_MIN', 1))
+        max_limit = max(min_limit, int(os.getenv('LLM_CONCURRENCY_MAX', max_limit)) // shares)
+        return cls(
+            initial_limit=max(min_limit, min(int(os.getenv('LLM_CONCURRENCY_INITIAL', 10)) // shares, max_limit)),
+            min_limit=min_limit,
+            max_limit=max_limit
+        )
+
+    @property
+    def limit(self) -> int:
+        """Current number of concurrent calls allowed."""
+        return self._limit
+
+    @property
+    def in_flight(self) -> int:
+        """Number of calls currently holding a slot."""
+        return self._in_flight
+
+    def slot(self, key: Optional[str] = None) -> ConcurrencyPermit:
+        """
+        Hold a slot for one call.
+
+        Args:
+            key: Kind of call (e.g. model and stage) whose latency baseline
+                the call is measured against
+
+        Returns:
+            ConcurrencyPermit: Async context manager wrapping the call
+        """
+        return ConcurrencyPermit(self, key)
+
+    async def acquire(self) -> float:
+        """
+        Wait for a free slot and any pending retry-after window.
+
+        Returns:
+            float: Monotonic start time to pass back to ``release``
+        """
+        loop = asyncio.get_running_loop()
+        queued = False
+        while True:
+            delay = self._blocked_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            # Newcomers queue behind earlier waiters so nobody starves
+            if self._in_flight < self._limit and (queued or not self._waiters):
+                self._in_flight += 1
+                self.stats.in_flight = self._in_flight
+                return time.monotonic()
+
+            waiter = loop.create_future()
+            if queued:
+                self._waiters.appendleft(waiter)
+            else:
+                self._waiters.append(waiter)
+            queued = True
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                else:
+                    # Pass a wake-up we consumed on to the next waiter
+                    self._wake()
+                raise
+
+    def release(
+        self,
+        started: float,
+        latency: Optional[float] = None,
+        overloaded: bool = False,
+        retry_after: Optional[float] = None,
+        key: Optional[str] = None
+    ) -> None:
+        """
+        Return a slot and feed the outcome into the limit.
+
+        Args:
+            started: Start time returned by ``acquire``
+            latency: Call latency in seconds for a successful call
+            overloaded: Whether the provider rejected the call for overload
+            retry_after: Seconds the provider asked callers to wait
+            key: Kind of call the latency is compared within
+        """
+        self._in_flight -= 1
+        self.stats.in_flight = self._in_flight
+        if overloaded:
+            self._on_overload(started, retry_after)
+        elif latency is not None:
+            self._on_success(started, latency, key)
+        self._wake()
+
+    def _on_success(self, started: float, latency: float, key: Optional[str] = None) -> None:
+        """Grow the limit by one per window of successes while latency is flat."""
+        smoothed = self._latency.get(key)
+        smoothed = latency if smoothed is None else smoothed + self.smoothing * (latency - smoothed)
+        self._latency[key] = smoothed
+        baseline = self._baseline_latency.get(key)
+        if baseline is None or smoothed < baseline:
+            baseline = smoothed
+        else:
+            # Drift slowly upwards so one unusually fast sample is not a permanent target
+            baseline += BASELINE_DRIFT * (smoothed - baseline)
+        self._baseline_latency[key] = baseline
+
+        if smoothed > baseline * self.latency_tolerance:
+            self._decrease(started, "latency")
+            return
+
+        self._successes += 1
+        if self._successes >= self._limit and self._limit < self.max_limit:
+            self._successes = 0
+            self._set_limit(self._limit + 1)
+            self.stats.increases += 1
+
+    def _on_overload(self, started: float, retry_after: Optional[float]) -> None:
+        """Back off on a 429/529 and pause new calls for any retry-after."""
+        self.stats.throttled += 1
+        if retry_after:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        self._decrease(started, "overload")
+
+    def _decrease(self, started: float, reason: str) -> None:
+        """Cut the limit once per congestion event."""
+        # Calls already in flight when we last backed off report the same event
+        if started < self._last_decrease:
+            return
+        self._last_decrease = time.monotonic()
+        self._successes = 0
+        new_limit = max(self.min_limit, int(self._limit * self.backoff_factor))
+        if new_limit < self._limit:
+            logger.info(f"Reducing LLM concurrency from {self._limit} to {new_limit} ({reason})")
+            self._set_limit(new_limit)
+            self.stats.decreases += 1
+
+    def _set_limit(self, limit: int) -> None:
+        self._limit = limit
+        self.stats.limit = limit
+        self.stats.peak_limit = max(self.stats.peak_limit, limit)
+
+    def _wake(self) -> None:
+        """Wake as many waiters as there are free slots."""
+        free = self._limit - self._in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
@@ -0,0 +1,559 @@
+"""
+Shared, connection-pooled HTTP client for LLM API calls.
+
+A single long-lived aiohttp session is reused by every review stage so that
+requests to the provider ride on kept-alive connections instead of paying a
+fresh TCP+TLS handshake for every prompt.
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+from dataclasses import dataclass, asdict
+from typing import AsyncIterator, Optional, Dict, Any
+
+import aiohttp
+
+from app.models.concurrency import AdaptiveConcurrencyLimiter, OVERLOAD_STATUSES, parse_retry_after
+from app.models.rate_limiter import RateLimiter, RateLimitReservation
+from app.utils.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+ANTHROPIC_MESSAGES_URL = "https://api.anthropic.com/v1/messages"
+ANTHROPIC_VERSION = "2023-06-01"
+
+# Output tokens reserved for a stage's first calls, before any usage is known
+DEFAULT_OUTPUT_ESTIMATE = 1000
+# Multiple of a stage's average output reserved for each further call
+OUTPUT_ESTIMATE_HEADROOM = 1.5
+
+
+class LLMOverloadedError(Exception):
+    """Raised when the provider keeps rejecting a call with 429/529."""
+    def __init__(self, status: int, retry_after: Optional[float] = None):
+        self.status = status
+        self.retry_after = retry_after
+        super().__init__(f"LLM provider overloaded (HTTP {status})")
+
+
+class LLMResponseError(Exception):
+    """Raised when the provider answers a call with an error response."""
+
+    # Statuses worth retrying: timeouts, conflicts and server-side failures
+    RETRYABLE_STATUSES = frozenset({408, 409, 500, 502, 503, 504})
+
+    def __init__(self, status: int, error_type: Optional[str] = None, message: Optional[str] = None):
+        self.status = status
+        self.error_type = error_type
+        self.message = message
+        super().__init__(f"LLM provider returned HTTP {status}: {error_type or 'error'} {message or ''}".strip())
+
+    @property
+    def retryable(self) -> bool:
+        """Whether the same request may succeed if sent again."""
+        return self.status in self.RETRYABLE_STATUSES or self.status in OVERLOAD_STATUSES
+
+
+def message_params(prompt: str, model: str, max_tokens: int = 4000, system: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build Messages API parameters for a prompt.
+
+    Args:
+        prompt: Prompt text
+        model: Model name
+        max_tokens: Maximum tokens to generate
+        system: Optional static instructions, marked as a prompt-cache prefix
+
+    Returns:
+        dict: Request body for the Messages API
+    """
+    params = {
+        "model": model,
+        "max_tokens": max_tokens,
+        "messages": [{"role": "user", "content": prompt}]
+    }
+    if system:
+        params["system"] = [
+            {"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}
+        ]
+    return params
+
+
+def latency_key(model: str, stage: Optional[str] = None) -> str:
+    """
+    Kind of call the concurrency limiter compares a call's latency within.
+
+    Stages send prompts and expect outputs of very different sizes, so each
+    model and stage pair keeps its own latency baseline.
+
+    Args:
+        model: Model name
+        stage: Optional stage name
+
+    Returns:
+        str: Latency key
+    """
+    return f"{model}/{stage}" if stage else model
+
+
+@dataclass
+class ConnectionStats:
+    """Counters describing how pooled connections were used."""
+    requests: int = 0
+    new_connections: int = 0
+    reused_connections: int = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        """Convert stats to dictionary."""
+        return asdict(self)
+
+
+@dataclass
+class TokenUsage:
+    """Token counts reported by the provider for one stage."""
+    requests: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    # Prompt-cache writes and reads; not included in input_tokens
+    cache_creation_input_tokens: int = 0
+    cache_read_input_tokens: int = 0
+
+    def add(self, usage: Dict[str, Any]) -> None:
+        """Add the usage block of one response."""
+        self.requests += 1
+        for name in ('input_tokens', 'output_tokens', 'cache_creation_input_tokens', 'cache_read_input_tokens'):
+            setattr(self, name, getattr(self, name) + (usage.get(name) or 0))
+
+    @property
+    def cache_hit_rate(self) -> float:
+        """Share of prompt tokens served from the prompt cache."""
+        total = self.input_tokens + self.cache_creation_input_tokens + self.cache_read_input_tokens
+        return self.cache_read_input_tokens / total if total else 0.0
+
+    def to_dict(self) -> Dict[str, int]:
+        """Convert usage to dictionary."""
+        return asdict(self)
+
+
+class LLMClient:
+    """
+    Long-lived, connection-pooled client for LLM HTTP APIs.
+
+    The underlying session is created lazily on first use and bound to the
+    running event loop; it is transparently re-created if the loop changes
+    (for example across separate ``asyncio.run`` calls).
+    """
+
+    def __init__(
+        self,
+        keepalive_timeout: float = 60.0,
+        limit: int = 100,
+        limit_per_host: int = 20,
+        request_timeout: float = 300.0,
+        limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+        max_overload_retries: int = 3,
+        rate_limiter: Optional[RateLimiter] = None
+    ):
+        """
+        Initialize the LLM client.
+
+        Args:
+            keepalive_timeout: Seconds an idle connection is kept open for reuse
+            limit: Maximum number of simultaneous connections in the pool
+            limit_per_host: Maximum number of simultaneous connections per host
+            request_timeout: Total timeout in seconds for a single request
+            limiter: Concurrency limiter shared by all calls; defaults to an
+                adaptive limiter capped at limit_per_host
+            max_overload_retries: Times a 429/529 response is retried after
+                the limiter backs off
+            rate_limiter: RPM/TPM budgets shared by all calls; unlimited if omitted
+        """
+        self.keepalive_timeout = keepalive_timeout
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.request_timeout = request_timeout
+        self.limiter = limiter or AdaptiveConcurrencyLimiter(max_limit=max(limit_per_host, 10))
+        self.max_overload_retries = max_overload_retries
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.stats = ConnectionStats()
+        self.usage: Dict[str, TokenUsage] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def from_env(cls) -> 'LLMClient':
+        """
+        Create a client configured from environment variables.
+
+        Returns:
+            LLMClient: Client using LLM_KEEPALIVE_TIMEOUT, LLM_POOL_LIMIT,
+            LLM_POOL_LIMIT_PER_HOST and LLM_REQUEST_TIMEOUT when set, with a
+            concurrency limiter configured by LLM_CONCURRENCY_* variables and
+            rate limits from the model configuration, both split between
+            LLM_BUDGET_SHARES processes when set
+        """
+        limit_per_host = int(os.getenv('LLM_POOL_LIMIT_PER_HOST', 20))
+        shares = int(os.getenv('LLM_BUDGET_SHARES', 1))
+        return cls(
+            keepalive_timeout=float(os.getenv('LLM_KEEPALIVE_TIMEOUT', 60.0)),
+            limit=int(os.getenv('LLM_POOL_LIMIT', 100)),
+            limit_per_host=limit_per_host,
+            request_timeout=float(os.getenv('LLM_REQUEST_TIMEOUT', 300.0)),
+            limiter=AdaptiveConcurrencyLimiter.from_env(max_limit=max(limit_per_host, 10), shares=shares),
+            rate_limiter=RateLimiter.from_config(shares=shares)
+        )
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        """Build trace hooks that count new and reused connections."""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_connection_create_end(session, context, params):
+            self.stats.new_connections += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            self.stats.reused_connections += 1
+
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Get the pooled session, creating it for the running loop if needed.
+
+        Returns:
+            aiohttp.ClientSession: Session bound to the current event loop
+        """
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+                trace_configs=[self._trace_config()]
+            )
+            self._loop = loop
+        return self._session
+
+    async def post_json(
+        self,
+        url: str,
+        headers: Dict[str, str],
+        payload: Dict[str, Any],
+        latency_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        POST a JSON payload over a pooled connection.
+
+        Each attempt holds a slot from the shared concurrency limiter. 429/529
+        responses shrink the limit, pause new calls for any ``retry-after``
+        and are retried up to max_overload_retries times.
+
+        Args:
+            url: Endpoint URL
+            headers: Request headers
+            payload: JSON body
+            latency_key: Kind of call whose latency baseline this call is
+                measured against; defaults to the payload's model
+
+        Returns:
+            dict: Decoded JSON response
+
+        Raises:
+            LLMOverloadedError: If the provider is still overloaded after all retries
+            LLMResponseError: If the provider returns any other error status
+        """
+        session = self._get_session()
+        for attempt in range(self.max_overload_retries + 1):
+            async with self.limiter.slot(latency_key or payload.get('model')) as permit:
+                self.stats.requests += 1
+                async with session.post(url, headers=headers, json=payload) as response:
+                    permit.responded()
+                    if response.status < 400:
+                        return await response.json()
+                    if response.status not in OVERLOAD_STATUSES:
+                        raise await self._response_error(response)
+                    retry_after = parse_retry_after(response.headers.get('retry-after'))
+                    permit.throttled(retry_after)
+            logger.warning(
+                f"LLM provider returned {response.status} (attempt {attempt + 1}), "
+                f"concurrency limit now {self.limiter.limit}"
+            )
+        raise LLMOverloadedError(response.status, retry_after)
+
+    async def get_text(self, url: str, headers: Dict[str, str]) -> str:
+        """
+        GET a resource over a pooled connection.
+
+        Used for status polls and result downloads, which do not count
+        against the concurrency limiter.
+
+        Args:
+            url: Resource URL
+            headers: Request headers
+
+        Returns:
+            str: Response body
+
+        Raises:
+            LLMResponseError: If the provider returns an error status
+        """
+        session = self._get_session()
+        self.stats.requests += 1
+        async with session.get(url, headers=headers) as response:
+            if response.status >= 400:
+                raise await self._response_error(response)
+            return await response.text()
+
+    @staticmethod
+    async def _response_error(response: aiohttp.ClientResponse) -> LLMResponseError:
+        """Build an error from a failed response, tolerating non-JSON bodies."""
+        try:
+            error = (await response.json(content_type=None) or {}).get('error') or {}
+        except (ValueError, AttributeError, aiohttp.ContentTypeError):
+            error = {}
+        if not isinstance(error, dict):
+            error = {'message': str(error)}
+        return LLMResponseError(response.status, error.get('type'), error.get('message'))
+
+    def record_usage(self, stage: Optional[str], usage: Dict[str, Any]) -> None:
+        """
+        Add a response's token usage to its stage's totals.
+
+        Args:
+            stage: Pipeline stage the call belongs to; "other" if None
+            usage: Usage block in Anthropic form
+        """
+        self.usage.setdefault(stage or "other", TokenUsage()).add(usage)
+
+    async def create_message(
+        self,
+        prompt: str,
+        model: str,
+        max_tokens: int = 4000,
+        system: Optional[str] = None,
+        stage: Optional[str] = None
+    ) -> str:
+        """
+        Send a prompt to the Anthropic Messages API.
+
+        The call first queues for the (provider, model, key) rate budget,
+        reserving the estimated input tokens and the output expected for the
+        stage, and settles the reservation with the usage reported in the
+        response, or returns its tokens if the call fails.
+
+        A static instruction block passed as ``system`` is sent ahead of the
+        prompt with a cache breakpoint, so repeated calls sharing it read the
+        prefix from the provider's prompt cache. Prefixes shorter than the
+        model's minimum cacheable length are processed without caching.
+
+        Args:
+            prompt: Prompt text, e.g. the per-file content
+            model: Model name
+            max_tokens: Maximum tokens to generate
+            system: Optional static instructions to cache as a prefix
+            stage: Optional stage name usage is reported under
+
+        Returns:
+            str: Text of the first content block in the response
+        """
+        api_key = os.getenv("ANTHROPIC_API_KEY")
+        reservation = await self._reserve(prompt, model, max_tokens, system, api_key, stage)
+        try:
+            result = await self.post_json(
+                ANTHROPIC_MESSAGES_URL,
+                headers=self._anthropic_headers(api_key),
+                payload=message_params(prompt, model, max_tokens, system),
+                latency_key=latency_key(model, stage)
+            )
+        except BaseException:
+            reservation.settle(0, 0)
+            raise
+        self._settle(reservation, stage, result.get('usage') or {})
+        return result['content'][0]['text']
+
+    async def stream_message(
+        self,
+        prompt: str,
+        model: str,
+        max_tokens: int = 4000,
+        system: Optional[str] = None,
+        stage: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a response from the Anthropic Messages API.
+
+        Text deltas are yielded as the server-sent events arrive. Closing the
+        iterator early (``aclose()``, or breaking out of ``async for``)
+        closes the connection, which stops the generation so no further
+        output tokens are spent. Rate budget and the concurrency slot are
+        held for the whole stream. Overload responses are retried like
+        ``post_json`` until streaming starts, and the rate reservation is
+        settled however the stream ends.
+
+        Args:
+            prompt: Prompt text
+            model: Model name
+            max_tokens: Maximum tokens to generate
+            system: Optional static instructions to cache as a prefix
+            stage: Optional stage name usage is reported under
+
+        Yields:
+            str: Text deltas of the response
+
+        Raises:
+            LLMOverloadedError: If the provider is still overloaded after all
+                retries or reports an overload mid-stream
+            LLMResponseError: If the provider returns any other error
+        """
+        api_key = os.getenv("ANTHROPIC_API_KEY")
+        reservation = await self._reserve(prompt, model, max_tokens, system, api_key, stage)
+        session = self._get_session()
+        usage: Dict[str, Any] = {}
+        streamed = []
+        accepted = finished = False
+        try:
+            for attempt in range(self.max_overload_retries + 1):
+                async with self.limiter.slot(latency_key(model, stage)) as permit:
+                    self.stats.requests += 1
+                    async with session.post(
+                        ANTHROPIC_MESSAGES_URL,
+                        headers=self._anthropic_headers(api_key),
+                        json=dict(message_params(prompt, model, max_tokens, system), stream=True)
+                    ) as response:
+                        # Time to first byte: the generation that follows is not congestion
+                        permit.responded()
+                        if response.status in OVERLOAD_STATUSES:
+                            retry_after = parse_retry_after(response.headers.get('retry-after'))
+                            permit.throttled(retry_after)
+                        else:
+                            if response.status >= 400:
+                                raise await self._response_error(response)
+                            accepted = True
+                            async for line in response.content:
+                                if not line.startswith(b'data:'):
+                                    continue
+                                event = json.loads(line[5:])
+                                if event['type'] == 'message_start':
+                                    usage.update(event['message'].get('usage') or {})
+                                elif event['type'] == 'message_delta':
+                                    usage.update(event.get('usage') or {})
+                                elif event['type'] == 'content_block_delta' and event['delta']['type'] == 'text_delta':
+                                    streamed.append(event['delta']['text'])
+                                    yield event['delta']['text']
+                                elif event['type'] == 'error':
+                                    error = event.get('error') or {}
+                                    if error.get('type') == 'overloaded_error':
+                                        permit.throttled()
+                                        raise LLMOverloadedError(529)
+                                    raise LLMResponseError(500, error.get('type'), error.get('message'))
+                            finished = True
+                            return
+                logger.warning(
+                    f"LLM provider returned {response.status} (attempt {attempt + 1}), "
+                    f"concurrency limit now {self.limiter.limit}"
+                )
+            raise LLMOverloadedError(response.status, retry_after)
+        finally:
+            if usage:
+                if not finished:
+                    # Cut off mid-stream: the final count never arrived
+                    usage['output_tokens'] = estimate_tokens(''.join(streamed))
+                self._settle(reservation, stage, usage)
+            elif accepted:
+                # Failed before message_start: input unknown, output as streamed
+                reservation.settle(None, estimate_tokens(''.join(streamed)))
+            else:
+                # Rejected or never sent: no tokens were processed
+                reservation.settle(0, 0)
+
+    async def _reserve(
+        self,
+        prompt: str,
+        model: str,
+        max_tokens: int,
+        system: Optional[str],
+        api_key: Optional[str],
+        stage: Optional[str]
+    ) -> RateLimitReservation:
+        """Queue for the rate budget of a Messages API call."""
+        return await self.rate_limiter.acquire(
+            "anthropic", model, api_key,
+            input_tokens=estimate_tokens(prompt) + (estimate_tokens(system) if system else 0),
+            output_tokens=self.output_estimate(stage, max_tokens)
+        )
+
+    def output_estimate(self, stage: Optional[str], max_tokens: int) -> int:
+        """
+        Output tokens to reserve for a call.
+
+        Reserving max_tokens would hold most of a small output budget for
+        every call in flight, so the stage's average output so far is
+        reserved instead, with headroom; settling corrects the difference.
+
+        Args:
+            stage: Pipeline stage the call belongs to; "other" if None
+            max_tokens: Maximum tokens the call may generate
+
+        Returns:
+            int: Tokens to reserve, at most max_tokens
+        """
+        usage = self.usage.get(stage or "other")
+        if usage is None or not usage.requests:
+            estimate = DEFAULT_OUTPUT_ESTIMATE
+        else:
+            estimate = usage.output_tokens / usage.requests * OUTPUT_ESTIMATE_HEADROOM
+        return max(1, min(max_tokens, math.ceil(estimate)))
+
+    @staticmethod
+    def _anthropic_headers(api_key: Optional[str]) -> Dict[str, str]:
+        """Request headers for the Anthropic API."""
+        return {
+            "x-api-key": api_key,
+            "anthropic-version": ANTHROPIC_VERSION,
+            "content-type": "application/json"
+        }
+
+    def _settle(self, reservation: RateLimitReservation, stage: Optional[str], usage: Dict[str, Any]) -> None:
+        """Record a call's usage and settle its rate reservation with it."""
+        self.record_usage(stage, usage)
+        # Cache reads do not count towards input rate limits; cache writes do
+        input_tokens = usage.get('input_tokens')
+        if input_tokens is not None:
+            input_tokens += usage.get('cache_creation_input_tokens') or 0
+        reservation.settle(input_tokens, usage.get('output_tokens'))
+
+    async def close(self) -> None:
+        """Close the pooled session and release its connections."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+
+_shared_client: Optional[LLMClient] = None
+
+
+def get_llm_client() -> LLMClient:
+    """
+    Get the process-wide shared LLM client.
+
+    Returns:
+        LLMClient: Shared client, created from the environment on first use
+    """
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = LLMClient.from_env()
+    return _shared_client
+
+
+async def close_llm_client() -> None:
+    """Close the shared LLM client's connections if it has been created."""
+    if _shared_client is not None:
+        await _shared_client.close()
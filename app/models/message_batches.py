@@ -0,0 +1,257 @@
+"""
+Offline bulk submission through the Anthropic Message Batches API.
+
+A batch job carries many prompts in one request and is processed
+asynchronously by the provider at a lower price and outside the real-time
+rate limits, at the cost of latency (results can take up to a day). Work
+larger than one job allows is split across several jobs, and a job that
+fails or times out is cancelled and reported as failed requests so callers
+can fall back to real-time calls.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.models.llm_client import ANTHROPIC_VERSION, LLMClient, get_llm_client
+
+logger = logging.getLogger(__name__)
+
+ANTHROPIC_BATCHES_URL = "https://api.anthropic.com/v1/messages/batches"
+
+# Limits of one Message Batches job
+MAX_BATCH_REQUESTS = 100_000
+MAX_BATCH_BYTES = 256 * 1024 * 1024
+
+
+@dataclass
+class BatchResult:
+    """Outcome of one request in a batch job."""
+    custom_id: str
+    text: Optional[str] = None
+    error: Optional[str] = None
+    usage: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def succeeded(self) -> bool:
+        """Whether the request produced a message."""
+        return self.error is None
+
+
+class MessageBatchClient:
+    """Submits batch jobs, waits for them to end and collects their results."""
+
+    def __init__(
+        self,
+        client: Optional[LLMClient] = None,
+        batches_url: str = ANTHROPIC_BATCHES_URL,
+        poll_interval: float = 30.0,
+        timeout: float = 24 * 3600.0,
+        max_requests: int = MAX_BATCH_REQUESTS,
+        max_bytes: int = MAX_BATCH_BYTES
+    ):
+        """
+        Initialize the batch client.
+
+        Args:
+            client: Pooled client to send requests with; defaults to the shared client
+            batches_url: Message Batches endpoint
+            poll_interval: Seconds between status polls
+            timeout: Seconds to wait for a batch before giving up
+            max_requests: Requests submitted per batch job
+            max_bytes: Request body size of a batch job
+        """
+        self._client = client
+        self.batches_url = batches_url
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def from_env(cls) -> 'MessageBatchClient':
+        """
+        Create a batch client configured from environment variables.
+
+        Returns:
+            MessageBatchClient: Client using LLM_BATCH_POLL_INTERVAL,
+            LLM_BATCH_TIMEOUT, LLM_BATCH_MAX_REQUESTS and LLM_BATCH_MAX_BYTES
+            when set
+        """
+        return cls(
+            poll_interval=float(os.getenv('LLM_BATCH_POLL_INTERVAL', 30.0)),
+            timeout=float(os.getenv('LLM_BATCH_TIMEOUT', 24 * 3600.0)),
+            max_requests=int(os.getenv('LLM_BATCH_MAX_REQUESTS', MAX_BATCH_REQUESTS)),
+            max_bytes=int(os.getenv('LLM_BATCH_MAX_BYTES', MAX_BATCH_BYTES))
+        )
+
+    @property
+    def client(self) -> LLMClient:
+        """Client used to send requests."""
+        return self._client or get_llm_client()
+
+    @staticmethod
+    def _headers() -> Dict[str, str]:
+        return {
+            "x-api-key": os.getenv("ANTHROPIC_API_KEY"),
+            "anthropic-version": ANTHROPIC_VERSION,
+            "content-type": "application/json"
+        }
+
+    async def submit(self, requests: Dict[str, Dict[str, Any]]) -> str:
+        """
+        Submit a batch job.
+
+        Args:
+            requests: Messages API params by custom id (letters, digits, _ and -)
+
+        Returns:
+            str: Batch id
+
+        Raises:
+            ValueError: If there are no requests
+        """
+        if not requests:
+            raise ValueError("A batch needs at least one request")
+        batch = await self.client.post_json(
+            self.batches_url,
+            headers=self._headers(),
+            payload={"requests": [
+                {"custom_id": custom_id, "params": params} for custom_id, params in requests.items()
+            ]}
+        )
+        logger.info(f"Submitted message batch {batch['id']} with {len(requests)} requests")
+        return batch['id']
+
+    def split(self, requests: Dict[str, Dict[str, Any]]) -> List[Dict[str, Dict[str, Any]]]:
+        """
+        Split requests into batch jobs within the request-count and size limits.
+
+        Args:
+            requests: Messages API params by custom id
+
+        Returns:
+            List[dict]: Requests of each job, in submission order
+        """
+        jobs: List[Dict[str, Dict[str, Any]]] = []
+        job: Dict[str, Dict[str, Any]] = {}
+        # Size of the {"requests": [...]} envelope
+        size = overhead = len(b'{"requests":[]}')
+        for custom_id, params in requests.items():
+            entry_size = len(json.dumps({"custom_id": custom_id, "params": params}).encode()) + 1
+            if job and (len(job) >= self.max_requests or size + entry_size > self.max_bytes):
+                jobs.append(job)
+                job, size = {}, overhead
+            job[custom_id] = params
+            size += entry_size
+        if job:
+            jobs.append(job)
+        return jobs
+
+    async def cancel(self, batch_id: str) -> None:
+        """
+        Ask the provider to stop a batch job.
+
+        Args:
+            batch_id: Batch id
+        """
+        await self.client.post_json(f"{self.batches_url}/{batch_id}/cancel", headers=self._headers(), payload={})
+        logger.info(f"Cancelled message batch {batch_id}")
+
+    async def wait(self, batch_id: str) -> Dict[str, Any]:
+        """
+        Poll a batch job until it has ended.
+
+        Args:
+            batch_id: Batch id
+
+        Returns:
+            dict: The ended batch
+
+        Raises:
+            TimeoutError: If the batch has not ended within the timeout
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            batch = json.loads(await self.client.get_text(f"{self.batches_url}/{batch_id}", self._headers()))
+            if batch['processing_status'] == "ended":
+                return batch
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Message batch {batch_id} did not end within {self.timeout}s")
+            logger.info(f"Message batch {batch_id} still processing: {batch.get('request_counts')}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def results(self, batch: Dict[str, Any]) -> Dict[str, BatchResult]:
+        """
+        Download the results of an ended batch job.
+
+        Args:
+            batch: The ended batch, as returned by wait
+
+        Returns:
+            Dict[str, BatchResult]: Results by custom id
+        """
+        body = await self.client.get_text(batch['results_url'], self._headers())
+        results = {}
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            outcome = entry['result']
+            result = BatchResult(custom_id=entry['custom_id'])
+            if outcome['type'] == "succeeded":
+                message = outcome['message']
+                result.text = message['content'][0]['text']
+                result.usage = message.get('usage') or {}
+            else:
+                error = (outcome.get('error') or {}).get('error') or outcome.get('error') or {}
+                result.error = f"{outcome['type']}: {error.get('message', '')}".rstrip(": ")
+            results[result.custom_id] = result
+        return results
+
+    async def _run_job(self, requests: Dict[str, Dict[str, Any]]) -> Dict[str, BatchResult]:
+        """Run one batch job, reporting every request as failed if the job fails."""
+        batch_id = None
+        try:
+            batch_id = await self.submit(requests)
+            return await self.results(await self.wait(batch_id))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Message batch {batch_id or '(not submitted)'} failed: {e!r}")
+            if batch_id is not None:
+                try:
+                    # Do not leave an abandoned job running and billing
+                    await self.cancel(batch_id)
+                except Exception as cancel_error:
+                    logger.warning(f"Could not cancel message batch {batch_id}: {cancel_error!r}")
+            return {custom_id: BatchResult(custom_id, error=f"batch job failed: {e!r}") for custom_id in requests}
+
+    async def run(self, requests: Dict[str, Dict[str, Any]], stage: Optional[str] = None) -> Dict[str, BatchResult]:
+        """
+        Submit batch jobs, wait for them and collect the results.
+
+        Requests are split into as many jobs as the batch limits require,
+        and the jobs run concurrently. A job that cannot be submitted, does
+        not end within the timeout or whose results cannot be read is
+        cancelled and its requests are reported as errors.
+
+        Args:
+            requests: Messages API params by custom id
+            stage: Optional stage name token usage is reported under
+
+        Returns:
+            Dict[str, BatchResult]: Results by custom id; requests missing
+            from the output are reported as errors
+        """
+        results: Dict[str, BatchResult] = {}
+        for job_results in await asyncio.gather(*(self._run_job(job) for job in self.split(requests))):
+            results.update(job_results)
+        for custom_id in requests:
+            result = results.setdefault(custom_id, BatchResult(custom_id, error="missing from batch results"))
+            if result.succeeded:
+                self.client.record_usage(stage, result.usage)
+        return results
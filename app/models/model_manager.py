@@ -1,13 +1,17 @@
 """
 Simple model manager for LLM selection and fallback handling.
 """
+import asyncio
+import logging
 import os
 import yaml
-import json
-import re
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from dataclasses import dataclass
 
+from app.models.providers import API_KEY_ENV, MockProvider, ProviderAdapter, get_adapter
+
+logger = logging.getLogger(__name__)
+
 @dataclass
 class ModelConfig:
     """Model configuration data."""
@@ -24,12 +28,14 @@ class ModelManager:
     3. Reset to primary model when desired
     """
     
-    def __init__(self, config_path: str):
+    def __init__(self, config_path: str, adapters: Optional[Dict[str, ProviderAdapter]] = None):
         """
         Initialize the model manager.
         
         Args:
             config_path: Path to YAML configuration file
+            adapters: Optional provider adapters by provider name; providers
+                without one get an adapter over the shared pooled client
             
         Raises:
             ValueError: If configuration is invalid or API keys are missing
@@ -37,9 +43,26 @@ class ModelManager:
         self._load_config(config_path)
         self._validate_api_keys()
         self._using_primary = True
+        self.adapters: Dict[str, ProviderAdapter] = dict(adapters or {})
 
     def _load_config(self, config_path: str) -> None:
         """Load model configuration from YAML file."""
+        self.primary, self.backup = self.load_models(config_path)
+
+    @staticmethod
+    def load_models(config_path: str) -> Tuple[ModelConfig, ModelConfig]:
+        """
+        Read the primary and backup models from a YAML configuration file.
+        
+        Args:
+            config_path: Path to YAML configuration file
+            
+        Returns:
+            tuple: (primary, backup) model configurations
+            
+        Raises:
+            ValueError: If configuration is invalid
+        """
         with open(config_path, 'r') as f:
             config = yaml.safe_load(f)
 
@@ -50,25 +73,17 @@ class ModelManager:
         if 'primary' not in models or 'backup' not in models:
             raise ValueError("Configuration must specify primary and backup models")
 
-        self.primary = ModelConfig(**models['primary'])
-        self.backup = ModelConfig(**models['backup'])
+        return ModelConfig(**models['primary']), ModelConfig(**models['backup'])
 
     def _validate_api_keys(self) -> None:
         """Validate required API keys are present."""
-        required_keys = {
-            'openai': 'OPENAI_API_KEY',
-            'anthropic': 'ANTHROPIC_API_KEY'
-        }
-
-        # Check for primary model's API key
-        key_name = required_keys.get(self.primary.provider)
-        if not key_name or not os.getenv(key_name):
-            raise ValueError(f"Missing API key for {self.primary.provider}")
-
-        # Check for backup model's API key
-        key_name = required_keys.get(self.backup.provider)
-        if not key_name or not os.getenv(key_name):
-            raise ValueError(f"Missing API key for {self.backup.provider}")
+        for model in (self.primary, self.backup):
+            # The local mock provider needs no key
+            if model.provider == MockProvider.provider:
+                continue
+            key_name = API_KEY_ENV.get(model.provider)
+            if not key_name or not os.getenv(key_name):
+                raise ValueError(f"Missing API key for {model.provider}")
 
     @property
     def current_model(self) -> str:
@@ -83,12 +98,8 @@ class ModelManager:
     @property
     def api_key(self) -> str:
         """Get the API key for the current provider."""
-        key_mapping = {
-            'openai': 'OPENAI_API_KEY',
-            'anthropic': 'ANTHROPIC_API_KEY'
-        }
         provider = self.current_provider
-        key_name = key_mapping.get(provider)
+        key_name = API_KEY_ENV.get(provider)
         if not key_name:
             raise ValueError(f"Unsupported provider: {provider}")
         
@@ -105,178 +116,104 @@ class ModelManager:
         """Reset to using the primary model."""
         self._using_primary = True
         
-    def generate_review(self, prompt: str) -> str:
+    def adapter_for(self, provider: str) -> ProviderAdapter:
+        """
+        Get the adapter that serves a provider, creating it on first use.
+        
+        Args:
+            provider: Provider name
+            
+        Returns:
+            ProviderAdapter: Adapter for the provider
+            
+        Raises:
+            ValueError: If the provider is not supported
+        """
+        if provider not in self.adapters:
+            self.adapters[provider] = get_adapter(provider)
+        return self.adapters[provider]
+
+    async def agenerate_review(
+        self,
+        prompt: str,
+        max_tokens: int = 4000,
+        system: Optional[str] = None,
+        stage: Optional[str] = None
+    ) -> str:
         """
         Generate a code review using the current model.
         
+        If the primary model fails, this call is retried once on the backup
+        model. The manager keeps using the primary model for later calls, so
+        one failure does not move every concurrent review to the backup.
+        
         Args:
             prompt: The formatted prompt to send to the model
+            max_tokens: Maximum tokens to generate
+            system: Optional static instructions sent as a cacheable prefix
+            stage: Optional stage name token usage is reported under
             
         Returns:
-            str: JSON string containing the review results
+            str: Model output, expected to be a JSON review
             
         Raises:
-            ValueError: If model generation fails
+            Exception: The provider's error if the backup model fails as well
+        """
+        review, _ = await self.agenerate_review_with_model(
+            prompt, max_tokens=max_tokens, system=system, stage=stage
+        )
+        return review
+
+    async def agenerate_review_with_model(
+        self,
+        prompt: str,
+        max_tokens: int = 4000,
+        system: Optional[str] = None,
+        stage: Optional[str] = None
+    ) -> Tuple[str, str]:
         """
-        # Determine review type from prompt
-        if "MERGED REVIEW TO ANALYZE:" in prompt:
-            # Return mock final review
-            mock_review = {
-                "final_assessment": {
-                    "final_score": 8.3,
-                    "quality_breakdown": {
-                        "code_quality": 8.5,
-                        "architecture": 7.9,
-                        "maintainability": 8.2,
-                        "scalability": 8.0
-                    },
-                    "recommendations": [
-                        "Implement comprehensive architectural documentation with business impact analysis",
-                        "Establish cross-team code review practices to maintain quality",
-                        "Develop automated testing strategy with clear ROI metrics"
-                    ],
-                    "risk_analysis": {
-                        "high_priority": [
-                            "Architectural documentation gaps",
-                            "Cross-component integration points"
-                        ],
-                        "medium_priority": [
-                            "Code duplication across services",
-                            "Inconsistent error handling"
-                        ],
-                        "low_priority": [
-                            "Minor style inconsistencies",
-                            "Documentation updates needed"
-                        ]
-                    }
-                },
-                "action_plan": {
-                    "immediate_actions": [
-                        "Document critical architectural decisions",
-                        "Implement integration test suite"
-                    ],
-                    "short_term_goals": [
-                        "Refactor shared utilities",
-                        "Standardize error handling"
-                    ],
-                    "long_term_improvements": [
-                        "Migrate to microservices architecture",
-                        "Implement continuous architecture reviews"
-                    ]
-                },
-                "summary": "The codebase demonstrates strong fundamentals with opportunities for architectural improvements"
-            }
-        elif "BATCH REVIEWS TO MERGE:" in prompt:
-            # Return mock merged batch review
-            mock_review = {
-                "merged_analysis": {
-                    "overall_quality_score": 8.2,
-                    "architectural_alignment_score": 7.9,
-                    "integration_impact_score": 8.5,
-                    "key_findings": {
-                        "strengths": [
-                            "Consistent architectural patterns",
-                            "Good separation of concerns",
-                            "Strong type safety practices"
-                        ],
-                        "concerns": [
-                            "Mixed language integration points",
-                            "Some architectural inconsistencies"
-                        ],
-                        "risks": [
-                            "Cross-language type safety",
-                            "Architectural drift between components"
-                        ]
-                    }
-                },
-                "recommendations": {
-                    "architectural_improvements": [
-                        "Refactor towards layered architecture pattern",
-                        "Implement architectural decision records",
-                        "Strengthen architectural boundaries"
-                    ],
-                    "integration_considerations": [
-                        "Implement strict type checking",
-                        "Document cross-component interfaces"
-                    ],
-                    "priority_actions": [
-                        "Define clear architectural guidelines",
-                        "Add integration tests"
-                    ]
-                },
-                "summary": "Overall strong codebase with good architectural foundation, some opportunities for improvement"
-            }
-        elif "FILES TO REVIEW:" in prompt:
-            # Extract file paths for batch review
-            file_paths = re.findall(r'File: (.+?)\n', prompt)
+        Generate a code review and report which model produced it.
+        
+        Same as agenerate_review, for callers that cache output per model and
+        must not file a backup model's answer under the primary model.
+        
+        Returns:
+            tuple: (model output, name of the model that answered)
             
-            # Return mock batch review
-            mock_review = {
-                "batch_analysis": {
-                    "files_reviewed": file_paths,
-                    "consistency_score": 8.5,
-                    "pattern_quality": 7.8,
-                    "cohesion_rating": 8.2,
-                    "findings": {
-                        "patterns_identified": [
-                            "Consistent function naming",
-                            "Mixed language usage patterns"
-                        ],
-                        "consistency_issues": [
-                            "Minor style variations"
-                        ],
-                        "cohesion_concerns": [
-                            "Some duplicate utilities"
-                        ]
-                    }
-                },
-                "recommendations": {
-                    "pattern_improvements": [
-                        "Extract common utilities",
-                        "Standardize error handling"
-                    ],
-                    "consistency_fixes": [
-                        "Apply consistent naming",
-                        "Standardize file structure"
-                    ],
-                    "cohesion_enhancements": [
-                        "Create shared module",
-                        "Improve interfaces"
-                    ]
-                }
-            }
-        else:
-            # Extract file path for individual review
-            path_match = re.search(r'Path: (.+)\n', prompt)
-            if not path_match:
-                raise ValueError("Invalid prompt format: missing file path")
-            file_path = path_match.group(1)
+        Raises:
+            Exception: The provider's error if the backup model fails as well
+        """
+        using_primary = self._using_primary
+        model = self.primary if using_primary else self.backup
+        try:
+            review = await self.adapter_for(model.provider).generate(
+                prompt, model.name, max_tokens=max_tokens, system=system, stage=stage
+            )
+            return review, model.name
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if not using_primary:
+                raise
+            logger.warning(f"{model.name} failed ({e!r}), falling back to {self.backup.name} for this call")
+            review = await self.adapter_for(self.backup.provider).generate(
+                prompt, self.backup.name, max_tokens=max_tokens, system=system, stage=stage
+            )
+            return review, self.backup.name
+
+    def generate_review(self, prompt: str) -> str:
+        """
+        Generate a canned code review without calling a provider.
+        
+        Kept for synchronous callers; use agenerate_review for real model output.
+        
+        Args:
+            prompt: The formatted prompt to send to the model
             
-            # Return mock individual file review
-            mock_review = {
-                "file_scores": {
-                    file_path: {
-                        "readability": 8.5,
-                        "maintainability": 7.8,
-                        "complexity": 6.5,
-                        "coding_standards": 9.0,
-                        "documentation": 7.0,
-                        "security": 8.0,
-                        "performance": 8.5,
-                        "reusability": 7.5,
-                        "error_handling": 8.0,
-                        "test_coverage": 6.0,
-                        "notes": "Well-structured code with good practices."
-                    }
-                },
-                "overall_review": {
-                    "total_score": 7.7,
-                    "strengths": ["Clean code", "Good organization"],
-                    "concerns": ["Could use more comments"],
-                    "hiring_confidence": 8.0,
-                    "risks": ["Minor documentation gaps"],
-                    "summary": "Overall solid code quality with room for minor improvements."
-                }
-            }
+        Returns:
+            str: JSON string containing the review results
             
-        return json.dumps(mock_review)
+        Raises:
+            ValueError: If the prompt format is not recognized
+        """
+        return MockProvider.render(prompt)
@@ -0,0 +1,355 @@
+"""
+Token-bucket rate limiting for LLM calls.
+
+Every call reserves capacity from one set of buckets per (provider, model,
+API key): requests per minute plus input and output tokens per minute.
+Callers queue in arrival order instead of being rejected. The call at the
+head of the queue waits until the buckets hold its reservation, re-checking
+whenever a settled call refunds unused capacity, and the demand still
+queued gives an estimate of how long new work will wait. Concurrent
+reviews sharing a key therefore share its budget fairly.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG_PATH = "app/models/config/model_config.yml"
+
+
+@dataclass
+class RateLimits:
+    """Per-minute budgets for one provider and model; None means unlimited."""
+    requests_per_minute: Optional[int] = None
+    input_tokens_per_minute: Optional[int] = None
+    output_tokens_per_minute: Optional[int] = None
+
+    def share(self, shares: int) -> 'RateLimits':
+        """
+        Split the budgets evenly between processes using the same keys.
+
+        Args:
+            shares: Number of processes sharing the budgets
+
+        Returns:
+            RateLimits: Each process's part, at least one unit per minute
+        """
+        def part(value: Optional[int]) -> Optional[int]:
+            return max(1, value // shares) if value else value
+        return RateLimits(
+            part(self.requests_per_minute), part(self.input_tokens_per_minute), part(self.output_tokens_per_minute)
+        )
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``capacity`` per minute."""
+
+    def __init__(self, per_minute: int):
+        """
+        Initialize a full bucket.
+
+        Args:
+            per_minute: Bucket capacity and refill rate per minute
+        """
+        if per_minute <= 0:
+            raise ValueError("Rate limit must be positive")
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: Optional[float] = None) -> float:
+        """
+        Seconds until ``amount`` could be taken without reserving it.
+
+        Args:
+            amount: Units wanted
+            now: Current monotonic time
+
+        Returns:
+            float: Seconds to wait, zero if available now
+        """
+        self._refill(time.monotonic() if now is None else now)
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+    def reserve(self, amount: float, now: Optional[float] = None) -> float:
+        """
+        Take ``amount`` now, going into debt if necessary.
+
+        Args:
+            amount: Units to take
+            now: Current monotonic time
+
+        Returns:
+            float: Seconds until the debt is repaid and the caller may proceed
+        """
+        self._refill(time.monotonic() if now is None else now)
+        self.tokens -= amount
+        return max(0.0, -self.tokens / self.rate)
+
+    def refund(self, amount: float) -> None:
+        """Return unused units, for example when actual usage was below the estimate."""
+        self._refill(time.monotonic())
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimitReservation:
+    """Capacity reserved for one call, settled against actual usage afterwards."""
+
+    def __init__(self, buckets: '_KeyBuckets', input_tokens: int, output_tokens: int, wait: float):
+        self._buckets = buckets
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.wait = wait
+
+    def settle(self, input_tokens: Optional[int] = None, output_tokens: Optional[int] = None) -> None:
+        """
+        Adjust the reservation to the usage the provider reported.
+
+        Args:
+            input_tokens: Actual input tokens, if known
+            output_tokens: Actual output tokens, if known
+        """
+        if input_tokens is not None and self._buckets.input_tokens is not None:
+            self._buckets.input_tokens.refund(self.input_tokens - input_tokens)
+        if output_tokens is not None and self._buckets.output_tokens is not None:
+            self._buckets.output_tokens.refund(self.output_tokens - output_tokens)
+        self._buckets.wake()
+
+    def cancel(self) -> None:
+        """Return the whole reservation for a call that was never made."""
+        if self._buckets.requests is not None:
+            self._buckets.requests.refund(1)
+        self.settle(0, 0)
+
+
+class _KeyBuckets:
+    """Buckets for one (provider, model, key)."""
+
+    def __init__(self, limits: RateLimits):
+        self.requests = TokenBucket(limits.requests_per_minute) if limits.requests_per_minute else None
+        self.input_tokens = TokenBucket(limits.input_tokens_per_minute) if limits.input_tokens_per_minute else None
+        self.output_tokens = TokenBucket(limits.output_tokens_per_minute) if limits.output_tokens_per_minute else None
+        # Events of the calls waiting for their turn, in arrival order
+        self.waiters: deque = deque()
+        self.queued_input = 0
+        self.queued_output = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self.waiters)
+
+    def _pairs(self, input_tokens: int, output_tokens: int, requests: int = 1):
+        return [
+            (bucket, amount) for bucket, amount in (
+                (self.requests, requests), (self.input_tokens, input_tokens), (self.output_tokens, output_tokens)
+            ) if bucket is not None
+        ]
+
+    def wait_time(self, input_tokens: int, output_tokens: int) -> float:
+        """Seconds until a new call could start, behind every queued call."""
+        now = time.monotonic()
+        pairs = self._pairs(input_tokens + self.queued_input, output_tokens + self.queued_output, 1 + self.queued)
+        return max((bucket.wait_time(amount, now) for bucket, amount in pairs), default=0.0)
+
+    def ready_in(self, input_tokens: int, output_tokens: int) -> float:
+        """Seconds until the buckets hold a call's reservation, capped at their capacity."""
+        now = time.monotonic()
+        pairs = self._pairs(input_tokens, output_tokens)
+        return max((bucket.wait_time(min(amount, bucket.capacity), now) for bucket, amount in pairs), default=0.0)
+
+    def reserve(self, input_tokens: int, output_tokens: int) -> float:
+        now = time.monotonic()
+        return max((bucket.reserve(amount, now) for bucket, amount in self._pairs(input_tokens, output_tokens)), default=0.0)
+
+    def wake(self) -> None:
+        """Let the call at the head of the queue re-check the buckets."""
+        if self.waiters:
+            self.waiters[0].set()
+
+
+class RateLimiter:
+    """Shared rate limiter holding one set of buckets per (provider, model, key)."""
+
+    def __init__(self, limits: Optional[Dict[Tuple[str, str], RateLimits]] = None):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            limits: Budgets keyed by (provider, model); a model of ``"default"``
+                applies to every model of that provider without its own entry
+        """
+        self.limits = limits or {}
+        self._buckets: Dict[Tuple[str, str, str], _KeyBuckets] = {}
+
+    @classmethod
+    def from_config(cls, config_path: str = DEFAULT_CONFIG_PATH, shares: int = 1) -> 'RateLimiter':
+        """
+        Create a limiter from the ``rate_limits`` section of the model config.
+
+        The section maps provider to model (or ``default``) to
+        requests_per_minute, input_tokens_per_minute and
+        output_tokens_per_minute.
+
+        Args:
+            config_path: Path to YAML configuration file
+            shares: Number of processes calling with the same keys; each
+                limiter enforces its share of the configured budgets
+
+        Returns:
+            RateLimiter: Limiter with the configured budgets; unlimited if the
+            file or section is missing
+        """
+        if not Path(config_path).exists():
+            return cls()
+        with open(config_path, 'r') as f:
+            config = yaml.safe_load(f) or {}
+
+        limits = {}
+        for provider, models in (config.get('rate_limits') or {}).items():
+            for model, values in (models or {}).items():
+                limits[(provider, model)] = RateLimits(**values).share(shares)
+        return cls(limits)
+
+    @staticmethod
+    def key_id(api_key: Optional[str]) -> str:
+        """
+        Identify an API key without keeping the secret in memory.
+
+        Args:
+            api_key: API key, or None
+
+        Returns:
+            str: Short SHA-256 prefix of the key
+        """
+        return hashlib.sha256((api_key or "").encode('utf-8')).hexdigest()[:16]
+
+    def limits_for(self, provider: str, model: str) -> RateLimits:
+        """
+        Get the budgets for a provider and model.
+
+        Args:
+            provider: Provider name
+            model: Model name
+
+        Returns:
+            RateLimits: Model budgets, the provider default, or unlimited
+        """
+        return self.limits.get((provider, model)) or self.limits.get((provider, 'default')) or RateLimits()
+
+    def _key_buckets(self, provider: str, model: str, api_key: Optional[str]) -> _KeyBuckets:
+        key = (provider, model, self.key_id(api_key))
+        if key not in self._buckets:
+            self._buckets[key] = _KeyBuckets(self.limits_for(provider, model))
+        return self._buckets[key]
+
+    def estimated_wait(
+        self,
+        provider: str,
+        model: str,
+        api_key: Optional[str],
+        input_tokens: int = 0,
+        output_tokens: int = 0
+    ) -> float:
+        """
+        Estimate how long a call would queue if made now, without reserving.
+
+        Args:
+            provider: Provider name
+            model: Model name
+            api_key: API key the call would use
+            input_tokens: Estimated input tokens
+            output_tokens: Output tokens to reserve
+
+        Returns:
+            float: Seconds until the call could start
+        """
+        return self._key_buckets(provider, model, api_key).wait_time(input_tokens, output_tokens)
+
+    def queued(self, provider: str, model: str, api_key: Optional[str]) -> int:
+        """Number of calls currently waiting for this key's budget."""
+        return self._key_buckets(provider, model, api_key).queued
+
+    def longest_wait(self) -> float:
+        """
+        Estimate how long a new call would queue on the busiest key.
+
+        Returns:
+            float: Seconds until a call could start behind every queued call,
+            0 if nothing is rate limited
+        """
+        return max((buckets.wait_time(0, 0) for buckets in list(self._buckets.values())), default=0.0)
+
+    async def acquire(
+        self,
+        provider: str,
+        model: str,
+        api_key: Optional[str],
+        input_tokens: int = 0,
+        output_tokens: int = 0
+    ) -> RateLimitReservation:
+        """
+        Wait for the budget of one call and reserve it.
+
+        Calls are served in arrival order. Output tokens should be reserved
+        at a realistic estimate rather than max_tokens and settled with
+        actual usage once the response arrives; refunds from settling let
+        the next queued call start early. A reservation larger than a
+        bucket's capacity waits for a full bucket and runs it into debt.
+
+        Args:
+            provider: Provider name
+            model: Model name
+            api_key: API key the call will use
+            input_tokens: Estimated input tokens
+            output_tokens: Output tokens to reserve
+
+        Returns:
+            RateLimitReservation: Reservation to settle after the call
+        """
+        buckets = self._key_buckets(provider, model, api_key)
+        if not buckets.waiters and buckets.ready_in(input_tokens, output_tokens) <= 0:
+            buckets.reserve(input_tokens, output_tokens)
+            return RateLimitReservation(buckets, input_tokens, output_tokens, 0.0)
+
+        logger.info(
+            f"Rate limit for {provider}/{model}: queued for about "
+            f"{buckets.wait_time(input_tokens, output_tokens):.1f}s"
+        )
+        waiter = asyncio.Event()
+        buckets.waiters.append(waiter)
+        buckets.queued_input += input_tokens
+        buckets.queued_output += output_tokens
+        queued_at = time.monotonic()
+        try:
+            while True:
+                timeout = None
+                if buckets.waiters[0] is waiter:
+                    timeout = buckets.ready_in(input_tokens, output_tokens)
+                    if timeout <= 0:
+                        buckets.reserve(input_tokens, output_tokens)
+                        return RateLimitReservation(
+                            buckets, input_tokens, output_tokens, time.monotonic() - queued_at
+                        )
+                waiter.clear()
+                try:
+                    await asyncio.wait_for(waiter.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            buckets.waiters.remove(waiter)
+            buckets.queued_input -= input_tokens
+            buckets.queued_output -= output_tokens
+            buckets.wake()
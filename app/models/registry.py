@@ -0,0 +1,160 @@
+"""
+Process-wide registry of model configuration and prompt templates.
+
+Reviewers and pipeline stages look up the model configuration, the shared
+ModelManager and prompt templates here instead of re-reading YAML and prompt
+files every time they are built. Entries are loaded lazily and reloaded
+when the underlying file changes on disk.
+"""
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.models.model_manager import ModelConfig, ModelManager
+
+logger = logging.getLogger(__name__)
+
+MODEL_CONFIG_PATH = "app/models/config/model_config.yml"
+PROMPTS_DIR = "app/prompts"
+
+
+class ConfigRegistry:
+    """Lazily loaded, mtime-checked model configuration and prompts."""
+
+    def __init__(self, config_path: str = MODEL_CONFIG_PATH, prompts_dir: str = PROMPTS_DIR):
+        """
+        Initialize the registry.
+
+        Args:
+            config_path: Path to the model configuration YAML file
+            prompts_dir: Directory holding ``<name>.txt`` prompt templates
+        """
+        self.config_path = config_path
+        self.prompts_dir = prompts_dir
+        self.loads = 0
+        self._entries: Dict[Tuple[str, str], Tuple[Tuple[int, int], Any]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'ConfigRegistry':
+        """
+        Create a registry configured from environment variables.
+
+        Returns:
+            ConfigRegistry: Registry using MODEL_CONFIG_PATH and PROMPTS_DIR when set
+        """
+        return cls(
+            config_path=os.getenv('MODEL_CONFIG_PATH', MODEL_CONFIG_PATH),
+            prompts_dir=os.getenv('PROMPTS_DIR', PROMPTS_DIR)
+        )
+
+    def _get(self, kind: str, path: str, loader: Callable[[str], Any]) -> Any:
+        """
+        Get a cached entry, reloading it if its file changed.
+
+        Args:
+            kind: Kind of entry, so one file can back several entries
+            path: File the entry is loaded from
+            loader: Loads the entry from the file
+
+        Returns:
+            Any: The loaded entry
+        """
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._entries.get((kind, path))
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            if cached is not None:
+                logger.info(f"Reloading {kind} from {path}")
+            value = loader(path)
+            self.loads += 1
+            self._entries[(kind, path)] = (version, value)
+            return value
+
+    def models(self) -> Tuple[ModelConfig, ModelConfig]:
+        """
+        Get the configured models.
+
+        Returns:
+            tuple: (primary, backup) model configurations
+
+        Raises:
+            ValueError: If the configuration is invalid
+        """
+        return self._get("models", self.config_path, ModelManager.load_models)
+
+    def model_manager(self) -> ModelManager:
+        """
+        Get the shared model manager.
+
+        The same instance is returned until the configuration file changes,
+        so fallback to the backup model is shared by every reviewer.
+
+        Returns:
+            ModelManager: Shared model manager
+
+        Raises:
+            ValueError: If the configuration is invalid or API keys are missing
+        """
+        return self._get("model_manager", self.config_path, ModelManager)
+
+    def model_provider(self, model: str, default: str = "anthropic") -> str:
+        """
+        Get the provider serving a configured model.
+
+        Args:
+            model: Model name
+            default: Provider for models that are not configured
+
+        Returns:
+            str: Provider name
+        """
+        for config in self.models():
+            if config.name == model:
+                return config.provider
+        return default
+
+    def prompt(self, name: str) -> str:
+        """
+        Get a prompt template.
+
+        Args:
+            name: Template name, e.g. "initial_review"
+
+        Returns:
+            str: Template text
+
+        Raises:
+            FileNotFoundError: If the template does not exist
+        """
+        return self._get("prompt", str(Path(self.prompts_dir) / f"{name}.txt"), _read_text)
+
+    def clear(self) -> None:
+        """Drop every cached entry."""
+        with self._lock:
+            self._entries.clear()
+
+
+def _read_text(path: str) -> str:
+    with open(path, 'r') as f:
+        return f.read()
+
+
+_registry: Optional[ConfigRegistry] = None
+
+
+def get_registry() -> ConfigRegistry:
+    """
+    Get the process-wide registry.
+
+    Returns:
+        ConfigRegistry: Shared registry, created from the environment on first use
+    """
+    global _registry
+    if _registry is None:
+        _registry = ConfigRegistry.from_env()
+    return _registry
@@ -15,7 +15,9 @@ class Review:
         batch_reviews: Optional[List[Dict]] = None,
         final_review: Optional[Dict] = None,
         timestamp: Optional[datetime] = None,
-        code_quality_metrics: Optional[Dict] = None
+        code_quality_metrics: Optional[Dict] = None,
+        file_tree: Optional[Dict[str, str]] = None,
+        batch_files: Optional[List[List[str]]] = None
     ):
         self.review_id = review_id or str(uuid.uuid4())
         self.repo_id = repo_id
@@ -25,6 +27,10 @@ class Review:
         self.final_review = final_review
         self.timestamp = timestamp or datetime.utcnow()
         self.code_quality_metrics = code_quality_metrics or {}
+        # Blob tree (path -> sha) and batch membership this review was built
+        # from, used to re-review only what changed on the next run
+        self.file_tree = file_tree or {}
+        self.batch_files = batch_files or []
 
     @property
     def overall_quality_score(self) -> float:
@@ -46,7 +52,8 @@ class Review:
         repo_id: int, 
         file_reviews: List[Dict], 
         repository_name: Optional[str] = None,
-        code_quality_metrics: Optional[Dict] = None
+        code_quality_metrics: Optional[Dict] = None,
+        review_id: Optional[str] = None
     ) -> 'Review':
         """
         Create a new review instance.
@@ -55,9 +62,11 @@ class Review:
         :param file_reviews: List of individual file reviews
         :param repository_name: Name of the repository
         :param code_quality_metrics: Additional code quality metrics
+        :param review_id: Optional id to create the review under; generated if omitted
         :return: Review instance
         """
         return cls(
+            review_id=review_id,
             repo_id=repo_id,
             file_reviews=file_reviews,
             repository_name=repository_name,
@@ -135,7 +144,9 @@ class Review:
             'batch_reviews': self.batch_reviews,
             'final_review': self.final_review,
             'timestamp': self.timestamp.isoformat(),
-            'code_quality_metrics': self.code_quality_metrics
+            'code_quality_metrics': self.code_quality_metrics,
+            'file_tree': self.file_tree,
+            'batch_files': self.batch_files
         }
         
         # Save to file
@@ -144,6 +155,27 @@ class Review:
         
         return filename
 
+    @classmethod
+    def _from_data(cls, review_data: Dict) -> 'Review':
+        """
+        Build a review instance from saved JSON data.
+        
+        :param review_data: Dictionary loaded from a saved review file
+        :return: Review instance
+        """
+        return cls(
+            review_id=review_data['review_id'],
+            repo_id=review_data['repo_id'],
+            repository_name=review_data.get('repository_name'),
+            file_reviews=review_data.get('file_reviews', []),
+            batch_reviews=review_data.get('batch_reviews', []),
+            final_review=review_data.get('final_review'),
+            timestamp=datetime.fromisoformat(review_data.get('timestamp', datetime.utcnow().isoformat())),
+            code_quality_metrics=review_data.get('code_quality_metrics', {}),
+            file_tree=review_data.get('file_tree', {}),
+            batch_files=review_data.get('batch_files', [])
+        )
+
     @classmethod
     def get(cls, review_id: str) -> 'Review':
         """
@@ -161,15 +193,30 @@ class Review:
             with open(file, 'r') as f:
                 review_data = json.load(f)
                 if review_data['review_id'] == review_id:
-                    return cls(
-                        review_id=review_data['review_id'],
-                        repo_id=review_data['repo_id'],
-                        repository_name=review_data.get('repository_name'),
-                        file_reviews=review_data.get('file_reviews', []),
-                        batch_reviews=review_data.get('batch_reviews', []),
-                        final_review=review_data.get('final_review'),
-                        timestamp=datetime.fromisoformat(review_data.get('timestamp', datetime.utcnow().isoformat())),
-                        code_quality_metrics=review_data.get('code_quality_metrics', {})
-                    )
+                    return cls._from_data(review_data)
         
         return None
+
+    @classmethod
+    def latest_for_repository(cls, repository_name: str) -> Optional['Review']:
+        """
+        Retrieve the most recent saved review of a repository.
+        
+        :param repository_name: Repository name, e.g. "owner/repo"
+        :return: Latest Review instance, or None if the repository was never reviewed
+        """
+        reviews_dir = Path("reviews")
+        if not reviews_dir.exists():
+            return None
+        
+        latest = None
+        for file in reviews_dir.glob("*.json"):
+            with open(file, 'r') as f:
+                review_data = json.load(f)
+            if review_data.get('repository_name') != repository_name:
+                continue
+            review = cls._from_data(review_data)
+            if latest is None or review.timestamp > latest.timestamp:
+                latest = review
+        
+        return latest
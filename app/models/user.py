@@ -1,6 +1,24 @@
 from datetime import datetime, timezone
+from typing import Optional
+from pydantic import BaseModel, EmailStr
 from app.db.session import get_supabase_client
 
+
+class UserCreate(BaseModel):
+    """Sign-up request for a new user."""
+    email: EmailStr
+    password: str
+    full_name: Optional[str] = None
+
+
+class UserResponse(BaseModel):
+    """User details returned by the API."""
+    id: str
+    email: EmailStr
+    full_name: Optional[str] = None
+    subscription_type: str = "free"
+
+
 class User:
     def __init__(self, user_id, email, name=None, subscription_type="free", created_at=None, updated_at=None):
         """
@@ -1,42 +1,97 @@
 """
 Module for handling batch code reviews of multiple files.
 """
-from pathlib import Path
-import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from app.intake.code_extraction import ExtractedFile
 from app.models.model_manager import ModelManager
+from app.models.registry import ConfigRegistry, get_registry
+from app.review.file_digest import FileDigest, use_digests
+from app.review.response_parsing import ResponseParseError, parse_review
 
 class BatchReviewer:
     """Handles batch code reviews across multiple files."""
     
-    def __init__(self):
-        """Initialize the batch reviewer with necessary components."""
-        config_path = str(Path("app/models/config/model_config.yml"))
-        self.model_manager = ModelManager(config_path)
-        self.prompt_template = self._load_prompt_template()
+    def __init__(self, model_manager: Optional[ModelManager] = None, registry: Optional[ConfigRegistry] = None):
+        """
+        Initialize the batch reviewer with necessary components.
+        
+        Args:
+            model_manager: Optional model manager; defaults to the registry's
+                shared manager
+            registry: Optional configuration registry; defaults to the
+                process-wide registry
+        """
+        self.registry = registry or get_registry()
+        self.model_manager = model_manager or self.registry.model_manager()
         
-    def _load_prompt_template(self) -> str:
+    @property
+    def prompt_template(self) -> str:
         """
-        Load the batch review prompt template.
+        The batch review prompt template, reloaded if the file changes.
         
         Returns:
             str: Content of the batch review prompt template
         """
-        prompt_path = Path("app/prompts/batch_review.txt")
-        with open(prompt_path, 'r') as f:
-            return f.read()
+        return self.registry.prompt("batch_review")
             
-    def review_batch(self, files: List[ExtractedFile]) -> Dict[str, Any]:
+    def review_batch(
+        self,
+        files: List[ExtractedFile],
+        file_reviews: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         """
         Review multiple files as a batch and analyze patterns.
         
         Args:
             files: List of ExtractedFile objects to review
+            file_reviews: Optional Stage 1 reviews by path; when given, files
+                are sent as digests instead of full source
             
         Returns:
             dict: Batch review results following the format specified in the prompt
             
+        Raises:
+            ValueError: If batch is empty or contains only one file
+        """
+        self._validate_batch(files)
+        
+        # Prepare prompt with all file contents or digests
+        prompt = self._prepare_batch_prompt(files, file_reviews)
+        
+        # Get review from model
+        return self._parse_review(self.model_manager.generate_review(prompt), files)
+    
+    async def areview_batch(
+        self,
+        files: List[ExtractedFile],
+        file_reviews: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Review a batch of files using the model manager's async providers.
+        
+        Args:
+            files: List of ExtractedFile objects to review
+            file_reviews: Optional Stage 1 reviews by path; when given, files
+                are sent as digests instead of full source
+            
+        Returns:
+            dict: Batch review results following the format specified in the prompt
+            
+        Raises:
+            ValueError: If batch is empty or contains only one file
+        """
+        self._validate_batch(files)
+        
+        # The template goes first as a cacheable prefix shared by every batch
+        review_result = await self.model_manager.agenerate_review(
+            self._batch_section(files, file_reviews), system=self.prompt_template, stage="batch_reviews"
+        )
+        return self._parse_review(review_result, files)
+    
+    def _validate_batch(self, files: List[ExtractedFile]):
+        """
+        Check that a batch can be reviewed.
+        
         Raises:
             ValueError: If batch is empty or contains only one file
         """
@@ -44,89 +99,74 @@ class BatchReviewer:
             raise ValueError("Empty batch")
         if len(files) < 2:
             raise ValueError("Batch must contain at least 2 files")
-            
-        # Prepare prompt with all file contents
-        prompt = self._prepare_batch_prompt(files)
+    
+    def _parse_review(self, review_result: str, files: List[ExtractedFile]) -> Dict[str, Any]:
+        """
+        Parse and validate model output.
         
-        # Get review from model
-        try:
-            review_result = self.model_manager.generate_review(prompt)
-            parsed_result = json.loads(review_result)
-            
-            # Validate review format
-            self._validate_review_format(parsed_result, files)
-            
-            return parsed_result
-            
-        except json.JSONDecodeError:
-            raise ValueError("Invalid review format received from model")
+        Raises:
+            ValueError: If the review format is invalid
+        """
+        parsed_result = parse_review(review_result, self.prompt_template)
+        
+        # Validate file list
+        if len(parsed_result["batch_analysis"]["files_reviewed"]) != len(files):
+            raise ResponseParseError("Invalid review format: file count mismatch")
+        
+        return parsed_result
             
-    def _prepare_batch_prompt(self, files: List[ExtractedFile]) -> str:
+    def _prepare_batch_prompt(
+        self,
+        files: List[ExtractedFile],
+        file_reviews: Optional[Dict[str, Any]] = None
+    ) -> str:
         """
         Prepare the review prompt for a batch of files.
         
         Args:
             files: List of ExtractedFile objects to review
+            file_reviews: Optional Stage 1 reviews by path
             
         Returns:
             str: Formatted prompt for the model
         """
-        files_content = "\n\n".join([
-            f"File: {file.path}\n"
-            f"Language: {file.language}\n"
-            f"Size: {file.size} bytes\n"
-            f"Content:\n{file.content}"
-            for file in files
-        ])
-        
         return f"""
 {self.prompt_template}
 
-FILES TO REVIEW:
-{files_content}
-"""
+{self._batch_section(files, file_reviews)}"""
         
-    def _validate_review_format(self, review: Dict[str, Any], files: List[ExtractedFile]):
+    def _batch_section(
+        self,
+        files: List[ExtractedFile],
+        file_reviews: Optional[Dict[str, Any]] = None
+    ) -> str:
         """
-        Validate that the review follows the expected format.
+        Format the per-batch part of the review prompt.
+        
+        With Stage 1 reviews (and BATCH_PROMPT_MODE not "full"), each file is
+        sent as its digest; otherwise its full content is sent.
         
         Args:
-            review: Review dictionary to validate
-            files: List of files that were reviewed
+            files: List of ExtractedFile objects to review
+            file_reviews: Optional Stage 1 reviews by path
             
-        Raises:
-            ValueError: If review format is invalid
+        Returns:
+            str: File details and contents, without the prompt template
         """
-        # Check top-level structure
-        required_keys = {"batch_analysis", "recommendations"}
-        if not all(key in review for key in required_keys):
-            raise ValueError("Invalid review format: missing required sections")
-            
-        # Check batch analysis
-        analysis = review["batch_analysis"]
-        required_analysis = {
-            "files_reviewed", "consistency_score", "pattern_quality",
-            "cohesion_rating", "findings"
-        }
-        if not all(key in analysis for key in required_analysis):
-            raise ValueError("Invalid review format: missing analysis metrics")
-            
-        # Check findings
-        findings = analysis["findings"]
-        required_findings = {
-            "patterns_identified", "consistency_issues", "cohesion_concerns"
-        }
-        if not all(key in findings for key in required_findings):
-            raise ValueError("Invalid review format: missing findings sections")
-            
-        # Check recommendations
-        recommendations = review["recommendations"]
-        required_recommendations = {
-            "pattern_improvements", "consistency_fixes", "cohesion_enhancements"
-        }
-        if not all(key in recommendations for key in required_recommendations):
-            raise ValueError("Invalid review format: missing recommendations")
-            
-        # Validate file list
-        if len(analysis["files_reviewed"]) != len(files):
-            raise ValueError("Invalid review format: file count mismatch")
+        if file_reviews is not None and use_digests():
+            files_content = "\n\n".join([
+                FileDigest.build(file.path, file.content, file.language, file_reviews.get(file.path)).render()
+                for file in files
+            ])
+        else:
+            files_content = "\n\n".join([
+                f"File: {file.path}\n"
+                f"Language: {file.language}\n"
+                f"Size: {file.size} bytes\n"
+                f"Content:\n{file.content}"
+                for file in files
+            ])
+        
+        return f"""FILES TO REVIEW:
+{files_content}
+"""
@@ -0,0 +1,313 @@
+"""
+Stage-level checkpoints for multi-stage reviews.
+
+File reviews are recorded as they complete, and the outputs of the batch and
+merged stages are recorded when those stages finish, so a review that fails
+late can be resumed from its last completed stage instead of paying for
+every file review again. File reviews are buffered and committed in batches
+(every REVIEW_CHECKPOINT_FLUSH_EVERY reviews or
+REVIEW_CHECKPOINT_FLUSH_SECONDS), so the event loop recording them does not
+wait on a disk sync per file; a crash loses at most one batch, which is
+simply reviewed again on resume.
+
+A completed review keeps only its stage, so a finished id cannot be resumed
+by mistake, and checkpoints not updated for REVIEW_CHECKPOINT_MAX_AGE_DAYS
+are pruned when a new review starts.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Stages in the order they complete
+STAGES = ("started", "initial_reviews", "batch_reviews", "merged_review", "completed")
+
+DEFAULT_MAX_AGE_DAYS = 30.0
+DEFAULT_FLUSH_EVERY = 25
+DEFAULT_FLUSH_SECONDS = 5.0
+
+
+@dataclass
+class Checkpoint:
+    """Saved progress of one review."""
+    review_id: str
+    repo_url: str
+    model: str
+    stage: str
+    file_reviews: List[Dict[str, Any]] = field(default_factory=list)
+    batch_reviews: List[Any] = field(default_factory=list)
+    batch_files: List[List[str]] = field(default_factory=list)
+    merged_review: Optional[str] = None
+    # Saved review an incremental run is based on
+    previous_review_id: Optional[str] = None
+
+    def reached(self, stage: str) -> bool:
+        """Whether the review has completed ``stage``."""
+        return STAGES.index(self.stage) >= STAGES.index(stage)
+
+
+class CheckpointStore:
+    """SQLite-backed store of review checkpoints."""
+
+    def __init__(
+        self,
+        db_path: str = ".cache/review_checkpoints.sqlite3",
+        max_age_days: float = DEFAULT_MAX_AGE_DAYS,
+        flush_every: int = DEFAULT_FLUSH_EVERY,
+        flush_seconds: float = DEFAULT_FLUSH_SECONDS
+    ):
+        """
+        Initialize the checkpoint store.
+
+        Args:
+            db_path: Path to the SQLite database file
+            max_age_days: Days after its last update that prune() removes a checkpoint
+            flush_every: Buffered file reviews that trigger a commit
+            flush_seconds: Age of the oldest buffered file review that triggers a commit
+        """
+        self.db_path = db_path
+        self.max_age_days = max_age_days
+        self.flush_every = flush_every
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        # File reviews not yet written, by (review_id, path); the latest wins
+        self._pending: Dict[Tuple[str, str], str] = {}
+        self._pending_since = 0.0
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS review_checkpoints (
+                review_id TEXT PRIMARY KEY,
+                repo_url TEXT NOT NULL,
+                model TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                data TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS checkpoint_file_reviews (
+                review_id TEXT NOT NULL,
+                path TEXT NOT NULL,
+                file_review TEXT NOT NULL,
+                PRIMARY KEY (review_id, path)
+            )
+            """
+        )
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls) -> 'CheckpointStore':
+        """
+        Create a store configured from environment variables.
+
+        Returns:
+            CheckpointStore: Store using REVIEW_CHECKPOINT_PATH,
+            REVIEW_CHECKPOINT_MAX_AGE_DAYS, REVIEW_CHECKPOINT_FLUSH_EVERY and
+            REVIEW_CHECKPOINT_FLUSH_SECONDS when set
+        """
+        return cls(
+            db_path=os.getenv('REVIEW_CHECKPOINT_PATH', ".cache/review_checkpoints.sqlite3"),
+            max_age_days=float(os.getenv('REVIEW_CHECKPOINT_MAX_AGE_DAYS', DEFAULT_MAX_AGE_DAYS)),
+            flush_every=int(os.getenv('REVIEW_CHECKPOINT_FLUSH_EVERY', DEFAULT_FLUSH_EVERY)),
+            flush_seconds=float(os.getenv('REVIEW_CHECKPOINT_FLUSH_SECONDS', DEFAULT_FLUSH_SECONDS))
+        )
+
+    def start(self, review_id: str, repo_url: str, model: str, previous_review_id: Optional[str] = None) -> None:
+        """
+        Record a new review.
+
+        Args:
+            review_id: Review identifier
+            repo_url: Repository being reviewed
+            model: Model name
+            previous_review_id: Saved review an incremental run is based on
+        """
+        data = {'previous_review_id': previous_review_id} if previous_review_id else {}
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO review_checkpoints (review_id, repo_url, model, stage, data, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (review_id, repo_url, model, STAGES[0], json.dumps(data), time.time())
+            )
+            self._conn.commit()
+
+    def save_file_review(self, review_id: str, file_review: Dict[str, Any]) -> None:
+        """
+        Record one completed file review.
+
+        The review is buffered and written with others in a single commit
+        once flush_every reviews are pending or the oldest has waited
+        flush_seconds. Every other operation of the store flushes first, so
+        buffered reviews are never missed by load() or overwritten out of
+        order.
+
+        Args:
+            review_id: Review identifier
+            file_review: File review dictionary with at least a 'path' key
+        """
+        row = json.dumps(file_review)
+        with self._lock:
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            self._pending[(review_id, file_review['path'])] = row
+            if (len(self._pending) >= self.flush_every
+                    or time.monotonic() - self._pending_since >= self.flush_seconds):
+                self._flush_locked()
+
+    def flush(self) -> None:
+        """Write buffered file reviews to the database."""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._pending:
+            return
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO checkpoint_file_reviews (review_id, path, file_review) VALUES (?, ?, ?)",
+            [(review_id, path, row) for (review_id, path), row in self._pending.items()]
+        )
+        self._conn.commit()
+        self._pending.clear()
+
+    def complete_stage(self, review_id: str, stage: str, **outputs: Any) -> None:
+        """
+        Record that a stage completed, along with its outputs.
+
+        Completing the last stage drops the saved outputs, since the review
+        itself has been saved by then.
+
+        Args:
+            review_id: Review identifier
+            stage: One of STAGES
+            **outputs: Stage outputs to keep (file_reviews, batch_reviews,
+                batch_files, merged_review)
+
+        Raises:
+            ValueError: If the stage is unknown or the review was never started
+        """
+        if stage not in STAGES:
+            raise ValueError(f"Unknown stage: {stage}")
+        file_reviews = outputs.pop('file_reviews', None)
+        with self._lock:
+            self._flush_locked()
+            row = self._conn.execute(
+                "SELECT data FROM review_checkpoints WHERE review_id = ?", (review_id,)
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"No checkpoint for review {review_id}")
+            data = {**json.loads(row[0]), **outputs}
+            if stage == STAGES[-1]:
+                data, file_reviews = {}, []
+            if file_reviews is not None:
+                # The stage's list is authoritative, e.g. after carrying reviews over
+                self._conn.execute("DELETE FROM checkpoint_file_reviews WHERE review_id = ?", (review_id,))
+                self._conn.executemany(
+                    "INSERT INTO checkpoint_file_reviews (review_id, path, file_review) VALUES (?, ?, ?)",
+                    [(review_id, review['path'], json.dumps(review)) for review in file_reviews]
+                )
+            self._conn.execute(
+                "UPDATE review_checkpoints SET stage = ?, data = ?, updated_at = ? WHERE review_id = ?",
+                (stage, json.dumps(data), time.time(), review_id)
+            )
+            self._conn.commit()
+
+    def load(self, review_id: str) -> Optional[Checkpoint]:
+        """
+        Load the saved progress of a review.
+
+        Args:
+            review_id: Review identifier
+
+        Returns:
+            Optional[Checkpoint]: Saved progress, or None if unknown
+        """
+        with self._lock:
+            self._flush_locked()
+            row = self._conn.execute(
+                "SELECT repo_url, model, stage, data FROM review_checkpoints WHERE review_id = ?",
+                (review_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            file_rows = self._conn.execute(
+                "SELECT file_review FROM checkpoint_file_reviews WHERE review_id = ? ORDER BY path",
+                (review_id,)
+            ).fetchall()
+
+        repo_url, model, stage, data = row
+        data = json.loads(data)
+        return Checkpoint(
+            review_id=review_id,
+            repo_url=repo_url,
+            model=model,
+            stage=stage,
+            file_reviews=[json.loads(file_row[0]) for file_row in file_rows],
+            batch_reviews=data.get('batch_reviews', []),
+            batch_files=data.get('batch_files', []),
+            merged_review=data.get('merged_review'),
+            previous_review_id=data.get('previous_review_id')
+        )
+
+    def incomplete(self) -> List[str]:
+        """
+        List reviews that can be resumed.
+
+        Returns:
+            List[str]: Ids of checkpointed reviews that have not completed, oldest first
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT review_id FROM review_checkpoints WHERE stage != ? ORDER BY updated_at",
+                (STAGES[-1],)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def delete(self, review_id: str) -> None:
+        """
+        Remove a review's checkpoints.
+
+        Args:
+            review_id: Review identifier
+        """
+        with self._lock:
+            self._flush_locked()
+            self._conn.execute("DELETE FROM checkpoint_file_reviews WHERE review_id = ?", (review_id,))
+            self._conn.execute("DELETE FROM review_checkpoints WHERE review_id = ?", (review_id,))
+            self._conn.commit()
+
+    def prune(self) -> int:
+        """
+        Remove checkpoints not updated for max_age_days, finished or not.
+
+        Returns:
+            int: Number of reviews whose checkpoints were removed
+        """
+        cutoff = time.time() - self.max_age_days * 86400
+        with self._lock:
+            self._flush_locked()
+            self._conn.execute(
+                "DELETE FROM checkpoint_file_reviews WHERE review_id IN "
+                "(SELECT review_id FROM review_checkpoints WHERE updated_at < ?)",
+                (cutoff,)
+            )
+            removed = self._conn.execute(
+                "DELETE FROM review_checkpoints WHERE updated_at < ?", (cutoff,)
+            ).rowcount
+            self._conn.commit()
+        return removed
+
+    def close(self) -> None:
+        """Write buffered file reviews and close the database connection."""
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
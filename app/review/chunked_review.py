@@ -0,0 +1,415 @@
+"""
+Module for reviewing files too large for a single model call.
+
+Oversized files (generated code, vendored bundles, very long modules) are
+split into chunks under a token budget, preferring the boundaries between
+top-level definitions and then between members, and each chunk repeats the
+last lines of the previous one for context. Chunks are reviewed
+concurrently and their reviews reduced into a single review of the file:
+scores are averaged weighted by chunk size, findings are concatenated.
+A chunk whose review fails is left out rather than failing the file.
+"""
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.intake.code_extraction import ExtractedFile
+from app.intake.code_skeleton import get_skeleton_extractor
+from app.review.individual_file_review import FileReviewer
+from app.review.response_parsing import parse_json_response
+from app.utils.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Outlines above this share of the chunk budget are left out of chunk prompts
+MAX_OUTLINE_SHARE = 0.25
+
+
+@dataclass
+class ChunkingPolicy:
+    """When and how files are split for review."""
+    # Estimated tokens of new code per chunk; larger files are chunked
+    token_budget: int = 24000
+    # Lines of the previous chunk repeated at the start of the next
+    overlap_lines: int = 20
+    # Chunks of one file reviewed at the same time
+    max_parallel: int = 8
+
+    @classmethod
+    def from_env(cls) -> 'ChunkingPolicy':
+        """
+        Create a policy configured from environment variables.
+
+        Returns:
+            ChunkingPolicy: Policy using FILE_CHUNK_TOKENS,
+            FILE_CHUNK_OVERLAP_LINES and FILE_CHUNK_PARALLEL when set
+        """
+        return cls(
+            token_budget=int(os.getenv('FILE_CHUNK_TOKENS', 24000)),
+            overlap_lines=int(os.getenv('FILE_CHUNK_OVERLAP_LINES', 20)),
+            max_parallel=int(os.getenv('FILE_CHUNK_PARALLEL', 8))
+        )
+
+    def needs_chunking(self, content: str) -> bool:
+        """Whether a file is too large to review in one call."""
+        return estimate_tokens(content) > self.token_budget
+
+
+@dataclass
+class Chunk:
+    """A window of a file reviewed on its own."""
+    index: int
+    total: int
+    # 1-based, inclusive line range of the chunk's own code
+    start_line: int
+    end_line: int
+    # First line of the context repeated from the previous chunk
+    context_start: int
+    text: str
+    tokens: int
+
+    def header(self) -> str:
+        """Describe where the chunk sits in its file."""
+        header = f"Part: {self.index} of {self.total}, lines {self.start_line}-{self.end_line}"
+        if self.context_start < self.start_line:
+            header += (
+                f" (lines {self.context_start}-{self.start_line - 1} repeat the end of the"
+                f" previous part for context)"
+            )
+        return header
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip())
+
+
+def _split_long_lines(lines: List[str], token_budget: int) -> List[str]:
+    """Break lines over the budget (minified code) into budget-sized pieces."""
+    pieces = []
+    for line in lines:
+        if estimate_tokens(line) <= token_budget:
+            pieces.append(line)
+            continue
+        # Punctuation-heavy code can run to a token per character
+        width = token_budget
+        pieces.extend(line[start:start + width] for start in range(0, len(line), width))
+    return pieces
+
+
+def _segments(lines: List[str], costs: List[int], start: int, end: int, budget: int) -> List[Tuple[int, int]]:
+    """
+    Split lines[start:end] into ranges under the budget at definition boundaries.
+
+    A boundary is a line at the shallowest indentation that follows a blank
+    line, which is where top-level definitions (or, one level down, class
+    members) start in practice. Ranges without boundaries are split by line.
+    """
+    if sum(costs[start:end]) <= budget or end - start == 1:
+        return [(start, end)]
+    levels = sorted({_indent(line) for line in lines[start + 1:end] if line.strip()})
+    for level in levels:
+        cuts = [
+            index for index in range(start + 1, end)
+            if lines[index].strip() and _indent(lines[index]) == level and not lines[index - 1].strip()
+        ]
+        if cuts:
+            bounds = [start] + cuts + [end]
+            return [
+                segment for low, high in zip(bounds, bounds[1:])
+                for segment in _segments(lines, costs, low, high, budget)
+            ]
+    # No boundary at all: split by lines
+    segments, low, total = [], start, 0
+    for index in range(start, end):
+        if total + costs[index] > budget and index > low:
+            segments.append((low, index))
+            low, total = index, 0
+        total += costs[index]
+    segments.append((low, end))
+    return segments
+
+
+def split_into_chunks(content: str, token_budget: int, overlap_lines: int = 20) -> List[Chunk]:
+    """
+    Split a file into chunks of at most token_budget estimated tokens.
+
+    Args:
+        content: File content
+        token_budget: Estimated tokens of new code per chunk
+        overlap_lines: Lines of the previous chunk repeated for context
+
+    Returns:
+        List[Chunk]: Chunks in file order; a single chunk if the file fits
+
+    Raises:
+        ValueError: If the budget is not positive
+    """
+    if token_budget <= 0:
+        raise ValueError("Chunk token budget must be positive")
+    lines = _split_long_lines(content.splitlines(keepends=True), token_budget)
+    costs = [estimate_tokens(line) for line in lines]
+
+    # Pack consecutive segments into windows under the budget
+    windows: List[Tuple[int, int]] = []
+    window_tokens = 0
+    for low, high in _segments(lines, costs, 0, len(lines), token_budget):
+        tokens = sum(costs[low:high])
+        if windows and window_tokens + tokens <= token_budget:
+            windows[-1] = (windows[-1][0], high)
+            window_tokens += tokens
+        else:
+            windows.append((low, high))
+            window_tokens = tokens
+
+    chunks = []
+    for index, (low, high) in enumerate(windows, 1):
+        context = max(low - overlap_lines, 0) if index > 1 else low
+        chunks.append(Chunk(
+            index=index,
+            total=len(windows),
+            start_line=low + 1,
+            end_line=high,
+            context_start=context + 1,
+            text="".join(lines[context:high]),
+            tokens=sum(costs[low:high])
+        ))
+    return chunks
+
+
+def chunk_outline(content: str, language: str, token_budget: int) -> Optional[str]:
+    """
+    Skeleton of the whole file to show alongside each chunk, if small enough.
+
+    Args:
+        content: File content
+        language: Language name as detected at intake
+        token_budget: Chunk token budget the outline is weighed against
+
+    Returns:
+        Optional[str]: The skeleton, or None if unavailable or too large
+    """
+    outline = get_skeleton_extractor().get(content, language)
+    if outline and estimate_tokens(outline) <= token_budget * MAX_OUTLINE_SHARE:
+        return outline
+    return None
+
+
+def chunk_section(chunk: Chunk, outline: Optional[str] = None) -> str:
+    """
+    Format a chunk's part header, optional file outline and code.
+
+    Args:
+        chunk: The chunk
+        outline: Optional skeleton of the whole file
+
+    Returns:
+        str: Text to place after the file details in a review prompt
+    """
+    outline_section = f"\nOUTLINE OF THE WHOLE FILE:\n{outline}\n" if outline else ""
+    return f"{chunk.header()}\n{outline_section}\nCODE:\n{chunk.text}"
+
+
+def _distinct(values: Sequence[Any]) -> List[Any]:
+    """Values in order with duplicates removed, including unhashable ones."""
+    seen, result = set(), []
+    for value in values:
+        key = json.dumps(value, sort_keys=True, default=str)
+        if key not in seen:
+            seen.add(key)
+            result.append(value)
+    return result
+
+
+def reduce_reviews(reviews: Sequence[Any], weights: Sequence[float]) -> Any:
+    """
+    Reduce the reviews of a file's chunks into one review of the same shape.
+
+    Numbers are averaged weighted by chunk size, lists are concatenated
+    without duplicates, distinct strings are joined, and objects are
+    reduced key by key.
+
+    Args:
+        reviews: Decoded chunk reviews
+        weights: Relative size of each chunk
+
+    Returns:
+        Any: The combined review
+    """
+    pairs = [(review, max(weight, 1)) for review, weight in zip(reviews, weights) if review is not None]
+    if not pairs:
+        return None
+    values = [review for review, _ in pairs]
+    if all(isinstance(value, dict) for value in values):
+        keys = _distinct([key for value in values for key in value])
+        return {
+            key: reduce_reviews([value.get(key) for value, _ in pairs], [weight for _, weight in pairs])
+            for key in keys
+        }
+    if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+        total = sum(weight for _, weight in pairs)
+        return round(sum(value * weight for value, weight in pairs) / total, 2)
+    if all(isinstance(value, list) for value in values):
+        return _distinct([item for value in values for item in value])
+    if all(isinstance(value, str) for value in values):
+        return " ".join(_distinct([value for value in values if value]))
+    return values[0]
+
+
+async def review_chunks(
+    prompts: Sequence[str], generate: Callable[[str], Awaitable[str]], max_parallel: int
+) -> List[Optional[str]]:
+    """
+    Review a file's chunks concurrently, at most max_parallel at a time.
+
+    Args:
+        prompts: Prompt of each chunk
+        generate: Coroutine function returning the review of one prompt
+        max_parallel: Chunk reviews in flight at once
+
+    Returns:
+        List[Optional[str]]: Review of each chunk, or None where the call
+        failed, so one failed chunk does not discard the others
+    """
+    semaphore = asyncio.Semaphore(max(max_parallel, 1))
+
+    async def review(prompt: str) -> str:
+        async with semaphore:
+            return await generate(prompt)
+
+    results = await asyncio.gather(*(review(prompt) for prompt in prompts), return_exceptions=True)
+    texts: List[Optional[str]] = []
+    for number, result in enumerate(results, 1):
+        if isinstance(result, Exception):
+            logger.warning(f"Review of part {number} of {len(results)} failed: {result!r}")
+            texts.append(None)
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            texts.append(result)
+    return texts
+
+
+class ChunkedFileReviewer(FileReviewer):
+    """Reviews files of any size, splitting oversized ones into chunks."""
+
+    def __init__(self, *args, policy: Optional[ChunkingPolicy] = None, **kwargs):
+        """
+        Initialize the chunked reviewer.
+
+        Args:
+            *args: Passed to FileReviewer
+            policy: Chunking policy; defaults to one from the environment
+            **kwargs: Passed to FileReviewer
+        """
+        super().__init__(*args, **kwargs)
+        self.policy = policy or ChunkingPolicy.from_env()
+
+    def review_file(self, file: ExtractedFile) -> Dict[str, Any]:
+        """
+        Review a file, in concurrent chunks if it is over the token budget.
+
+        Args:
+            file: ExtractedFile object containing the code to review
+
+        Returns:
+            dict: Review results following the format specified in the prompt
+
+        Raises:
+            ValueError: If file is invalid or empty, or no chunk review is valid
+        """
+        if not self.policy.needs_chunking(file.content):
+            return super().review_file(file)
+        cache_key, cached = self._start_review(file)
+        if cached is not None:
+            return self._finish_review(file, cache_key, cached, True)
+
+        chunks, prompts = self._chunk_prompts(file)
+        with ThreadPoolExecutor(max_workers=min(len(chunks), self.policy.max_parallel)) as executor:
+            results = list(executor.map(self._generate_chunk, prompts))
+        return self._combine(file, cache_key, chunks, results)
+
+    def _generate_chunk(self, prompt: str) -> Optional[str]:
+        """Review one chunk with the blocking model call, None if the call fails."""
+        try:
+            return self.model_manager.generate_review(f"{self.prompt_template}\n\n{prompt}")
+        except Exception as e:
+            logger.warning(f"Chunk review failed: {e!r}")
+            return None
+
+    async def areview_file(self, file: ExtractedFile) -> Dict[str, Any]:
+        """
+        Review a file with the async providers, in concurrent chunks if needed.
+
+        Args:
+            file: ExtractedFile object containing the code to review
+
+        Returns:
+            dict: Review results following the format specified in the prompt
+
+        Raises:
+            ValueError: If file is invalid or empty, or no chunk review is valid
+        """
+        if not self.policy.needs_chunking(file.content):
+            return await super().areview_file(file)
+        cache_key, cached = self._start_review(file)
+        if cached is not None:
+            return self._finish_review(file, cache_key, cached, True)
+
+        chunks, prompts = self._chunk_prompts(file)
+        results = await review_chunks(
+            prompts,
+            lambda prompt: self.model_manager.agenerate_review(
+                prompt, system=self.prompt_template, stage="initial_reviews"
+            ),
+            self.policy.max_parallel
+        )
+        return self._combine(file, cache_key, chunks, results)
+
+    def _chunk_prompts(self, file: ExtractedFile) -> Tuple[List[Chunk], List[str]]:
+        """Split a file and format the per-chunk part of each prompt."""
+        chunks = split_into_chunks(file.content, self.policy.token_budget, self.policy.overlap_lines)
+        outline = chunk_outline(file.content, file.language, self.policy.token_budget)
+        logger.info(f"Reviewing {file.path} in {len(chunks)} chunks")
+        prompts = [
+            f"FILE TO REVIEW:\n"
+            f"Path: {file.path}\n"
+            f"Language: {file.language}\n"
+            f"Size: {file.size} bytes\n"
+            f"{chunk_section(chunk, outline)}"
+            for chunk in chunks
+        ]
+        return chunks, prompts
+
+    def _combine(
+        self, file: ExtractedFile, cache_key: tuple, chunks: List[Chunk], results: List[Optional[str]]
+    ) -> Dict[str, Any]:
+        """
+        Validate the chunk reviews and reduce the valid ones into one review.
+
+        Raises:
+            ValueError: If no chunk has a valid review
+        """
+        reviews = []
+        weights = []
+        for chunk, result in zip(chunks, results):
+            if result is None:
+                continue
+            try:
+                review = parse_json_response(result)
+                self._validate_review_format(review, file.path)
+            except ValueError as e:
+                logger.warning(f"Dropping review of {file.path} part {chunk.index}: {str(e)}")
+                continue
+            reviews.append(review)
+            weights.append(chunk.tokens)
+        if not reviews:
+            raise ValueError(f"Invalid review format: no part of {file.path} has a valid review")
+        combined = reduce_reviews(reviews, weights)
+
+        # Every chunk names the same file; metadata strings are not combined
+        combined["file_review"]["file_metadata"] = reviews[0]["file_review"]["file_metadata"]
+        return self._finish_review(file, cache_key, json.dumps(combined), False)
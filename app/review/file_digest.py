@@ -0,0 +1,296 @@
+"""
+Module for building compact per-file digests for batch review prompts.
+
+Stage 2 looks for patterns, consistency and cohesion across files; it does
+not need every line of source again after Stage 1 has already read it. A
+digest keeps a file's structure (its code skeleton for Python, JavaScript
+and TypeScript, its import and signature lines otherwise) together with
+the scores and notes of its Stage 1 review. Full source is only kept for files whose
+digest would not be meaningfully smaller, or that have neither an outline
+nor a usable Stage 1 review to stand in for them.
+"""
+import contextvars
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+from app.intake.code_skeleton import get_skeleton_extractor
+from app.review.response_parsing import ResponseParseError, parse_json_response
+from app.utils.tokens import estimate_tokens
+
+# Files at or below this many tokens are cheaper to send whole
+SOURCE_INLINE_TOKENS = 200
+
+# Keep the source unless the digest is at most this fraction of its size
+MAX_DIGEST_RATIO = 0.5
+
+# Longest notes and most signature lines kept per file
+MAX_NOTES_CHARS = 600
+MAX_OUTLINE_LINES = 60
+
+_IMPORTS = {
+    'Python': r'^\s*(?:import|from)\s+[\w.]+',
+    'JavaScript': r'^\s*(?:import\s|export\s.*\sfrom\s|(?:const|let|var)\s.*=\s*require\()',
+    'Java': r'^\s*import\s',
+    'Kotlin': r'^\s*import\s',
+    'Scala': r'^\s*import\s',
+    'Go': r'^\s*(?:import\s|"[\w./-]+"$)',
+    'Rust': r'^\s*(?:use|extern\s+crate)\s',
+    'C': r'^\s*#\s*include\s',
+    'C++': r'^\s*#\s*include\s',
+    'C#': r'^\s*using\s+[\w.]+\s*;',
+    'Ruby': r'^\s*require(?:_relative)?\s',
+    'PHP': r'^\s*(?:use|require|include)(?:_once)?\s',
+    'Swift': r'^\s*import\s',
+}
+_IMPORTS['TypeScript'] = _IMPORTS['JavaScript']
+
+_SIGNATURES = {
+    'Python': r'^\s*(?:@[\w.]+.*|(?:async\s+)?def\s+\w+.*|class\s+\w+.*)',
+    'JavaScript': (
+        r'^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?'
+        r'(?:function\*?\s*\w*\s*\(|class\s+\w+|(?:const|let)\s+\w+\s*=\s*(?:async\s*)?(?:\([^)]*\)|\w+)\s*=>)'
+    ),
+    'TypeScript': (
+        r'^\s*(?:export\s+)?(?:default\s+)?(?:abstract\s+)?(?:async\s+)?'
+        r'(?:function\*?\s*\w*\s*[(<]|class\s+\w+|interface\s+\w+|type\s+\w+\s*=|enum\s+\w+'
+        r'|(?:const|let)\s+\w+\s*(?::[^=]+)?=\s*(?:async\s*)?(?:\([^)]*\)|\w+)\s*=>)'
+    ),
+    'Go': r'^\s*(?:func\s|type\s+\w+\s+(?:struct|interface))',
+    'Rust': r'^\s*(?:pub(?:\([\w:]+\))?\s+)?(?:async\s+)?(?:fn|struct|enum|trait|impl|mod)\b',
+    'Ruby': r'^\s*(?:def|class|module)\s',
+}
+# Brace languages: declarations with a visibility or type keyword up front
+_GENERIC_SIGNATURE = (
+    r'^\s*(?:(?:public|private|protected|internal|static|final|abstract|override|virtual|async|export|open'
+    r'|suspend|inline|data|sealed)\s+)*'
+    r'(?:class|interface|struct|enum|trait|object|record|func|fun|fn|def|function|'
+    r'(?!(?:return|else|new|throw|await|case)\b)[\w<>\[\],.?]+\s+\w+\s*\([^;]*$)'
+)
+
+_compiled: Dict[Tuple[str, str], Optional[Pattern]] = {}
+
+# Sections rendered outside a run, keyed by (path, blob SHA, review hash);
+# runs started with start_digest_run keep their own
+_sections: Dict[Tuple[str, Any, int], str] = {}
+_run_sections: contextvars.ContextVar[Optional[Dict[Tuple[str, Any, int], str]]] = (
+    contextvars.ContextVar("digest_sections", default=None)
+)
+
+
+def _section_memo() -> Dict[Tuple[str, Any, int], str]:
+    """Digest memo of the current run."""
+    sections = _run_sections.get()
+    return _sections if sections is None else sections
+
+
+def _pattern(kind: str, language: str) -> Optional[Pattern]:
+    """Compiled import or signature pattern for a language, None if it has no code structure."""
+    key = (kind, language)
+    if key not in _compiled:
+        if kind == 'imports':
+            source = _IMPORTS.get(language)
+        elif language in ('HTML', 'CSS', 'SQL', 'YAML', 'JSON', 'XML', 'Markdown', 'Shell', 'Unknown'):
+            source = None
+        else:
+            source = _SIGNATURES.get(language, _GENERIC_SIGNATURE)
+        _compiled[key] = re.compile(source) if source else None
+    return _compiled[key]
+
+
+def extract_outline(content: str, language: str) -> Tuple[List[str], List[str]]:
+    """
+    Extract the import lines and declaration signatures of a source file.
+
+    Signatures keep their indentation so nesting stays visible; bodies
+    and opening braces are dropped.
+
+    Args:
+        content: File content
+        language: Language name as detected at intake
+
+    Returns:
+        tuple: (imports, signatures), each a list of stripped source lines
+    """
+    imports_pattern = _pattern('imports', language)
+    signature_pattern = _pattern('signatures', language)
+    imports, signatures = [], []
+    for line in content.splitlines():
+        if imports_pattern is not None and imports_pattern.match(line):
+            imports.append(line.strip())
+        elif signature_pattern is not None and signature_pattern.match(line):
+            signatures.append(line.rstrip().rstrip('{').rstrip())
+    return imports, signatures[:MAX_OUTLINE_LINES]
+
+
+def _flatten(value: Any) -> List[str]:
+    """Collect the strings of a nested findings structure."""
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, dict):
+        return [item for sub_value in value.values() for item in _flatten(sub_value)]
+    if isinstance(value, list):
+        return [item for sub_value in value for item in _flatten(sub_value)]
+    return []
+
+
+def summarize_review(review: Any) -> Tuple[Dict[str, Any], str]:
+    """
+    Pull the scores and notes out of a Stage 1 review.
+
+    Reviews follow the initial review prompt: ``file_review.quality_scores``
+    with a top-level summary.
+
+    Args:
+        review: Stage 1 review, as text or decoded
+
+    Returns:
+        tuple: (numeric scores by name, notes text); empty if the review
+        cannot be read
+    """
+    if isinstance(review, str):
+        try:
+            review = parse_json_response(review)
+        except ResponseParseError:
+            return {}, ""
+    if not isinstance(review, dict):
+        return {}, ""
+
+    file_review = review.get('file_review')
+    if not isinstance(file_review, dict):
+        return {}, ""
+    scores = file_review.get('quality_scores') or {}
+    concerns = _flatten((file_review.get('key_findings') or {}).get('concerns'))
+    notes = [review.get('summary')] + concerns
+    scores = {
+        name: value for name, value in scores.items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    }
+    return scores, " ".join(note for note in notes if isinstance(note, str) and note)[:MAX_NOTES_CHARS]
+
+
+@dataclass
+class FileDigest:
+    """Compact stand-in for a file in a batch review prompt."""
+    path: str
+    language: str
+    imports: List[str] = field(default_factory=list)
+    signatures: List[str] = field(default_factory=list)
+    scores: Dict[str, Any] = field(default_factory=dict)
+    notes: str = ""
+    # Structural skeleton, replacing imports and signatures where available
+    skeleton: Optional[str] = None
+    # Full source, set only when the digest cannot stand in for it
+    content: Optional[str] = None
+
+    @classmethod
+    def build(cls, path: str, content: str, language: str, review: Any = None) -> 'FileDigest':
+        """
+        Build the digest of a reviewed file.
+
+        Args:
+            path: File path
+            content: File content
+            language: Language name as detected at intake
+            review: Stage 1 review of the file, as text or decoded
+
+        Returns:
+            FileDigest: Digest carrying the source only when it is needed
+        """
+        skeleton = get_skeleton_extractor().get(content, language)
+        imports, signatures = extract_outline(content, language) if skeleton is None else ([], [])
+        scores, notes = summarize_review(review) if review is not None else ({}, "")
+        digest = cls(path, language, imports, signatures, scores, notes, skeleton)
+        source_tokens = estimate_tokens(content)
+        if (
+            not (signatures or skeleton or scores)
+            or source_tokens <= SOURCE_INLINE_TOKENS
+            or estimate_tokens(digest.render()) > source_tokens * MAX_DIGEST_RATIO
+        ):
+            digest.content = content
+        return digest
+
+    def render(self) -> str:
+        """
+        Format the digest as a batch prompt section.
+
+        Returns:
+            str: The file's section of a batch prompt
+        """
+        parts = [f"File: {self.path}", f"Language: {self.language}"]
+        if self.scores:
+            parts.append(f"Stage 1 scores: {json.dumps(self.scores, separators=(',', ':'))}")
+        if self.notes:
+            parts.append(f"Stage 1 notes: {self.notes}")
+        if self.content is not None:
+            parts.append(f"Content:\n{self.content}")
+            return "\n".join(parts)
+        if self.skeleton:
+            parts.append(f"Skeleton:\n{self.skeleton}")
+        if self.imports:
+            parts.append("Imports:\n" + "\n".join(self.imports))
+        if self.signatures:
+            parts.append("Signatures:\n" + "\n".join(self.signatures))
+        return "\n".join(parts)
+
+
+def digest_section(
+    path: str, content: str, language: str, review: Optional[str] = None, sha: Optional[str] = None
+) -> str:
+    """
+    Render the digest of a file reviewed as text, memoized for the run.
+
+    Batch planning and prompt building both size the same sections, so
+    each digest is built once per run. Entries are keyed by the blob SHA
+    and a hash of the review rather than the texts themselves, and are
+    dropped by clear_digest_sections once Stage 2 is done.
+
+    Args:
+        path: File path
+        content: File content
+        language: Language name as detected at intake
+        review: Stage 1 review text
+        sha: Git blob SHA of the content; the content is hashed if omitted
+
+    Returns:
+        str: The file's section of a batch prompt
+    """
+    sections = _section_memo()
+    key = (path, sha or hash(content), hash(review))
+    section = sections.get(key)
+    if section is None:
+        section = sections[key] = FileDigest.build(path, content, language, review).render()
+    return section
+
+
+def start_digest_run() -> None:
+    """
+    Give the current run its own digest memo.
+
+    The memo follows the calling task and the tasks it starts, so reviews
+    running concurrently in one process neither share nor clear each other's.
+    """
+    _run_sections.set({})
+
+
+def clear_digest_sections() -> None:
+    """Drop the digests memoized during the current run."""
+    _section_memo().clear()
+
+
+def use_digests() -> bool:
+    """
+    Whether batch prompts are built from digests.
+
+    Returns:
+        bool: False if BATCH_PROMPT_MODE is "full", True otherwise
+
+    Raises:
+        ValueError: If BATCH_PROMPT_MODE is set to anything else
+    """
+    mode = os.getenv('BATCH_PROMPT_MODE', 'digest').lower()
+    if mode not in ('digest', 'full'):
+        raise ValueError(f"BATCH_PROMPT_MODE must be 'digest' or 'full', got {mode!r}")
+    return mode == 'digest'
@@ -1,30 +1,37 @@
 """
 Module for generating final comprehensive code reviews.
 """
-from pathlib import Path
 import json
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from app.models.model_manager import ModelManager
+from app.models.registry import ConfigRegistry, get_registry
+from app.review.response_parsing import ResponseParseError, parse_review, template_schema
 
 class FinalReviewer:
     """Handles generation of final comprehensive reviews."""
     
-    def __init__(self):
-        """Initialize the final reviewer."""
-        config_path = str(Path("app/models/config/model_config.yml"))
-        self.model_manager = ModelManager(config_path)
-        self.prompt_template = self._load_prompt_template()
+    def __init__(self, model_manager: Optional[ModelManager] = None, registry: Optional[ConfigRegistry] = None):
+        """
+        Initialize the final reviewer.
+        
+        Args:
+            model_manager: Optional model manager; defaults to the registry's
+                shared manager
+            registry: Optional configuration registry; defaults to the
+                process-wide registry
+        """
+        self.registry = registry or get_registry()
+        self.model_manager = model_manager or self.registry.model_manager()
         
-    def _load_prompt_template(self) -> str:
+    @property
+    def prompt_template(self) -> str:
         """
-        Load the final review prompt template.
+        The final review prompt template, reloaded if the file changes.
         
         Returns:
             str: Content of the final review prompt template
         """
-        prompt_path = Path("app/prompts/final_review.txt")
-        with open(prompt_path, 'r') as f:
-            return f.read()
+        return self.registry.prompt("final_review")
             
     def generate_final_review(self, merged_review: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -39,6 +46,29 @@ class FinalReviewer:
         Raises:
             ValueError: If merged review is invalid
         """
+        prompt = self._build_prompt(merged_review)
+        
+        # Get final review from model
+        return self._parse_review(self.model_manager.generate_review(prompt))
+    
+    async def agenerate_final_review(self, merged_review: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Generate the final review using the model manager's async providers.
+        
+        Args:
+            merged_review: Results from merged batch review
+            
+        Returns:
+            dict: Final review results following the format specified in the prompt
+            
+        Raises:
+            ValueError: If merged review is invalid
+        """
+        prompt = self._build_prompt(merged_review)
+        return self._parse_review(await self.model_manager.agenerate_review(prompt, stage="final_review"))
+    
+    def _build_prompt(self, merged_review: Dict[str, Any]) -> str:
+        """Validate the merged review and prepare the final prompt."""
         if not merged_review:
             raise ValueError("Invalid merged review")
             
@@ -46,20 +76,16 @@ class FinalReviewer:
         self._validate_merged_review(merged_review)
         
         # Prepare prompt with merged review data
-        prompt = self._prepare_final_prompt(merged_review)
+        return self._prepare_final_prompt(merged_review)
+    
+    def _parse_review(self, review_result: str) -> Dict[str, Any]:
+        """
+        Parse and validate model output.
         
-        # Get final review from model
-        try:
-            review_result = self.model_manager.generate_review(prompt)
-            parsed_result = json.loads(review_result)
-            
-            # Validate review format
-            self._validate_review_format(parsed_result)
-            
-            return parsed_result
-            
-        except json.JSONDecodeError:
-            raise ValueError("Invalid review format received from model")
+        Raises:
+            ValueError: If the review format is invalid
+        """
+        return parse_review(review_result, self.prompt_template)
             
     def _prepare_final_prompt(self, merged_review: Dict[str, Any]) -> str:
         """
@@ -71,22 +97,23 @@ class FinalReviewer:
         Returns:
             str: Formatted prompt for the model
         """
-        analysis = merged_review["merged_analysis"]
-        findings = analysis["key_findings"]
-        recommendations = merged_review["recommendations"]
+        foundation = merged_review["technical_foundation"]
+        risks = merged_review["risk_patterns"]
+        actions = merged_review["actionability_assessment"]
         
         review_summary = (
-            f"Overall Quality Score: {analysis['overall_quality_score']}\n"
-            f"Architectural Alignment: {analysis['architectural_alignment_score']}\n"
-            f"Integration Impact: {analysis['integration_impact_score']}\n\n"
+            f"Reliability Score: {foundation['reliability_indicators']['score']}\n"
+            f"Maintenance Score: {foundation['maintenance_assessment']['score']}\n"
+            f"Scalability Score: {foundation['scalability_evaluation']['score']}\n"
+            f"Development Efficiency Score: {foundation['development_efficiency']['score']}\n\n"
             f"Key Findings:\n"
-            f"Strengths:\n{json.dumps(findings['strengths'], indent=2)}\n"
-            f"Concerns:\n{json.dumps(findings['concerns'], indent=2)}\n"
-            f"Risks:\n{json.dumps(findings['risks'], indent=2)}\n\n"
+            f"Strengths:\n{json.dumps(foundation['reliability_indicators']['strong_points'], indent=2)}\n"
+            f"Concerns:\n{json.dumps(foundation['reliability_indicators']['vulnerabilities'], indent=2)}\n"
+            f"Risks:\n{json.dumps(risks['immediate_concerns']['critical_issues'], indent=2)}\n\n"
             f"Recommendations:\n"
-            f"Architectural: {json.dumps(recommendations['architectural_improvements'], indent=2)}\n"
-            f"Integration: {json.dumps(recommendations['integration_considerations'], indent=2)}\n"
-            f"Priority: {json.dumps(recommendations['priority_actions'], indent=2)}"
+            f"Quick Wins: {json.dumps(actions['quick_wins']['tasks'], indent=2)}\n"
+            f"Strategic: {json.dumps(actions['strategic_improvements']['tasks'], indent=2)}\n\n"
+            f"Summary: {merged_review['consolidated_summary']}"
         )
         
         return f"""
@@ -106,73 +133,7 @@ MERGED REVIEW TO ANALYZE:
         Raises:
             ValueError: If review format is invalid
         """
-        if "merged_analysis" not in review:
-            raise ValueError("Invalid merged review format: missing merged_analysis")
-            
-        analysis = review["merged_analysis"]
-        required_fields = {
-            "overall_quality_score",
-            "architectural_alignment_score",
-            "integration_impact_score",
-            "key_findings"
-        }
-        
-        if not all(field in analysis for field in required_fields):
-            raise ValueError("Invalid merged review format: missing required fields")
-            
-    def _validate_review_format(self, review: Dict[str, Any]):
-        """
-        Validate that the review follows the expected format.
-        
-        Args:
-            review: Review dictionary to validate
-            
-        Raises:
-            ValueError: If review format is invalid
-        """
-        # Check top-level structure
-        required_keys = {"final_assessment", "action_plan", "summary"}
-        if not all(key in review for key in required_keys):
-            raise ValueError("Invalid review format: missing required sections")
-            
-        # Check final assessment
-        assessment = review["final_assessment"]
-        required_assessment = {
-            "final_score",
-            "quality_breakdown",
-            "recommendations",
-            "risk_analysis"
-        }
-        if not all(key in assessment for key in required_assessment):
-            raise ValueError("Invalid review format: missing assessment sections")
-            
-        # Check quality breakdown
-        breakdown = assessment["quality_breakdown"]
-        required_metrics = {
-            "code_quality",
-            "architecture",
-            "maintainability",
-            "scalability"
-        }
-        if not all(metric in breakdown for metric in required_metrics):
-            raise ValueError("Invalid review format: missing quality metrics")
-            
-        # Check risk analysis
-        risks = assessment["risk_analysis"]
-        required_risks = {
-            "high_priority",
-            "medium_priority",
-            "low_priority"
-        }
-        if not all(level in risks for level in required_risks):
-            raise ValueError("Invalid review format: missing risk levels")
-            
-        # Check action plan
-        plan = review["action_plan"]
-        required_plan = {
-            "immediate_actions",
-            "short_term_goals",
-            "long_term_improvements"
-        }
-        if not all(key in plan for key in required_plan):
-            raise ValueError("Invalid review format: missing action plan sections")
+        try:
+            template_schema(self.registry.prompt("merged_batch_review")).validate(review)
+        except ResponseParseError as e:
+            raise ValueError(f"Invalid merged review format: {str(e)}")
@@ -0,0 +1,115 @@
+"""
+Module for planning incremental re-reviews of a repository.
+
+Compares the blob tree recorded with a previous review against the current
+repository tree so that only added or modified files are sent back through
+the review stages, while stored reviews are carried over for unchanged files.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Set, Any, Optional, Sequence, Tuple
+
+
+@dataclass
+class TreeDiff:
+    """Differences between two repository trees (path -> blob sha)."""
+    added: List[str] = field(default_factory=list)
+    modified: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+
+    @property
+    def changed(self) -> Set[str]:
+        """Paths whose content must be (re-)reviewed."""
+        return set(self.added) | set(self.modified)
+
+    @property
+    def has_changes(self) -> bool:
+        """Whether the trees differ at all."""
+        return bool(self.added or self.modified or self.removed)
+
+
+@dataclass
+class IncrementalPlan:
+    """Work needed to bring a previous review up to date."""
+    diff: TreeDiff
+    carried_reviews: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def paths_to_review(self) -> Set[str]:
+        """Paths that need a fresh file review."""
+        carried = {review['path'] for review in self.carried_reviews}
+        return self.diff.changed | (set(self.diff.unchanged) - carried)
+
+
+def diff_trees(previous: Dict[str, str], current: Dict[str, str]) -> TreeDiff:
+    """
+    Compare two repository trees.
+
+    Args:
+        previous: Mapping of path to blob sha from the previous review
+        current: Mapping of path to blob sha for the current tree
+
+    Returns:
+        TreeDiff: Added, modified, removed and unchanged paths (sorted)
+    """
+    diff = TreeDiff()
+    for path in sorted(current):
+        if path not in previous:
+            diff.added.append(path)
+        elif previous[path] != current[path]:
+            diff.modified.append(path)
+        else:
+            diff.unchanged.append(path)
+    diff.removed = sorted(path for path in previous if path not in current)
+    return diff
+
+
+def plan_incremental_review(
+    previous_tree: Dict[str, str],
+    previous_file_reviews: List[Dict[str, Any]],
+    current_tree: Dict[str, str]
+) -> IncrementalPlan:
+    """
+    Plan which files to re-review and which stored reviews to keep.
+
+    Args:
+        previous_tree: Mapping of path to blob sha recorded with the previous review
+        previous_file_reviews: File reviews stored with the previous review
+        current_tree: Mapping of path to blob sha for the current tree
+
+    Returns:
+        IncrementalPlan: Tree diff plus the file reviews carried over unchanged
+    """
+    diff = diff_trees(previous_tree, current_tree)
+    unchanged = set(diff.unchanged)
+    carried = [
+        review for review in previous_file_reviews
+        if review.get('path') in unchanged
+    ]
+    return IncrementalPlan(diff=diff, carried_reviews=carried)
+
+
+def batches_to_recompute(
+    batches: Sequence[Sequence[str]],
+    previous_batches: Optional[Dict[Tuple[str, ...], Any]],
+    changed_paths: Set[str]
+) -> List[bool]:
+    """
+    Decide which batches need a new batch review.
+
+    A batch can reuse its previous review only if exactly the same files were
+    batched together last time and none of them changed.
+
+    Args:
+        batches: Paths in each batch, in batch order
+        previous_batches: Mapping of previous batch membership to its review
+        changed_paths: Paths added or modified since the previous review
+
+    Returns:
+        List[bool]: True for each batch that must be recomputed
+    """
+    previous_batches = previous_batches or {}
+    return [
+        tuple(paths) not in previous_batches or any(path in changed_paths for path in paths)
+        for paths in batches
+    ]
@@ -1,20 +1,36 @@
 """
 Module for handling individual file code reviews.
 """
-from pathlib import Path
 import json
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 from app.intake.code_extraction import ExtractedFile
 from app.models.model_manager import ModelManager
+from app.models.registry import ConfigRegistry, get_registry
+from app.review.response_parsing import ResponseParseError, parse_json_response, template_schema
+from app.review.review_cache import ReviewCache
 
 class FileReviewer:
     """Handles individual file code reviews."""
     
-    def __init__(self):
-        """Initialize the file reviewer with necessary components."""
-        config_path = str(Path("app/models/config/model_config.yml"))
-        self.model_manager = ModelManager(config_path)
-        self.prompt_template = self._load_prompt_template()
+    def __init__(
+        self,
+        cache: Optional[ReviewCache] = None,
+        model_manager: Optional[ModelManager] = None,
+        registry: Optional[ConfigRegistry] = None
+    ):
+        """
+        Initialize the file reviewer with necessary components.
+        
+        Args:
+            cache: Optional review cache consulted before calling the model
+            model_manager: Optional model manager; defaults to the registry's
+                shared manager
+            registry: Optional configuration registry; defaults to the
+                process-wide registry
+        """
+        self.registry = registry or get_registry()
+        self.model_manager = model_manager or self.registry.model_manager()
+        self.cache = cache
         self.supported_languages = {
             'Python', 'JavaScript', 'TypeScript', 'Java', 'C++', 'C',
             'C#', 'Ruby', 'PHP', 'Go', 'Rust', 'Swift', 'Kotlin',
@@ -22,16 +38,15 @@ class FileReviewer:
             'XML', 'Markdown'
         }
         
-    def _load_prompt_template(self) -> str:
+    @property
+    def prompt_template(self) -> str:
         """
-        Load the initial review prompt template.
+        The initial review prompt template, reloaded if the file changes.
         
         Returns:
             str: Content of the initial review prompt template
         """
-        prompt_path = Path("app/prompts/initial_review.txt")
-        with open(prompt_path, 'r') as f:
-            return f.read()
+        return self.registry.prompt("initial_review")
             
     def review_file(self, file: ExtractedFile) -> Dict[str, Any]:
         """
@@ -43,6 +58,54 @@ class FileReviewer:
         Returns:
             dict: Review results following the format specified in the prompt
             
+        Raises:
+            ValueError: If file is invalid or empty
+        """
+        cache_key, review_result = self._start_review(file)
+        from_cache = review_result is not None
+        
+        if not from_cache:
+            # Get review from model
+            review_result = self.model_manager.generate_review(self._prepare_review_prompt(file))
+        
+        return self._finish_review(file, cache_key, review_result, from_cache)
+    
+    async def areview_file(self, file: ExtractedFile) -> Dict[str, Any]:
+        """
+        Review an individual file using the model manager's async providers.
+        
+        Args:
+            file: ExtractedFile object containing the code to review
+            
+        Returns:
+            dict: Review results following the format specified in the prompt
+            
+        Raises:
+            ValueError: If file is invalid or empty
+        """
+        cache_key, review_result = self._start_review(file)
+        from_cache = review_result is not None
+        
+        if not from_cache:
+            # The template goes first as a cacheable prefix shared by every file
+            review_result, model = await self.model_manager.agenerate_review_with_model(
+                self._file_section(file), system=self.prompt_template, stage="initial_reviews"
+            )
+            # File the review under the model that wrote it, which is the backup if the primary failed
+            cache_key = cache_key[:-1] + (model,)
+        
+        return self._finish_review(file, cache_key, review_result, from_cache)
+    
+    def _start_review(self, file: ExtractedFile) -> Tuple[tuple, Optional[str]]:
+        """
+        Validate a file and look up a cached review of identical content.
+        
+        Args:
+            file: ExtractedFile object to review
+            
+        Returns:
+            tuple: (cache_key, cached review or None)
+            
         Raises:
             ValueError: If file is invalid or empty
         """
@@ -52,21 +115,35 @@ class FileReviewer:
         if not file.content.strip():
             raise ValueError("Empty file")
             
-        # Prepare prompt with file content
-        prompt = self._prepare_review_prompt(file)
+        # Reuse a cached review of identical content when available
+        cache_key = (
+            file.blob_sha,
+            ReviewCache.prompt_hash(self.prompt_template),
+            self.model_manager.current_model
+        )
+        review_result = self.cache.get(*cache_key) if self.cache is not None else None
+        return cache_key, review_result
+    
+    def _finish_review(self, file: ExtractedFile, cache_key: tuple, review_result: str, from_cache: bool) -> Dict[str, Any]:
+        """
+        Parse and validate model output, caching it if it came from the model.
         
-        # Get review from model
-        try:
-            review_result = self.model_manager.generate_review(prompt)
-            parsed_result = json.loads(review_result)
-            
-            # Validate review format
-            self._validate_review_format(parsed_result, file.path)
-            
-            return parsed_result
+        Raises:
+            ValueError: If the review format is invalid
+        """
+        parsed_result = parse_json_response(review_result)
+        
+        if from_cache:
+            parsed_result = self._point_at_path(parsed_result, file.path)
             
-        except json.JSONDecodeError:
-            raise ValueError("Invalid review format received from model")
+        # Validate review format
+        self._validate_review_format(parsed_result, file.path)
+        
+        if self.cache is not None and not from_cache:
+            # Cache the clean document so hits skip extraction and repair
+            self.cache.set(*cache_key, json.dumps(parsed_result))
+        
+        return parsed_result
             
     def _prepare_review_prompt(self, file: ExtractedFile) -> str:
         """
@@ -81,7 +158,19 @@ class FileReviewer:
         return f"""
 {self.prompt_template}
 
-FILE TO REVIEW:
+{self._file_section(file)}"""
+        
+    def _file_section(self, file: ExtractedFile) -> str:
+        """
+        Format the per-file part of the review prompt.
+        
+        Args:
+            file: ExtractedFile object to review
+            
+        Returns:
+            str: File details and code, without the prompt template
+        """
+        return f"""FILE TO REVIEW:
 Path: {file.path}
 Language: {file.language}
 Size: {file.size} bytes
@@ -90,9 +179,29 @@ CODE:
 {file.content}
 """
         
+    def _point_at_path(self, review: Dict[str, Any], file_path: str) -> Dict[str, Any]:
+        """
+        Point a cached review at the path being reviewed.
+        
+        Cache entries are keyed by content, so an identical file at another
+        path yields a review whose metadata names the old path.
+        
+        Args:
+            review: Parsed cached review
+            file_path: Path of the file being reviewed
+            
+        Returns:
+            dict: Review whose file_metadata names file_path
+        """
+        metadata = review.get("file_review", {}).get("file_metadata")
+        if isinstance(metadata, dict):
+            metadata["path"] = file_path
+            metadata["filename"] = file_path.rsplit("/", 1)[-1]
+        return review
+        
     def _validate_review_format(self, review: Dict[str, Any], file_path: str):
         """
-        Validate that the review follows the expected format.
+        Validate that the review follows the format the prompt asks for.
         
         Args:
             review: Review dictionary to validate
@@ -101,32 +210,7 @@ CODE:
         Raises:
             ValueError: If review format is invalid
         """
-        # Check top-level structure
-        required_keys = {"file_scores", "overall_review"}
-        if not all(key in review for key in required_keys):
-            raise ValueError("Invalid review format: missing required sections")
-            
-        # Check file scores
-        if file_path not in review["file_scores"]:
-            raise ValueError("Invalid review format: file path not in scores")
-            
-        scores = review["file_scores"][file_path]
-        required_metrics = {
-            "readability", "maintainability", "complexity",
-            "coding_standards", "documentation", "security",
-            "performance", "reusability", "error_handling",
-            "test_coverage", "notes"
-        }
-        
-        if not all(metric in scores for metric in required_metrics):
-            raise ValueError("Invalid review format: missing required metrics")
-            
-        # Check overall review
-        overall = review["overall_review"]
-        required_overall = {
-            "total_score", "strengths", "concerns",
-            "hiring_confidence", "risks", "summary"
-        }
+        template_schema(self.prompt_template).validate(review)
         
-        if not all(key in overall for key in required_overall):
-            raise ValueError("Invalid review format: missing overall review sections")
+        if review["file_review"]["file_metadata"]["path"] != file_path:
+            raise ResponseParseError("Invalid review format: review is for another file")
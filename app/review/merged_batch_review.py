@@ -1,42 +1,126 @@
 """
 Module for merging and analyzing multiple batch reviews.
 """
-from pathlib import Path
 import json
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
 from app.models.model_manager import ModelManager
+from app.models.registry import ConfigRegistry, get_registry
+from app.review.response_parsing import parse_review
 from app.review.numerical_calculations import NumericalProcessor, ReviewMetrics
+from app.review.tree_merge import check_fan_in, merge_fan_in, tree_reduce, tree_reduce_sync
+
+# Scored sections of a merged review's technical foundation
+MERGED_SCORE_SECTIONS = (
+    'reliability_indicators', 'maintenance_assessment', 'scalability_evaluation', 'development_efficiency'
+)
 
 class MergedBatchReviewer:
     """Handles merging and analysis of multiple batch reviews."""
     
-    def __init__(self):
-        """Initialize the merged batch reviewer."""
-        config_path = str(Path("app/models/config/model_config.yml"))
-        self.model_manager = ModelManager(config_path)
-        self.prompt_template = self._load_prompt_template()
+    def __init__(
+        self,
+        model_manager: Optional[ModelManager] = None,
+        registry: Optional[ConfigRegistry] = None,
+        fan_in: Optional[int] = None
+    ):
+        """
+        Initialize the merged batch reviewer.
+        
+        Args:
+            model_manager: Optional model manager; defaults to the registry's
+                shared manager
+            registry: Optional configuration registry; defaults to the
+                process-wide registry
+            fan_in: Batch reviews merged per model call; larger sets are
+                merged as a tree. Defaults to MERGE_FAN_IN or 8
+        """
+        self.registry = registry or get_registry()
+        self.model_manager = model_manager or self.registry.model_manager()
+        self.fan_in = check_fan_in(fan_in) if fan_in is not None else merge_fan_in()
         
-    def _load_prompt_template(self) -> str:
+    @property
+    def prompt_template(self) -> str:
         """
-        Load the merged batch review prompt template.
+        The merged batch review prompt template, reloaded if the file changes.
         
         Returns:
             str: Content of the merged batch review prompt template
         """
-        prompt_path = Path("app/prompts/merged_batch_review.txt")
-        with open(prompt_path, 'r') as f:
-            return f.read()
+        return self.registry.prompt("merged_batch_review")
             
-    def merge_reviews(self, batch_reviews: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def merge_reviews(
+        self,
+        batch_reviews: List[Dict[str, Any]],
+        fan_in: Optional[int] = None,
+        parallel: bool = False
+    ) -> Dict[str, Any]:
         """
         Merge multiple batch reviews into a comprehensive analysis.
         
+        More reviews than the fan-in are merged in groups, level by level,
+        until one merged review remains.
+        
+        Args:
+            batch_reviews: List of batch review results to merge
+            fan_in: Reviews merged per model call; defaults to the reviewer's
+            parallel: Run the merges of each level in parallel threads
+            
+        Returns:
+            dict: Merged review results following the format specified in the prompt
+            
+        Raises:
+            ValueError: If no reviews provided or only one batch review
+        """
+        self._check_reviews(batch_reviews)
+        fan_in = check_fan_in(fan_in) if fan_in is not None else self.fan_in
+        
+        def merge(group):
+            # Get merged analysis from model
+            return self._as_batch_review(
+                self._parse_review(self.model_manager.generate_review(self._build_prompt(group))), group
+            )
+        
+        if not parallel:
+            return self._unwrap(tree_reduce_sync(batch_reviews, merge, fan_in))
+        with ThreadPoolExecutor(max_workers=fan_in) as executor:
+            return self._unwrap(tree_reduce_sync(batch_reviews, merge, fan_in, executor))
+    
+    async def amerge_reviews(
+        self,
+        batch_reviews: List[Dict[str, Any]],
+        fan_in: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Merge batch reviews using the model manager's async providers.
+        
+        More reviews than the fan-in are merged as a tree; the merges of
+        each level run concurrently.
+        
         Args:
             batch_reviews: List of batch review results to merge
+            fan_in: Reviews merged per model call; defaults to the reviewer's
             
         Returns:
             dict: Merged review results following the format specified in the prompt
             
+        Raises:
+            ValueError: If no reviews provided or only one batch review
+        """
+        self._check_reviews(batch_reviews)
+        fan_in = check_fan_in(fan_in) if fan_in is not None else self.fan_in
+        
+        async def merge(group):
+            review = await self.model_manager.agenerate_review(self._build_prompt(group), stage="merged_review")
+            return self._as_batch_review(self._parse_review(review), group)
+        
+        return self._unwrap(await tree_reduce(batch_reviews, merge, fan_in))
+    
+    @staticmethod
+    def _check_reviews(batch_reviews: List[Dict[str, Any]]) -> None:
+        """
+        Check there is something to merge.
+        
         Raises:
             ValueError: If no reviews provided or only one batch review
         """
@@ -44,26 +128,87 @@ class MergedBatchReviewer:
             raise ValueError("No batch reviews provided")
         if len(batch_reviews) < 2:
             raise ValueError("At least two batch reviews required")
+    
+    @staticmethod
+    def _as_batch_review(merged: Dict[str, Any], group: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Present a merged review as a batch review so it can be merged again.
+        
+        The merged section scores and main findings are kept under their own
+        names in "merged_metrics" and "merged_findings" rather than passed
+        off as batch scores. "batches_covered" and "aggregate_metrics" carry
+        the number of batches below the node and their averages, so the next
+        level weights the node by its batches. The merged review itself is
+        kept under "merged_review".
+        
+        Args:
+            merged: Validated merged review of a group
+            group: The batch reviews that were merged
             
+        Returns:
+            dict: Batch review covering every file of the group
+        """
+        foundation = merged['technical_foundation']
+        return {
+            'batch_analysis': {
+                'files_reviewed': [
+                    path for review in group for path in review.get('batch_analysis', {}).get('files_reviewed', [])
+                ]
+            },
+            'merged_metrics': {section: foundation[section]['score'] for section in MERGED_SCORE_SECTIONS},
+            'merged_findings': {
+                'strong_points': foundation['reliability_indicators']['strong_points'],
+                'vulnerabilities': foundation['reliability_indicators']['vulnerabilities'],
+                'critical_issues': merged['risk_patterns']['immediate_concerns']['critical_issues']
+            },
+            'batches_covered': sum(review.get('batches_covered', 1) for review in group),
+            'aggregate_metrics': NumericalProcessor.calculate_batch_averages(group).to_dict(),
+            'merged_review': merged
+        }
+    
+    @staticmethod
+    def _unwrap(review: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the merged review held by the root of the merge tree."""
+        return review['merged_review']
+    
+    def _build_prompt(self, batch_reviews: List[Dict[str, Any]]) -> str:
+        """Prepare the merge prompt for a group of batch reviews."""
         # Calculate aggregate metrics
         metrics = NumericalProcessor.calculate_batch_averages(batch_reviews)
         
         # Prepare prompt with batch reviews
-        prompt = self._prepare_merged_prompt(batch_reviews, metrics)
+        return self._prepare_merged_prompt(batch_reviews, metrics)
+    
+    def _parse_review(self, review_result: str) -> Dict[str, Any]:
+        """
+        Parse and validate model output.
         
-        # Get merged analysis from model
-        try:
-            review_result = self.model_manager.generate_review(prompt)
-            parsed_result = json.loads(review_result)
-            
-            # Validate review format
-            self._validate_review_format(parsed_result)
-            
-            return parsed_result
-            
-        except json.JSONDecodeError:
-            raise ValueError("Invalid review format received from model")
+        Raises:
+            ValueError: If the review format is invalid
+        """
+        return parse_review(review_result, self.prompt_template)
             
+    @staticmethod
+    def _review_summary(review: Dict[str, Any]) -> str:
+        """Scores and findings of a batch review, or of a merged group under the merged names."""
+        if 'merged_metrics' in review:
+            metrics = review['merged_metrics']
+            return (
+                f"Merged Batches: {review['batches_covered']}\n"
+                f"Reliability Score: {metrics['reliability_indicators']}\n"
+                f"Maintenance Score: {metrics['maintenance_assessment']}\n"
+                f"Scalability Score: {metrics['scalability_evaluation']}\n"
+                f"Development Efficiency Score: {metrics['development_efficiency']}\n"
+                f"Findings: {json.dumps(review['merged_findings'], indent=2)}"
+            )
+        indicators = review.get('batch_analysis', {}).get('reliability_indicators', {})
+        return (
+            f"Consistency Score: {indicators.get('consistency_score')}\n"
+            f"Pattern Quality: {indicators.get('pattern_quality')}\n"
+            f"Cohesion Rating: {indicators.get('cohesion_rating')}\n"
+            f"Findings: {json.dumps(indicators.get('key_observations', {}), indent=2)}"
+        )
+    
     def _prepare_merged_prompt(self, batch_reviews: List[Dict[str, Any]], metrics: ReviewMetrics) -> str:
         """
         Prepare the review prompt for merged analysis.
@@ -78,10 +223,7 @@ class MergedBatchReviewer:
         reviews_summary = "\n\n".join([
             f"Batch {i+1}:\n"
             f"Files: {len(review.get('batch_analysis', {}).get('files_reviewed', []))}\n"
-            f"Consistency Score: {review.get('batch_analysis', {}).get('consistency_score')}\n"
-            f"Pattern Quality: {review.get('batch_analysis', {}).get('pattern_quality')}\n"
-            f"Cohesion Rating: {review.get('batch_analysis', {}).get('cohesion_rating')}\n"
-            f"Findings: {json.dumps(review.get('batch_analysis', {}).get('findings', {}), indent=2)}"
+            f"{self._review_summary(review)}"
             for i, review in enumerate(batch_reviews)
         ])
         
@@ -108,45 +250,3 @@ BATCH REVIEWS TO MERGE:
 AGGREGATE METRICS:
 {metrics_summary}
 """
-        
-    def _validate_review_format(self, review: Dict[str, Any]):
-        """
-        Validate that the review follows the expected format.
-        
-        Args:
-            review: Review dictionary to validate
-            
-        Raises:
-            ValueError: If review format is invalid
-        """
-        # Check top-level structure
-        required_keys = {"merged_analysis", "recommendations"}
-        if not all(key in review for key in required_keys):
-            raise ValueError("Invalid review format: missing required sections")
-            
-        # Check merged analysis
-        analysis = review["merged_analysis"]
-        required_analysis = {
-            "overall_quality_score",
-            "architectural_alignment_score",
-            "integration_impact_score",
-            "key_findings"
-        }
-        if not all(key in analysis for key in required_analysis):
-            raise ValueError("Invalid review format: missing analysis metrics")
-            
-        # Check findings
-        findings = analysis["key_findings"]
-        required_findings = {"strengths", "concerns", "risks"}
-        if not all(key in findings for key in required_findings):
-            raise ValueError("Invalid review format: missing findings sections")
-            
-        # Check recommendations
-        recommendations = review["recommendations"]
-        required_recommendations = {
-            "architectural_improvements",
-            "integration_considerations",
-            "priority_actions"
-        }
-        if not all(key in recommendations for key in required_recommendations):
-            raise ValueError("Invalid review format: missing recommendations")
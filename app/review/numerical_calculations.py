@@ -8,6 +8,9 @@ from typing import List, Dict, Any, Union
 from statistics import mean
 from dataclasses import dataclass, asdict
 
+# Initial review prompt metric names that differ from the ReviewMetrics fields
+PROMPT_METRIC_NAMES = {'simplicity': 'complexity', 'standards': 'coding_standards'}
+
 @dataclass
 class ReviewMetrics:
     """
@@ -46,6 +49,22 @@ class ReviewMetrics:
         """Convert metrics to dictionary."""
         return asdict(self)
 
+    @classmethod
+    def from_quality_scores(cls, scores: Dict[str, Union[int, float]]):
+        """
+        Create ReviewMetrics from a file review's quality_scores.
+        
+        The initial review prompt names two metrics differently; they are
+        mapped onto the ReviewMetrics fields.
+        
+        Args:
+            scores: quality_scores of a file review
+        
+        Returns:
+            ReviewMetrics instance
+        """
+        return cls.from_dict({PROMPT_METRIC_NAMES.get(name, name): value for name, value in scores.items()})
+
 class NumericalProcessor:
     """
     Processes numerical metrics for code reviews across different stages.
@@ -70,28 +89,26 @@ class NumericalProcessor:
         if not reviews:
             raise ValueError("Cannot process empty batch of reviews")
             
-        # For batch reviews, use consistency and pattern quality scores
+        # For batch reviews, use consistency and pattern quality scores. A
+        # merged group carries the averages of the batches it covers and is
+        # weighted by their number, so every batch counts once at any level
         if all('batch_analysis' in review for review in reviews):
-            metrics = {
-                'readability': mean(review['batch_analysis'].get('consistency_score', 0) for review in reviews),
-                'maintainability': mean(review['batch_analysis'].get('pattern_quality', 0) for review in reviews),
-                'complexity': mean(review['batch_analysis'].get('cohesion_rating', 0) for review in reviews),
-                'coding_standards': mean(review['batch_analysis'].get('consistency_score', 0) for review in reviews),
-                'documentation': mean(review['batch_analysis'].get('pattern_quality', 0) for review in reviews),
-                'security': 0.0,  # Not applicable for batch reviews
-                'performance': 0.0,  # Not applicable for batch reviews
-                'reusability': mean(review['batch_analysis'].get('cohesion_rating', 0) for review in reviews),
-                'error_handling': 0.0,  # Not applicable for batch reviews
-                'test_coverage': 0.0  # Not applicable for batch reviews
-            }
-            return ReviewMetrics(**metrics)
+            batch_metrics = [
+                ReviewMetrics.from_dict(review['aggregate_metrics']) if 'aggregate_metrics' in review
+                else NumericalProcessor._batch_metrics(review['batch_analysis'])
+                for review in reviews
+            ]
+            weights = [review.get('batches_covered', 1) for review in reviews]
+            return ReviewMetrics(**{
+                metric: sum(getattr(m, metric) * weight for m, weight in zip(batch_metrics, weights)) / sum(weights)
+                for metric in ReviewMetrics.__annotations__
+            })
             
-        # For individual file reviews, use file scores
-        batch_metrics = []
-        for review in reviews:
-            file_scores = review.get('file_scores', {})
-            for scores in file_scores.values():
-                batch_metrics.append(ReviewMetrics.from_dict(scores))
+        # For individual file reviews, use quality scores
+        batch_metrics = [
+            ReviewMetrics.from_quality_scores(review['file_review']['quality_scores'])
+            for review in reviews if 'quality_scores' in review.get('file_review', {})
+        ]
         
         if not batch_metrics:
             raise ValueError("No valid metrics found in reviews")
@@ -104,6 +121,23 @@ class NumericalProcessor:
         
         return ReviewMetrics(**avg_metrics)
     
+    @staticmethod
+    def _batch_metrics(analysis: Dict[str, Any]) -> ReviewMetrics:
+        """Map one batch review's scores onto the review metrics."""
+        analysis = analysis.get('reliability_indicators', {})
+        return ReviewMetrics(
+            readability=analysis.get('consistency_score', 0),
+            maintainability=analysis.get('pattern_quality', 0),
+            complexity=analysis.get('cohesion_rating', 0),
+            coding_standards=analysis.get('consistency_score', 0),
+            documentation=analysis.get('pattern_quality', 0),
+            security=0.0,  # Not applicable for batch reviews
+            performance=0.0,  # Not applicable for batch reviews
+            reusability=analysis.get('cohesion_rating', 0),
+            error_handling=0.0,  # Not applicable for batch reviews
+            test_coverage=0.0  # Not applicable for batch reviews
+        )
+    
     @staticmethod
     def calculate_merged_batch_averages(batches: List[List[Dict[str, Any]]]) -> ReviewMetrics:
         """
@@ -138,20 +172,14 @@ class NumericalProcessor:
         for review in reviews:
             # Handle batch reviews
             if 'batch_analysis' in review:
-                findings = review['batch_analysis'].get('findings', {})
-                for category in ['patterns_identified', 'consistency_issues', 'cohesion_concerns']:
-                    qualitative_data.extend(findings.get(category, []))
+                observations = review['batch_analysis'].get('reliability_indicators', {}).get('key_observations', {})
+                for category in ['strong_patterns', 'consistency_gaps', 'organization_issues']:
+                    qualitative_data.extend(observations.get(category, []))
                 continue
                 
             # Handle individual file reviews
-            overall_review = review.get('overall_review', {})
-            if not any(
-                isinstance(val, (int, float)) or 
-                (isinstance(val, str) and val.replace('.', '').isdigit())
-                for val in overall_review.values()
-            ):
-                summary = overall_review.get('summary', '')
-                if summary:
-                    qualitative_data.append(summary)
+            summary = review.get('summary', '')
+            if isinstance(summary, str) and summary:
+                qualitative_data.append(summary)
         
         return qualitative_data
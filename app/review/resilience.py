@@ -0,0 +1,180 @@
+"""
+Failure-tolerant fan-out of LLM calls.
+
+Each item is retried on its own with jittered exponential backoff, fails over
+to the backup model for that call only, and ends in a per-item outcome
+instead of an exception, so one flaky request cannot discard hundreds of
+completed reviews.
+"""
+import asyncio
+import logging
+import os
+import random
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Sequence
+
+import aiohttp
+
+from app.models.llm_client import LLMOverloadedError, LLMResponseError
+from app.review.response_parsing import ResponseParseError
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RetryPolicy:
+    """How often and how patiently a single call is retried."""
+    max_attempts: int = 4
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+    # Retryable failures on a model before switching to the next one
+    failover_after: int = 2
+
+    @classmethod
+    def from_env(cls) -> 'RetryPolicy':
+        """
+        Create a policy configured from environment variables.
+
+        Returns:
+            RetryPolicy: Policy using LLM_RETRY_ATTEMPTS, LLM_RETRY_BASE_DELAY,
+            LLM_RETRY_MAX_DELAY and LLM_FAILOVER_AFTER when set
+        """
+        return cls(
+            max_attempts=int(os.getenv('LLM_RETRY_ATTEMPTS', 4)),
+            base_delay=float(os.getenv('LLM_RETRY_BASE_DELAY', 1.0)),
+            max_delay=float(os.getenv('LLM_RETRY_MAX_DELAY', 30.0)),
+            failover_after=int(os.getenv('LLM_FAILOVER_AFTER', 2))
+        )
+
+    def delay(self, attempt: int) -> float:
+        """
+        Backoff before the next attempt, using full jitter.
+
+        Args:
+            attempt: Number of attempts made so far (1 after the first failure)
+
+        Returns:
+            float: Seconds to wait
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+@dataclass
+class CallOutcome:
+    """Result of running one item through the executor."""
+    item: Any
+    result: Any = None
+    error: Optional[BaseException] = None
+    attempts: int = 0
+    model: Optional[str] = None
+
+    @property
+    def succeeded(self) -> bool:
+        """Whether the call eventually produced a result."""
+        return self.error is None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Classify an error from an LLM call.
+
+    Transport failures, overload and server errors, and model output that is
+    not the requested JSON are worth retrying. Client errors such as invalid
+    requests or authentication failures are fatal, as are programming errors
+    (KeyError, IndexError, ...), which would only fail the same way again.
+
+    Args:
+        error: Exception raised by the call
+
+    Returns:
+        bool: True if the call should be retried
+    """
+    if isinstance(error, LLMResponseError):
+        return error.retryable
+    return isinstance(error, (
+        LLMOverloadedError, aiohttp.ClientError, asyncio.TimeoutError,
+        ConnectionError, ResponseParseError
+    ))
+
+
+class ResilientExecutor:
+    """Runs calls per item with retries, per-call failover and outcomes."""
+
+    def __init__(
+        self,
+        models: Sequence[str],
+        policy: Optional[RetryPolicy] = None,
+        classify: Callable[[BaseException], bool] = is_retryable
+    ):
+        """
+        Initialize the executor.
+
+        Args:
+            models: Models to try in order, typically primary then backup
+            policy: Retry policy; defaults to RetryPolicy()
+            classify: Returns True for errors worth retrying
+        """
+        if not models:
+            raise ValueError("At least one model is required")
+        # Keep order but drop duplicates, e.g. when primary and backup are the same
+        self.models = list(dict.fromkeys(models))
+        self.policy = policy or RetryPolicy()
+        self.classify = classify
+
+    def _model_for(self, retryable_failures: int) -> str:
+        index = retryable_failures // self.policy.failover_after if self.policy.failover_after else 0
+        return self.models[min(index, len(self.models) - 1)]
+
+    async def run(self, item: Any, call: Callable[[str], Awaitable[Any]]) -> CallOutcome:
+        """
+        Run one call until it succeeds, fails fatally or runs out of attempts.
+
+        Args:
+            item: The item being processed, kept on the outcome
+            call: Coroutine function taking the model name to use
+
+        Returns:
+            CallOutcome: Result or final error, attempts made and model used
+        """
+        outcome = CallOutcome(item=item)
+        failures = 0
+        while outcome.attempts < self.policy.max_attempts:
+            outcome.model = self._model_for(failures)
+            outcome.attempts += 1
+            try:
+                outcome.result = await call(outcome.model)
+                outcome.error = None
+                return outcome
+            except Exception as e:
+                outcome.error = e
+                if not self.classify(e):
+                    logger.error(f"Fatal error on {outcome.model}: {e!r}")
+                    return outcome
+                failures += 1
+                if outcome.attempts < self.policy.max_attempts:
+                    delay = self.policy.delay(outcome.attempts)
+                    logger.warning(
+                        f"Attempt {outcome.attempts} on {outcome.model} failed ({e!r}); "
+                        f"retrying in {delay:.1f}s"
+                    )
+                    await asyncio.sleep(delay)
+        return outcome
+
+    async def gather(
+        self,
+        items: Iterable[Any],
+        call: Callable[[Any, str], Awaitable[Any]]
+    ) -> List[CallOutcome]:
+        """
+        Run a call for every item concurrently.
+
+        Args:
+            items: Items to process
+            call: Coroutine function taking (item, model)
+
+        Returns:
+            List[CallOutcome]: One outcome per item, in input order
+        """
+        return list(await asyncio.gather(*(
+            self.run(item, lambda model, item=item: call(item, model)) for item in items
+        )))
@@ -0,0 +1,507 @@
+"""
+Parsing and validation of JSON review responses from LLMs.
+
+Model output is rarely a bare JSON document: it may be wrapped in code
+fences, followed by prose, or cut off at max_tokens. This module extracts
+the JSON object from the text, repairs common truncation instead of
+re-requesting the review, and validates it against a schema derived from
+the output format the stage's prompt template asks for. orjson is used for decoding when it is installed.
+"""
+import functools
+import json
+import logging
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional fast backend
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Trailing members dropped at most while repairing a truncated response
+MAX_REPAIR_STEPS = 50
+
+# Characters a streamed response may contain before its JSON starts
+MAX_PREAMBLE_CHARS = 500
+
+_CLOSERS = {'{': '}', '[': ']'}
+
+# Opening line of a Markdown code fence, with an optional language tag
+_FENCE = re.compile(r'```[\w-]*[ \t]*\n')
+
+# An opening brace followed by a key, its closing brace, or the end of the text
+_OBJECT_START = re.compile(r'\{\s*(?:["}]|$)')
+
+
+class ResponseParseError(ValueError):
+    """Raised when a response holds no usable JSON or does not match its schema."""
+
+
+def loads(text: str) -> Any:
+    """
+    Decode JSON text with the fastest available backend.
+
+    Args:
+        text: JSON document
+
+    Returns:
+        Any: Decoded value
+
+    Raises:
+        ValueError: If the text is not valid JSON
+    """
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+class IncrementalJSONScanner:
+    """
+    Tracks the structure of a JSON object as its text arrives in chunks.
+
+    Used on streamed responses to tell, before generation finishes, when
+    the response is off-format (no JSON within the first few hundred
+    characters, or mismatched brackets) and when the JSON value is complete,
+    so the rest of the generation can be cancelled.
+
+    Every review stage answers with an object, so a value starts at any
+    ``{`` followed by a key or its closing brace, as in "Sure, here is the
+    review: {...}"; square brackets and braces around prose in an
+    introduction such as "Here is my review of [app/main.py]:" are ignored.
+    With ``validate``, a value only counts as complete once it decodes; one
+    that does not is skipped and scanning carries on after it.
+    """
+
+    def __init__(self, max_preamble: Optional[int] = MAX_PREAMBLE_CHARS, validate: bool = True):
+        """
+        Initialize the scanner.
+
+        Args:
+            max_preamble: Characters allowed before the value starts (code
+                fences, a short introduction); None for no limit
+            validate: Decode the value when its brackets close and keep
+                scanning if it is not valid JSON
+        """
+        self.max_preamble = max_preamble
+        self.validate = validate
+        self.stack: List[str] = []
+        self.in_string = False
+        self.escaped = False
+        self.started = False
+        self.complete = False
+        # Characters consumed, including any preamble
+        self.consumed = 0
+        # Whether the value's opening brace has yet to be followed by a key
+        self._tentative = False
+        self._value: List[str] = []
+
+    def _start(self) -> None:
+        self.started = self._tentative = True
+        self.stack = ['{']
+        self._value = ['{']
+
+    def _drop(self) -> None:
+        """Forget a value that turned out not to be one."""
+        self.started = self._tentative = False
+        self.stack = []
+        self._value = []
+
+    def feed(self, chunk: str) -> bool:
+        """
+        Scan the next chunk of text.
+
+        Args:
+            chunk: Text following what was fed before
+
+        Returns:
+            bool: True once the JSON value is complete; later text is ignored
+
+        Raises:
+            ResponseParseError: If the text cannot be the expected JSON value
+        """
+        for char in chunk:
+            if self.complete:
+                break
+            self.consumed += 1
+            if self._tentative:
+                if char.isspace():
+                    self._value.append(char)
+                    continue
+                if char in '"}':
+                    self._tentative = False
+                else:
+                    # A brace in prose, e.g. "{see notes}"
+                    self._drop()
+            if not self.started:
+                if char == '{':
+                    self._start()
+                elif self.max_preamble is not None and self.consumed > self.max_preamble:
+                    raise ResponseParseError("Invalid review format: response does not start with JSON")
+                continue
+            if self.validate:
+                self._value.append(char)
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in _CLOSERS:
+                self.stack.append(char)
+            elif char in '}]':
+                if _CLOSERS[self.stack[-1]] != char:
+                    raise ResponseParseError("Invalid review format: mismatched brackets in response")
+                self.stack.pop()
+                if not self.stack:
+                    self.complete = not self.validate or self._decodes()
+        return self.complete
+
+    def _decodes(self) -> bool:
+        """Whether the value just closed is valid JSON; if not, look for the next one."""
+        try:
+            loads("".join(self._value))
+            return True
+        except ValueError:
+            self._drop()
+            return False
+
+
+def _scan(text: str, start: int) -> Tuple[Optional[int], List[str], bool]:
+    """
+    Scan a JSON object starting at its opening brace.
+
+    Returns:
+        tuple: (index just past the matching close or None if the text ends
+        first, brackets still open, whether the text ends inside a string)
+    """
+    scanner = IncrementalJSONScanner(max_preamble=None, validate=False)
+    end = start + scanner.consumed if scanner.feed(text[start:]) else None
+    return end, scanner.stack, scanner.in_string
+
+
+def _candidates(text: str, opening: str) -> List[int]:
+    """Positions of an opening bracket, those inside the first code fence first."""
+    starts = [match.start() for match in re.finditer(re.escape(opening), text)]
+    fence = _FENCE.search(text)
+    if fence is None:
+        return starts
+    return [start for start in starts if start >= fence.end()] + [start for start in starts if start < fence.end()]
+
+
+def _locate(text: str) -> Tuple[str, Optional[Any]]:
+    """
+    Find the JSON value in a response.
+
+    Candidate starts are tried in order, fenced ones first, and the first
+    object that decodes as is wins. Failing that, the first object (a brace
+    followed by a key) that is still open at the end of the text is returned
+    undecoded, for repair.
+    Arrays are only accepted when they decode and no object was found.
+
+    Returns:
+        tuple: (JSON text, decoded value or None if it needs repair)
+
+    Raises:
+        ResponseParseError: If the text holds no usable JSON
+    """
+    stripped = text.strip()
+    if stripped.startswith('{') and stripped.endswith('}'):
+        try:
+            return stripped, loads(stripped)
+        except ValueError:
+            pass
+    decoder = json.JSONDecoder()
+    for start in _candidates(text, '{'):
+        try:
+            value, end = decoder.raw_decode(text, start)
+            return text[start:end], value
+        except ValueError:
+            pass
+        if not _OBJECT_START.match(text, start):
+            continue
+        try:
+            end, _, _ = _scan(text, start)
+        except ResponseParseError:
+            continue
+        if end is None:
+            # Cut off: every later candidate lies inside this value
+            return text[start:].rstrip().removesuffix("```").rstrip(), None
+    for start in _candidates(text, '['):
+        try:
+            value, end = decoder.raw_decode(text, start)
+            return text[start:end], value
+        except ValueError:
+            pass
+    raise ResponseParseError("Invalid review format: no JSON object in response")
+
+
+def extract_json(text: str) -> str:
+    """
+    Extract the JSON object (or, failing that, array) from LLM output.
+
+    Code fences, leading explanations and trailing prose are dropped, and
+    bracketed asides in the prose are skipped. If the object is cut off,
+    everything from its start is returned so that it can be repaired.
+
+    Args:
+        text: Raw model output
+
+    Returns:
+        str: The JSON text
+
+    Raises:
+        ResponseParseError: If the text contains no JSON object or array
+    """
+    json_text, _ = _locate(text)
+    return json_text
+
+
+def _close(fragment: str) -> str:
+    """Close an open string and every open bracket of a truncated fragment."""
+    _, stack, in_string = _scan(fragment, 0)
+    if in_string:
+        fragment += '"'
+    fragment = fragment.rstrip().rstrip(',')
+    if fragment.endswith(':'):
+        fragment += ' null'
+    return fragment + ''.join(_CLOSERS[bracket] for bracket in reversed(stack))
+
+
+def repair_truncated_json(fragment: str) -> Any:
+    """
+    Decode a JSON value that was cut off mid-way.
+
+    Open strings and brackets are closed; if that is not enough (for
+    example a number or literal was cut in half), trailing members are
+    dropped one at a time until the value decodes.
+
+    Args:
+        fragment: Truncated JSON text starting at its opening bracket
+
+    Returns:
+        Any: The decoded, possibly incomplete, value
+
+    Raises:
+        ResponseParseError: If the fragment cannot be repaired
+    """
+    candidate = fragment
+    for _ in range(MAX_REPAIR_STEPS):
+        try:
+            return loads(_close(candidate))
+        except ValueError:
+            pass
+        cut = max(candidate.rfind(','), candidate.rfind('{') + 1, candidate.rfind('[') + 1)
+        shorter = candidate[:cut].rstrip().rstrip(',')
+        if cut <= 0 or shorter == candidate:
+            break
+        candidate = shorter
+    raise ResponseParseError("Invalid review format received from model")
+
+
+def _parse(text: str) -> Tuple[Any, bool]:
+    """Decode the JSON value in a response; returns (value, whether it was repaired)."""
+    json_text, value = _locate(text)
+    if value is not None:
+        return value, False
+    value = repair_truncated_json(json_text)
+    logger.warning("Repaired a truncated JSON response")
+    return value, True
+
+
+def parse_json_response(text: str) -> Any:
+    """
+    Parse the JSON value in an LLM response, repairing truncation.
+
+    Args:
+        text: Raw model output
+
+    Returns:
+        Any: Decoded value
+
+    Raises:
+        ResponseParseError: If no JSON value can be recovered
+    """
+    value, _ = _parse(text)
+    return value
+
+
+Validator = Callable[[Any, str], None]
+
+
+def compile_schema(spec: Any) -> Validator:
+    """
+    Compile a schema spec into a validator.
+
+    A spec is a dict of required keys to specs, a one-item list whose item
+    is the spec of every element, a type or tuple of types, or None for any
+    value. Extra keys are allowed.
+
+    Args:
+        spec: Schema spec
+
+    Returns:
+        Callable: validate(value, path) raising ResponseParseError
+    """
+    if spec is None:
+        return lambda value, path: None
+    if isinstance(spec, dict):
+        fields = [(key, compile_schema(sub_spec)) for key, sub_spec in spec.items()]
+
+        def validate_object(value, path):
+            if not isinstance(value, dict):
+                raise ResponseParseError(f"Invalid review format: {path or 'response'} is not an object")
+            for key, validate in fields:
+                if key not in value:
+                    raise ResponseParseError(f"Invalid review format: missing {path + '.' if path else ''}{key}")
+                validate(value[key], f"{path}.{key}" if path else key)
+        return validate_object
+    if isinstance(spec, list):
+        validate_item = compile_schema(spec[0])
+
+        def validate_list(value, path):
+            if not isinstance(value, list):
+                raise ResponseParseError(f"Invalid review format: {path} is not a list")
+            for index, item in enumerate(value):
+                validate_item(item, f"{path}[{index}]")
+        return validate_list
+
+    def validate_type(value, path):
+        if not isinstance(value, spec) or isinstance(value, bool) and bool not in _as_tuple(spec):
+            raise ResponseParseError(f"Invalid review format: {path} has the wrong type")
+    return validate_type
+
+
+def _as_tuple(spec: Any) -> tuple:
+    return spec if isinstance(spec, tuple) else (spec,)
+
+
+class Schema:
+    """A compiled response schema."""
+
+    def __init__(self, spec: Any):
+        """
+        Compile a schema.
+
+        Args:
+            spec: Schema spec, see compile_schema
+        """
+        self.spec = spec
+        self._validate = compile_schema(spec)
+
+    def validate(self, value: Any) -> Any:
+        """
+        Validate a decoded response.
+
+        Args:
+            value: Decoded response
+
+        Returns:
+            Any: The value, unchanged
+
+        Raises:
+            ResponseParseError: If the value does not match the schema
+        """
+        self._validate(value, "")
+        return value
+
+
+NUMBER = (int, float)
+
+# Where a prompt template's example output starts; outside its strings the
+# example has bare number placeholders and // comments
+_OUTPUT_FORMAT = re.compile(r'^OUTPUT FORMAT[ \t]*$', re.M)
+_EXAMPLE_TOKEN = re.compile(r'("(?:[^"\\]|\\.)*")|(\bnumber\b)|//[^\n]*')
+
+
+def _example_spec(example: Any) -> Any:
+    """Schema spec for a value of a template's example output."""
+    if isinstance(example, dict):
+        return {key: _example_spec(value) for key, value in example.items()}
+    if isinstance(example, list):
+        # Example lists hold placeholder words, not the items' real shape
+        return list
+    if isinstance(example, str):
+        return NUMBER if example == "number" else str
+    if isinstance(example, bool):
+        return bool
+    if isinstance(example, (int, float)):
+        return NUMBER
+    return None
+
+
+@functools.lru_cache(maxsize=32)
+def template_schema(template: str) -> Schema:
+    """
+    Derive the schema of a stage's responses from its prompt template.
+
+    The example document under the template's OUTPUT FORMAT heading is the
+    schema: every key in it is required, "number" placeholders must be
+    numbers, other strings must be strings and lists must be lists.
+
+    Args:
+        template: Prompt template text
+
+    Returns:
+        Schema: Compiled schema, shared by every call with the same template
+
+    Raises:
+        ValueError: If the template has no decodable OUTPUT FORMAT example
+    """
+    heading = _OUTPUT_FORMAT.search(template)
+    start = template.find('{', heading.end()) if heading else -1
+    if start < 0:
+        raise ValueError("Prompt template has no OUTPUT FORMAT example")
+    example = _EXAMPLE_TOKEN.sub(
+        lambda match: match.group(1) or ('"number"' if match.group(2) else ''), template[start:]
+    )
+    try:
+        value, _ = json.JSONDecoder().raw_decode(example)
+    except ValueError as e:
+        raise ValueError(f"Prompt template OUTPUT FORMAT example is not JSON: {str(e)}")
+    return Schema(_example_spec(value))
+
+
+def parse_review(text: str, template: str) -> Dict[str, Any]:
+    """
+    Parse and validate a review response.
+
+    Args:
+        text: Raw model output
+        template: Prompt template the response answers, see template_schema
+
+    Returns:
+        dict: The validated review
+
+    Raises:
+        ResponseParseError: If the response is unusable or invalid
+    """
+    return template_schema(template).validate(parse_json_response(text))
+
+
+def normalize_response(text: str) -> str:
+    """
+    Reduce a response to compact JSON when it contains any.
+
+    Responses without JSON, or whose JSON could only be recovered by
+    repairing a truncated value, are returned unchanged: callers store the
+    result in place of the response, and a repair drops whatever was cut.
+
+    Args:
+        text: Raw model output
+
+    Returns:
+        str: Compact JSON text, or the original text
+    """
+    try:
+        value, repaired = _parse(text)
+    except ResponseParseError as e:
+        logger.warning(f"Keeping unparsed response: {str(e)}")
+        return text
+    if repaired:
+        return text
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
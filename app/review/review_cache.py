@@ -0,0 +1,165 @@
+"""
+Persistent, content-addressed cache of individual file reviews.
+
+Reviews are keyed by the file's git blob SHA, a hash of the review prompt
+template and the model name, so an unchanged file reviewed with the same
+prompt and model never has to be sent to the LLM again.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+
+class ReviewCache:
+    """SQLite-backed review cache with size and age based eviction."""
+
+    def __init__(
+        self,
+        db_path: str = ".cache/review_cache.sqlite3",
+        max_entries: int = 50000,
+        max_age_seconds: float = 30 * 24 * 3600
+    ):
+        """
+        Initialize the review cache.
+
+        Args:
+            db_path: Path to the SQLite database file
+            max_entries: Maximum number of cached reviews kept; least recently
+                used entries are evicted first
+            max_age_seconds: Entries older than this are treated as misses
+                and evicted
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS file_reviews (
+                blob_sha TEXT NOT NULL,
+                prompt_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                review TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (blob_sha, prompt_hash, model)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_file_reviews_accessed ON file_reviews (accessed_at)"
+        )
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls) -> 'ReviewCache':
+        """
+        Create a cache configured from environment variables.
+
+        Returns:
+            ReviewCache: Cache using REVIEW_CACHE_PATH, REVIEW_CACHE_MAX_ENTRIES
+            and REVIEW_CACHE_MAX_AGE when set
+        """
+        return cls(
+            db_path=os.getenv('REVIEW_CACHE_PATH', ".cache/review_cache.sqlite3"),
+            max_entries=int(os.getenv('REVIEW_CACHE_MAX_ENTRIES', 50000)),
+            max_age_seconds=float(os.getenv('REVIEW_CACHE_MAX_AGE', 30 * 24 * 3600))
+        )
+
+    @staticmethod
+    def prompt_hash(prompt_template: str) -> str:
+        """
+        Hash a prompt template for use in cache keys.
+
+        Args:
+            prompt_template: Prompt text
+
+        Returns:
+            str: SHA-256 hex digest of the template
+        """
+        return hashlib.sha256(prompt_template.encode('utf-8')).hexdigest()
+
+    def get(self, blob_sha: str, prompt_hash: str, model: str) -> Optional[str]:
+        """
+        Look up a cached review.
+
+        Args:
+            blob_sha: Git blob SHA of the reviewed file
+            prompt_hash: Hash of the prompt template used
+            model: Model name
+
+        Returns:
+            Optional[str]: Cached review text, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT review, created_at FROM file_reviews "
+                "WHERE blob_sha = ? AND prompt_hash = ? AND model = ?",
+                (blob_sha, prompt_hash, model)
+            ).fetchone()
+
+            if row is None or now - row[1] > self.max_age_seconds:
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE file_reviews SET accessed_at = ? "
+                "WHERE blob_sha = ? AND prompt_hash = ? AND model = ?",
+                (now, blob_sha, prompt_hash, model)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, blob_sha: str, prompt_hash: str, model: str, review: str) -> None:
+        """
+        Store a review and evict entries beyond the configured limits.
+
+        Args:
+            blob_sha: Git blob SHA of the reviewed file
+            prompt_hash: Hash of the prompt template used
+            model: Model name
+            review: Review text returned by the model
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_reviews "
+                "(blob_sha, prompt_hash, model, review, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (blob_sha, prompt_hash, model, review, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then least recently used ones over the size limit."""
+        self._conn.execute(
+            "DELETE FROM file_reviews WHERE created_at < ?",
+            (now - self.max_age_seconds,)
+        )
+        self._conn.execute(
+            "DELETE FROM file_reviews WHERE rowid IN ("
+            "SELECT rowid FROM file_reviews ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM file_reviews").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,141 @@
+"""
+Module for merging many reviews by tree reduction.
+
+Sending every batch review of a large repository to the model in one merge
+prompt overflows the context window. Instead reviews are merged in groups
+of at most ``fan_in``, the groups of a level in parallel, and the merged
+results are merged again level by level until one review remains. The
+number of sequential merge calls grows with log(batches) / log(fan_in).
+"""
+import asyncio
+import logging
+import os
+from concurrent.futures import Executor
+from typing import Awaitable, Callable, List, Optional, Sequence, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Reviews merged by one call unless MERGE_FAN_IN says otherwise
+DEFAULT_FAN_IN = 8
+
+
+def merge_fan_in() -> int:
+    """
+    Get the configured merge fan-in.
+
+    Returns:
+        int: MERGE_FAN_IN if set, else DEFAULT_FAN_IN
+
+    Raises:
+        ValueError: If the configured fan-in is below 2
+    """
+    return check_fan_in(int(os.getenv('MERGE_FAN_IN', DEFAULT_FAN_IN)))
+
+
+def check_fan_in(fan_in: int) -> int:
+    """
+    Validate a merge fan-in.
+
+    Args:
+        fan_in: Reviews merged per call
+
+    Returns:
+        int: The fan-in
+
+    Raises:
+        ValueError: If the fan-in is below 2, which would never reduce
+    """
+    if fan_in < 2:
+        raise ValueError(f"Merge fan-in must be at least 2, got {fan_in}")
+    return fan_in
+
+
+def merge_groups(items: Sequence[T], fan_in: int) -> List[List[T]]:
+    """
+    Split one level of a tree reduction into merge groups.
+
+    Args:
+        items: Reviews on the current level
+        fan_in: Reviews merged per call
+
+    Returns:
+        List[List[T]]: Consecutive groups of at most fan_in reviews
+    """
+    return [list(items[start:start + fan_in]) for start in range(0, len(items), fan_in)]
+
+
+def _next_level(groups: List[List[T]], merged: List[T]) -> List[T]:
+    """Replace each merged group with its result; single reviews pass through unchanged."""
+    results = iter(merged)
+    return [next(results) if len(group) > 1 else group[0] for group in groups]
+
+
+async def tree_reduce(
+    items: Sequence[T],
+    merge: Callable[[List[T]], Awaitable[T]],
+    fan_in: int = DEFAULT_FAN_IN
+) -> T:
+    """
+    Merge reviews level by level, running each level's merges concurrently.
+
+    The final merge always goes through ``merge``, even for a single review,
+    so callers get one merged result in every case.
+
+    Args:
+        items: Reviews to merge
+        merge: Coroutine function merging a group of reviews into one
+        fan_in: Reviews merged per call
+
+    Returns:
+        T: The single merged review
+
+    Raises:
+        ValueError: If there are no reviews or the fan-in is below 2
+    """
+    check_fan_in(fan_in)
+    if not items:
+        raise ValueError("No reviews to merge")
+    level, depth = list(items), 1
+    while len(level) > fan_in:
+        groups = merge_groups(level, fan_in)
+        logger.info(f"Merge level {depth}: {len(level)} reviews in {len(groups)} groups")
+        merged = await asyncio.gather(*(merge(group) for group in groups if len(group) > 1))
+        level, depth = _next_level(groups, merged), depth + 1
+    return await merge(level)
+
+
+def tree_reduce_sync(
+    items: Sequence[T],
+    merge: Callable[[List[T]], T],
+    fan_in: int = DEFAULT_FAN_IN,
+    executor: Optional[Executor] = None
+) -> T:
+    """
+    Merge reviews level by level with a blocking merge function.
+
+    Args:
+        items: Reviews to merge
+        merge: Function merging a group of reviews into one
+        fan_in: Reviews merged per call
+        executor: Optional executor to run each level's merges in parallel;
+            merges run one after another without it
+
+    Returns:
+        T: The single merged review
+
+    Raises:
+        ValueError: If there are no reviews or the fan-in is below 2
+    """
+    check_fan_in(fan_in)
+    if not items:
+        raise ValueError("No reviews to merge")
+    run_level = executor.map if executor is not None else map
+    level, depth = list(items), 1
+    while len(level) > fan_in:
+        groups = merge_groups(level, fan_in)
+        logger.info(f"Merge level {depth}: {len(level)} reviews in {len(groups)} groups")
+        merged = list(run_level(merge, [group for group in groups if len(group) > 1]))
+        level, depth = _next_level(groups, merged), depth + 1
+    return merge(level)
@@ -0,0 +1,659 @@
+"""
+Durable review job queue and worker pool.
+
+Reviews are enqueued into a local SQLite database and executed by a pool of
+worker processes, each running several jobs concurrently on its own event
+loop. This keeps long LLM pipelines out of the API request path and spreads
+many repositories across cores. Job statuses follow
+``Repository.STATUS_TRANSITIONS``, extended with a terminal "Failed" status
+and the re-queueing of jobs whose worker stopped heartbeating. A job keeps
+the id of its review across attempts, so a re-queued job resumes the
+review's checkpoint instead of starting over. Workers report with each
+heartbeat how long their LLM calls are queued behind the rate limits, so the
+API can tell users how long a running review is held up.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.models.repository import Repository
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_DB_PATH = ".cache/review_jobs.sqlite3"
+
+# Longest time between a worker's heartbeats, and so between wait reports
+MAX_HEARTBEAT_INTERVAL = 30.0
+
+JOB_STATUS_TRANSITIONS = {
+    **Repository.STATUS_TRANSITIONS,
+    # A job may fail, or return to the queue if its worker disappears
+    "In Progress": Repository.STATUS_TRANSITIONS["In Progress"] + ["Failed", "Pending"],
+    "Failed": []
+}
+JOB_STATUSES = list(JOB_STATUS_TRANSITIONS)
+
+
+@dataclass
+class ReviewJob:
+    """A queued repository review."""
+    job_id: str
+    repo_url: str
+    status: str
+    model: Optional[str] = None
+    attempts: int = 0
+    worker_id: Optional[str] = None
+    review_id: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float = 0.0
+    updated_at: float = 0.0
+    owner_id: Optional[str] = None
+    # Seconds the job's LLM calls were queued behind the rate limits at the last heartbeat
+    rate_limit_wait: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert job to dictionary."""
+        return asdict(self)
+
+
+_JOB_COLUMNS = (
+    "job_id, repo_url, status, model, attempts, worker_id, review_id, error, created_at, updated_at, owner_id, "
+    "rate_limit_wait"
+)
+
+
+class ReviewJobQueue:
+    """SQLite-backed queue of review jobs, safe to share between processes."""
+
+    def __init__(
+        self,
+        db_path: str = DEFAULT_JOB_DB_PATH,
+        lease_seconds: float = 600.0,
+        max_attempts: int = 3
+    ):
+        """
+        Initialize the job queue.
+
+        Args:
+            db_path: Path to the SQLite database file
+            lease_seconds: How long a claimed job stays with its worker without
+                a heartbeat before it is re-queued
+            max_attempts: Claims allowed per job before an expired lease marks
+                it Failed instead of re-queueing it
+        """
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode; claims open their own write transaction
+        self._conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS review_jobs (
+                job_id TEXT PRIMARY KEY,
+                repo_url TEXT NOT NULL,
+                status TEXT NOT NULL,
+                model TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker_id TEXT,
+                review_id TEXT,
+                error TEXT,
+                lease_expires_at REAL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                owner_id TEXT,
+                rate_limit_wait REAL
+            )
+            """
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(review_jobs)")]
+        if "owner_id" not in columns:
+            # Queues created before jobs recorded who submitted them
+            self._conn.execute("ALTER TABLE review_jobs ADD COLUMN owner_id TEXT")
+        if "rate_limit_wait" not in columns:
+            # Queues created before workers reported rate-limit waits
+            self._conn.execute("ALTER TABLE review_jobs ADD COLUMN rate_limit_wait REAL")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_review_jobs_status ON review_jobs (status, created_at)"
+        )
+
+    @classmethod
+    def from_env(cls) -> 'ReviewJobQueue':
+        """
+        Create a queue configured from environment variables.
+
+        Returns:
+            ReviewJobQueue: Queue using REVIEW_JOB_DB_PATH, REVIEW_JOB_LEASE
+            and REVIEW_JOB_MAX_ATTEMPTS when set
+        """
+        return cls(
+            db_path=os.getenv('REVIEW_JOB_DB_PATH', DEFAULT_JOB_DB_PATH),
+            lease_seconds=float(os.getenv('REVIEW_JOB_LEASE', 600.0)),
+            max_attempts=int(os.getenv('REVIEW_JOB_MAX_ATTEMPTS', 3))
+        )
+
+    @staticmethod
+    def _check_transition(current: str, new: str) -> None:
+        if new not in JOB_STATUS_TRANSITIONS.get(current, []):
+            raise ValueError(f"Invalid status transition from {current} to {new}")
+
+    @staticmethod
+    def _row_to_job(row) -> ReviewJob:
+        return ReviewJob(*row)
+
+    def enqueue(self, repo_url: str, model: Optional[str] = None, owner_id: Optional[str] = None) -> ReviewJob:
+        """
+        Add a review job to the queue.
+
+        Args:
+            repo_url: GitHub repository URL to review
+            model: Optional model name; workers use their default when omitted
+            owner_id: Identifier of the user who submitted the review
+
+        Returns:
+            ReviewJob: The new pending job
+        """
+        now = time.time()
+        job = ReviewJob(
+            job_id=str(uuid.uuid4()), repo_url=repo_url, status="Pending",
+            model=model, created_at=now, updated_at=now, owner_id=owner_id
+        )
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO review_jobs (job_id, repo_url, status, model, attempts, created_at, updated_at, owner_id) "
+                "VALUES (?, ?, ?, ?, 0, ?, ?, ?)",
+                (job.job_id, repo_url, job.status, model, now, now, owner_id)
+            )
+        return job
+
+    def get(self, job_id: str) -> Optional[ReviewJob]:
+        """
+        Look up a job.
+
+        Args:
+            job_id: Job identifier
+
+        Returns:
+            Optional[ReviewJob]: The job, or None if unknown
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {_JOB_COLUMNS} FROM review_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list(self, status: Optional[str] = None) -> List[ReviewJob]:
+        """
+        List jobs in queue order.
+
+        Args:
+            status: Only return jobs with this status
+
+        Returns:
+            List[ReviewJob]: Matching jobs, oldest first
+        """
+        query = f"SELECT {_JOB_COLUMNS} FROM review_jobs"
+        params = ()
+        if status is not None:
+            query += " WHERE status = ?"
+            params = (status,)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY created_at, rowid", params).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def position(self, job_id: str) -> Optional[int]:
+        """
+        Number of pending jobs ahead of a pending job.
+
+        Args:
+            job_id: Job identifier
+
+        Returns:
+            Optional[int]: Queue position (0 is next), or None if not pending
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at, rowid FROM review_jobs WHERE job_id = ? AND status = 'Pending'",
+                (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM review_jobs WHERE status = 'Pending' "
+                "AND (created_at < ? OR (created_at = ? AND rowid < ?))",
+                (row[0], row[0], row[1])
+            ).fetchone()[0]
+
+    def claim(self, worker_id: str) -> Optional[ReviewJob]:
+        """
+        Atomically take the oldest pending job.
+
+        Jobs whose lease expired are first returned to the queue, or marked
+        Failed once they have used up max_attempts. The first claim assigns
+        the id the job's review is checkpointed under; later claims keep it.
+
+        Args:
+            worker_id: Identifier of the claiming worker
+
+        Returns:
+            Optional[ReviewJob]: The claimed job, or None if the queue is empty
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._expire_leases(now)
+                row = self._conn.execute(
+                    "SELECT job_id FROM review_jobs WHERE status = 'Pending' "
+                    "ORDER BY created_at, rowid LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._check_transition("Pending", "In Progress")
+                self._conn.execute(
+                    "UPDATE review_jobs SET status = 'In Progress', worker_id = ?, "
+                    "attempts = attempts + 1, review_id = COALESCE(review_id, ?), "
+                    "lease_expires_at = ?, updated_at = ? WHERE job_id = ?",
+                    (worker_id, str(uuid.uuid4()), now + self.lease_seconds, now, row[0])
+                )
+                job = self._row_to_job(self._conn.execute(
+                    f"SELECT {_JOB_COLUMNS} FROM review_jobs WHERE job_id = ?", row
+                ).fetchone())
+                self._conn.execute("COMMIT")
+                return job
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _expire_leases(self, now: float) -> None:
+        """Requeue or fail jobs held by workers that stopped heartbeating."""
+        expired = self._conn.execute(
+            "SELECT job_id, attempts, worker_id FROM review_jobs "
+            "WHERE status = 'In Progress' AND lease_expires_at < ?",
+            (now,)
+        ).fetchall()
+        for job_id, attempts, worker_id in expired:
+            new_status = "Failed" if attempts >= self.max_attempts else "Pending"
+            self._check_transition("In Progress", new_status)
+            logger.warning(f"Lease of job {job_id} held by {worker_id} expired; marking {new_status}")
+            self._conn.execute(
+                "UPDATE review_jobs SET status = ?, worker_id = NULL, lease_expires_at = NULL, "
+                "error = ?, updated_at = ? WHERE job_id = ?",
+                (new_status, f"Worker {worker_id} stopped responding", now, job_id)
+            )
+
+    def heartbeat(self, job_ids: List[str], worker_id: str, rate_limit_wait: Optional[float] = None) -> None:
+        """
+        Extend the leases of jobs a worker is still running.
+
+        Args:
+            job_ids: Jobs held by the worker
+            worker_id: Identifier of the worker
+            rate_limit_wait: Seconds the worker's LLM calls are currently
+                queued behind the rate limits, if known
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE review_jobs SET lease_expires_at = ?, rate_limit_wait = COALESCE(?, rate_limit_wait) "
+                "WHERE job_id = ? AND worker_id = ? AND status = 'In Progress'",
+                [(now + self.lease_seconds, rate_limit_wait, job_id, worker_id) for job_id in job_ids]
+            )
+
+    def _finish(
+        self, job_id: str, worker_id: str, new_status: str, review_id: Optional[str], error: Optional[str]
+    ) -> ReviewJob:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT status FROM review_jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                raise ValueError(f"Unknown job: {job_id}")
+            self._check_transition(row[0], new_status)
+            # A worker whose lease expired may race the worker that re-claimed the job
+            cursor = self._conn.execute(
+                "UPDATE review_jobs SET status = ?, review_id = COALESCE(?, review_id), error = ?, "
+                "lease_expires_at = NULL, "
+                "updated_at = ? WHERE job_id = ? AND status = 'In Progress' AND worker_id = ? "
+                "AND lease_expires_at >= ?",
+                (new_status, review_id, error, now, job_id, worker_id, now)
+            )
+            if cursor.rowcount == 0:
+                raise ValueError(f"Job {job_id} is no longer leased to {worker_id}")
+        return self.get(job_id)
+
+    def complete(self, job_id: str, review_id: str, worker_id: str) -> ReviewJob:
+        """
+        Mark a running job Completed.
+
+        Args:
+            job_id: Job identifier
+            review_id: Identifier of the saved review
+            worker_id: Identifier of the worker holding the job
+
+        Returns:
+            ReviewJob: The updated job
+
+        Raises:
+            ValueError: If the job is unknown, not In Progress, or its lease
+                expired or belongs to another worker
+        """
+        return self._finish(job_id, worker_id, "Completed", review_id, None)
+
+    def fail(self, job_id: str, error: str, worker_id: str) -> ReviewJob:
+        """
+        Mark a running job Failed.
+
+        Args:
+            job_id: Job identifier
+            error: Error description
+            worker_id: Identifier of the worker holding the job
+
+        Returns:
+            ReviewJob: The updated job
+
+        Raises:
+            ValueError: If the job is unknown, not In Progress, or its lease
+                expired or belongs to another worker
+        """
+        return self._finish(job_id, worker_id, "Failed", None, error)
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+JobRunner = Callable[[ReviewJob], Awaitable[str]]
+
+
+def llm_rate_limit_wait() -> float:
+    """
+    Seconds a new LLM call from this process would queue behind the rate limits.
+
+    Returns:
+        float: Wait on the busiest key of the shared LLM client
+    """
+    from app.models.llm_client import get_llm_client
+
+    return get_llm_client().rate_limiter.longest_wait()
+
+
+async def run_review_job(job: ReviewJob) -> str:
+    """
+    Run the four review stages for a job.
+
+    A job re-queued after its worker stopped resumes the review's checkpoint,
+    so stages and file reviews finished by the earlier attempt are kept.
+
+    Args:
+        job: Claimed review job
+
+    Returns:
+        str: Identifier of the saved review
+    """
+    # Imported here so the queue and API do not pull in the LLM pipeline
+    from app.main import run_review, resume, DEFAULT_MODEL
+    from app.review.checkpoint import CheckpointStore
+
+    checkpoints = CheckpointStore.from_env()
+    try:
+        checkpoint = checkpoints.load(job.review_id) if job.review_id else None
+        if checkpoint is not None and checkpoint.reached("completed"):
+            # The earlier attempt saved the review but stopped before reporting it
+            return job.review_id
+        if checkpoint is not None:
+            review = await resume(job.review_id, checkpoints=checkpoints)
+        else:
+            review = await run_review(
+                job.repo_url, job.model or DEFAULT_MODEL, review_id=job.review_id, checkpoints=checkpoints
+            )
+        return review.review_id
+    finally:
+        checkpoints.close()
+
+
+class ReviewWorker:
+    """Pulls jobs from the queue and runs several concurrently on one event loop."""
+
+    def __init__(
+        self,
+        queue: ReviewJobQueue,
+        runner: JobRunner = run_review_job,
+        worker_id: Optional[str] = None,
+        max_jobs: int = 2,
+        poll_interval: float = 1.0,
+        wait_estimate: Callable[[], float] = llm_rate_limit_wait
+    ):
+        """
+        Initialize the worker.
+
+        Args:
+            queue: Job queue to pull from
+            runner: Coroutine function running a job and returning its review id
+            worker_id: Identifier recorded on claimed jobs
+            max_jobs: Jobs run concurrently by this worker
+            poll_interval: Seconds to wait when the queue is empty
+            wait_estimate: Returns how long the worker's LLM calls are queued
+                behind the rate limits; reported with each heartbeat
+        """
+        self.queue = queue
+        self.runner = runner
+        self.worker_id = worker_id or f"worker-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.max_jobs = max_jobs
+        self.poll_interval = poll_interval
+        self.wait_estimate = wait_estimate
+
+    def _rate_limit_wait(self) -> Optional[float]:
+        try:
+            return self.wait_estimate()
+        except Exception as e:
+            logger.warning(f"Could not estimate the rate-limit wait: {e!r}")
+            return None
+
+    async def _run_job(self, job: ReviewJob) -> None:
+        logger.info(f"{self.worker_id} running job {job.job_id} for {job.repo_url}")
+        try:
+            try:
+                review_id = await self.runner(job)
+            except Exception as e:
+                logger.error(f"Job {job.job_id} failed: {str(e)}")
+                await asyncio.to_thread(self.queue.fail, job.job_id, str(e), self.worker_id)
+            else:
+                await asyncio.to_thread(self.queue.complete, job.job_id, review_id, self.worker_id)
+        except ValueError as e:
+            # The job was handed to another worker; its outcome is recorded there
+            logger.warning(f"Dropping result of job {job.job_id}: {str(e)}")
+
+    async def run(self, stop_event=None, exit_when_idle: bool = False) -> None:
+        """
+        Process jobs until stopped.
+
+        Args:
+            stop_event: threading or multiprocessing Event; running jobs are
+                allowed to finish once it is set
+            exit_when_idle: Return once the queue is empty and no jobs are running
+        """
+        running: Dict[str, asyncio.Task] = {}
+        heartbeat_interval = min(self.queue.lease_seconds / 3, MAX_HEARTBEAT_INTERVAL)
+        last_heartbeat = time.monotonic()
+        try:
+            while not (stop_event is not None and stop_event.is_set()):
+                claimed = False
+                while len(running) < self.max_jobs:
+                    job = await asyncio.to_thread(self.queue.claim, self.worker_id)
+                    if job is None:
+                        break
+                    claimed = True
+                    running[job.job_id] = asyncio.create_task(self._run_job(job))
+
+                if not running and not claimed and exit_when_idle:
+                    return
+
+                if running and time.monotonic() - last_heartbeat >= heartbeat_interval:
+                    await asyncio.to_thread(
+                        self.queue.heartbeat, list(running), self.worker_id, self._rate_limit_wait()
+                    )
+                    last_heartbeat = time.monotonic()
+
+                if running:
+                    await asyncio.wait(
+                        running.values(), timeout=self.poll_interval, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for job_id in [job_id for job_id, task in running.items() if task.done()]:
+                        running.pop(job_id)
+                else:
+                    await asyncio.sleep(self.poll_interval)
+        finally:
+            if running:
+                await asyncio.gather(*running.values(), return_exceptions=True)
+
+
+def _worker_process(db_path: str, lease_seconds: float, runner: JobRunner, max_jobs: int,
+                    poll_interval: float, stop_event, processes: int = 1) -> None:
+    """Entry point of a worker process."""
+    from app.models.llm_client import close_llm_client
+
+    # Every worker builds its own limiters for the same API keys, so each
+    # enforces its share of the configured budgets
+    os.environ.setdefault('LLM_BUDGET_SHARES', str(processes))
+
+    async def serve():
+        queue = ReviewJobQueue(db_path, lease_seconds=lease_seconds)
+        try:
+            await ReviewWorker(queue, runner, max_jobs=max_jobs, poll_interval=poll_interval).run(stop_event)
+        finally:
+            queue.close()
+            await close_llm_client()
+
+    asyncio.run(serve())
+
+
+class ReviewWorkerPool:
+    """Pool of worker processes serving one job queue."""
+
+    def __init__(
+        self,
+        db_path: str = DEFAULT_JOB_DB_PATH,
+        processes: Optional[int] = None,
+        jobs_per_worker: int = 2,
+        runner: JobRunner = run_review_job,
+        poll_interval: float = 1.0,
+        lease_seconds: float = 600.0
+    ):
+        """
+        Initialize the worker pool.
+
+        Args:
+            db_path: Path to the job queue database
+            processes: Number of worker processes; defaults to the CPU count.
+                The LLM rate and concurrency budgets are split between them
+            jobs_per_worker: Jobs run concurrently by each worker
+            runner: Picklable coroutine function running a job
+            poll_interval: Seconds an idle worker waits between claims
+            lease_seconds: Lease length used by the workers' queue connections
+        """
+        self.db_path = db_path
+        self.processes = processes or os.cpu_count() or 1
+        self.jobs_per_worker = jobs_per_worker
+        self.runner = runner
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self._context = multiprocessing.get_context("spawn")
+        self._stop_event = self._context.Event()
+        self._workers: List[multiprocessing.Process] = []
+
+    @classmethod
+    def from_env(cls) -> 'ReviewWorkerPool':
+        """
+        Create a pool configured from environment variables.
+
+        Returns:
+            ReviewWorkerPool: Pool using REVIEW_JOB_DB_PATH, REVIEW_WORKERS and
+            REVIEW_JOBS_PER_WORKER when set
+        """
+        workers = os.getenv('REVIEW_WORKERS')
+        return cls(
+            db_path=os.getenv('REVIEW_JOB_DB_PATH', DEFAULT_JOB_DB_PATH),
+            processes=int(workers) if workers else None,
+            jobs_per_worker=int(os.getenv('REVIEW_JOBS_PER_WORKER', 2)),
+            lease_seconds=float(os.getenv('REVIEW_JOB_LEASE', 600.0))
+        )
+
+    def start(self) -> None:
+        """Start the worker processes."""
+        self._stop_event.clear()
+        for _ in range(self.processes):
+            worker = self._context.Process(
+                target=_worker_process,
+                args=(self.db_path, self.lease_seconds, self.runner, self.jobs_per_worker,
+                      self.poll_interval, self._stop_event, self.processes),
+                daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+        logger.info(f"Started {self.processes} review workers")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the workers after their running jobs finish.
+
+        Args:
+            timeout: Seconds to wait for each worker before terminating it
+        """
+        self._stop_event.set()
+        for worker in self._workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+        self._workers = []
+
+    def join(self) -> None:
+        """Block until every worker process exits."""
+        for worker in self._workers:
+            worker.join()
+
+    def __enter__(self) -> 'ReviewWorkerPool':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+
+_shared_queue: Optional[ReviewJobQueue] = None
+
+
+def get_review_job_queue() -> ReviewJobQueue:
+    """
+    Get the process-wide job queue used by the API.
+
+    Returns:
+        ReviewJobQueue: Shared queue, created from the environment on first use
+    """
+    global _shared_queue
+    if _shared_queue is None:
+        _shared_queue = ReviewJobQueue.from_env()
+    return _shared_queue
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    pool = ReviewWorkerPool.from_env()
+    pool.start()
+    try:
+        pool.join()
+    except KeyboardInterrupt:
+        pool.stop()
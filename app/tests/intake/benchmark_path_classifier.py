@@ -0,0 +1,35 @@
+"""
+Micro-benchmark of the precompiled path classifier against the original rules.
+
+Not collected by pytest; run it directly:
+
+    python -m app.tests.intake.benchmark_path_classifier [path_count]
+"""
+import sys
+import time
+
+from app.intake.path_classifier import PathClassifier
+from app.tests.intake.test_path_classifier import legacy_classify, synthetic_tree
+
+
+def benchmark(count: int = 100000) -> None:
+    """Classify a synthetic tree of ``count`` paths with both implementations and report the timings."""
+    paths = synthetic_tree(count)
+    classifier = PathClassifier()
+
+    start = time.perf_counter()
+    for path in paths:
+        legacy_classify(path)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for path in paths:
+        classifier.classify(path)
+    classifier_time = time.perf_counter() - start
+
+    print(f"classified {len(paths)} paths: legacy {legacy_time:.3f}s, "
+          f"classifier {classifier_time:.3f}s ({legacy_time / classifier_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,96 @@
+"""
+Tests for token-aware batch planning.
+"""
+import pytest
+from app.intake.batch_planning import BatchPlanner
+from app.intake.code_extraction import CodeExtractor, ExtractedFile
+
+
+def make_file(path, content="x = 1\n", priority="Medium"):
+    return ExtractedFile(path=path, content=content, language="Python", size=len(content), priority=priority)
+
+
+def paths(batches):
+    return [[f.path for f in batch] for batch in batches]
+
+
+def test_small_files_share_a_batch():
+    """Many tiny files should be packed into one call instead of groups of ten."""
+    files = [make_file(f"config/c{i:02d}.py") for i in range(30)]
+    batches = BatchPlanner(token_budget=5000).plan(files)
+    assert len(batches) == 1
+    assert len(batches[0]) == 30
+
+
+def test_large_files_split_under_budget():
+    """No batch may exceed the token budget unless it holds a single file."""
+    planner = BatchPlanner(token_budget=3000)
+    files = [make_file(f"src/big{i}.py", "value = compute(x)\n" * 200) for i in range(6)]
+    batches = planner.plan(files)
+    assert len(batches) > 1
+    for batch in batches:
+        tokens = sum(planner.estimate_file_tokens(f.path, f.content) for f in batch)
+        assert tokens <= planner.token_budget or len(batch) == 1
+
+
+def test_oversized_file_gets_own_batch():
+    planner = BatchPlanner(token_budget=500)
+    files = [make_file("a/small.py"), make_file("a/huge.py", "token " * 5000), make_file("a/tiny.py")]
+    batches = planner.plan(files)
+    assert ["a/huge.py"] in paths(batches)
+    assert sum(len(b) for b in batches) == 3
+
+
+def test_priority_order_respected():
+    files = [
+        make_file("docs/guide.md", priority="Low"),
+        make_file("conf/settings.py", priority="Medium"),
+        make_file("src/core.py", priority="High"),
+        make_file("main.py", priority="Critical"),
+    ]
+    batches = BatchPlanner(token_budget=100000, max_files=2).plan(files)
+    assert paths(batches) == [["main.py", "src/core.py"], ["conf/settings.py", "docs/guide.md"]]
+
+
+def test_directories_kept_together():
+    """Files from one directory should not be scattered across batches when they fit."""
+    planner = BatchPlanner(token_budget=100000, max_files=4)
+    files = [make_file(p) for p in ["a/1.py", "b/1.py", "a/2.py", "b/2.py", "c/1.py", "a/3.py", "b/3.py"]]
+    batches = planner.plan(files)
+    for directory in ("a", "b"):
+        holding = [i for i, batch in enumerate(paths(batches)) if any(p.startswith(directory + "/") for p in batch)]
+        assert len(holding) == 1
+
+
+def test_plan_is_deterministic_across_input_order():
+    files = [make_file(f"pkg{i % 3}/m{i}.py", "y = 2\n" * (i + 1)) for i in range(20)]
+    planner = BatchPlanner(token_budget=200)
+    assert paths(planner.plan(files)) == paths(planner.plan(list(reversed(files))))
+
+
+def test_plan_with_describe():
+    reviews = [{'path': f"lib/m{i}.py", 'content': "z = 3", 'priority': "High"} for i in range(3)]
+    batches = BatchPlanner(token_budget=1000).plan(
+        reviews, describe=lambda r: (r['path'], r['content'], r['priority'])
+    )
+    assert batches == [reviews]
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv('BATCH_TOKEN_BUDGET', '1234')
+    monkeypatch.setenv('BATCH_MAX_FILES', '7')
+    planner = BatchPlanner.from_env()
+    assert planner.token_budget == 1234
+    assert planner.max_files == 7
+
+
+def test_invalid_budget():
+    with pytest.raises(ValueError):
+        BatchPlanner(token_budget=0)
+
+
+def test_form_review_batches_with_token_budget():
+    files = [make_file(f"config/c{i:02d}.py") for i in range(12)] + [make_file("main.py", priority="Critical")]
+    batches = CodeExtractor().form_review_batches(files, token_budget=5000)
+    assert len(batches) == 1
+    assert batches[0][0].path == "main.py"
@@ -1,18 +1,43 @@
 """
 Tests for enhanced code extraction functionality with streaming and concurrent processing.
 """
+import io
 import os
 import pytest
+import tarfile
 import tempfile
 import zipfile
 from unittest.mock import patch, Mock
 from pathlib import Path
 import logging
-from app.intake.code_extraction import CodeExtractor, ExtractedFile
+from app.intake.code_extraction import CodeExtractor, ExtractedFile, git_blob_sha
+from app.intake.input_validation import InputValidator, ValidationError
 
 # Set up logging for tests
 logging.basicConfig(level=logging.INFO)
 
+@pytest.fixture
+def repo_tarball(tmp_path):
+    """Create a GitHub-style repository tarball fixture."""
+    members = {
+        "main.py": b"print('entry')\n",
+        "src/utils.py": b"def helper():\n    return 1\n",
+        "config.json": b'{"debug": false}\n',
+        "README.md": b"# Readme\n",
+        "tests/test_main.py": b"def test_x(): pass\n",
+        "assets/logo.png": b"\x89PNG",
+    }
+    archive_path = tmp_path / "repo.tar.gz"
+    with tarfile.open(archive_path, "w:gz") as archive:
+        root = tarfile.TarInfo("owner-repo-abc123")
+        root.type = tarfile.DIRTYPE
+        archive.addfile(root)
+        for name, data in members.items():
+            info = tarfile.TarInfo(f"owner-repo-abc123/{name}")
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return archive_path
+
 class TestEnhancedCodeExtraction:
     @patch('requests.get')
     def test_stream_github_files(self, mock_get):
@@ -169,3 +194,122 @@ class TestEnhancedCodeExtraction:
         assert len(streamed_files) == 20
         for file in streamed_files:
             assert isinstance(file, ExtractedFile)
+
+class TestArchiveExtraction:
+    def test_stream_tar_files(self, repo_tarball):
+        """Test reviewable files are streamed from a tarball with skip rules applied."""
+        extractor = CodeExtractor()
+        with open(repo_tarball, "rb") as f:
+            files = {file.path: file for file in extractor.stream_tar_files(f, "owner", "repo")}
+
+        assert set(files) == {"main.py", "src/utils.py", "config.json"}
+        assert files["main.py"].priority == "Critical"
+        assert files["src/utils.py"].priority == "High"
+        assert files["src/utils.py"].language == "Python"
+        assert files["src/utils.py"].content == "def helper():\n    return 1\n"
+        assert files["src/utils.py"].sha == git_blob_sha(b"def helper():\n    return 1\n")
+        assert files["config.json"].repository_hierarchy == {
+            'owner': 'owner', 'repo': 'repo', 'branch': 'main', 'full_path': 'config.json'
+        }
+
+    def test_stream_tar_files_restricted_paths(self, repo_tarball):
+        """Test extraction can be restricted to a set of paths."""
+        extractor = CodeExtractor()
+        with open(repo_tarball, "rb") as f:
+            files = list(extractor.stream_tar_files(f, "owner", "repo", paths={"src/utils.py"}))
+
+        assert [file.path for file in files] == ["src/utils.py"]
+
+    @patch('requests.get')
+    def test_stream_github_files_uses_single_archive_request(self, mock_get, repo_tarball):
+        """Test archive mode downloads the repository with one request."""
+        with open(repo_tarball, "rb") as f:
+            response = Mock()
+            response.raw = f
+            response.raise_for_status = lambda: None
+            mock_get.return_value = response
+
+            extractor = CodeExtractor(use_archive=True)
+            files = list(extractor.stream_github_files("https://github.com/owner/repo"))
+
+        assert len(files) == 3
+        mock_get.assert_called_once()
+        assert mock_get.call_args[0][0] == "https://api.github.com/repos/owner/repo/tarball/main"
+        assert mock_get.call_args[1]["stream"] is True
+        response.close.assert_called_once()
+
+@pytest.fixture
+def upload_zip(tmp_path):
+    """Create a ZIP upload fixture."""
+    zip_path = tmp_path / "upload.zip"
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("project/", "")
+        zf.writestr("project/app.py", "print('app')\n")
+        zf.writestr("project/lib/helpers.js", "export const x = 1;\n")
+        zf.writestr("project/tests/test_app.py", "def test(): pass\n")
+        zf.writestr("project/LICENSE.md", "MIT\n")
+        for i in range(20):
+            zf.writestr(f"project/src/module{i}.py", f"VALUE = {i}\n" * 50)
+    return zip_path
+
+class TestZipExtraction:
+    def test_stream_zip_files(self, upload_zip):
+        """Test reviewable files are streamed from a ZIP with shared skip and priority rules."""
+        extractor = CodeExtractor(max_workers=3)
+        files = list(extractor.stream_zip_files(str(upload_zip)))
+        paths = [file.path for file in files]
+
+        assert paths[:2] == ["project/app.py", "project/lib/helpers.js"]
+        assert len(files) == 22
+        by_path = {file.path: file for file in files}
+        assert by_path["project/app.py"].priority == "Critical"
+        assert by_path["project/lib/helpers.js"].language == "JavaScript"
+        assert by_path["project/src/module3.py"].content == "VALUE = 3\n" * 50
+        assert by_path["project/app.py"].sha == git_blob_sha(b"print('app')\n")
+        assert by_path["project/app.py"].repository_hierarchy == {
+            'archive': 'upload.zip', 'full_path': 'project/app.py'
+        }
+
+    def test_stream_zip_files_decompresses_lazily(self, upload_zip):
+        """Test only a bounded window of members is decompressed ahead of the consumer."""
+        extractor = CodeExtractor(max_workers=1)
+        original = extractor._read_zip_member
+        calls = []
+
+        def counting_read(*args):
+            calls.append(args[1].filename)
+            return original(*args)
+
+        with patch.object(extractor, '_read_zip_member', side_effect=counting_read):
+            stream = extractor.stream_zip_files(str(upload_zip))
+            next(stream)
+            assert len(calls) <= 2
+            remaining = list(stream)
+
+        assert len(remaining) == 21
+        assert len(calls) == 22
+
+    def test_stream_zip_files_with_validation(self, upload_zip):
+        """Test validation limits are enforced in the same pass as extraction."""
+        extractor = CodeExtractor()
+        files = list(extractor.stream_zip_files(str(upload_zip), validator=InputValidator("free")))
+        assert len(files) == 22
+
+        strict = InputValidator("free")
+        strict.max_files = 10
+        with pytest.raises(ValidationError, match="too many files"):
+            list(extractor.stream_zip_files(str(upload_zip), validator=strict))
+
+    def test_stream_zip_files_aborts_on_oversized_member(self, tmp_path):
+        """Test decompressed bytes are checked even if headers were trusted."""
+        zip_path = tmp_path / "big.zip"
+        with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("a.py", "x = 1\n")
+            zf.writestr("b.py", "y = 2\n" * 1000)
+
+        validator = InputValidator("free")
+        validator.MAX_FILE_SIZE = 1024
+        validator.MAX_COMPRESSION_RATIO = 10 ** 6
+        with patch.object(validator, 'check_zip_entries', side_effect=lambda infos: infos):
+            with pytest.raises(ValidationError, match="exceeds size limit"):
+                list(CodeExtractor().stream_zip_files(str(zip_path), validator=validator))
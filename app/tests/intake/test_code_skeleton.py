@@ -0,0 +1,170 @@
+"""
+Tests for structural code skeletons.
+"""
+import asyncio
+
+from app.intake import code_skeleton
+from app.intake.code_skeleton import SkeletonExtractor, extract_skeleton
+
+PYTHON_SOURCE = '''"""Order processing."""
+import json
+from typing import List
+
+RATES = {
+    "standard": 1.0,
+    "express": 2.5,
+    "overnight": 4.0,
+    "freight": 0.5,
+}
+
+
+@dataclass(frozen=True)
+class Order:
+    """An order.
+
+    Longer description that is dropped.
+    """
+    id: str
+
+    @property
+    def key(self) -> str:
+        return self.id
+
+    def total(self, items: List[dict]) -> float:
+        """Sum the order."""
+        subtotal = 0.0
+        for item in items:
+            subtotal += item["price"] * item["qty"]
+        return subtotal * RATES["standard"]
+
+
+async def load(path: str) -> Order:
+    with open(path) as f:
+        data = json.load(f)
+    order = Order(**data)
+    return order
+'''
+
+SCRIPT_SOURCE = '''import { api } from "./api";
+const BRACES = "{{{";
+const pattern = /[{}]+/g;
+
+export class Client extends Base {
+  constructor(url) {
+    super(url);
+    this.url = url;
+    this.label = `${url} {`;
+    this.ready = false;
+  }
+  get host() { return this.url; }
+}
+
+export async function fetchAll(ids) {
+  const results = [];
+  for (const id of ids) {
+    results.push(await api.get(id));
+  }
+  return results;
+}
+
+export interface Options {
+  retries: number;
+  timeout: number;
+  verbose: boolean;
+  label: string;
+}
+'''
+
+
+class TestPythonSkeleton:
+    def test_structure_is_kept_and_long_bodies_elided(self):
+        skeleton = extract_skeleton(PYTHON_SOURCE, "Python")
+        assert skeleton.splitlines() == [
+            '"""Order processing."""',
+            'import json',
+            'from typing import List',
+            'RATES = ...',
+            '@dataclass(frozen=True)',
+            'class Order:',
+            '    """An order."""',
+            '    id: str',
+            '    @property',
+            '    def key(self) -> str:',
+            '        return self.id',
+            '    def total(self, items: List[dict]) -> float:',
+            '        """Sum the order."""',
+            '        ...',
+            'async def load(path: str) -> Order:',
+            '    ...',
+        ]
+
+    def test_threshold(self):
+        skeleton = extract_skeleton(PYTHON_SOURCE, "Python", max_body_lines=10)
+        assert "subtotal += item" in skeleton
+
+    def test_syntax_error(self):
+        assert extract_skeleton("def broken(:\n", "Python") is None
+
+
+class TestScriptSkeleton:
+    def test_braces_in_strings_and_regexes_are_ignored(self):
+        skeleton = extract_skeleton(SCRIPT_SOURCE, "TypeScript")
+        assert "constructor(url) { ... }" in skeleton
+        assert "get host() { return this.url; }" in skeleton
+        assert "export async function fetchAll(ids) { ... }" in skeleton
+        assert "results.push" not in skeleton
+        # Class and interface bodies are declarations and stay
+        assert "  verbose: boolean;" in skeleton
+        assert skeleton.startswith('import { api } from "./api";\nconst BRACES = "{{{";')
+
+    def test_unsupported_language(self):
+        assert extract_skeleton("fn main() {}", "Rust") is None
+
+
+class TestSkeletonExtractor:
+    async def test_prefetch_in_process_pool(self, monkeypatch):
+        extractor = SkeletonExtractor(max_workers=2)
+        files = [(PYTHON_SOURCE.replace("Order", f"Order{i}"), "Python") for i in range(40)]
+        try:
+            await extractor.prefetch(files + [("x = 1", "YAML")])
+        finally:
+            extractor.close()
+
+        def fail(*args, **kwargs):
+            raise AssertionError("skeleton extracted again")
+
+        monkeypatch.setattr(code_skeleton, "extract_skeleton", fail)
+        assert "class Order39:" in extractor.get(*files[39])
+        assert extractor.get("x = 1", "YAML") is None
+
+    def test_clear_forgets_skeletons(self, monkeypatch):
+        extractor = SkeletonExtractor()
+        assert "class Order:" in extractor.get(PYTHON_SOURCE, "Python")
+        extractor.clear()
+
+        calls = []
+        monkeypatch.setattr(code_skeleton, "extract_skeleton", lambda *args: calls.append(args))
+        extractor.get(PYTHON_SOURCE, "Python")
+        assert len(calls) == 1
+
+    async def test_runs_keep_separate_memos(self, monkeypatch):
+        extractor = SkeletonExtractor()
+        calls = []
+        monkeypatch.setattr(code_skeleton, "extract_skeleton", lambda *args: calls.append(args) or "skeleton")
+
+        async def run():
+            extractor.start_run()
+            extractor.get(PYTHON_SOURCE, "Python")
+            extractor.get(PYTHON_SOURCE, "Python")
+            await asyncio.sleep(0)
+            extractor.clear()
+
+        await asyncio.gather(run(), run())
+        # Each run extracted the file once, and neither saw the other's memo
+        assert len(calls) == 2
+
+    def test_from_env(self, monkeypatch):
+        monkeypatch.setenv("SKELETON_WORKERS", "3")
+        monkeypatch.setenv("SKELETON_MAX_BODY_LINES", "5")
+        extractor = SkeletonExtractor.from_env()
+        assert (extractor.max_workers, extractor.max_body_lines) == (3, 5)
@@ -0,0 +1,99 @@
+"""
+Tests for duplicate and near-duplicate file detection.
+"""
+import pytest
+
+from app.intake.code_extraction import ExtractedFile
+from app.intake.duplicate_detection import DuplicateDetector, estimate_similarity, minhash_signature
+
+CLIENT = "\n".join(
+    f"def get_resource_{i}(session, resource_id, params=None):\n"
+    f"    response = session.get(f'/api/v1/resource_{i}/{{resource_id}}', params=params or {{}})\n"
+    f"    response.raise_for_status()\n"
+    f"    return response.json()['data']\n"
+    for i in range(20)
+)
+
+OTHER = "\n".join(
+    f"class Handler{i}:\n"
+    f"    def handle(self, event):\n"
+    f"        if event.kind == 'create_{i}':\n"
+    f"            return self.store.insert(event.payload)\n"
+    f"        raise UnknownEvent(event.kind)\n"
+    for i in range(20)
+)
+
+
+def make_file(path, content, language="Python"):
+    return ExtractedFile(path=path, content=content, language=language, size=len(content))
+
+
+class TestSignatures:
+    def test_reformatting_keeps_similarity(self):
+        reformatted = CLIENT.replace("    ", "  ").replace(", ", ",")
+        assert estimate_similarity(minhash_signature(CLIENT), minhash_signature(reformatted)) == 1.0
+
+    def test_small_edit_is_near_and_other_code_is_far(self):
+        edited = CLIENT.replace("resource_7", "resource_seven")
+        assert estimate_similarity(minhash_signature(CLIENT), minhash_signature(edited)) >= 0.9
+        assert estimate_similarity(minhash_signature(CLIENT), minhash_signature(OTHER)) < 0.2
+
+    def test_tiny_files_have_no_signature(self):
+        assert minhash_signature("x = 1\n") is None
+
+    def test_signature_is_stable(self):
+        assert minhash_signature(CLIENT) == minhash_signature(CLIENT)
+
+
+class TestDuplicateDetector:
+    def test_exact_and_near_duplicates(self):
+        detector = DuplicateDetector()
+        files = [
+            make_file("api/client.py", CLIENT),
+            make_file("vendor/api/client.py", CLIENT),
+            make_file("legacy/client.py", CLIENT.replace("resource_7", "resource_seven")),
+            make_file("handlers.py", OTHER),
+        ]
+        representatives, duplicates = detector.partition(files)
+
+        assert [file.path for file in representatives] == ["api/client.py", "handlers.py"]
+        matches = {file.path: match for file, match in duplicates["api/client.py"]}
+        assert matches["vendor/api/client.py"].exact
+        assert matches["vendor/api/client.py"].similarity == 1.0
+        assert not matches["legacy/client.py"].exact
+        assert matches["legacy/client.py"].similarity >= 0.9
+        assert (detector.exact_duplicates, detector.near_duplicates) == (1, 1)
+
+    def test_copy_of_near_duplicate_points_at_representative(self):
+        detector = DuplicateDetector()
+        edited = CLIENT.replace("resource_7", "resource_seven")
+        assert detector.match(make_file("a.py", CLIENT)) is None
+        assert detector.match(make_file("b.py", edited)).original == "a.py"
+        assert detector.match(make_file("c.py", edited)).original == "a.py"
+
+    def test_languages_are_kept_apart(self):
+        detector = DuplicateDetector()
+        assert detector.match(make_file("a.py", CLIENT)) is None
+        assert detector.match(make_file("a.rb", CLIENT, language="Ruby")) is None
+
+    def test_exact_mode_ignores_near_duplicates(self):
+        detector = DuplicateDetector(mode='exact')
+        assert detector.match(make_file("a.py", CLIENT)) is None
+        assert detector.match(make_file("b.py", CLIENT.replace("resource_7", "resource_seven"))) is None
+        assert detector.match(make_file("c.py", CLIENT)).exact
+
+    def test_off_reviews_everything(self):
+        detector = DuplicateDetector(mode='off')
+        assert detector.match(make_file("a.py", CLIENT)) is None
+        assert detector.match(make_file("b.py", CLIENT)) is None
+
+    def test_from_env(self, monkeypatch):
+        monkeypatch.setenv('DEDUP_MODE', 'EXACT')
+        monkeypatch.setenv('DEDUP_SIMILARITY', '0.8')
+        detector = DuplicateDetector.from_env()
+        assert (detector.mode, detector.threshold) == ('exact', 0.8)
+
+    @pytest.mark.parametrize("kwargs", [{'mode': 'fuzzy'}, {'threshold': 0}, {'bands': 3}])
+    def test_invalid_configuration(self, kwargs):
+        with pytest.raises(ValueError):
+            DuplicateDetector(**kwargs)
@@ -120,3 +120,52 @@ class TestInputValidator:
             with pytest.raises(ValidationError) as exc_info:
                 self.free_validator.validate_input(invalid_input)
             assert 'invalid input' in str(exc_info.value).lower()
+    
+    def test_zip_bomb_rejected_from_headers(self):
+        """Test highly compressed members are rejected without decompression"""
+        with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as tf:
+            with zipfile.ZipFile(tf.name, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+                zf.writestr('bomb.py', '0' * (4 * 1024 * 1024))
+            
+            try:
+                with pytest.raises(ValidationError) as exc_info:
+                    self.free_validator.validate_input(tf.name)
+                assert exc_info.value.error_type == 'zip_bomb'
+            finally:
+                os.unlink(tf.name)
+    
+    def test_small_repetitive_file_accepted(self):
+        """Test the compression ratio is not applied to small members"""
+        with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as tf:
+            with zipfile.ZipFile(tf.name, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+                zf.writestr('table.py', 'x = 0\n' * (128 * 1024))
+            
+            try:
+                assert self.free_validator.validate_input(tf.name)['is_valid']
+            finally:
+                os.unlink(tf.name)
+    
+    def test_read_zip_member_detects_corruption(self):
+        """Test CRC errors are reported while a member is streamed"""
+        with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as tf:
+            with zipfile.ZipFile(tf.name, 'w') as zf:
+                zf.writestr('app.py', 'print("hello world")\n')
+            with open(tf.name, 'r+b') as f:
+                data = f.read()
+                offset = data.index(b'hello')
+                f.seek(offset)
+                f.write(b'HELLO')
+            
+            try:
+                # Headers are intact, so only the CRC check catches this
+                with zipfile.ZipFile(tf.name) as zf:
+                    assert self.free_validator.check_zip_entries(zf.infolist())
+                with pytest.raises(ValidationError) as exc_info:
+                    self.free_validator.validate_input(tf.name)
+                assert exc_info.value.error_type == 'corrupt_zip'
+                with zipfile.ZipFile(tf.name) as zf:
+                    with pytest.raises(ValidationError) as exc_info:
+                        self.free_validator.read_zip_member(zf, zf.getinfo('app.py'))
+                assert exc_info.value.error_type == 'corrupt_zip'
+            finally:
+                os.unlink(tf.name)
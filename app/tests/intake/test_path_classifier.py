@@ -0,0 +1,90 @@
+"""
+Tests for the precompiled path classifier.
+
+The timing comparison with the original rules lives in
+benchmark_path_classifier.py, outside the unit suite.
+"""
+import re
+import random
+from pathlib import Path
+import pytest
+from app.intake.path_classifier import (
+    PathClassifier, DEFAULT_CRITICAL_NAMES, DEFAULT_SKIP_PATTERNS, detect_language
+)
+from app.intake.code_extraction import CodeExtractor, ExtractedFile
+
+LEGACY_SKIP_REGEX = re.compile('|'.join(set(DEFAULT_SKIP_PATTERNS)))
+LEGACY_EXTENSIONS = {
+    '.py': 'Python', '.js': 'JavaScript', '.ts': 'TypeScript', '.java': 'Java',
+    '.md': 'Markdown', '.json': 'JSON', '.yml': 'YAML', '.txt': 'Unknown',
+}
+
+
+def legacy_classify(file_path):
+    """Reference implementation of the original Path-based rules."""
+    name = Path(file_path).name
+    language = LEGACY_EXTENSIONS.get(Path(file_path).suffix.lower(), 'Unknown')
+    if name in DEFAULT_CRITICAL_NAMES:
+        return False, 'Critical', language
+    lower = name.lower()
+    if LEGACY_SKIP_REGEX.search(file_path) or any(
+        i in lower for i in ['test_', '_test', 'spec_', '_spec']
+    ):
+        return True, 'Skip', language
+    path_lower = file_path.lower()
+    if lower.startswith('test_') or lower.endswith('_test.py'):
+        return False, 'Low', language
+    if any(path_lower.startswith(d) for d in {'src/', 'lib/', 'core/'}):
+        return False, 'High', language
+    if path_lower.endswith(('.md', '.txt')):
+        return False, 'Low', language
+    return False, 'Medium', language
+
+
+def synthetic_tree(count, seed=7):
+    """Build a synthetic monorepo tree of the given size."""
+    rng = random.Random(seed)
+    dirs = ['src', 'lib', 'core', 'app/api', 'tests', 'test/fixtures', 'node_modules/pkg',
+            'docs', 'build', 'packages/web/src', 'services/auth', '.vscode', 'contest']
+    names = ['main.py', 'index.js', 'utils', 'README', 'config', 'handler_test', 'test_models',
+             'view_spec', 'server.py', 'schema', 'LICENSE', 'data.', '.env.local', 'setup']
+    exts = ['.py', '.js', '.ts', '.java', '.md', '.json', '.yml', '.txt', '']
+    paths = []
+    for i in range(count):
+        name = rng.choice(names)
+        if '.' not in name[1:-1] and not name.endswith('.'):
+            name = f"{name}{i % 97}{rng.choice(exts)}"
+        depth = rng.randint(0, 2)
+        parts = [rng.choice(dirs) for _ in range(depth)] + [name]
+        paths.append('/'.join(parts))
+    return paths
+
+
+class TestPathClassifier:
+    def test_matches_legacy_rules(self):
+        """The classifier must agree with the original rules on every path."""
+        classifier = PathClassifier()
+        for path in synthetic_tree(20000):
+            result = classifier.classify(path)
+            assert (result.skip, result.priority, result.language) == legacy_classify(path), path
+
+    def test_known_paths(self):
+        """Spot-check skip, priority and language classification."""
+        classifier = PathClassifier()
+        assert classifier.classify("tests/main.py").priority == 'Critical'
+        assert classifier.classify("tests/helpers.py").skip
+        assert classifier.classify("src/app/models.py").priority == 'High'
+        assert classifier.classify("docs/guide.md").priority == 'Low'
+        assert classifier.classify("config/settings.yml").priority == 'Medium'
+        assert classifier.classify("web/App.TS").language == 'TypeScript'
+        assert detect_language("Makefile") == 'Unknown'
+        assert ExtractedFile.detect_language("lib/x.rs") == 'Rust'
+
+    def test_extractor_uses_shared_classifier(self):
+        """CodeExtractor helpers delegate to one classification."""
+        extractor = CodeExtractor()
+        assert extractor.determine_priority("main.py") == 'Critical'
+        assert extractor.should_skip_file("node_modules/x/index2.js")
+        assert not extractor.should_skip_file("index.js")
+        assert extractor.is_reviewable("src/utils.py")
+        assert not extractor.is_reviewable("src/image.png")
@@ -0,0 +1,152 @@
+"""
+Tests for the adaptive concurrency limiter.
+"""
+import asyncio
+import time
+import pytest
+from unittest.mock import patch
+
+from app.models.concurrency import AdaptiveConcurrencyLimiter, parse_retry_after
+
+
+async def run_calls(limiter, count, duration=0.01):
+    """Run count calls through the limiter and return the peak concurrency seen."""
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        async with limiter.slot():
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(duration)
+
+    await asyncio.gather(*(call() for _ in range(count)))
+    return peak
+
+
+class TestAdaptiveConcurrencyLimiter:
+    async def test_never_exceeds_limit(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=3, max_limit=3)
+        peak = await run_calls(limiter, 20)
+        assert peak == 3
+        assert limiter.in_flight == 0
+
+    async def test_additive_increase_while_latency_flat(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=50)
+        await run_calls(limiter, 60)
+        assert limiter.limit > 2
+        assert limiter.stats.increases == limiter.limit - 2
+        assert limiter.stats.decreases == 0
+
+    async def test_increase_capped_at_max(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=4)
+        await run_calls(limiter, 100, duration=0)
+        assert limiter.limit == 4
+
+    async def test_multiplicative_decrease_on_overload(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=16, max_limit=16)
+        async with limiter.slot() as permit:
+            permit.throttled()
+        assert limiter.limit == 8
+        assert limiter.stats.throttled == 1
+        assert limiter.stats.decreases == 1
+
+    async def test_one_decrease_per_congestion_event(self):
+        """Calls in flight together that all get 429 should back off only once."""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=16, max_limit=16)
+        starts = [await limiter.acquire() for _ in range(8)]
+        for started in starts:
+            limiter.release(started, overloaded=True)
+        assert limiter.limit == 8
+        assert limiter.stats.throttled == 8
+
+    async def test_min_limit_respected(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, min_limit=2, max_limit=4)
+        async with limiter.slot() as permit:
+            permit.throttled()
+        assert limiter.limit == 2
+
+    async def test_decrease_on_rising_latency(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=10, max_limit=10, smoothing=1.0)
+        for _ in range(3):
+            limiter.release(await limiter.acquire(), latency=0.1)
+        limiter.release(await limiter.acquire(), latency=1.0)
+        assert limiter.limit == 5
+
+    async def test_latency_baselines_are_kept_per_kind_of_call(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=10, max_limit=10, smoothing=1.0)
+        for _ in range(3):
+            limiter.release(await limiter.acquire(), latency=0.1, key="model/initial_reviews")
+        # A slower stage is not congestion of the faster one
+        limiter.release(await limiter.acquire(), latency=1.0, key="model/final_review")
+        assert limiter.limit == 10
+        limiter.release(await limiter.acquire(), latency=1.0, key="model/initial_reviews")
+        assert limiter.limit == 5
+
+    async def test_latency_ends_at_response_headers(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=4)
+        with patch.object(limiter, "release", wraps=limiter.release) as release:
+            async with limiter.slot("model") as permit:
+                permit.responded()
+                # Time spent generating after the headers arrived is not latency
+                await asyncio.sleep(0.1)
+        assert release.call_args.kwargs["latency"] < 0.05
+        assert release.call_args.kwargs["key"] == "model"
+
+    async def test_retry_after_pauses_new_calls(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=4)
+        async with limiter.slot() as permit:
+            permit.throttled(retry_after=0.2)
+        start = time.monotonic()
+        async with limiter.slot():
+            pass
+        assert time.monotonic() - start >= 0.15
+
+    async def test_errors_release_without_adjusting(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=4)
+        with pytest.raises(RuntimeError):
+            async with limiter.slot():
+                raise RuntimeError("boom")
+        assert limiter.in_flight == 0
+        assert limiter.limit == 4
+
+    async def test_cancelled_waiter_does_not_leak(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=1)
+        held = await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release(held)
+        started = await asyncio.wait_for(limiter.acquire(), 1)
+        limiter.release(started)
+        assert limiter.in_flight == 0
+
+    def test_invalid_limits(self):
+        with pytest.raises(ValueError):
+            AdaptiveConcurrencyLimiter(initial_limit=0)
+        with pytest.raises(ValueError):
+            AdaptiveConcurrencyLimiter(initial_limit=5, max_limit=4)
+        with pytest.raises(ValueError):
+            AdaptiveConcurrencyLimiter(backoff_factor=1.5)
+
+    def test_from_env(self, monkeypatch):
+        monkeypatch.setenv("LLM_CONCURRENCY_INITIAL", "6")
+        monkeypatch.setenv("LLM_CONCURRENCY_MAX", "12")
+        limiter = AdaptiveConcurrencyLimiter.from_env()
+        assert limiter.limit == 6
+        assert limiter.max_limit == 12
+
+    def test_from_env_split_between_processes(self, monkeypatch):
+        monkeypatch.setenv("LLM_CONCURRENCY_INITIAL", "6")
+        monkeypatch.setenv("LLM_CONCURRENCY_MAX", "12")
+        limiter = AdaptiveConcurrencyLimiter.from_env(shares=4)
+        assert (limiter.limit, limiter.max_limit) == (1, 3)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("0.5") == 0.5
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
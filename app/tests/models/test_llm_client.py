@@ -0,0 +1,409 @@
+"""
+Tests for the shared pooled LLM client.
+"""
+import asyncio
+import contextlib
+import json
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.models.concurrency import AdaptiveConcurrencyLimiter
+from app.models.llm_client import LLMClient, LLMOverloadedError, LLMResponseError, TokenUsage, get_llm_client
+
+
+@contextlib.asynccontextmanager
+async def messages_server():
+    """Local stand-in for the Messages API."""
+    async def handle(request):
+        body = await request.json()
+        return web.json_response({
+            "content": [{"type": "text", "text": f"reviewed by {body['model']}"}],
+            "usage": {"input_tokens": 12, "output_tokens": 40}
+        })
+
+    app = web.Application()
+    app.router.add_post("/v1/messages", handle)
+    server = TestServer(app)
+    await server.start_server()
+    yield server
+    await server.close()
+
+
+@contextlib.asynccontextmanager
+async def overloaded_server(failures, status=429):
+    """Stand-in that rejects the first ``failures`` requests for overload."""
+    calls = []
+
+    async def handle(request):
+        calls.append(request)
+        if len(calls) <= failures:
+            return web.json_response({"error": "overloaded"}, status=status, headers={"retry-after": "0.05"})
+        return web.json_response({"content": [{"type": "text", "text": "ok"}]})
+
+    app = web.Application()
+    app.router.add_post("/v1/messages", handle)
+    server = TestServer(app)
+    await server.start_server()
+    yield server, calls
+    await server.close()
+
+
+@contextlib.asynccontextmanager
+async def caching_server():
+    """Stand-in that reports a cache write on the first call and reads after."""
+    bodies = []
+
+    async def handle(request):
+        bodies.append(await request.json())
+        cached = len(bodies) > 1
+        return web.json_response({
+            "content": [{"type": "text", "text": "ok"}],
+            "usage": {
+                "input_tokens": 50,
+                "output_tokens": 20,
+                "cache_creation_input_tokens": 0 if cached else 2000,
+                "cache_read_input_tokens": 2000 if cached else 0
+            }
+        })
+
+    app = web.Application()
+    app.router.add_post("/v1/messages", handle)
+    server = TestServer(app)
+    await server.start_server()
+    yield server, bodies
+    await server.close()
+
+
+@contextlib.asynccontextmanager
+async def error_server(status, body):
+    """Stand-in that answers every request with an error."""
+    async def handle(request):
+        if isinstance(body, str):
+            return web.Response(text=body, status=status)
+        return web.json_response(body, status=status)
+
+    app = web.Application()
+    app.router.add_post("/v1/messages", handle)
+    server = TestServer(app)
+    await server.start_server()
+    yield server
+    await server.close()
+
+
+@contextlib.asynccontextmanager
+async def streaming_server(pieces, error=None, failures=0):
+    """
+    Stand-in that streams ``pieces`` as server-sent events, then ``error`` if given.
+
+    The first ``failures`` requests are rejected with 429.
+    """
+    state = {"sent": 0, "disconnected": False, "body": None, "calls": 0}
+
+    async def send(response, event):
+        await response.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode())
+
+    async def handle(request):
+        state["calls"] += 1
+        if state["calls"] <= failures:
+            return web.json_response({"error": "overloaded"}, status=429, headers={"retry-after": "0.05"})
+        state["body"] = await request.json()
+        response = web.StreamResponse(headers={"content-type": "text/event-stream"})
+        await response.prepare(request)
+        try:
+            await send(response, {"type": "message_start", "message": {
+                "usage": {"input_tokens": 12, "cache_read_input_tokens": 100, "output_tokens": 1}
+            }})
+            for piece in pieces:
+                await send(response, {"type": "content_block_delta", "index": 0,
+                                      "delta": {"type": "text_delta", "text": piece}})
+                state["sent"] += 1
+                await asyncio.sleep(0.01)
+            if error:
+                await send(response, {"type": "error", "error": error})
+            else:
+                await send(response, {"type": "message_delta", "usage": {"output_tokens": 30}})
+                await send(response, {"type": "message_stop"})
+        except (ConnectionResetError, asyncio.CancelledError):
+            state["disconnected"] = True
+            raise
+        return response
+
+    app = web.Application()
+    app.router.add_post("/v1/messages", handle)
+    server = TestServer(app)
+    await server.start_server()
+    yield server, state
+    await server.close()
+
+
+class TestLLMClient:
+    async def test_connections_are_reused(self):
+        """Sequential requests should ride on a single kept-alive connection."""
+        client = LLMClient(keepalive_timeout=30, limit_per_host=2)
+        async with messages_server() as server:
+            url = str(server.make_url("/v1/messages"))
+            try:
+                for _ in range(5):
+                    result = await client.post_json(url, {}, {"model": "test-model"})
+                    assert result["content"][0]["text"] == "reviewed by test-model"
+            finally:
+                await client.close()
+
+        assert client.stats.requests == 5
+        assert client.stats.new_connections == 1
+        assert client.stats.reused_connections == 4
+
+    async def test_close_releases_session(self):
+        """Closing the client should allow a fresh session afterwards."""
+        client = LLMClient()
+        async with messages_server() as server:
+            url = str(server.make_url("/v1/messages"))
+            await client.post_json(url, {}, {"model": "m"})
+            await client.close()
+            await client.post_json(url, {}, {"model": "m"})
+            await client.close()
+
+        assert client.stats.new_connections == 2
+
+    def test_from_env(self, monkeypatch):
+        """Pool settings should be configurable from the environment."""
+        monkeypatch.setenv("LLM_KEEPALIVE_TIMEOUT", "15")
+        monkeypatch.setenv("LLM_POOL_LIMIT_PER_HOST", "4")
+        client = LLMClient.from_env()
+        assert client.keepalive_timeout == 15.0
+        assert client.limit_per_host == 4
+
+    def test_shared_client_is_singleton(self):
+        """All stages should share one client instance."""
+        assert get_llm_client() is get_llm_client()
+
+    async def test_overload_backs_off_and_retries(self):
+        """429 responses should shrink the shared limit and be retried."""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=8, max_limit=8)
+        client = LLMClient(limiter=limiter)
+        async with overloaded_server(failures=1) as (server, calls):
+            try:
+                result = await client.post_json(str(server.make_url("/v1/messages")), {}, {})
+            finally:
+                await client.close()
+
+        assert result["content"][0]["text"] == "ok"
+        assert len(calls) == 2
+        assert limiter.limit == 4
+        assert limiter.stats.throttled == 1
+
+    async def test_persistent_overload_raises(self):
+        client = LLMClient(max_overload_retries=1)
+        async with overloaded_server(failures=10, status=529) as (server, calls):
+            try:
+                with pytest.raises(LLMOverloadedError) as exc_info:
+                    await client.post_json(str(server.make_url("/v1/messages")), {}, {})
+            finally:
+                await client.close()
+
+        assert exc_info.value.status == 529
+        assert exc_info.value.retry_after == 0.05
+        assert len(calls) == 2
+
+    async def test_create_message_passes_rate_limiter(self, monkeypatch):
+        """Messages should reserve rate budget and settle it from reported usage."""
+        from app.models.rate_limiter import RateLimiter, RateLimits
+
+        rate_limiter = RateLimiter({("anthropic", "test-model"): RateLimits(output_tokens_per_minute=6000)})
+        client = LLMClient(rate_limiter=rate_limiter)
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+        async with messages_server() as server:
+            monkeypatch.setattr("app.models.llm_client.ANTHROPIC_MESSAGES_URL", str(server.make_url("/v1/messages")))
+            try:
+                text = await client.create_message("review this", "test-model", max_tokens=5000)
+            finally:
+                await client.close()
+
+        assert text == "reviewed by test-model"
+        # The 5000-token max_tokens reservation is settled down to the 40 used
+        assert rate_limiter.estimated_wait("anthropic", "test-model", "test-key", output_tokens=5900) == 0.0
+        assert rate_limiter.estimated_wait("anthropic", "test-model", "test-key", output_tokens=6000) > 0
+
+    async def test_failed_message_returns_reservation(self, monkeypatch):
+        from app.models.rate_limiter import RateLimiter, RateLimits
+
+        rate_limiter = RateLimiter({("anthropic", "test-model"): RateLimits(output_tokens_per_minute=1000)})
+        client = LLMClient(rate_limiter=rate_limiter)
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+        async with error_server(400, {"error": {"type": "invalid_request_error"}}) as server:
+            monkeypatch.setattr("app.models.llm_client.ANTHROPIC_MESSAGES_URL", str(server.make_url("/v1/messages")))
+            try:
+                with pytest.raises(LLMResponseError):
+                    await client.create_message("review this", "test-model")
+            finally:
+                await client.close()
+
+        assert rate_limiter.estimated_wait("anthropic", "test-model", "test-key", output_tokens=1000) == 0.0
+
+    def test_output_estimate_follows_stage_usage(self):
+        client = LLMClient()
+        assert client.output_estimate("file_reviews", 4000) == 1000
+        assert client.output_estimate("file_reviews", 500) == 500
+        client.record_usage("file_reviews", {"output_tokens": 300})
+        client.record_usage("file_reviews", {"output_tokens": 500})
+        assert client.output_estimate("file_reviews", 4000) == 600
+        assert client.output_estimate("batch_reviews", 4000) == 1000
+
+    async def test_client_error_raises_response_error(self):
+        client = LLMClient()
+        body = {"type": "error", "error": {"type": "invalid_request_error", "message": "prompt is too long"}}
+        async with error_server(400, body) as server:
+            try:
+                with pytest.raises(LLMResponseError) as exc_info:
+                    await client.post_json(str(server.make_url("/v1/messages")), {}, {})
+            finally:
+                await client.close()
+
+        assert exc_info.value.status == 400
+        assert exc_info.value.error_type == "invalid_request_error"
+        assert "prompt is too long" in str(exc_info.value)
+        assert not exc_info.value.retryable
+
+    async def test_server_error_with_html_body_is_retryable(self):
+        client = LLMClient()
+        async with error_server(502, "<html>Bad Gateway</html>") as server:
+            try:
+                with pytest.raises(LLMResponseError) as exc_info:
+                    await client.post_json(str(server.make_url("/v1/messages")), {}, {})
+            finally:
+                await client.close()
+
+        assert exc_info.value.status == 502
+        assert exc_info.value.retryable
+
+    async def test_system_prefix_is_cached_and_usage_reported(self, monkeypatch):
+        client = LLMClient()
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+        async with caching_server() as (server, bodies):
+            monkeypatch.setattr("app.models.llm_client.ANTHROPIC_MESSAGES_URL", str(server.make_url("/v1/messages")))
+            try:
+                for name in ("a.py", "b.py", "c.py"):
+                    await client.create_message(f"FILE TO REVIEW:\n{name}", "test-model",
+                                                system="static instructions", stage="initial_reviews")
+                await client.create_message("merge these", "test-model", stage="merged_review")
+            finally:
+                await client.close()
+
+        assert bodies[0]["system"] == [
+            {"type": "text", "text": "static instructions", "cache_control": {"type": "ephemeral"}}
+        ]
+        assert bodies[0]["messages"] == [{"role": "user", "content": "FILE TO REVIEW:\na.py"}]
+        assert "system" not in bodies[3]
+
+        initial = client.usage["initial_reviews"]
+        assert initial.requests == 3
+        assert initial.cache_creation_input_tokens == 2000
+        assert initial.cache_read_input_tokens == 4000
+        assert initial.input_tokens == 150
+        assert client.usage["merged_review"].requests == 1
+
+    def test_cache_hit_rate(self):
+        usage = TokenUsage()
+        assert usage.cache_hit_rate == 0.0
+        usage.add({"input_tokens": 100, "cache_creation_input_tokens": 100, "cache_read_input_tokens": 200})
+        assert usage.cache_hit_rate == 0.5
+
+
+class TestStreamMessage:
+    async def test_streams_text_and_records_usage(self, monkeypatch):
+        client = LLMClient()
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+        async with streaming_server(['{"summary": ', '"fine"', '}']) as (server, state):
+            monkeypatch.setattr("app.models.llm_client.ANTHROPIC_MESSAGES_URL", str(server.make_url("/v1/messages")))
+            try:
+                chunks = [chunk async for chunk in client.stream_message(
+                    "review this", "test-model", system="instructions", stage="final_review"
+                )]
+            finally:
+                await client.close()
+
+        assert chunks == ['{"summary": ', '"fine"', '}']
+        assert state["body"]["stream"] is True
+        usage = client.usage["final_review"]
+        assert (usage.input_tokens, usage.output_tokens, usage.cache_read_input_tokens) == (12, 30, 100)
+
+    async def test_closing_early_cancels_generation(self, monkeypatch):
+        client = LLMClient()
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+        async with streaming_server(["chunk "] * 100) as (server, state):
+            monkeypatch.setattr("app.models.llm_client.ANTHROPIC_MESSAGES_URL", str(server.make_url("/v1/messages")))
+            try:
+                stream = client.stream_message("review this", "test-model", stage="initial_reviews")
+                async for chunk in stream:
+                    break
+                await stream.aclose()
+                await asyncio.sleep(0.05)
+            finally:
+                await client.close()
+
+        assert state["disconnected"]
+        assert state["sent"] < 100
+        # The final count never arrived, so output is estimated from the text seen
+        assert client.usage["initial_reviews"].output_tokens < 30
+        assert client.limiter.in_flight == 0
+
+    async def test_overload_event_raises(self, monkeypatch):
+        client = LLMClient()
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+        error = {"type": "overloaded_error", "message": "Overloaded"}
+        async with streaming_server(["{"], error=error) as (server, state):
+            monkeypatch.setattr("app.models.llm_client.ANTHROPIC_MESSAGES_URL", str(server.make_url("/v1/messages")))
+            try:
+                with pytest.raises(LLMOverloadedError):
+                    async for _ in client.stream_message("review this", "test-model"):
+                        pass
+            finally:
+                await client.close()
+
+    async def test_error_status_raises_response_error(self, monkeypatch):
+        client = LLMClient()
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+        body = {"type": "error", "error": {"type": "authentication_error", "message": "invalid x-api-key"}}
+        async with error_server(401, body) as server:
+            monkeypatch.setattr("app.models.llm_client.ANTHROPIC_MESSAGES_URL", str(server.make_url("/v1/messages")))
+            try:
+                with pytest.raises(LLMResponseError) as exc_info:
+                    async for _ in client.stream_message("review this", "test-model"):
+                        pass
+            finally:
+                await client.close()
+
+        assert exc_info.value.error_type == "authentication_error"
+
+    async def test_overload_before_streaming_is_retried(self, monkeypatch):
+        client = LLMClient(max_overload_retries=2)
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+        async with streaming_server(["{", "}"], failures=1) as (server, state):
+            monkeypatch.setattr("app.models.llm_client.ANTHROPIC_MESSAGES_URL", str(server.make_url("/v1/messages")))
+            try:
+                pieces = [piece async for piece in client.stream_message("review this", "test-model")]
+            finally:
+                await client.close()
+
+        assert pieces == ["{", "}"]
+        assert state["calls"] == 2
+
+    @pytest.mark.parametrize("status", [401, 429])
+    async def test_rejected_stream_releases_reservation(self, monkeypatch, status):
+        from app.models.rate_limiter import RateLimiter, RateLimits
+
+        rate_limiter = RateLimiter({("anthropic", "test-model"): RateLimits(output_tokens_per_minute=6000)})
+        client = LLMClient(rate_limiter=rate_limiter, max_overload_retries=0)
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+        async with error_server(status, {"error": {"type": "error"}}) as server:
+            monkeypatch.setattr("app.models.llm_client.ANTHROPIC_MESSAGES_URL", str(server.make_url("/v1/messages")))
+            try:
+                with pytest.raises((LLMResponseError, LLMOverloadedError)):
+                    async for _ in client.stream_message("review this", "test-model", max_tokens=5000):
+                        pass
+            finally:
+                await client.close()
+
+        # Nothing was generated, so the 5000-token reservation is returned
+        assert rate_limiter.estimated_wait("anthropic", "test-model", "test-key", output_tokens=6000) == 0.0
@@ -0,0 +1,166 @@
+"""
+Tests for offline bulk submission through the Message Batches API.
+"""
+import contextlib
+import json
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.models.llm_client import LLMClient, message_params
+from app.models.message_batches import BatchResult, MessageBatchClient
+
+
+@contextlib.asynccontextmanager
+async def batch_server(polls_until_ended=2):
+    """Local stand-in for the Message Batches API."""
+    state = {"polls": 0, "submitted": {"requests": []}, "cancelled": []}
+
+    async def create(request):
+        state["submitted"] = await request.json()
+        return web.json_response({"id": "msgbatch_1", "processing_status": "in_progress"})
+
+    async def status(request):
+        state["polls"] += 1
+        ended = state["polls"] >= polls_until_ended
+        return web.json_response({
+            "id": request.match_info["batch_id"],
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {"processing": 0 if ended else len(state["submitted"]["requests"])},
+            "results_url": str(request.url.with_path("/v1/messages/batches/msgbatch_1/results"))
+        })
+
+    async def results(request):
+        lines = []
+        for entry in state["submitted"]["requests"]:
+            prompt = entry["params"]["messages"][0]["content"]
+            if "broken" in prompt:
+                result = {"type": "errored", "error": {"type": "error", "error": {
+                    "type": "invalid_request_error", "message": "prompt is too long"
+                }}}
+            else:
+                result = {"type": "succeeded", "message": {
+                    "content": [{"type": "text", "text": f"review of {prompt}"}],
+                    "usage": {"input_tokens": 10, "output_tokens": 20, "cache_read_input_tokens": 100}
+                }}
+            lines.append(json.dumps({"custom_id": entry["custom_id"], "result": result}))
+        return web.Response(text="\n".join(lines) + "\n", content_type="application/binary")
+
+    async def cancel(request):
+        state["cancelled"].append(request.match_info["batch_id"])
+        return web.json_response({"id": request.match_info["batch_id"], "processing_status": "canceling"})
+
+    app = web.Application()
+    app.router.add_post("/v1/messages/batches", create)
+    app.router.add_post("/v1/messages/batches/{batch_id}/cancel", cancel)
+    app.router.add_get("/v1/messages/batches/{batch_id}", status)
+    app.router.add_get("/v1/messages/batches/msgbatch_1/results", results)
+    server = TestServer(app)
+    await server.start_server()
+    yield server, state
+    await server.close()
+
+
+class TestMessageBatchClient:
+    async def test_run_maps_results_to_custom_ids(self, monkeypatch):
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+        client = LLMClient()
+        async with batch_server() as (server, state):
+            batches = MessageBatchClient(client, str(server.make_url("/v1/messages/batches")), poll_interval=0.01)
+            try:
+                results = await batches.run({
+                    "file-0": message_params("a.py", "test-model", system="instructions"),
+                    "file-1": message_params("broken.py", "test-model", system="instructions"),
+                }, stage="initial_reviews")
+            finally:
+                await client.close()
+
+        assert state["polls"] == 2
+        assert state["submitted"]["requests"][0]["params"]["system"][0]["cache_control"] == {"type": "ephemeral"}
+        assert results["file-0"].succeeded
+        assert results["file-0"].text == "review of a.py"
+        assert not results["file-1"].succeeded
+        assert results["file-1"].error == "errored: prompt is too long"
+        usage = client.usage["initial_reviews"]
+        assert (usage.requests, usage.cache_read_input_tokens) == (1, 100)
+
+    async def test_missing_results_are_errors(self, monkeypatch):
+        batches = MessageBatchClient(LLMClient())
+
+        async def submit(requests):
+            return "msgbatch_1"
+
+        async def wait(batch_id):
+            return {"id": batch_id, "processing_status": "ended"}
+
+        async def results(batch):
+            return {"file-0": BatchResult("file-0", text="ok")}
+
+        monkeypatch.setattr(batches, "submit", submit)
+        monkeypatch.setattr(batches, "wait", wait)
+        monkeypatch.setattr(batches, "results", results)
+        outcome = await batches.run({"file-0": {}, "file-1": {}})
+        assert outcome["file-1"].error == "missing from batch results"
+
+    async def test_wait_times_out(self, monkeypatch):
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+        client = LLMClient()
+        async with batch_server(polls_until_ended=1000) as (server, state):
+            batches = MessageBatchClient(
+                client, str(server.make_url("/v1/messages/batches")), poll_interval=0.01, timeout=0.05
+            )
+            try:
+                with pytest.raises(TimeoutError):
+                    await batches.wait("msgbatch_1")
+            finally:
+                await client.close()
+
+    async def test_timed_out_job_is_cancelled_and_reported(self, monkeypatch):
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "test-key")
+        client = LLMClient()
+        async with batch_server(polls_until_ended=1000) as (server, state):
+            batches = MessageBatchClient(
+                client, str(server.make_url("/v1/messages/batches")), poll_interval=0.01, timeout=0.05
+            )
+            try:
+                results = await batches.run({"file-0": message_params("a.py", "test-model")})
+            finally:
+                await client.close()
+        assert state["cancelled"] == ["msgbatch_1"]
+        assert "TimeoutError" in results["file-0"].error
+
+    async def test_failed_submit_is_reported(self, monkeypatch):
+        batches = MessageBatchClient(LLMClient())
+
+        async def submit(requests):
+            raise RuntimeError("payload too large")
+
+        monkeypatch.setattr(batches, "submit", submit)
+        monkeypatch.setattr(batches, "cancel", lambda batch_id: pytest.fail("nothing to cancel"))
+        results = await batches.run({"file-0": {}, "file-1": {}})
+        assert all("payload too large" in result.error for result in results.values())
+
+    async def test_requests_are_split_into_jobs(self, monkeypatch):
+        batches = MessageBatchClient(LLMClient(), max_requests=2)
+        submitted = []
+
+        async def run_job(requests):
+            submitted.append(list(requests))
+            return {custom_id: BatchResult(custom_id, text="ok") for custom_id in requests}
+
+        monkeypatch.setattr(batches, "_run_job", run_job)
+        results = await batches.run({f"file-{i}": {} for i in range(5)})
+        assert submitted == [["file-0", "file-1"], ["file-2", "file-3"], ["file-4"]]
+        assert len(results) == 5
+
+    def test_split_respects_size_limit(self):
+        params = message_params("x" * 1000, "test-model")
+        batches = MessageBatchClient(LLMClient(), max_bytes=2500)
+        jobs = batches.split({f"file-{i}": params for i in range(5)})
+        assert [len(job) for job in jobs] == [2, 2, 1]
+        # A request over the limit on its own still gets a job
+        assert len(MessageBatchClient(LLMClient(), max_bytes=10).split({"file-0": params})) == 1
+
+    async def test_empty_batch_rejected(self):
+        with pytest.raises(ValueError):
+            await MessageBatchClient(LLMClient()).submit({})
@@ -1,12 +1,16 @@
 """
 Test suite for the LLM model manager.
 """
+import json
 import pytest
 import os
 from unittest.mock import patch, Mock
 import yaml
 from pathlib import Path
 
+from app.models.model_manager import ModelManager
+from app.models.providers import MockProvider, ProviderAdapter
+
 class TestModelManager:
     """
     Test suite for ModelManager class.
@@ -90,3 +94,81 @@ class TestModelManager:
             with patch.dict(os.environ, {}, clear=True):
                 with pytest.raises(ValueError):
                     ModelManager(mock_config)
+
+
+class FailingProvider(ProviderAdapter):
+    """Provider whose every call fails."""
+    provider = "failing"
+
+    async def generate(self, prompt, model, max_tokens=4000, **kwargs):
+        raise RuntimeError(f"{model} unavailable")
+
+
+class TestAsyncModelManager:
+    """Tests for async generation through provider adapters."""
+
+    @pytest.fixture
+    def mixed_config(self, tmp_path):
+        config = {
+            "models": {
+                "primary": {"name": "claude-test", "provider": "anthropic"},
+                "backup": {"name": "gpt-test", "provider": "openai"}
+            }
+        }
+        config_path = tmp_path / "model_config.yml"
+        config_path.write_text(yaml.dump(config))
+        return str(config_path)
+
+    async def test_agenerate_review_uses_current_provider(self, mixed_config, monkeypatch):
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "key")
+        monkeypatch.setenv("OPENAI_API_KEY", "key")
+        manager = ModelManager(mixed_config, adapters={"anthropic": MockProvider()})
+        result = await manager.agenerate_review("FILE TO REVIEW:\nPath: a.py\n")
+        assert json.loads(result)["file_review"]["file_metadata"]["path"] == "a.py"
+        assert manager.current_model == "claude-test"
+
+    async def test_agenerate_review_falls_back_to_backup(self, mixed_config, monkeypatch):
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "key")
+        monkeypatch.setenv("OPENAI_API_KEY", "key")
+        failing = FailingProvider()
+        backup = MockProvider()
+        manager = ModelManager(mixed_config, adapters={"anthropic": failing, "openai": backup})
+        with patch.object(failing, "generate", wraps=failing.generate) as primary_calls, \
+             patch.object(backup, "generate", wraps=backup.generate) as backup_calls:
+            result = await manager.agenerate_review("FILE TO REVIEW:\nPath: a.py\n")
+            assert "file_review" in json.loads(result)
+            # The fallback applies to the failed call only
+            assert manager.current_model == "claude-test"
+            await manager.agenerate_review("FILE TO REVIEW:\nPath: b.py\n")
+        assert primary_calls.call_count == 2
+        assert backup_calls.call_count == 2
+
+    async def test_agenerate_review_reports_answering_model(self, mixed_config, monkeypatch):
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "key")
+        monkeypatch.setenv("OPENAI_API_KEY", "key")
+        manager = ModelManager(mixed_config, adapters={"anthropic": MockProvider(), "openai": MockProvider()})
+        _, model = await manager.agenerate_review_with_model("FILE TO REVIEW:\nPath: a.py\n")
+        assert model == "claude-test"
+        manager.adapters["anthropic"] = FailingProvider()
+        _, model = await manager.agenerate_review_with_model("FILE TO REVIEW:\nPath: a.py\n")
+        assert model == "gpt-test"
+
+    async def test_agenerate_review_raises_when_backup_fails(self, mixed_config, monkeypatch):
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "key")
+        monkeypatch.setenv("OPENAI_API_KEY", "key")
+        failing = FailingProvider()
+        manager = ModelManager(mixed_config, adapters={"anthropic": failing, "openai": failing})
+        with pytest.raises(RuntimeError, match="gpt-test unavailable"):
+            await manager.agenerate_review("prompt")
+
+    def test_mock_provider_needs_no_api_key(self, tmp_path):
+        config_path = tmp_path / "model_config.yml"
+        config_path.write_text(yaml.dump({
+            "models": {
+                "primary": {"name": "fake", "provider": "mock"},
+                "backup": {"name": "fake", "provider": "mock"}
+            }
+        }))
+        with patch.dict(os.environ, {}, clear=True):
+            manager = ModelManager(str(config_path))
+        assert manager.current_provider == "mock"
@@ -0,0 +1,97 @@
+"""
+Tests for the provider adapters.
+"""
+import contextlib
+import json
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.models.llm_client import LLMClient
+from app.models.providers import (
+    AnthropicAdapter, MockProvider, OpenAIAdapter, ProviderAdapter, get_adapter
+)
+
+
+@contextlib.asynccontextmanager
+async def provider_server():
+    """Local stand-in for both the Anthropic and OpenAI APIs."""
+    requests = []
+
+    async def messages(request):
+        body = await request.json()
+        requests.append((request.path, dict(request.headers), body))
+        return web.json_response({
+            "content": [{"type": "text", "text": f"anthropic:{body['model']}"}],
+            "usage": {"input_tokens": 5, "output_tokens": 7}
+        })
+
+    async def chat(request):
+        body = await request.json()
+        requests.append((request.path, dict(request.headers), body))
+        return web.json_response({
+            "choices": [{"message": {"role": "assistant", "content": f"openai:{body['model']}"}}],
+            "usage": {"prompt_tokens": 1500, "completion_tokens": 7, "prompt_tokens_details": {"cached_tokens": 1024}}
+        })
+
+    app = web.Application()
+    app.router.add_post("/v1/messages", messages)
+    app.router.add_post("/v1/chat/completions", chat)
+    server = TestServer(app)
+    await server.start_server()
+    yield server, requests
+    await server.close()
+
+
+class TestProviderAdapters:
+    async def test_adapters_share_pooled_client(self, monkeypatch):
+        monkeypatch.setenv("ANTHROPIC_API_KEY", "anthropic-key")
+        monkeypatch.setenv("OPENAI_API_KEY", "openai-key")
+        client = LLMClient()
+        async with provider_server() as (server, requests):
+            monkeypatch.setattr("app.models.llm_client.ANTHROPIC_MESSAGES_URL", str(server.make_url("/v1/messages")))
+            monkeypatch.setattr("app.models.providers.OPENAI_CHAT_URL", str(server.make_url("/v1/chat/completions")))
+            try:
+                anthropic_text = await AnthropicAdapter(client).generate("review", "claude-test")
+                openai_text = await OpenAIAdapter(client).generate(
+                    "review", "gpt-test", max_tokens=100, system="instructions", stage="batch_reviews"
+                )
+            finally:
+                await client.close()
+
+        assert anthropic_text == "anthropic:claude-test"
+        assert openai_text == "openai:gpt-test"
+        openai_headers, openai_body = requests[1][1], requests[1][2]
+        assert openai_headers["Authorization"] == "Bearer openai-key"
+        assert openai_body["max_tokens"] == 100
+        assert openai_body["messages"] == [
+            {"role": "system", "content": "instructions"},
+            {"role": "user", "content": "review"}
+        ]
+        assert client.usage["batch_reviews"].cache_read_input_tokens == 1024
+        assert client.usage["batch_reviews"].input_tokens == 476
+        # Both providers ride on the same pool
+        assert client.stats.requests == 2
+        assert client.stats.new_connections == 1
+
+    async def test_mock_provider_matches_prompt_stage(self):
+        mock = MockProvider()
+        file_review = json.loads(await mock.generate("FILE TO REVIEW:\nPath: src/app.py\n", "any"))
+        assert file_review["file_review"]["file_metadata"]["path"] == "src/app.py"
+        batch_review = json.loads(await mock.generate("FILES TO REVIEW:\nFile: a.py\nFile: b.py\n", "any"))
+        assert batch_review["batch_analysis"]["files_reviewed"] == ["a.py", "b.py"]
+        with pytest.raises(ValueError, match="missing file path"):
+            MockProvider.render("no recognizable sections")
+
+    def test_adapter_must_implement_generate(self):
+        class Incomplete(ProviderAdapter):
+            provider = "incomplete"
+
+        with pytest.raises(TypeError):
+            Incomplete()
+
+    def test_get_adapter(self):
+        assert isinstance(get_adapter("openai"), OpenAIAdapter)
+        assert isinstance(get_adapter("mock"), MockProvider)
+        with pytest.raises(ValueError, match="Unsupported provider"):
+            get_adapter("unknown")
@@ -0,0 +1,178 @@
+"""
+Tests for the token-bucket rate limiter.
+"""
+import asyncio
+import time
+import pytest
+
+from app.models.rate_limiter import RateLimiter, RateLimits, TokenBucket
+
+
+def limiter_with(**limits):
+    return RateLimiter({("anthropic", "test-model"): RateLimits(**limits)})
+
+
+class TestTokenBucket:
+    def test_reserve_within_capacity(self):
+        bucket = TokenBucket(60)
+        assert bucket.reserve(10) == 0.0
+
+    def test_debt_gives_wait(self):
+        bucket = TokenBucket(60)  # one unit per second
+        now = time.monotonic()
+        bucket.reserve(60, now)
+        assert bucket.reserve(3, now) == pytest.approx(3.0)
+        assert bucket.wait_time(1, now) == pytest.approx(4.0)
+
+    def test_refund_capped_at_capacity(self):
+        bucket = TokenBucket(60)
+        bucket.refund(1000)
+        assert bucket.tokens == bucket.capacity
+
+    def test_invalid_rate(self):
+        with pytest.raises(ValueError):
+            TokenBucket(0)
+
+
+class TestRateLimiter:
+    async def test_calls_queue_instead_of_failing(self):
+        """Requests beyond the RPM budget wait for refill rather than raising."""
+        limiter = limiter_with(requests_per_minute=600)  # 10 per second
+        for _ in range(600):
+            await limiter.acquire("anthropic", "test-model", "key")
+        start = time.monotonic()
+        reservation = await limiter.acquire("anthropic", "test-model", "key")
+        assert reservation.wait > 0
+        assert time.monotonic() - start >= 0.05
+
+    async def test_waiting_calls_queue_behind_each_other(self):
+        limiter = limiter_with(requests_per_minute=60)  # one per second
+        for _ in range(60):
+            await limiter.acquire("anthropic", "test-model", "key")
+        tasks = [asyncio.create_task(limiter.acquire("anthropic", "test-model", "key")) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert limiter.queued("anthropic", "test-model", "key") == 3
+        # A new call would wait behind all three queued ones
+        assert limiter.estimated_wait("anthropic", "test-model", "key") > 3.5
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def test_keys_have_separate_budgets(self):
+        limiter = limiter_with(requests_per_minute=60)
+        for _ in range(60):
+            await limiter.acquire("anthropic", "test-model", "key-a")
+        assert limiter.estimated_wait("anthropic", "test-model", "key-a") > 0
+        assert limiter.estimated_wait("anthropic", "test-model", "key-b") == 0.0
+
+    async def test_longest_wait_covers_every_key(self):
+        limiter = limiter_with(requests_per_minute=60)
+        assert limiter.longest_wait() == 0.0
+        await limiter.acquire("anthropic", "test-model", "key-a")
+        for _ in range(60):
+            await limiter.acquire("anthropic", "test-model", "key-b")
+        assert limiter.longest_wait() > 0
+        assert limiter.longest_wait() == pytest.approx(limiter.estimated_wait("anthropic", "test-model", "key-b"), abs=0.1)
+
+    async def test_token_budgets(self):
+        limiter = limiter_with(input_tokens_per_minute=6000, output_tokens_per_minute=600)
+        await limiter.acquire("anthropic", "test-model", "key", input_tokens=100, output_tokens=600)
+        # Output budget exhausted by the max_tokens reservation
+        assert limiter.estimated_wait("anthropic", "test-model", "key", output_tokens=60) == pytest.approx(6.0, abs=0.1)
+        assert limiter.estimated_wait("anthropic", "test-model", "key", input_tokens=100) == 0.0
+
+    async def test_settle_refunds_unused_output(self):
+        limiter = limiter_with(output_tokens_per_minute=600)
+        reservation = await limiter.acquire("anthropic", "test-model", "key", output_tokens=600)
+        reservation.settle(output_tokens=50)
+        assert limiter.estimated_wait("anthropic", "test-model", "key", output_tokens=500) == 0.0
+
+    async def test_cancelled_wait_returns_reservation(self):
+        limiter = limiter_with(requests_per_minute=60)
+        for _ in range(60):
+            await limiter.acquire("anthropic", "test-model", "key")
+        task = asyncio.create_task(limiter.acquire("anthropic", "test-model", "key"))
+        await asyncio.sleep(0)
+        assert limiter.queued("anthropic", "test-model", "key") == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert limiter.queued("anthropic", "test-model", "key") == 0
+        assert limiter.estimated_wait("anthropic", "test-model", "key") <= 1.0
+
+    async def test_refund_lets_queued_call_start_early(self):
+        limiter = limiter_with(output_tokens_per_minute=600)  # ten per second
+        first = await limiter.acquire("anthropic", "test-model", "key", output_tokens=600)
+        waiter = asyncio.create_task(limiter.acquire("anthropic", "test-model", "key", output_tokens=300))
+        await asyncio.sleep(0)
+        assert limiter.queued("anthropic", "test-model", "key") == 1
+        # Without the refund the queued call would wait 30 seconds
+        first.settle(output_tokens=100)
+        reservation = await asyncio.wait_for(waiter, 1)
+        assert reservation.wait < 1
+
+    async def test_queued_calls_start_in_arrival_order(self):
+        limiter = limiter_with(output_tokens_per_minute=600)
+        first = await limiter.acquire("anthropic", "test-model", "key", output_tokens=600)
+        started = []
+
+        async def call(name, tokens):
+            await limiter.acquire("anthropic", "test-model", "key", output_tokens=tokens)
+            started.append(name)
+
+        tasks = [asyncio.create_task(call("large", 500)), asyncio.create_task(call("small", 10))]
+        await asyncio.sleep(0)
+        first.settle(output_tokens=0)
+        await asyncio.wait_for(asyncio.gather(*tasks), 1)
+        assert started == ["large", "small"]
+
+    async def test_reservation_above_capacity_waits_for_full_bucket(self):
+        limiter = limiter_with(output_tokens_per_minute=600)
+        reservation = await limiter.acquire("anthropic", "test-model", "key", output_tokens=1000)
+        assert reservation.wait == 0.0
+        assert limiter.estimated_wait("anthropic", "test-model", "key", output_tokens=1) > 30
+
+    async def test_unconfigured_model_is_unlimited(self):
+        limiter = RateLimiter()
+        reservation = await limiter.acquire("openai", "gpt-4", "key", input_tokens=10**9)
+        assert reservation.wait == 0.0
+
+    def test_provider_default_limits(self):
+        limiter = RateLimiter({("anthropic", "default"): RateLimits(requests_per_minute=5)})
+        assert limiter.limits_for("anthropic", "any-model").requests_per_minute == 5
+        assert limiter.limits_for("openai", "gpt-4").requests_per_minute is None
+
+    def test_key_id_does_not_contain_key(self):
+        assert "secret" not in RateLimiter.key_id("sk-secret")
+        assert RateLimiter.key_id("a") != RateLimiter.key_id("b")
+
+    def test_from_config(self, tmp_path):
+        config = tmp_path / "model_config.yml"
+        config.write_text(
+            "models: {}\n"
+            "rate_limits:\n"
+            "  anthropic:\n"
+            "    test-model:\n"
+            "      requests_per_minute: 50\n"
+            "      output_tokens_per_minute: 10000\n"
+        )
+        limits = RateLimiter.from_config(str(config)).limits_for("anthropic", "test-model")
+        assert limits.requests_per_minute == 50
+        assert limits.output_tokens_per_minute == 10000
+        assert limits.input_tokens_per_minute is None
+
+    def test_from_config_split_between_processes(self, tmp_path):
+        config = tmp_path / "model_config.yml"
+        config.write_text(
+            "rate_limits:\n"
+            "  anthropic:\n"
+            "    test-model:\n"
+            "      requests_per_minute: 50\n"
+            "      output_tokens_per_minute: 10000\n"
+        )
+        limits = RateLimiter.from_config(str(config), shares=4).limits_for("anthropic", "test-model")
+        assert (limits.requests_per_minute, limits.output_tokens_per_minute) == (12, 2500)
+        assert limits.input_tokens_per_minute is None
+
+    def test_from_missing_config(self, tmp_path):
+        assert RateLimiter.from_config(str(tmp_path / "missing.yml")).limits == {}
@@ -0,0 +1,85 @@
+"""
+Tests for the model configuration and prompt registry.
+"""
+import os
+import pytest
+import yaml
+
+from app.models.registry import ConfigRegistry, get_registry
+from app.review.batch_review import BatchReviewer
+from app.review.individual_file_review import FileReviewer
+
+
+def write_config(path, primary="claude-test", backup="gpt-test"):
+    path.write_text(yaml.dump({
+        "models": {
+            "primary": {"name": primary, "provider": "anthropic"},
+            "backup": {"name": backup, "provider": "openai"}
+        }
+    }))
+
+
+def touch_later(path):
+    """Advance a file's mtime so the change is visible even on coarse clocks."""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setenv("ANTHROPIC_API_KEY", "key")
+    monkeypatch.setenv("OPENAI_API_KEY", "key")
+    write_config(tmp_path / "model_config.yml")
+    prompts = tmp_path / "prompts"
+    prompts.mkdir()
+    (prompts / "initial_review.txt").write_text("OBJECTIVE v1")
+    (prompts / "batch_review.txt").write_text("BATCH v1")
+    return ConfigRegistry(str(tmp_path / "model_config.yml"), str(prompts))
+
+
+class TestConfigRegistry:
+    def test_entries_are_loaded_once(self, registry):
+        for _ in range(3):
+            registry.prompt("initial_review")
+            registry.models()
+        assert registry.loads == 2
+
+    def test_prompt_reloads_on_change(self, registry, tmp_path):
+        assert registry.prompt("initial_review") == "OBJECTIVE v1"
+        path = tmp_path / "prompts" / "initial_review.txt"
+        path.write_text("OBJECTIVE v2")
+        touch_later(path)
+        assert registry.prompt("initial_review") == "OBJECTIVE v2"
+
+    def test_model_manager_is_shared_until_config_changes(self, registry, tmp_path):
+        manager = registry.model_manager()
+        manager.handle_model_error()
+        assert registry.model_manager() is manager
+        assert registry.model_manager().current_model == "gpt-test"
+
+        write_config(tmp_path / "model_config.yml", primary="claude-next")
+        touch_later(tmp_path / "model_config.yml")
+        reloaded = registry.model_manager()
+        assert reloaded is not manager
+        assert reloaded.current_model == "claude-next"
+
+    def test_model_provider(self, registry):
+        assert registry.model_provider("gpt-test") == "openai"
+        assert registry.model_provider("unknown") == "anthropic"
+
+    def test_missing_prompt(self, registry):
+        with pytest.raises(FileNotFoundError):
+            registry.prompt("missing")
+
+    def test_reviewers_share_manager_and_prompts(self, registry):
+        file_reviewer = FileReviewer(registry=registry)
+        batch_reviewer = BatchReviewer(registry=registry)
+        assert file_reviewer.model_manager is batch_reviewer.model_manager
+        assert file_reviewer.prompt_template == "OBJECTIVE v1"
+        assert batch_reviewer.prompt_template == "BATCH v1"
+        FileReviewer(registry=registry)
+        # Config plus two prompt templates
+        assert registry.loads == 3
+
+    def test_shared_registry_is_singleton(self):
+        assert get_registry() is get_registry()
@@ -55,23 +55,25 @@ class TestBatchReviewer:
         assert len(result["batch_analysis"]["files_reviewed"]) == 3
         
         # Check metrics
+        indicators = result["batch_analysis"]["reliability_indicators"]
         metrics = ["consistency_score", "pattern_quality", "cohesion_rating"]
         for metric in metrics:
-            assert metric in result["batch_analysis"]
-            assert isinstance(result["batch_analysis"][metric], (int, float))
-            assert 0 <= result["batch_analysis"][metric] <= 10
+            assert metric in indicators
+            assert isinstance(indicators[metric], (int, float))
+            assert 0 <= indicators[metric] <= 10
             
         # Check findings
-        findings = result["batch_analysis"]["findings"]
-        assert "patterns_identified" in findings
-        assert "consistency_issues" in findings
-        assert "cohesion_concerns" in findings
+        observations = indicators["key_observations"]
+        assert "strong_patterns" in observations
+        assert "consistency_gaps" in observations
+        assert "organization_issues" in observations
         
         # Check recommendations
-        assert "recommendations" in result
-        assert "pattern_improvements" in result["recommendations"]
-        assert "consistency_fixes" in result["recommendations"]
-        assert "cohesion_enhancements" in result["recommendations"]
+        assert "actionable_findings" in result
+        assert "pattern_improvements" in result["actionable_findings"]
+        assert "consistency_fixes" in result["actionable_findings"]
+        assert "organization_enhancements" in result["actionable_findings"]
+        assert isinstance(result["batch_summary"], str)
         
     def test_empty_batch(self):
         """Test handling empty batch."""
@@ -98,7 +100,7 @@ class TestBatchReviewer:
         result = reviewer.review_batch(sample_files)
         
         # Should identify language mixing in patterns
-        patterns = result["batch_analysis"]["findings"]["patterns_identified"]
+        patterns = result["batch_analysis"]["reliability_indicators"]["key_observations"]["strong_patterns"]
         assert any("mixed language" in pattern.lower() for pattern in patterns)
         
     def test_consistency_across_files(self):
@@ -122,4 +124,37 @@ class TestBatchReviewer:
         result = reviewer.review_batch(files)
         
         # Should have high consistency score for similar files
-        assert result["batch_analysis"]["consistency_score"] >= 8.0
+        assert result["batch_analysis"]["reliability_indicators"]["consistency_score"] >= 8.0
+
+    def test_digest_prompt_uses_stage_one_reviews(self, sample_files, monkeypatch):
+        """Test that Stage 1 reviews replace large file contents in the prompt."""
+        body = "\n".join(f"    total += compute_value({i}, factor={i} * 2, label='item {i}')" for i in range(200))
+        large = ExtractedFile(
+            path="src/big.py",
+            content=f"import math\n\ndef total_values():\n    total = 0\n{body}\n    return total\n",
+            language="Python",
+            size=9000
+        )
+        file_reviews = {"src/big.py": {
+            "file_review": {
+                "quality_scores": {"readability": 4},
+                "key_findings": {"concerns": {"maintenance_issues": ["Needs a loop."]}}
+            },
+            "summary": "Repetitive."
+        }}
+        reviewer = BatchReviewer()
+        prompts = []
+        generate = reviewer.model_manager.generate_review
+
+        def spy(prompt, *args, **kwargs):
+            prompts.append(prompt)
+            return generate(prompt, *args, **kwargs)
+
+        monkeypatch.setattr(reviewer.model_manager, "generate_review", spy)
+        result = reviewer.review_batch([large, sample_files[0]], file_reviews)
+        assert result["batch_analysis"]["files_reviewed"] == ["src/big.py", "src/main.py"]
+        assert "def total_values():" in prompts[0]
+        assert "Repetitive. Needs a loop." in prompts[0]
+        assert "compute_value(199" not in prompts[0]
+        # Files too small to summarize are still sent whole
+        assert "print('hello')" in prompts[0]
@@ -0,0 +1,166 @@
+"""
+Tests for review checkpoints.
+"""
+import pytest
+from app.review.checkpoint import CheckpointStore, Checkpoint
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_new_review_starts_empty(store):
+    store.start("r1", "https://github.com/user/repo", "test-model")
+    checkpoint = store.load("r1")
+    assert checkpoint.stage == "started"
+    assert checkpoint.repo_url == "https://github.com/user/repo"
+    assert checkpoint.model == "test-model"
+    assert checkpoint.file_reviews == []
+    assert not checkpoint.reached("initial_reviews")
+
+
+def test_file_reviews_recorded_individually(store):
+    store.start("r1", "https://github.com/user/repo", "test-model")
+    store.save_file_review("r1", {'path': "b.py", 'review': "b"})
+    store.save_file_review("r1", {'path': "a.py", 'review': "a"})
+    store.save_file_review("r1", {'path': "a.py", 'review': "a2"})
+    assert store.load("r1").file_reviews == [{'path': "a.py", 'review': "a2"}, {'path': "b.py", 'review': "b"}]
+
+
+def test_file_reviews_are_committed_in_batches(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite3")
+    store = CheckpointStore(path, flush_every=3, flush_seconds=3600)
+    store.start("r1", "https://github.com/user/repo", "test-model")
+
+    def committed():
+        reader = CheckpointStore(path)
+        try:
+            return reader._conn.execute("SELECT COUNT(*) FROM checkpoint_file_reviews").fetchone()[0]
+        finally:
+            reader.close()
+
+    store.save_file_review("r1", {'path': "a.py", 'review': "a"})
+    store.save_file_review("r1", {'path': "b.py", 'review': "b"})
+    assert committed() == 0
+    store.save_file_review("r1", {'path': "c.py", 'review': "c"})
+    assert committed() == 3
+    store.save_file_review("r1", {'path': "d.py", 'review': "d"})
+    store.flush()
+    assert committed() == 4
+    store.close()
+
+
+def test_file_reviews_flushed_after_interval(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite3")
+    store = CheckpointStore(path, flush_every=100, flush_seconds=0)
+    store.start("r1", "https://github.com/user/repo", "test-model")
+    store.save_file_review("r1", {'path': "a.py", 'review': "a"})
+    assert store._pending == {}
+    store.close()
+
+
+def test_from_env_flush_settings(tmp_path, monkeypatch):
+    monkeypatch.setenv("REVIEW_CHECKPOINT_PATH", str(tmp_path / "checkpoints.sqlite3"))
+    monkeypatch.setenv("REVIEW_CHECKPOINT_FLUSH_EVERY", "7")
+    monkeypatch.setenv("REVIEW_CHECKPOINT_FLUSH_SECONDS", "1.5")
+    store = CheckpointStore.from_env()
+    assert store.flush_every == 7
+    assert store.flush_seconds == 1.5
+    store.close()
+
+
+def test_stage_outputs_persist(store):
+    store.start("r1", "https://github.com/user/repo", "test-model")
+    store.complete_stage(
+        "r1", "batch_reviews",
+        file_reviews=[{'path': "a.py", 'review': "a"}],
+        batch_reviews=["batch 1"], batch_files=[["a.py"]]
+    )
+    store.complete_stage("r1", "merged_review", merged_review="merged")
+
+    checkpoint = store.load("r1")
+    assert checkpoint.stage == "merged_review"
+    assert checkpoint.reached("batch_reviews")
+    assert not checkpoint.reached("completed")
+    assert checkpoint.batch_reviews == ["batch 1"]
+    assert checkpoint.batch_files == [["a.py"]]
+    assert checkpoint.merged_review == "merged"
+
+
+def test_stage_file_reviews_replace_partial_ones(store):
+    store.start("r1", "https://github.com/user/repo", "test-model")
+    store.save_file_review("r1", {'path': "removed.py", 'review': "old"})
+    store.complete_stage("r1", "initial_reviews", file_reviews=[{'path': "a.py", 'review': "a"}])
+    assert [r['path'] for r in store.load("r1").file_reviews] == ["a.py"]
+
+
+def test_survives_reopen(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite3")
+    first = CheckpointStore(path)
+    first.start("r1", "https://github.com/user/repo", "test-model")
+    first.save_file_review("r1", {'path': "a.py", 'review': "a"})
+    first.close()
+
+    second = CheckpointStore(path)
+    assert second.load("r1").file_reviews == [{'path': "a.py", 'review': "a"}]
+    second.close()
+
+
+def test_incomplete_and_delete(store):
+    store.start("r1", "https://github.com/user/repo", "test-model")
+    store.start("r2", "https://github.com/user/other", "test-model")
+    store.complete_stage("r2", "completed")
+    assert store.incomplete() == ["r1"]
+    store.delete("r1")
+    assert store.load("r1") is None
+
+
+def test_completion_drops_saved_outputs(store):
+    store.start("r1", "https://github.com/user/repo", "test-model", previous_review_id="r0")
+    store.complete_stage(
+        "r1", "batch_reviews",
+        file_reviews=[{'path': "a.py", 'review': "a"}], batch_reviews=["batch 1"], batch_files=[["a.py"]]
+    )
+    store.complete_stage("r1", "completed")
+    checkpoint = store.load("r1")
+    assert checkpoint.reached("completed")
+    assert (checkpoint.file_reviews, checkpoint.batch_reviews, checkpoint.previous_review_id) == ([], [], None)
+
+
+def test_previous_review_id_persists(store):
+    store.start("r1", "https://github.com/user/repo", "test-model", previous_review_id="r0")
+    store.complete_stage("r1", "initial_reviews", file_reviews=[])
+    assert store.load("r1").previous_review_id == "r0"
+
+
+def test_prune_removes_stale_checkpoints(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"), max_age_days=1)
+    store.start("stale", "https://github.com/user/repo", "test-model")
+    store.save_file_review("stale", {'path': "a.py", 'review': "a"})
+    store._conn.execute("UPDATE review_checkpoints SET updated_at = updated_at - 2 * 86400")
+    store.start("fresh", "https://github.com/user/repo", "test-model")
+    assert store.prune() == 1
+    assert store.load("stale") is None
+    assert store.load("fresh") is not None
+    assert store._conn.execute("SELECT COUNT(*) FROM checkpoint_file_reviews").fetchone()[0] == 0
+    store.close()
+
+
+def test_unknown_review_and_stage(store):
+    assert store.load("missing") is None
+    with pytest.raises(ValueError, match="No checkpoint"):
+        store.complete_stage("missing", "merged_review")
+    store.start("r1", "https://github.com/user/repo", "test-model")
+    with pytest.raises(ValueError, match="Unknown stage"):
+        store.complete_stage("r1", "bogus")
+
+
+def test_checkpoint_reached_order():
+    checkpoint = Checkpoint("r1", "url", "model", "batch_reviews")
+    assert checkpoint.reached("started")
+    assert checkpoint.reached("initial_reviews")
+    assert checkpoint.reached("batch_reviews")
+    assert not checkpoint.reached("merged_review")
@@ -0,0 +1,224 @@
+"""
+Tests for chunked review of oversized files.
+"""
+import asyncio
+import json
+import time
+import pytest
+from unittest.mock import patch
+
+from app.intake.code_extraction import ExtractedFile
+from app.models.model_manager import ModelManager
+from app.models.providers import MockProvider
+from app.review.chunked_review import (
+    ChunkedFileReviewer, ChunkingPolicy, chunk_section, reduce_reviews, review_chunks, split_into_chunks
+)
+from app.review.review_cache import ReviewCache
+from app.utils.tokens import estimate_tokens
+
+LARGE_PYTHON = "import os\n\n\n" + "\n\n".join(
+    f"# Handler for request type {i}\n"
+    f"def handler_{i}(request):\n"
+    f"    items = request.get('items', [])\n"
+    f"    values = [item * {i} for item in items if item is not None]\n"
+    f"    return sum(values)\n"
+    for i in range(30)
+)
+
+LARGE_CLASS = "class Service:\n" + "\n".join(
+    f"\n    def method_{i}(self, value):\n"
+    f"        result = value + {i}\n"
+    f"        return result * 2"
+    for i in range(30)
+)
+
+
+def covered_lines(chunks):
+    return [line for chunk in chunks for line in range(chunk.start_line, chunk.end_line + 1)]
+
+
+class TestSplitIntoChunks:
+    def test_small_file_is_one_chunk(self):
+        chunks = split_into_chunks("def f():\n    return 1\n", 1000)
+        assert len(chunks) == 1
+        assert chunks[0].text == "def f():\n    return 1\n"
+        assert (chunks[0].start_line, chunks[0].end_line, chunks[0].total) == (1, 2, 1)
+
+    def test_splits_at_top_level_definitions(self):
+        chunks = split_into_chunks(LARGE_PYTHON, 200, overlap_lines=0)
+        lines = LARGE_PYTHON.splitlines()
+        assert len(chunks) > 1
+        assert covered_lines(chunks) == list(range(1, len(lines) + 1))
+        for chunk in chunks:
+            assert chunk.tokens <= 200
+        for chunk in chunks[1:]:
+            # Comments stay with the definition they describe
+            assert lines[chunk.start_line - 1].startswith("# Handler")
+
+    def test_splits_class_at_members(self):
+        chunks = split_into_chunks(LARGE_CLASS, 150, overlap_lines=0)
+        lines = LARGE_CLASS.splitlines()
+        assert len(chunks) > 1
+        assert covered_lines(chunks) == list(range(1, len(lines) + 1))
+        for chunk in chunks[1:]:
+            assert lines[chunk.start_line - 1].startswith("    def method_")
+
+    def test_overlap_repeats_previous_lines(self):
+        chunks = split_into_chunks(LARGE_PYTHON, 200, overlap_lines=3)
+        lines = LARGE_PYTHON.splitlines(keepends=True)
+        second = chunks[1]
+        assert second.context_start == second.start_line - 3
+        assert second.text == "".join(lines[second.context_start - 1:second.end_line])
+        assert "repeat the end of the previous part" in second.header()
+        assert "repeat" not in chunks[0].header()
+
+    def test_minified_line_is_split(self):
+        content = "var a=" + "[1,2,3]," * 500 + "0;"
+        chunks = split_into_chunks(content, 300, overlap_lines=0)
+        assert len(chunks) > 1
+        assert "".join(chunk.text for chunk in chunks) == content
+        assert all(estimate_tokens(chunk.text) <= 300 for chunk in chunks)
+
+    def test_rejects_non_positive_budget(self):
+        with pytest.raises(ValueError):
+            split_into_chunks("x = 1\n", 0)
+
+    def test_section_includes_outline(self):
+        chunk = split_into_chunks(LARGE_PYTHON, 200)[1]
+        section = chunk_section(chunk, outline="def handler_0(request): ...")
+        assert section.startswith(f"Part: 2 of {chunk.total}")
+        assert "OUTLINE OF THE WHOLE FILE:\ndef handler_0(request): ..." in section
+        assert section.endswith(chunk.text)
+
+
+class TestReduceReviews:
+    def test_numbers_weighted_by_chunk_size(self):
+        assert reduce_reviews([{"score": 8}, {"score": 4}], [300, 100]) == {"score": 7.0}
+
+    def test_lists_and_strings_are_combined(self):
+        combined = reduce_reviews(
+            [
+                {"concerns": ["no tests", "long function"], "summary": "Parser."},
+                {"concerns": ["no tests"], "summary": "Writer."},
+            ],
+            [1, 1]
+        )
+        assert combined == {"concerns": ["no tests", "long function"], "summary": "Parser. Writer."}
+
+    def test_nested_and_missing_keys(self):
+        combined = reduce_reviews(
+            [{"a": {"x": 2, "flag": True}}, {"a": {"x": 4, "y": [1]}}, None],
+            [1, 1, 1]
+        )
+        assert combined == {"a": {"x": 3.0, "flag": True, "y": [1]}}
+
+    def test_nothing_to_reduce(self):
+        assert reduce_reviews([None, None], [1, 1]) is None
+
+
+class TestChunkedFileReviewer:
+    @pytest.fixture(autouse=True)
+    def setup_env(self, monkeypatch):
+        """Setup environment variables for testing."""
+        monkeypatch.setenv('OPENAI_API_KEY', 'test-key')
+        monkeypatch.setenv('ANTHROPIC_API_KEY', 'test-key')
+
+    @pytest.fixture
+    def large_file(self):
+        return ExtractedFile(path="handlers.py", content=LARGE_PYTHON, language="Python", size=len(LARGE_PYTHON))
+
+    def test_policy_from_env(self, monkeypatch):
+        monkeypatch.setenv('FILE_CHUNK_TOKENS', '500')
+        monkeypatch.setenv('FILE_CHUNK_OVERLAP_LINES', '5')
+        policy = ChunkingPolicy.from_env()
+        assert (policy.token_budget, policy.overlap_lines, policy.max_parallel) == (500, 5, 8)
+        assert policy.needs_chunking(LARGE_PYTHON)
+        assert not policy.needs_chunking("x = 1\n")
+
+    def test_small_file_reviewed_whole(self):
+        reviewer = ChunkedFileReviewer(policy=ChunkingPolicy(token_budget=1000))
+        small = ExtractedFile(path="test.py", content="def hello():\n    return 'world'", language="Python", size=28)
+        with patch.object(reviewer.model_manager, 'generate_review', wraps=reviewer.model_manager.generate_review) as generate:
+            result = reviewer.review_file(small)
+        assert generate.call_count == 1
+        assert result["file_review"]["file_metadata"]["path"] == "test.py"
+
+    def test_large_file_reviewed_in_chunks(self, large_file, tmp_path):
+        cache = ReviewCache(db_path=str(tmp_path / "cache.sqlite3"))
+        reviewer = ChunkedFileReviewer(cache=cache, policy=ChunkingPolicy(token_budget=200, overlap_lines=2))
+        chunk_count = len(split_into_chunks(LARGE_PYTHON, 200, 2))
+        with patch.object(reviewer.model_manager, 'generate_review', wraps=reviewer.model_manager.generate_review) as generate:
+            result = reviewer.review_file(large_file)
+            prompts = [call.args[0] for call in generate.call_args_list]
+        assert len(prompts) == chunk_count
+        assert all("Path: handlers.py" in prompt for prompt in prompts)
+
+        assert result["file_review"]["file_metadata"]["path"] == "handlers.py"
+        scores = result["file_review"]["quality_scores"]
+        for metric in ("readability", "security", "test_coverage"):
+            assert 0 <= scores[metric] <= 10
+        assert isinstance(result["summary"], str)
+
+        # The combined review is cached as one document
+        with patch.object(reviewer.model_manager, 'generate_review') as generate:
+            assert reviewer.review_file(large_file) == result
+            generate.assert_not_called()
+        cache.close()
+
+    async def test_async_chunks_run_concurrently(self, large_file):
+        class SlowMockProvider(MockProvider):
+            async def generate(self, prompt, model, max_tokens=4000, **kwargs):
+                await asyncio.sleep(0.2)
+                return await super().generate(prompt, model, max_tokens, **kwargs)
+
+        manager = ModelManager("app/models/config/model_config.yml", adapters={"anthropic": SlowMockProvider()})
+        reviewer = ChunkedFileReviewer(model_manager=manager, policy=ChunkingPolicy(token_budget=200, max_parallel=16))
+        assert 2 < len(split_into_chunks(LARGE_PYTHON, 200)) <= 16
+
+        start = time.monotonic()
+        result = await reviewer.areview_file(large_file)
+
+        assert time.monotonic() - start < 0.35
+        assert result["file_review"]["file_metadata"]["path"] == "handlers.py"
+        json.dumps(result)
+
+    async def test_failed_chunks_are_left_out(self, large_file):
+        calls = []
+
+        class FlakyMockProvider(MockProvider):
+            async def generate(self, prompt, model, max_tokens=4000, **kwargs):
+                calls.append(prompt)
+                if "Part: 1 of" in prompt:
+                    raise RuntimeError("provider unavailable")
+                return await super().generate(prompt, model, max_tokens, **kwargs)
+
+        manager = ModelManager("app/models/config/model_config.yml", adapters={"anthropic": FlakyMockProvider()})
+        reviewer = ChunkedFileReviewer(model_manager=manager, policy=ChunkingPolicy(token_budget=200, max_parallel=1))
+        result = await reviewer.areview_file(large_file)
+        assert result["file_review"]["file_metadata"]["path"] == "handlers.py"
+        # The failed part was tried on the primary and backup model only
+        assert sum("Part: 1 of" in prompt for prompt in calls) == 2
+
+    async def test_file_fails_when_no_chunk_is_valid(self, large_file):
+        class FailingProvider(MockProvider):
+            async def generate(self, prompt, model, max_tokens=4000, **kwargs):
+                raise RuntimeError("provider unavailable")
+
+        manager = ModelManager("app/models/config/model_config.yml", adapters={"anthropic": FailingProvider()})
+        reviewer = ChunkedFileReviewer(model_manager=manager, policy=ChunkingPolicy(token_budget=200))
+        with pytest.raises(ValueError, match="no part of handlers.py"):
+            await reviewer.areview_file(large_file)
+
+    async def test_review_chunks_respects_max_parallel(self):
+        in_flight = peak = 0
+
+        async def generate(prompt):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return prompt
+
+        assert await review_chunks([str(i) for i in range(6)], generate, 2) == [str(i) for i in range(6)]
+        assert peak == 2
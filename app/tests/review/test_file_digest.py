@@ -0,0 +1,139 @@
+"""
+Tests for per-file digests used in batch review prompts.
+"""
+import asyncio
+import json
+import pytest
+
+from unittest.mock import patch
+
+from app.review import file_digest
+from app.review.file_digest import (
+    FileDigest, clear_digest_sections, digest_section, extract_outline, start_digest_run, summarize_review,
+    use_digests
+)
+
+LARGE_PYTHON = "import os\nfrom typing import List\n\n" + "\n".join(
+    f"def handler_{i}(request: dict) -> dict:\n"
+    f"    \"\"\"Handle request type {i}.\"\"\"\n"
+    f"    items = request.get('items', [])\n"
+    f"    values = [item * {i} for item in items if item is not None]\n"
+    f"    total = sum(values)\n"
+    f"    return {{'status': 'ok', 'total': total, 'count': len(values)}}\n"
+    for i in range(40)
+)
+
+PIPELINE_REVIEW = json.dumps({
+    "file_review": {
+        "quality_scores": {"readability": 8, "security": 6.5},
+        "key_findings": {"concerns": {"reliability_issues": ["no input validation"], "growth_limitations": []}}
+    },
+    "summary": "Simple request handlers."
+})
+
+
+class TestOutline:
+    def test_python(self):
+        imports, signatures = extract_outline(
+            "import os\nfrom a.b import c\n\n@dataclass\nclass A:\n    async def run(self, x: int) -> None:\n        pass\n",
+            "Python"
+        )
+        assert imports == ["import os", "from a.b import c"]
+        assert signatures == ["@dataclass", "class A:", "    async def run(self, x: int) -> None:"]
+
+    def test_javascript(self):
+        imports, signatures = extract_outline(
+            "import x from 'x';\nconst fs = require('fs');\nexport async function load(path) {\n"
+            "  return fs.read(path);\n}\nconst add = (a, b) => a + b;\n",
+            "JavaScript"
+        )
+        assert imports == ["import x from 'x';", "const fs = require('fs');"]
+        assert signatures == ["export async function load(path)", "const add = (a, b) => a + b;"]
+
+    def test_brace_language_skips_statements(self):
+        _, signatures = extract_outline(
+            "public class Foo {\n    public int size(List<String> items) {\n"
+            "        if (items.isEmpty()) {\n        } else if (other(\n        return compute(\n",
+            "Java"
+        )
+        assert signatures == ["public class Foo", "    public int size(List<String> items)"]
+
+    def test_markup_has_no_outline(self):
+        assert extract_outline("<div>def not_code():</div>", "HTML") == ([], [])
+
+
+class TestSummarizeReview:
+    def test_pipeline_shape(self):
+        scores, notes = summarize_review(PIPELINE_REVIEW)
+        assert scores == {"readability": 8, "security": 6.5}
+        assert notes == "Simple request handlers. no input validation"
+
+    def test_other_shapes_are_unreadable(self):
+        review = {
+            "file_scores": {"app.py": {"readability": 7, "notes": "Clear names."}},
+            "overall_review": {"summary": "Solid.", "concerns": ["No tests"]}
+        }
+        assert summarize_review(review) == ({}, "")
+
+    def test_unreadable_review(self):
+        assert summarize_review("not a review") == ({}, "")
+
+
+class TestFileDigest:
+    def test_large_file_is_summarized(self):
+        digest = FileDigest.build("src/handlers.py", LARGE_PYTHON, "Python", PIPELINE_REVIEW)
+        assert digest.content is None
+        text = digest.render()
+        assert "def handler_39(request: dict) -> dict:" in text
+        assert "Stage 1 scores: {\"readability\":8,\"security\":6.5}" in text
+        assert "sum(values)" not in text
+        assert len(text) < len(LARGE_PYTHON) / 3
+
+    def test_small_file_keeps_source(self):
+        digest = FileDigest.build("src/tiny.py", "def main():\n    print('hi')\n", "Python", PIPELINE_REVIEW)
+        assert digest.content is not None
+        assert "print('hi')" in digest.render()
+
+    def test_file_without_outline_or_review_keeps_source(self):
+        content = "key: value\n" * 500
+        assert FileDigest.build("config.yaml", content, "YAML").content == content
+
+    def test_sections_memoized_until_cleared(self):
+        clear_digest_sections()
+        with patch.object(FileDigest, 'build', wraps=FileDigest.build) as build:
+            first = digest_section("src/handlers.py", LARGE_PYTHON, "Python", PIPELINE_REVIEW, "sha-1")
+            assert digest_section("src/handlers.py", LARGE_PYTHON, "Python", PIPELINE_REVIEW, "sha-1") == first
+            assert build.call_count == 1
+            # A new review of the same blob gets its own section
+            digest_section("src/handlers.py", LARGE_PYTHON, "Python", "{}", "sha-1")
+            assert build.call_count == 2
+        assert len(file_digest._sections) == 2
+        clear_digest_sections()
+        assert file_digest._sections == {}
+
+    async def test_concurrent_runs_keep_separate_memos(self):
+        async def run(sha, cleared, done):
+            start_digest_run()
+            digest_section("src/handlers.py", LARGE_PYTHON, "Python", PIPELINE_REVIEW, sha)
+            if sha == "sha-1":
+                clear_digest_sections()
+                cleared.set()
+                await done.wait()
+            else:
+                await cleared.wait()
+                memo = dict(file_digest._section_memo())
+                done.set()
+                return memo
+
+        cleared, done = asyncio.Event(), asyncio.Event()
+        _, memo = await asyncio.gather(run("sha-1", cleared, done), run("sha-2", cleared, done))
+        # The first run clearing its memo left the second run's digest alone
+        assert [key[1] for key in memo] == ["sha-2"]
+
+    def test_mode_from_env(self, monkeypatch):
+        assert use_digests()
+        monkeypatch.setenv("BATCH_PROMPT_MODE", "full")
+        assert not use_digests()
+        monkeypatch.setenv("BATCH_PROMPT_MODE", "everything")
+        with pytest.raises(ValueError):
+            use_digests()
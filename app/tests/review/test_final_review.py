@@ -1,8 +1,11 @@
 """
 Tests for final review functionality.
 """
+import asyncio
 import pytest
 from pathlib import Path
+from app.models.model_manager import ModelManager
+from app.models.providers import MockProvider
 from app.review.final_review import FinalReviewer
 from app.review.merged_batch_review import MergedBatchReviewer
 from app.review.batch_review import BatchReviewer
@@ -72,31 +75,32 @@ class TestFinalReviewer:
         result = reviewer.generate_final_review(merged_review)
         
         # Check structure
-        assert "final_assessment" in result
-        assessment = result["final_assessment"]
+        assert "business_assessment" in result
+        assessment = result["business_assessment"]
         
         # Check scores
-        assert "final_score" in assessment
-        assert 0 <= assessment["final_score"] <= 10
+        assert "confidence_score" in assessment
+        assert 0 <= assessment["confidence_score"] <= 10
         
-        # Check quality breakdown
-        breakdown = assessment["quality_breakdown"]
-        metrics = ["code_quality", "architecture", "maintainability", "scalability"]
+        # Check quality factors
+        factors = assessment["quality_factors"]
+        metrics = ["reliability", "future_proof", "efficiency", "growth_ready"]
         for metric in metrics:
-            assert metric in breakdown
-            assert 0 <= breakdown[metric] <= 10
+            assert metric in factors
+            assert 0 <= factors[metric] <= 10
             
-        # Check recommendations and risks
-        assert "recommendations" in assessment
-        assert len(assessment["recommendations"]) > 0
+        # Check action items and risks
+        assert "action_items" in assessment
+        assert len(assessment["action_items"]) > 0
         
-        risk_analysis = assessment["risk_analysis"]
-        assert all(k in risk_analysis for k in ["high_priority", "medium_priority", "low_priority"])
+        risks = assessment["business_risks"]
+        assert all(k in risks for k in ["urgent_attention", "watch_list", "minor_concerns"])
         
-        # Check action plan
-        assert "action_plan" in result
-        plan = result["action_plan"]
-        assert all(k in plan for k in ["immediate_actions", "short_term_goals", "long_term_improvements"])
+        # Check game plan
+        assert "game_plan" in result
+        plan = result["game_plan"]
+        assert all(k in plan for k in ["do_now", "do_soon", "do_later"])
+        assert isinstance(result["plain_english_summary"], str)
         
     def test_empty_merged_review(self):
         """Test handling empty merged review."""
@@ -108,8 +112,8 @@ class TestFinalReviewer:
         """Test handling invalid merged review format."""
         reviewer = FinalReviewer()
         invalid_review = {
-            "merged_analysis": {
-                "overall_quality_score": 8.0
+            "technical_foundation": {
+                "reliability_indicators": {"score": 8.0}
             }
         }
         with pytest.raises(ValueError, match="Invalid merged review format"):
@@ -121,7 +125,7 @@ class TestFinalReviewer:
         result = reviewer.generate_final_review(merged_review)
         
         # Check recommendations for business impact
-        recommendations = result["final_assessment"]["recommendations"]
+        recommendations = result["business_assessment"]["action_items"]
         assert any("impact" in str(item).lower() for item in recommendations)
         
     def test_timeline_inclusion(self, merged_review):
@@ -130,7 +134,26 @@ class TestFinalReviewer:
         result = reviewer.generate_final_review(merged_review)
         
         # Verify timeline-based organization
-        plan = result["action_plan"]
-        assert len(plan["immediate_actions"]) > 0
-        assert len(plan["short_term_goals"]) > 0
-        assert len(plan["long_term_improvements"]) > 0
+        plan = result["game_plan"]
+        assert len(plan["do_now"]) > 0
+        assert len(plan["do_soon"]) > 0
+        assert len(plan["do_later"]) > 0
+        
+    async def test_async_pipeline(self, merged_review):
+        """Test the async reviewers running over a local fake provider."""
+        manager = ModelManager("app/models/config/model_config.yml", adapters={"anthropic": MockProvider()})
+        files = [
+            ExtractedFile(path=f"src/mod{i}.py", content="x = 1", language="Python", size=5)
+            for i in range(4)
+        ]
+        
+        batch_reviewer = BatchReviewer(model_manager=manager)
+        batch_reviews = await asyncio.gather(
+            batch_reviewer.areview_batch(files[:2]),
+            batch_reviewer.areview_batch(files[2:])
+        )
+        merged = await MergedBatchReviewer(model_manager=manager).amerge_reviews(list(batch_reviews))
+        result = await FinalReviewer(model_manager=manager).agenerate_final_review(merged)
+        
+        assert "business_assessment" in result
+        assert "game_plan" in result
@@ -0,0 +1,44 @@
+"""
+Tests for incremental re-review planning.
+"""
+from app.review.incremental import diff_trees, plan_incremental_review, batches_to_recompute
+
+
+class TestIncrementalReview:
+    def test_diff_trees(self):
+        """Test classification of added, modified, removed and unchanged paths."""
+        previous = {"a.py": "1", "b.py": "2", "c.py": "3"}
+        current = {"a.py": "1", "b.py": "20", "d.py": "4"}
+
+        diff = diff_trees(previous, current)
+
+        assert diff.added == ["d.py"]
+        assert diff.modified == ["b.py"]
+        assert diff.removed == ["c.py"]
+        assert diff.unchanged == ["a.py"]
+        assert diff.changed == {"b.py", "d.py"}
+        assert diff.has_changes
+
+    def test_no_changes(self):
+        """Test identical trees produce no work."""
+        tree = {"a.py": "1"}
+        plan = plan_incremental_review(tree, [{"path": "a.py", "review": "ok"}], tree)
+
+        assert not plan.diff.has_changes
+        assert plan.paths_to_review == set()
+        assert plan.carried_reviews == [{"path": "a.py", "review": "ok"}]
+
+    def test_unchanged_file_without_stored_review_is_reviewed(self):
+        """Test unchanged paths missing from the previous review still get reviewed."""
+        tree = {"a.py": "1", "b.py": "2"}
+        plan = plan_incremental_review(tree, [{"path": "a.py", "review": "ok"}], tree)
+
+        assert plan.paths_to_review == {"b.py"}
+
+    def test_batches_to_recompute(self):
+        """Test batches are reused only when membership and content are unchanged."""
+        previous = {("a.py", "b.py"): "ab", ("c.py", "d.py"): "cd"}
+        batches = [["a.py", "b.py"], ["c.py", "d.py"], ["e.py"]]
+
+        assert batches_to_recompute(batches, previous, {"d.py"}) == [False, True, True]
+        assert batches_to_recompute(batches, None, set()) == [True, True, True]
@@ -1,6 +1,7 @@
 """
 Tests for merged batch review functionality.
 """
+import re
 import pytest
 from pathlib import Path
 from app.review.merged_batch_review import MergedBatchReviewer
@@ -69,27 +70,26 @@ class TestMergedBatchReviewer:
         result = reviewer.merge_reviews(batch_reviews)
         
         # Check structure
-        assert "merged_analysis" in result
-        analysis = result["merged_analysis"]
+        assert "technical_foundation" in result
+        foundation = result["technical_foundation"]
         
         # Check scores
-        assert "overall_quality_score" in analysis
-        assert "architectural_alignment_score" in analysis
-        assert "integration_impact_score" in analysis
-        assert all(0 <= analysis[k] <= 10 for k in analysis if k.endswith('_score'))
+        sections = ["reliability_indicators", "maintenance_assessment", "scalability_evaluation", "development_efficiency"]
+        assert all(0 <= foundation[k]["score"] <= 10 for k in sections)
         
         # Check findings
-        assert "key_findings" in analysis
-        findings = analysis["key_findings"]
-        assert all(k in findings for k in ["strengths", "concerns", "risks"])
-        assert all(isinstance(findings[k], list) for k in findings)
+        reliability = foundation["reliability_indicators"]
+        assert isinstance(reliability["strong_points"], list)
+        assert isinstance(reliability["vulnerabilities"], list)
+        risks = result["risk_patterns"]
+        assert all(k in risks for k in ["immediate_concerns", "medium_term_risks", "long_term_considerations"])
         
         # Check recommendations
-        assert "recommendations" in result
-        recommendations = result["recommendations"]
-        assert "architectural_improvements" in recommendations
-        assert "integration_considerations" in recommendations
-        assert "priority_actions" in recommendations
+        assert "actionability_assessment" in result
+        actions = result["actionability_assessment"]
+        assert "quick_wins" in actions
+        assert "strategic_improvements" in actions
+        assert isinstance(result["consolidated_summary"], str)
         
     def test_empty_reviews(self):
         """Test handling empty review list."""
@@ -109,8 +109,9 @@ class TestMergedBatchReviewer:
         result = reviewer.merge_reviews(batch_reviews)
         
         # Should identify cross-language patterns
-        findings = result["merged_analysis"]["key_findings"]
-        assert any("language" in str(item).lower() for items in findings.values() for item in items)
+        foundation = result["technical_foundation"]
+        findings = foundation["reliability_indicators"]["strong_points"] + foundation["reliability_indicators"]["vulnerabilities"]
+        assert any("language" in str(item).lower() for item in findings)
         
     def test_architectural_insights(self, batch_reviews):
         """Test architectural analysis in merged review."""
@@ -118,6 +119,50 @@ class TestMergedBatchReviewer:
         result = reviewer.merge_reviews(batch_reviews)
         
         # Should provide architectural insights
-        improvements = result["recommendations"]["architectural_improvements"]
+        improvements = result["actionability_assessment"]["strategic_improvements"]["tasks"]
         assert len(improvements) > 0
         assert any("architecture" in str(item).lower() for item in improvements)
+
+    def test_large_merge_uses_tree(self, batch_reviews, monkeypatch):
+        """Test that more reviews than the fan-in are merged in groups."""
+        reviewer = MergedBatchReviewer(fan_in=3)
+        prompts = []
+        generate = reviewer.model_manager.generate_review
+
+        def counting_generate(prompt, *args, **kwargs):
+            prompts.append(prompt)
+            return generate(prompt, *args, **kwargs)
+
+        monkeypatch.setattr(reviewer.model_manager, "generate_review", counting_generate)
+        reviews = (batch_reviews * 4)[:7]
+        sequential = reviewer.merge_reviews(reviews)
+        # Level 1 merges 3 + 3 (the 7th passes through), then one final merge
+        assert len(prompts) == 3
+        assert [len(re.findall(r"^Batch \d+:", prompt, re.M)) for prompt in prompts] == [3, 3, 3]
+        assert "technical_foundation" in sequential
+
+        prompts.clear()
+        assert "technical_foundation" in reviewer.merge_reviews(reviews, parallel=True)
+        assert len(prompts) == 3
+
+    def test_merged_group_keeps_its_own_metrics(self, batch_reviews):
+        """Test that merged scores are not passed off as batch scores."""
+        reviewer = MergedBatchReviewer()
+        merged = reviewer.merge_reviews(batch_reviews)
+        node = MergedBatchReviewer._as_batch_review(merged, batch_reviews)
+
+        assert "reliability_indicators" not in node["batch_analysis"]
+        score = merged["technical_foundation"]["reliability_indicators"]["score"]
+        assert node["merged_metrics"]["reliability_indicators"] == score
+        assert node["batches_covered"] == 2
+
+        # A node covering two batches outweighs a single batch one to two
+        outer = MergedBatchReviewer._as_batch_review(merged, [node, batch_reviews[0]])
+        assert outer["batches_covered"] == 3
+        prompt = reviewer._build_prompt([node, batch_reviews[0]])
+        assert "Merged Batches: 2\nReliability Score:" in prompt
+
+    def test_invalid_fan_in(self):
+        """Test that a fan-in below 2 is rejected."""
+        with pytest.raises(ValueError, match="at least 2"):
+            MergedBatchReviewer(fan_in=1)
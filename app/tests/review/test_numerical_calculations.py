@@ -16,12 +16,12 @@ class TestNumericalCalculations:
         """Generate sample individual review data."""
         return [
             {
-                'file_scores': {
-                    'actual_filename': {
+                'file_review': {
+                    'quality_scores': {
                         'readability': 7.0,
                         'maintainability': 6.5,
-                        'complexity': 5.0,
-                        'coding_standards': 8.0,
+                        'simplicity': 5.0,
+                        'standards': 8.0,
                         'documentation': 7.5
                     }
                 }
@@ -34,22 +34,22 @@ class TestNumericalCalculations:
         return [
             [
                 {
-                    'file_scores': {
-                        'actual_filename': {
+                    'file_review': {
+                        'quality_scores': {
                             'readability': 7.0,
                             'maintainability': 6.5,
-                            'complexity': 5.0
+                            'simplicity': 5.0
                         }
                     }
                 } for _ in range(5)
             ],
             [
                 {
-                    'file_scores': {
-                        'actual_filename': {
+                    'file_review': {
+                        'quality_scores': {
                             'readability': 8.0,
                             'maintainability': 7.5,
-                            'complexity': 6.0
+                            'simplicity': 6.0
                         }
                     }
                 } for _ in range(5)
@@ -80,6 +80,24 @@ class TestNumericalCalculations:
         assert merged_metrics.maintainability == pytest.approx(7.0)
         assert merged_metrics.complexity == pytest.approx(5.5)
     
+    def test_merged_groups_weighted_by_batches_covered(self):
+        """
+        Test that a merged group counts once per batch it covers.
+        """
+        batch = {'batch_analysis': {'reliability_indicators': {
+            'consistency_score': 9, 'pattern_quality': 6, 'cohesion_rating': 3
+        }}}
+        merged = {
+            'batch_analysis': {},
+            'batches_covered': 3,
+            'aggregate_metrics': ReviewMetrics(readability=5, maintainability=2, complexity=7).to_dict()
+        }
+        metrics = NumericalProcessor.calculate_batch_averages([batch, merged])
+        
+        assert metrics.readability == pytest.approx(6.0)
+        assert metrics.maintainability == pytest.approx(3.0)
+        assert metrics.complexity == pytest.approx(6.0)
+    
     def test_empty_batch_handling(self):
         """
         Test handling of empty batch and merged batch scenarios.
@@ -96,49 +114,41 @@ class TestNumericalCalculations:
         """
         sample_reviews = [
             {
-                'overall_review': {
-                    'summary': 'Good code quality',
-                    'total_score': 8.5,
-                    'metrics': {'complexity': 7}
-                }
+                'file_review': {'quality_scores': {'readability': 8.5, 'simplicity': 7}},
+                'summary': 'Good code quality'
             },
             {
-                'overall_review': {
-                    'summary': 'Needs improvement',
-                    'total_score': 6.5,
-                    'risks': ['Complex logic']
-                }
+                'file_review': {'quality_scores': {'readability': 6.5}},
+                'summary': 'Needs improvement'
             }
         ]
         
         qualitative_data = NumericalProcessor.extract_qualitative_data(sample_reviews)
         
-        assert len(qualitative_data) == 0, "No qualitative data should be extracted when numerical values are present"
+        assert qualitative_data == ['Good code quality', 'Needs improvement'], "Only the summaries should be extracted, not the scores"
     
     def test_pure_qualitative_reviews(self):
         """
-        Test extraction of qualitative data from reviews with no numerical values.
+        Test extraction of qualitative data from batch reviews.
         """
         sample_reviews = [
             {
-                'overall_review': {
-                    'summary': 'Good code quality',
-                    'strengths': ['Clean architecture']
-                }
-            },
-            {
-                'overall_review': {
-                    'summary': 'Needs improvement',
-                    'risks': ['Complex logic']
+                'batch_analysis': {
+                    'reliability_indicators': {
+                        'consistency_score': 8.0,
+                        'key_observations': {
+                            'strong_patterns': ['Clean architecture'],
+                            'consistency_gaps': [],
+                            'organization_issues': ['Complex logic']
+                        }
+                    }
                 }
             }
         ]
         
         qualitative_data = NumericalProcessor.extract_qualitative_data(sample_reviews)
         
-        assert len(qualitative_data) == 2
-        assert 'Good code quality' in qualitative_data
-        assert 'Needs improvement' in qualitative_data
+        assert qualitative_data == ['Clean architecture', 'Complex logic']
     
     def test_review_metrics_conversion(self):
         """
@@ -156,6 +166,10 @@ class TestNumericalCalculations:
         assert metrics.maintainability == 6.0
         assert metrics.complexity == 5.5
         
+        # The initial review prompt's names map onto the same fields
+        prompt_metrics = ReviewMetrics.from_quality_scores({'simplicity': 5.5, 'standards': 8.0})
+        assert (prompt_metrics.complexity, prompt_metrics.coding_standards) == (5.5, 8.0)
+        
         # Test to_dict method
         metrics_dict = metrics.to_dict()
         assert metrics_dict['readability'] == 7.5
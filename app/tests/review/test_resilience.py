@@ -0,0 +1,113 @@
+"""
+Tests for retrying, failing-over fan-out of LLM calls.
+"""
+import asyncio
+import pytest
+
+from app.models.llm_client import LLMOverloadedError, LLMResponseError
+from app.review.resilience import ResilientExecutor, RetryPolicy, is_retryable
+from app.review.response_parsing import ResponseParseError
+
+
+def no_wait(**kwargs):
+    return RetryPolicy(base_delay=0, **kwargs)
+
+
+def flaky(failures, error=ResponseParseError("Invalid review format: no JSON object found")):
+    """Call that fails ``failures`` times, recording the model of each attempt."""
+    models = []
+
+    async def call(model):
+        models.append(model)
+        if len(models) <= failures:
+            raise error
+        return f"review by {model}"
+
+    return call, models
+
+
+class TestRetryPolicy:
+    def test_delay_is_capped(self):
+        policy = RetryPolicy(base_delay=1.0, max_delay=5.0)
+        assert all(0 <= policy.delay(attempt) <= 5.0 for attempt in range(1, 10))
+
+    def test_from_env(self, monkeypatch):
+        monkeypatch.setenv("LLM_RETRY_ATTEMPTS", "6")
+        monkeypatch.setenv("LLM_RETRY_BASE_DELAY", "0")
+        policy = RetryPolicy.from_env()
+        assert policy.max_attempts == 6
+        assert policy.base_delay == 0.0
+        assert policy.failover_after == 2
+
+
+class TestIsRetryable:
+    def test_classification(self):
+        assert is_retryable(LLMOverloadedError(529))
+        assert is_retryable(LLMResponseError(503))
+        assert is_retryable(asyncio.TimeoutError())
+        assert is_retryable(ResponseParseError("Invalid review format: response does not start with JSON"))
+        assert not is_retryable(LLMResponseError(400, "invalid_request_error"))
+        assert not is_retryable(LLMResponseError(401, "authentication_error"))
+        assert not is_retryable(ValueError("bad prompt"))
+        assert not is_retryable(KeyError('content'))
+        assert not is_retryable(IndexError('list index out of range'))
+
+
+class TestResilientExecutor:
+    async def test_retries_until_success(self):
+        call, models = flaky(1)
+        outcome = await ResilientExecutor(["primary"], no_wait()).run("item", call)
+        assert outcome.succeeded
+        assert outcome.result == "review by primary"
+        assert outcome.attempts == 2
+
+    async def test_fatal_error_is_not_retried(self):
+        call, models = flaky(10, LLMResponseError(400, "invalid_request_error"))
+        outcome = await ResilientExecutor(["primary"], no_wait()).run("item", call)
+        assert not outcome.succeeded
+        assert isinstance(outcome.error, LLMResponseError)
+        assert outcome.attempts == 1
+
+    async def test_gives_up_after_max_attempts(self):
+        call, models = flaky(10)
+        outcome = await ResilientExecutor(["primary"], no_wait(max_attempts=3)).run("item", call)
+        assert not outcome.succeeded
+        assert isinstance(outcome.error, ResponseParseError)
+        assert len(models) == 3
+
+    async def test_programming_error_is_not_retried(self):
+        call, models = flaky(10, KeyError('content'))
+        outcome = await ResilientExecutor(["primary", "backup"], no_wait()).run("item", call)
+        assert isinstance(outcome.error, KeyError)
+        assert models == ["primary"]
+
+    async def test_fails_over_to_backup_model(self):
+        call, models = flaky(2, LLMOverloadedError(529))
+        outcome = await ResilientExecutor(["primary", "backup"], no_wait()).run("item", call)
+        assert outcome.result == "review by backup"
+        assert outcome.model == "backup"
+        assert models == ["primary", "primary", "backup"]
+
+    async def test_failover_is_per_call(self):
+        executor = ResilientExecutor(["primary", "backup"], no_wait())
+        await executor.run("a", flaky(2)[0])
+        call, models = flaky(0)
+        await executor.run("b", call)
+        assert models == ["primary"]
+
+    async def test_duplicate_models_are_dropped(self):
+        assert ResilientExecutor(["m", "m"]).models == ["m"]
+        with pytest.raises(ValueError):
+            ResilientExecutor([])
+
+    async def test_gather_keeps_order_and_isolates_failures(self):
+        async def call(item, model):
+            await asyncio.sleep(0.01 * (5 - item))
+            if item == 2:
+                raise LLMResponseError(400)
+            return item * 10
+
+        outcomes = await ResilientExecutor(["primary"], no_wait()).gather(range(5), call)
+        assert [outcome.item for outcome in outcomes] == [0, 1, 2, 3, 4]
+        assert [outcome.result for outcome in outcomes if outcome.succeeded] == [0, 10, 30, 40]
+        assert not outcomes[2].succeeded
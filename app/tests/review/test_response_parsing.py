@@ -0,0 +1,177 @@
+"""
+Tests for parsing and validating JSON review responses.
+"""
+import json
+import pytest
+
+from app.models.providers import MockProvider
+from app.models.registry import get_registry
+from app.review import response_parsing
+from app.review.response_parsing import (
+    IncrementalJSONScanner, MAX_PREAMBLE_CHARS, ResponseParseError, Schema, extract_json, normalize_response,
+    parse_json_response, parse_review, repair_truncated_json, template_schema
+)
+
+
+class TestExtractJson:
+    def test_code_fence_and_prose(self):
+        text = 'Here is the review:\n```json\n{"a": {"b": "}"}}\n```\nLet me know if you need more.'
+        assert extract_json(text) == '{"a": {"b": "}"}}'
+
+    def test_escaped_quotes(self):
+        text = '{"note": "say \\"hi\\" {"} trailing'
+        assert json.loads(extract_json(text)) == {"note": 'say "hi" {'}
+
+    def test_no_json(self):
+        with pytest.raises(ResponseParseError):
+            extract_json("I could not review this file.")
+
+    @pytest.mark.parametrize("text", [
+        'Here is the review of [app/main.py]:\n{"file_scores": {"a": 1}}',
+        'Scores are on a [1-10] scale.\n{"file_scores": {"a": 1}}',
+        'I used {placeholders} below.\n```json\n{"file_scores": {"a": 1}}\n```',
+    ])
+    def test_brackets_in_prose_are_skipped(self, text):
+        assert json.loads(extract_json(text)) == {"file_scores": {"a": 1}}
+
+    def test_bracketed_prose_alone_is_not_json(self):
+        with pytest.raises(ResponseParseError):
+            parse_json_response("Here is my review of [app/main.py]:\n")
+
+    def test_truncated_object_is_not_replaced_by_inner_value(self):
+        text = '{"file_scores": {"a.py": {"readability": 8}}, "summary": "cut'
+        assert parse_json_response(text) == {"file_scores": {"a.py": {"readability": 8}}, "summary": "cut"}
+
+
+    def test_truncated_object_after_inline_preamble_is_repaired(self):
+        text = 'Use {placeholders} sparingly. Sure, here is the review: {"summary": "cut'
+        assert parse_json_response(text) == {"summary": "cut"}
+
+
+class TestIncrementalScanner:
+    def test_completes_across_chunks(self):
+        scanner = IncrementalJSONScanner()
+        assert not scanner.feed('```json\n{"a": "}\\"')
+        assert not scanner.feed('", "b": [1, {"c": 2}')
+        assert scanner.feed(']}\n```')
+        assert scanner.consumed == len('```json\n{"a": "}\\"", "b": [1, {"c": 2}]}')
+
+    def test_long_preamble_is_rejected(self):
+        scanner = IncrementalJSONScanner(max_preamble=20)
+        scanner.feed("Here is the review:")
+        with pytest.raises(ResponseParseError, match="does not start with JSON"):
+            scanner.feed(" the code looks fine overall")
+
+    def test_brackets_in_preamble_do_not_start_a_value(self):
+        scanner = IncrementalJSONScanner()
+        assert not scanner.feed("Here is my review of [app/main.py]:\n")
+        assert not scanner.started
+        assert scanner.feed('{"a": [1]}')
+
+    def test_value_may_follow_preamble_on_its_line(self):
+        scanner = IncrementalJSONScanner()
+        assert not scanner.feed("Sure, here is the review: {\n")
+        assert scanner.started
+        assert scanner.feed('"a": {}}')
+
+    def test_long_review_after_inline_preamble_is_kept(self):
+        review = '{"summary": "' + "x" * 2 * MAX_PREAMBLE_CHARS + '"}'
+        scanner = IncrementalJSONScanner()
+        assert scanner.feed("Sure, here is the review: " + review)
+        assert parse_json_response("Sure, here is the review: " + review) == json.loads(review)
+
+    def test_braces_in_prose_do_not_start_a_value(self):
+        scanner = IncrementalJSONScanner()
+        assert not scanner.feed("Fill in {placeholders} as needed: ")
+        assert not scanner.started
+        assert scanner.feed('{"a": 1}')
+
+    def test_value_that_does_not_decode_is_skipped(self):
+        scanner = IncrementalJSONScanner()
+        assert not scanner.feed("{see notes}\n")
+        assert scanner.feed('{"a": 1}')
+
+    def test_mismatched_brackets_are_rejected(self):
+        with pytest.raises(ResponseParseError, match="mismatched"):
+            IncrementalJSONScanner().feed('{"a": [1, 2}')
+
+
+class TestRepair:
+    @pytest.mark.parametrize("fragment, expected", [
+        ('{"a": [1, 2, "thr', {"a": [1, 2, "thr"]}),
+        ('{"a": 1, "b": {"c": tru', {"a": 1, "b": {}}),
+        ('{"a": 1, "b":', {"a": 1, "b": None}),
+        ('{"a": 8.', {}),
+        ('{"a": {"b": 1},', {"a": {"b": 1}}),
+    ])
+    def test_truncated_fragments(self, fragment, expected):
+        assert repair_truncated_json(fragment) == expected
+
+    def test_truncated_response_is_repaired(self):
+        text = '```json\n{"summary": "fine", "risks": ["one", "tw'
+        assert parse_json_response(text) == {"summary": "fine", "risks": ["one", "tw"]}
+
+
+class TestSchemas:
+    def test_mock_outputs_match_prompt_formats(self):
+        prompt = get_registry().prompt
+        file = MockProvider.render("Path: src/a.py\n")
+        batch = MockProvider.render("FILES TO REVIEW:\nFile: a.py\nFile: b.py\n")
+        merged = MockProvider.render("BATCH REVIEWS TO MERGE:\n")
+        final = MockProvider.render("MERGED REVIEW TO ANALYZE:\n")
+        assert parse_review(file, prompt("initial_review"))["file_review"]["file_metadata"]["path"] == "src/a.py"
+        assert parse_review(batch, prompt("batch_review"))["batch_analysis"]["files_reviewed"] == ["a.py", "b.py"]
+        assert "technical_foundation" in parse_review(merged, prompt("merged_batch_review"))
+        assert "business_assessment" in parse_review(final, prompt("final_review"))
+
+    def test_schema_follows_template(self):
+        template = (
+            'OUTPUT FORMAT\n{\n  "scores": {"speed": number},  // 1-10\n'
+            '  "tags": ["any", "words"],\n  "summary": "text"\n}\nMore instructions.'
+        )
+        schema = template_schema(template)
+        schema.validate({"scores": {"speed": 7}, "tags": [{"nested": True}], "summary": "ok"})
+        with pytest.raises(ResponseParseError, match="scores.speed has the wrong type"):
+            schema.validate({"scores": {"speed": "fast"}, "tags": [], "summary": "ok"})
+        with pytest.raises(ValueError, match="no OUTPUT FORMAT"):
+            template_schema("Reply with JSON.")
+
+    def test_old_mock_shape_is_rejected(self):
+        old = {"file_scores": {"a.py": {"readability": 8}}, "overall_review": {"summary": "x"}}
+        with pytest.raises(ResponseParseError, match="missing file_review"):
+            parse_review(json.dumps(old), get_registry().prompt("initial_review"))
+
+    def test_missing_key_is_reported_with_path(self):
+        review = json.loads(MockProvider.render("MERGED REVIEW TO ANALYZE:\n"))
+        del review["business_assessment"]["quality_factors"]["growth_ready"]
+        with pytest.raises(ResponseParseError, match="missing business_assessment.quality_factors.growth_ready"):
+            parse_review(json.dumps(review), get_registry().prompt("final_review"))
+
+    def test_types_and_lists(self):
+        schema = Schema({"score": (int, float), "tags": [str], "extra": None})
+        schema.validate({"score": 1.5, "tags": ["a"], "extra": {"anything": True}})
+        with pytest.raises(ResponseParseError, match="score has the wrong type"):
+            schema.validate({"score": True, "tags": [], "extra": None})
+        with pytest.raises(ResponseParseError, match=r"tags\[1\] has the wrong type"):
+            schema.validate({"score": 1, "tags": ["a", 2], "extra": None})
+
+    def test_parse_error_is_value_error(self):
+        with pytest.raises(ValueError):
+            parse_review("not json", get_registry().prompt("batch_review"))
+
+
+class TestNormalize:
+    def test_compacts_json(self):
+        assert normalize_response('Sure!\n```json\n{"a": [1, 2]}\n```') == '{"a":[1,2]}'
+
+    def test_keeps_free_text(self):
+        assert normalize_response("plain prose review") == "plain prose review"
+
+    def test_keeps_text_that_needed_repair(self):
+        text = '```json\n{"summary": "fine", "risks": ["one", "tw'
+        assert normalize_response(text) == text
+
+
+def test_falls_back_to_json_module(monkeypatch):
+    monkeypatch.setattr(response_parsing, "orjson", None)
+    assert parse_json_response('{"a": 1}') == {"a": 1}
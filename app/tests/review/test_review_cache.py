@@ -0,0 +1,72 @@
+"""
+Tests for the persistent content-addressed review cache.
+"""
+import time
+import pytest
+from app.review.review_cache import ReviewCache
+from app.intake.code_extraction import ExtractedFile
+
+
+class TestReviewCache:
+    @pytest.fixture
+    def cache(self, tmp_path):
+        """Create a cache backed by a temporary database."""
+        cache = ReviewCache(db_path=str(tmp_path / "cache.sqlite3"))
+        yield cache
+        cache.close()
+
+    def test_miss_then_hit(self, cache):
+        """Stored reviews are returned for the same key only."""
+        prompt_hash = ReviewCache.prompt_hash("prompt v1")
+        assert cache.get("abc", prompt_hash, "model-a") is None
+
+        cache.set("abc", prompt_hash, "model-a", '{"review": 1}')
+
+        assert cache.get("abc", prompt_hash, "model-a") == '{"review": 1}'
+        assert cache.get("abc", prompt_hash, "model-b") is None
+        assert cache.get("abc", ReviewCache.prompt_hash("prompt v2"), "model-a") is None
+        assert cache.hits == 1
+        assert cache.misses == 3
+
+    def test_persists_across_instances(self, tmp_path):
+        """Entries survive reopening the database."""
+        db_path = str(tmp_path / "cache.sqlite3")
+        first = ReviewCache(db_path=db_path)
+        first.set("sha", "prompt", "model", "review")
+        first.close()
+
+        second = ReviewCache(db_path=db_path)
+        assert second.get("sha", "prompt", "model") == "review"
+        second.close()
+
+    def test_size_eviction_drops_least_recently_used(self, tmp_path):
+        """Only max_entries reviews are kept, evicting the least recently used."""
+        cache = ReviewCache(db_path=str(tmp_path / "cache.sqlite3"), max_entries=2)
+        cache.set("one", "p", "m", "1")
+        time.sleep(0.01)
+        cache.set("two", "p", "m", "2")
+        time.sleep(0.01)
+        cache.get("one", "p", "m")
+        time.sleep(0.01)
+        cache.set("three", "p", "m", "3")
+
+        assert len(cache) == 2
+        assert cache.get("two", "p", "m") is None
+        assert cache.get("one", "p", "m") == "1"
+        cache.close()
+
+    def test_age_eviction(self, tmp_path):
+        """Entries older than max_age_seconds are misses."""
+        cache = ReviewCache(db_path=str(tmp_path / "cache.sqlite3"), max_age_seconds=0.01)
+        cache.set("sha", "p", "m", "review")
+        time.sleep(0.05)
+        assert cache.get("sha", "p", "m") is None
+        cache.close()
+
+    def test_blob_sha_matches_git(self):
+        """Computed blob SHAs match git's hash-object output."""
+        file = ExtractedFile(path="a.txt", content="hello\n", language="Unknown", size=6)
+        assert file.blob_sha == "ce013625030ba8dba906f756967f9e9ca394464a"
+
+        tree_file = ExtractedFile(path="a.txt", content="hello\n", language="Unknown", size=6, sha="deadbeef")
+        assert tree_file.blob_sha == "deadbeef"
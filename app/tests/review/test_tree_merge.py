@@ -0,0 +1,65 @@
+"""
+Tests for tree-reduction merging.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.review.tree_merge import merge_fan_in, merge_groups, tree_reduce, tree_reduce_sync
+
+
+class TestTreeReduce:
+    async def test_levels_run_concurrently(self):
+        calls = []
+        running = {"now": 0, "peak": 0}
+
+        async def merge(group):
+            calls.append(len(group))
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+            await asyncio.sleep(0.01)
+            running["now"] -= 1
+            return sum(group)
+
+        assert await tree_reduce(list(range(100)), merge, fan_in=10) == sum(range(100))
+        # 10 merges of 10, then one final merge
+        assert calls == [10] * 10 + [10]
+        assert running["peak"] == 10
+
+    async def test_single_review_is_still_merged(self):
+        async def merge(group):
+            return f"merged {group}"
+
+        assert await tree_reduce(["a"], merge, fan_in=4) == "merged ['a']"
+
+    async def test_rejects_empty_input_and_small_fan_in(self):
+        async def merge(group):
+            return group
+
+        with pytest.raises(ValueError, match="No reviews"):
+            await tree_reduce([], merge)
+        with pytest.raises(ValueError, match="at least 2"):
+            await tree_reduce([1, 2], merge, fan_in=1)
+
+    def test_sync_with_executor(self):
+        calls = []
+
+        def merge(group):
+            calls.append(list(group))
+            return "".join(group)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            assert tree_reduce_sync(list("abcdefg"), merge, fan_in=2, executor=executor) == "abcdefg"
+        # 7 -> 4 (g passes through) -> 2 -> final merge
+        assert len(calls) == 3 + 2 + 1
+
+    def test_merge_groups(self):
+        assert merge_groups([1, 2, 3, 4, 5], 2) == [[1, 2], [3, 4], [5]]
+
+    def test_fan_in_from_env(self, monkeypatch):
+        monkeypatch.setenv("MERGE_FAN_IN", "4")
+        assert merge_fan_in() == 4
+        monkeypatch.setenv("MERGE_FAN_IN", "1")
+        with pytest.raises(ValueError):
+            merge_fan_in()
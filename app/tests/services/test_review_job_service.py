@@ -0,0 +1,249 @@
+"""
+Tests for the review job queue and worker pool.
+"""
+import asyncio
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.review.checkpoint import CheckpointStore
+from app.services.review_job_service import (
+    ReviewJobQueue, ReviewWorker, ReviewWorkerPool, JOB_STATUS_TRANSITIONS, run_review_job
+)
+
+
+async def fake_runner(job):
+    """Picklable runner standing in for the four review stages."""
+    await asyncio.sleep(0.05)
+    if "broken" in job.repo_url:
+        raise RuntimeError("extraction failed")
+    return f"review-for-{job.repo_url.rsplit('/', 1)[-1]}"
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = ReviewJobQueue(str(tmp_path / "jobs.sqlite3"))
+    yield queue
+    queue.close()
+
+
+class TestReviewJobQueue:
+    def test_transitions_mirror_repository(self):
+        assert JOB_STATUS_TRANSITIONS["Pending"] == ["In Progress"]
+        assert "Completed" in JOB_STATUS_TRANSITIONS["In Progress"]
+        assert JOB_STATUS_TRANSITIONS["Completed"] == []
+        assert JOB_STATUS_TRANSITIONS["Failed"] == []
+
+    def test_claim_in_fifo_order(self, queue):
+        first = queue.enqueue("https://github.com/user/one")
+        second = queue.enqueue("https://github.com/user/two")
+        assert queue.position(first.job_id) == 0
+        assert queue.position(second.job_id) == 1
+
+        claimed = queue.claim("w1")
+        assert claimed.job_id == first.job_id
+        assert claimed.status == "In Progress"
+        assert claimed.attempts == 1
+        assert queue.position(first.job_id) is None
+        assert queue.position(second.job_id) == 0
+
+    def test_claim_empty_queue(self, queue):
+        assert queue.claim("w1") is None
+
+    def test_complete_and_fail(self, queue):
+        queue.enqueue("https://github.com/user/one")
+        queue.enqueue("https://github.com/user/two")
+        done = queue.complete(queue.claim("w1").job_id, "review-1", "w1")
+        failed = queue.fail(queue.claim("w1").job_id, "boom", "w1")
+        assert (done.status, done.review_id) == ("Completed", "review-1")
+        assert (failed.status, failed.error) == ("Failed", "boom")
+
+    def test_invalid_transition(self, queue):
+        job = queue.enqueue("https://github.com/user/one")
+        with pytest.raises(ValueError, match="Invalid status transition from Pending to Completed"):
+            queue.complete(job.job_id, "review-1", "w1")
+
+    def test_only_the_claiming_worker_finishes(self, queue):
+        job = queue.enqueue("https://github.com/user/one")
+        queue.claim("w1")
+        with pytest.raises(ValueError, match="no longer leased to w2"):
+            queue.complete(job.job_id, "review-2", "w2")
+        assert queue.get(job.job_id).status == "In Progress"
+
+    def test_expired_lease_cannot_finish(self, tmp_path):
+        queue = ReviewJobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=0.01)
+        job = queue.enqueue("https://github.com/user/one")
+        queue.claim("w1")
+        time.sleep(0.02)
+        with pytest.raises(ValueError, match="no longer leased"):
+            queue.fail(job.job_id, "boom", "w1")
+        # The job is re-queued for another worker instead
+        assert queue.claim("w2").job_id == job.job_id
+        queue.close()
+
+    def test_owner_is_recorded(self, queue):
+        job = queue.enqueue("https://github.com/user/one", owner_id="user-1")
+        assert queue.get(job.job_id).owner_id == "user-1"
+        assert queue.claim("w1").owner_id == "user-1"
+
+    def test_expired_lease_is_requeued_then_failed(self, tmp_path):
+        queue = ReviewJobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=0.01, max_attempts=2)
+        job = queue.enqueue("https://github.com/user/one")
+        queue.claim("crashed-1")
+        time.sleep(0.02)
+
+        reclaimed = queue.claim("w2")
+        assert reclaimed.job_id == job.job_id
+        assert reclaimed.attempts == 2
+        time.sleep(0.02)
+
+        assert queue.claim("w3") is None
+        assert queue.get(job.job_id).status == "Failed"
+        queue.close()
+
+    def test_review_id_is_kept_across_claims(self, tmp_path):
+        queue = ReviewJobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=0.01)
+        job = queue.enqueue("https://github.com/user/one")
+        first = queue.claim("crashed-1")
+        assert first.review_id is not None
+        time.sleep(0.02)
+        assert queue.claim("w2").review_id == first.review_id
+        queue.close()
+        queue = ReviewJobQueue(str(tmp_path / "jobs.sqlite3"))
+        assert queue.fail(job.job_id, "boom", "w2").review_id == first.review_id
+        queue.close()
+
+    def test_heartbeat_keeps_lease(self, tmp_path):
+        queue = ReviewJobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=0.2)
+        job = queue.enqueue("https://github.com/user/one")
+        queue.claim("w1")
+        time.sleep(0.15)
+        queue.heartbeat([job.job_id], "w1")
+        time.sleep(0.1)
+        assert queue.claim("w2") is None
+        assert queue.get(job.job_id).worker_id == "w1"
+        queue.close()
+
+    def test_heartbeat_records_rate_limit_wait(self, queue):
+        job = queue.enqueue("https://github.com/user/one")
+        queue.claim("w1")
+        queue.heartbeat([job.job_id], "w1", rate_limit_wait=12.5)
+        assert queue.get(job.job_id).rate_limit_wait == 12.5
+        # A heartbeat without an estimate keeps the last one
+        queue.heartbeat([job.job_id], "w1")
+        assert queue.get(job.job_id).rate_limit_wait == 12.5
+
+    def test_queue_shared_between_connections(self, tmp_path):
+        path = str(tmp_path / "jobs.sqlite3")
+        producer, consumer = ReviewJobQueue(path), ReviewJobQueue(path)
+        job = producer.enqueue("https://github.com/user/one")
+        assert consumer.claim("w1").job_id == job.job_id
+        assert producer.get(job.job_id).status == "In Progress"
+        producer.close()
+        consumer.close()
+
+
+class TestReviewWorker:
+    async def test_runs_jobs_concurrently(self, queue):
+        jobs = [queue.enqueue(f"https://github.com/user/repo{i}") for i in range(4)]
+        started = []
+        all_started = asyncio.Event()
+
+        async def runner(job):
+            # No job finishes until every job has started, so they must overlap
+            started.append(job.job_id)
+            if len(started) == len(jobs):
+                all_started.set()
+            await asyncio.wait_for(all_started.wait(), 5)
+            return await fake_runner(job)
+
+        worker = ReviewWorker(queue, runner, max_jobs=4, poll_interval=0.01)
+        await worker.run(exit_when_idle=True)
+
+        for job in jobs:
+            finished = queue.get(job.job_id)
+            assert finished.status == "Completed"
+            assert finished.review_id == f"review-for-{job.repo_url.rsplit('/', 1)[-1]}"
+
+    async def test_heartbeat_reports_rate_limit_wait(self, tmp_path):
+        queue = ReviewJobQueue(str(tmp_path / "jobs.sqlite3"), lease_seconds=0.03)
+        job = queue.enqueue("https://github.com/user/one")
+        waits = []
+
+        async def runner(job):
+            await asyncio.sleep(0.1)
+            waits.append(queue.get(job.job_id).rate_limit_wait)
+            return "review-1"
+
+        await ReviewWorker(queue, runner, poll_interval=0.005, wait_estimate=lambda: 42.0).run(exit_when_idle=True)
+        assert waits == [42.0]
+        assert queue.get(job.job_id).status == "Completed"
+        queue.close()
+
+    async def test_failures_are_recorded(self, queue):
+        job = queue.enqueue("https://github.com/user/broken")
+        await ReviewWorker(queue, fake_runner, poll_interval=0.01).run(exit_when_idle=True)
+        failed = queue.get(job.job_id)
+        assert failed.status == "Failed"
+        assert failed.error == "extraction failed"
+
+
+class TestRunReviewJob:
+    @pytest.fixture
+    def checkpoints(self, tmp_path):
+        store = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"))
+        with patch.object(CheckpointStore, "from_env", return_value=store), \
+             patch.object(store, "close"):
+            yield store
+        store.close()
+
+    async def test_first_attempt_starts_review_under_job_review_id(self, queue, checkpoints):
+        queue.enqueue("https://github.com/user/one")
+        job = queue.claim("w1")
+        review = MagicMock(review_id=job.review_id)
+        with patch("app.main.run_review", AsyncMock(return_value=review)) as run_review, \
+             patch("app.main.resume", AsyncMock()) as resume:
+            assert await run_review_job(job) == job.review_id
+        assert run_review.call_args.kwargs["review_id"] == job.review_id
+        resume.assert_not_called()
+
+    async def test_retry_resumes_checkpoint(self, queue, checkpoints):
+        queue.enqueue("https://github.com/user/one")
+        job = queue.claim("w1")
+        checkpoints.start(job.review_id, job.repo_url, "model")
+        review = MagicMock(review_id=job.review_id)
+        with patch("app.main.run_review", AsyncMock()) as run_review, \
+             patch("app.main.resume", AsyncMock(return_value=review)) as resume:
+            assert await run_review_job(job) == job.review_id
+        assert resume.call_args.args == (job.review_id,)
+        run_review.assert_not_called()
+
+    async def test_completed_checkpoint_is_not_run_again(self, queue, checkpoints):
+        queue.enqueue("https://github.com/user/one")
+        job = queue.claim("w1")
+        checkpoints.start(job.review_id, job.repo_url, "model")
+        checkpoints.complete_stage(job.review_id, "completed")
+        with patch("app.main.run_review", AsyncMock()) as run_review, \
+             patch("app.main.resume", AsyncMock()) as resume:
+            assert await run_review_job(job) == job.review_id
+        run_review.assert_not_called()
+        resume.assert_not_called()
+
+
+def test_worker_pool_processes_jobs(tmp_path):
+    """Jobs enqueued from this process should be completed by worker processes."""
+    path = str(tmp_path / "jobs.sqlite3")
+    queue = ReviewJobQueue(path)
+    jobs = [queue.enqueue(f"https://github.com/user/repo{i}") for i in range(6)]
+
+    with ReviewWorkerPool(path, processes=2, jobs_per_worker=2, runner=fake_runner, poll_interval=0.05):
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if all(queue.get(job.job_id).status == "Completed" for job in jobs):
+                break
+            time.sleep(0.1)
+
+    finished = [queue.get(job.job_id) for job in jobs]
+    assert all(job.status == "Completed" for job in finished)
+    assert len({job.worker_id for job in finished}) >= 1
+    queue.close()
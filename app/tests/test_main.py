@@ -1,7 +1,15 @@
 import pytest
 import asyncio
+import json
+import time
 from unittest.mock import patch, MagicMock, AsyncMock
-from app.main import main, get_github_url
+from app.main import main, get_github_url, async_create_message, batch_section, process_merged_review, process_single_file, process_streaming_reviews, process_incremental_reviews, process_initial_reviews, run_review, resume
+from app.models.message_batches import BatchResult
+from app.models.providers import MockProvider
+from app.models.registry import get_registry
+from app.review.checkpoint import CheckpointStore
+from app.review.response_parsing import ResponseParseError, normalize_response
+from app.models.review import Review
 from app.intake.code_extraction import CodeExtractor, ExtractedFile
 
 @pytest.fixture
@@ -52,15 +60,16 @@ async def test_main_with_valid_url(mock_code_extractor):
     """Test main function with valid GitHub URL"""
     with patch('app.main.get_github_url', return_value='https://github.com/user/repo'), \
          patch('app.main.Review') as mock_review, \
-         patch('app.main.process_initial_reviews', new_callable=AsyncMock) as mock_initial, \
-         patch('app.main.process_batch_reviews', new_callable=AsyncMock) as mock_batch, \
+         patch('app.main.ReviewCache'), \
+         patch('app.main.CheckpointStore'), \
+         patch('app.main.process_streaming_reviews', new_callable=AsyncMock) as mock_streaming, \
          patch('app.main.process_merged_review', new_callable=AsyncMock) as mock_merged, \
          patch('app.main.process_final_review', new_callable=AsyncMock) as mock_final:
         
         # Configure mocks
         mock_review.create.return_value = MagicMock()
-        mock_initial.return_value = []
-        mock_batch.return_value = []
+        mock_review.latest_for_repository.return_value = None
+        mock_streaming.return_value = ([], [], [])
         mock_merged.return_value = "merged review"
         mock_final.return_value = "final review"
 
@@ -87,3 +96,544 @@ async def test_main_with_nonexistent_repo(mock_code_extractor):
     with patch('app.main.get_github_url', return_value='https://github.com/user/nonexistent'), \
          pytest.raises(Exception, match="Repository not found"):
         await main()
+
+@pytest.mark.asyncio
+async def test_streaming_reviews_overlap_extraction():
+    """Batch reviews should start before extraction has finished"""
+    total_files = 25
+    yielded = []
+    batch_started_after = []
+
+    def slow_extraction():
+        for i in range(total_files):
+            time.sleep(0.01)
+            yielded.append(i)
+            yield ExtractedFile(path=f"src/file{i}.py", content=f"x = {i}", language="Python", size=5)
+
+    async def fake_single_file(file, model, initial_prompt, timestamp, cache=None):
+        return {'path': file.path, 'content': file.content}
+
+    async def fake_single_batch(batch, index, model, batch_prompt, timestamp):
+        batch_started_after.append(len(yielded))
+        return f"batch {index}: {len(batch)} files"
+
+    with patch('app.main.process_single_file', side_effect=fake_single_file), \
+         patch('app.main.process_single_batch', side_effect=fake_single_batch):
+        file_reviews, batch_reviews, batch_files = await process_streaming_reviews(slow_extraction(), "test-model")
+
+    assert len(file_reviews) == total_files
+    assert batch_reviews == ["batch 1: 10 files", "batch 2: 10 files", "batch 3: 5 files"]
+    # Batch membership is recorded in the same order as the batch reviews
+    assert batch_files == [[review['path'] for review in file_reviews[start:start + 10]] for start in (0, 10, 20)]
+    assert batch_started_after[0] < total_files
+
+@pytest.mark.asyncio
+async def test_bulk_initial_reviews_use_batch_jobs(monkeypatch):
+    """Bulk mode should submit every file at once and review only failures in real time"""
+    monkeypatch.setenv("LLM_RETRY_BASE_DELAY", "0")
+    files = [
+        ExtractedFile(path=name, content=f"code of {name}", language="Python", size=1)
+        for name in ("a.py", "b.py", "c.py")
+    ]
+    submitted = {}
+    bulk_text = {"a.py": MockProvider.render("Path: a.py\n"), "c.py": "Sorry, I cannot review this file."}
+
+    async def fake_run(requests, stage=None):
+        submitted.update(requests)
+        return {
+            custom_id: BatchResult(custom_id, error="expired") if "b.py" in params["messages"][0]["content"]
+            else BatchResult(custom_id, text=bulk_text[params["messages"][0]["content"].rsplit(" ", 1)[-1]])
+            for custom_id, params in requests.items()
+        }
+
+    def fake_record(file, review_text, timestamp):
+        return {'path': file.path, 'review': review_text}
+
+    async def fake_single_file(file, model, initial_prompt, timestamp, cache=None):
+        return {'path': file.path, 'review': "real-time review"}
+
+    with patch('app.main.MessageBatchClient') as mock_batches, \
+         patch('app.main.record_file_review', side_effect=fake_record), \
+         patch('app.main.process_single_file', side_effect=fake_single_file) as mock_single:
+        mock_batches.from_env.return_value.run.side_effect = fake_run
+        file_reviews = await process_initial_reviews(files, "test-model", bulk=True)
+
+    assert len(submitted) == 3
+    assert all(params["model"] == "test-model" and params["system"] for params in submitted.values())
+    # A bulk response that is not a valid file review is redone in real time too
+    assert file_reviews == [
+        {'path': "a.py", 'review': normalize_response(bulk_text["a.py"])},
+        {'path': "b.py", 'review': "real-time review"},
+        {'path': "c.py", 'review': "real-time review"},
+    ]
+    assert [call.args[0].path for call in mock_single.call_args_list] == ["b.py", "c.py"]
+
+@pytest.mark.asyncio
+async def test_bulk_failure_falls_back_to_real_time():
+    """A batch run that fails outright should leave every file to real-time review"""
+    files = [ExtractedFile(path="a.py", content="code of a.py", language="Python", size=1)]
+
+    async def fake_single_file(file, model, initial_prompt, timestamp, cache=None):
+        return {'path': file.path, 'review': "real-time review"}
+
+    with patch('app.main.MessageBatchClient') as mock_batches, \
+         patch('app.main.process_single_file', side_effect=fake_single_file):
+        mock_batches.from_env.return_value.run.side_effect = TimeoutError("batch did not end")
+        file_reviews = await process_initial_reviews(files, "test-model", bulk=True)
+
+    assert file_reviews == [{'path': "a.py", 'review': "real-time review"}]
+
+@pytest.mark.asyncio
+async def test_bulk_oversized_file_is_sent_in_chunks(monkeypatch):
+    """Bulk mode should submit an oversized file's chunks and reduce their reviews"""
+    monkeypatch.setenv("FILE_CHUNK_TOKENS", "200")
+    monkeypatch.setenv("FILE_CHUNK_OVERLAP_LINES", "0")
+    content = "".join(f"def handler_{i}(request):\n    return process(request, {i})\n\n" for i in range(60))
+    files = [ExtractedFile(path="handlers.py", content=content, language="Python", size=len(content))]
+    submitted = {}
+
+    async def fake_run(requests, stage=None):
+        submitted.update(requests)
+        results = {}
+        for number, custom_id in enumerate(requests):
+            review = json.loads(MockProvider.render("Path: handlers.py\n"))
+            review["file_review"]["quality_scores"]["readability"] = 8 if number % 2 else 6
+            results[custom_id] = BatchResult(custom_id, text=json.dumps(review))
+        return results
+
+    def fake_record(file, review_text, timestamp):
+        return {'path': file.path, 'review': review_text}
+
+    with patch('app.main.MessageBatchClient') as mock_batches, \
+         patch('app.main.record_file_review', side_effect=fake_record), \
+         patch('app.main.process_single_file') as mock_single:
+        mock_batches.from_env.return_value.run.side_effect = fake_run
+        file_reviews = await process_initial_reviews(files, "test-model", bulk=True)
+
+    assert len(submitted) > 1
+    assert all("-part-" in custom_id for custom_id in submitted)
+    mock_single.assert_not_called()
+    review = json.loads(file_reviews[0]['review'])
+    assert 6 < review["file_review"]["quality_scores"]["readability"] < 8
+
+@pytest.mark.asyncio
+async def test_streaming_reviews_prefetch_skeletons_in_groups():
+    """Skeletons should be prefetched once per batch, not once per file"""
+    files = [ExtractedFile(path=f"src/file{i}.py", content=f"x = {i}", language="Python", size=5) for i in range(20)]
+    groups = []
+
+    async def fake_prefetch(file_reviews):
+        groups.append(len(file_reviews))
+
+    async def fake_single_file(file, model, initial_prompt, timestamp, cache=None):
+        return {'path': file.path, 'content': file.content}
+
+    with patch('app.main.prefetch_skeletons', side_effect=fake_prefetch), \
+         patch('app.main.process_single_file', side_effect=fake_single_file), \
+         patch('app.main.process_single_batch', new_callable=AsyncMock) as mock_batch:
+        mock_batch.return_value = "batch"
+        file_reviews, batch_reviews, _ = await process_streaming_reviews(files, "test-model")
+
+    assert len(file_reviews) == 20
+    assert batch_reviews == ["batch", "batch"]
+    assert groups == [10, 10]
+
+@pytest.mark.asyncio
+async def test_streaming_reviews_skips_failed_files(monkeypatch):
+    """A file that keeps failing should be dropped without aborting the others"""
+    monkeypatch.setenv("LLM_RETRY_BASE_DELAY", "0")
+    files = [
+        ExtractedFile(path=name, content=f"# {name}", language="Python", size=1)
+        for name in ("bad.py", "good.py")
+    ]
+    calls = []
+
+    async def fake_single_file(file, model, initial_prompt, timestamp, cache=None):
+        calls.append(file.path)
+        if file.path == "bad.py":
+            raise ResponseParseError("Invalid review format: no JSON object found")
+        return {'path': file.path, 'content': file.content, 'review': "ok"}
+
+    with patch('app.main.process_single_file', side_effect=fake_single_file), \
+         patch('app.main.process_single_batch', new_callable=AsyncMock) as mock_batch:
+        mock_batch.return_value = "batch"
+        file_reviews, batch_reviews, batch_files = await process_streaming_reviews(files, "test-model")
+
+    assert [review['path'] for review in file_reviews] == ["good.py"]
+    assert batch_files == [["good.py"]]
+    assert batch_reviews == ["batch"]
+    assert calls.count("bad.py") == 4
+
+@pytest.mark.asyncio
+async def test_streaming_reviews_propagates_total_failure(monkeypatch):
+    """If no file can be reviewed at all the pipeline should fail"""
+    monkeypatch.setenv("LLM_RETRY_BASE_DELAY", "0")
+    files = [ExtractedFile(path="bad.py", content="x", language="Python", size=1)]
+
+    with patch('app.main.process_single_file', new_callable=AsyncMock) as mock_single:
+        mock_single.side_effect = KeyError('content')
+        with pytest.raises(KeyError):
+            await process_streaming_reviews(files, "test-model")
+
+@pytest.mark.asyncio
+async def test_incremental_reviews_only_changed_files():
+    """Only changed files and the batches containing them should be re-reviewed"""
+    previous_tree = {f"src/file{i:02d}.py": f"sha{i}" for i in range(20)}
+    previous_file_reviews = [
+        {'path': path, 'content': 'x', 'review': f"old review of {path}", 'sha': sha}
+        for path, sha in previous_tree.items()
+    ]
+    paths = sorted(previous_tree)
+    previous_review = Review(
+        file_reviews=previous_file_reviews,
+        batch_reviews=["old batch 1", "old batch 2"],
+        file_tree=previous_tree,
+        batch_files=[paths[:10], paths[10:]]
+    )
+
+    current_tree = dict(previous_tree, **{"src/file15.py": "sha15-new"})
+    extractor = MagicMock()
+    extractor.list_github_tree.return_value = current_tree
+    extractor.stream_github_files.return_value = [
+        ExtractedFile(path="src/file15.py", content="y", language="Python", size=1, sha="sha15-new")
+    ]
+
+    async def fake_single_file(file, model, initial_prompt, timestamp, cache=None):
+        return {'path': file.path, 'content': file.content, 'review': "new review", 'sha': file.blob_sha}
+
+    with patch('app.main.process_single_file', side_effect=fake_single_file) as mock_single, \
+         patch('app.main.process_single_batch', new_callable=AsyncMock) as mock_batch, \
+         patch.dict('os.environ', {'BATCH_MAX_FILES': '10'}):
+        mock_batch.return_value = "new batch 2"
+        file_reviews, batch_reviews, batch_files = await process_incremental_reviews(
+            extractor, "https://github.com/user/repo", previous_review, "test-model"
+        )
+
+    extractor.stream_github_files.assert_called_once_with("https://github.com/user/repo", {"src/file15.py"})
+    assert mock_single.call_count == 1
+    assert mock_batch.call_count == 1
+    assert batch_reviews == ["old batch 1", "new batch 2"]
+    assert batch_files == [paths[:10], paths[10:]]
+    assert len(file_reviews) == 20
+    assert {r['path']: r['review'] for r in file_reviews}["src/file15.py"] == "new review"
+    assert {r['path']: r['review'] for r in file_reviews}["src/file00.py"] == "old review of src/file00.py"
+
+
+def test_batch_section_digest_and_full_modes(monkeypatch):
+    """Batch prompts should carry digests of large files unless full mode is set"""
+    from app.main import batch_section
+    content = "import os\n\n" + "\n".join(
+        f"def step_{i}(value):\n    parts = [str(value), 'part-{i}']\n    parts.append('suffix-{i}')\n"
+        f"    path = os.path.join(*parts)\n    return os.path.normpath(path)\n" for i in range(60)
+    )
+    review = {'path': "a.py", 'content': content, 'language': "Python",
+              'review': '{"file_review":{"quality_scores":{"readability":7}},"summary":"Repetitive helpers."}'}
+    digest = batch_section(review)
+    assert "def step_59(value):" in digest
+    assert "Repetitive helpers." in digest
+    assert "part-59" not in digest
+    monkeypatch.setenv("BATCH_PROMPT_MODE", "full")
+    assert batch_section(review) == f"File: a.py\n{content}"
+
+def test_group_into_batches_packs_small_files():
+    """Tiny files should share one batch instead of fixed groups of ten"""
+    from app.main import group_into_batches
+    from app.intake.batch_planning import BatchPlanner
+
+    reviews = [{'path': f"cfg/c{i:02d}.yml", 'content': "a: 1", 'review': "ok"} for i in range(25)]
+    batches = group_into_batches(reviews, planner=BatchPlanner(token_budget=10000))
+    assert len(batches) == 1
+    assert [r['path'] for r in batches[0]] == sorted(r['path'] for r in reviews)
+
+
+@pytest.mark.asyncio
+async def test_resume_skips_completed_stages(tmp_path):
+    """A failure in Stage 3 should not cost the file and batch reviews again"""
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"))
+    file_reviews = [{'path': "a.py", 'content': "x", 'review': "ok", 'sha': "sha-a"}]
+
+    async def fake_streaming(files, model, batch_size=10, cache=None, on_file_review=None):
+        for file_review in file_reviews:
+            on_file_review(file_review)
+        return file_reviews, ["batch 1"], [["a.py"]]
+
+    with patch('app.main.CodeExtractor'), \
+         patch('app.main.ReviewCache'), \
+         patch.object(Review, 'save'), \
+         patch.object(Review, 'latest_for_repository', return_value=None), \
+         patch('app.main.process_streaming_reviews', side_effect=fake_streaming) as mock_streaming, \
+         patch('app.main.process_merged_review', new_callable=AsyncMock) as mock_merged, \
+         patch('app.main.process_final_review', new_callable=AsyncMock) as mock_final:
+        mock_merged.side_effect = [ValueError("malformed response"), "merged review"]
+        mock_final.return_value = "final review"
+
+        with pytest.raises(ValueError, match="malformed response"):
+            await run_review("https://github.com/user/repo", "test-model", checkpoints=store)
+        [review_id] = store.incomplete()
+        assert store.load(review_id).stage == "batch_reviews"
+
+        review = await resume(review_id, checkpoints=store)
+
+    assert mock_streaming.call_count == 1
+    mock_merged.assert_called_with(["batch 1"], "test-model")
+    assert review.review_id == review_id
+    assert review.file_reviews == file_reviews
+    assert review.batch_files == [["a.py"]]
+    assert review.final_review == "final review"
+    assert store.load(review_id).stage == "completed"
+    with pytest.raises(ValueError, match="already completed"):
+        await resume(review_id, checkpoints=store)
+
+@pytest.mark.asyncio
+async def test_resume_reviews_only_remaining_files(tmp_path):
+    """Resuming an interrupted Stage 1 should review only files without a checkpoint"""
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"))
+    store.start("review-1", "https://github.com/user/repo", "test-model")
+    store.save_file_review("review-1", {'path': "a.py", 'content': "x", 'review': "old", 'sha': "sha-a"})
+
+    async def fake_single_file(file, model, initial_prompt, timestamp, cache=None):
+        return {'path': file.path, 'content': file.content, 'review': "new", 'sha': file.blob_sha}
+
+    with patch('app.main.CodeExtractor') as mock_extractor, \
+         patch('app.main.ReviewCache'), \
+         patch.object(Review, 'save'), \
+         patch('app.main.process_single_file', side_effect=fake_single_file) as mock_single, \
+         patch('app.main.process_batch_reviews', new_callable=AsyncMock) as mock_batches, \
+         patch('app.main.process_merged_review', new_callable=AsyncMock) as mock_merged, \
+         patch('app.main.process_final_review', new_callable=AsyncMock):
+        extractor = mock_extractor.return_value
+        extractor.list_github_tree.return_value = {"a.py": "sha-a", "b.py": "sha-b"}
+        extractor.stream_github_files.return_value = [
+            ExtractedFile(path="b.py", content="y", language="Python", size=1, sha="sha-b")
+        ]
+        mock_batches.return_value = ["batch 1"]
+        mock_merged.return_value = "merged"
+
+        review = await resume("review-1", checkpoints=store)
+
+    extractor.stream_github_files.assert_called_once_with("https://github.com/user/repo", {"b.py"})
+    assert mock_single.call_count == 1
+    assert [r['review'] for r in review.file_reviews] == ["old", "new"]
+    # Once the review is saved its checkpoint keeps only the stage
+    checkpoint = store.load("review-1")
+    assert (checkpoint.stage, checkpoint.file_reviews) == ("completed", [])
+
+@pytest.mark.asyncio
+async def test_resumed_incremental_review_keeps_previous_review(tmp_path):
+    """An interrupted incremental run should still carry over unchanged files when resumed"""
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"))
+    store.start("review-2", "https://github.com/user/repo", "test-model", previous_review_id="review-1")
+    store.save_file_review("review-2", {'path': "b.py", 'content': "y2", 'review': "changed", 'sha': "sha-b2"})
+    previous = Review(review_id="review-1", repo_id=1, file_reviews=[
+        {'path': "a.py", 'content': "x", 'review': "carried", 'sha': "sha-a"},
+        {'path': "b.py", 'content': "y", 'review': "stale", 'sha': "sha-b"},
+    ])
+
+    async def fake_single_file(file, model, initial_prompt, timestamp, cache=None):
+        return {'path': file.path, 'content': file.content, 'review': "new", 'sha': file.blob_sha}
+
+    with patch('app.main.CodeExtractor') as mock_extractor, \
+         patch('app.main.ReviewCache'), \
+         patch.object(Review, 'save'), \
+         patch.object(Review, 'get', return_value=previous) as mock_get, \
+         patch('app.main.process_single_file', side_effect=fake_single_file), \
+         patch('app.main.process_batch_reviews', new_callable=AsyncMock) as mock_batches, \
+         patch('app.main.process_merged_review', new_callable=AsyncMock) as mock_merged, \
+         patch('app.main.process_final_review', new_callable=AsyncMock):
+        extractor = mock_extractor.return_value
+        extractor.list_github_tree.return_value = {"a.py": "sha-a", "b.py": "sha-b2", "c.py": "sha-c"}
+        extractor.stream_github_files.return_value = [
+            ExtractedFile(path="c.py", content="z", language="Python", size=1, sha="sha-c")
+        ]
+        mock_batches.return_value = ["batch 1"]
+        mock_merged.return_value = "merged"
+
+        review = await resume("review-2", checkpoints=store)
+
+    mock_get.assert_called_once_with("review-1")
+    extractor.stream_github_files.assert_called_once_with("https://github.com/user/repo", {"c.py"})
+    assert [r['review'] for r in review.file_reviews] == ["carried", "changed", "new"]
+
+
+class StreamingAdapter:
+    """Adapter streaming canned chunks and recording how much was consumed."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.sent = 0
+        self.closed = False
+
+    async def stream(self, prompt, model, **kwargs):
+        try:
+            for chunk in self.chunks:
+                self.sent += 1
+                yield chunk
+        finally:
+            self.closed = True
+
+@pytest.mark.asyncio
+async def test_streamed_message_stops_when_json_completes():
+    """Generation should be cancelled once the JSON value is complete, with chunks reported as they arrive"""
+    adapter = StreamingAdapter(['```json\n{"summary": "a } b"', ', "risks": []}', '\n```', "\nAnything else?"] * 10)
+    seen = []
+    with patch('app.main.get_adapter', return_value=adapter), \
+         patch('app.main.model_provider', return_value="anthropic"):
+        text = await async_create_message("prompt", "test-model", stage="final_review", on_text=seen.append)
+
+    assert text == '```json\n{"summary": "a } b", "risks": []}'
+    assert seen == ['```json\n{"summary": "a } b"', ', "risks": []}']
+    assert adapter.sent == 2
+    assert adapter.closed
+
+@pytest.mark.asyncio
+async def test_off_format_stream_is_cancelled_early():
+    """A response that does not start with JSON should be abandoned without reading the rest"""
+    adapter = StreamingAdapter(["I'm sorry, but I cannot review this file because " * 5] * 100)
+    with patch('app.main.get_adapter', return_value=adapter), \
+         patch('app.main.model_provider', return_value="anthropic"):
+        with pytest.raises(ResponseParseError, match="does not start with JSON"):
+            await async_create_message("prompt", "test-model")
+
+    assert adapter.sent < 5
+    assert adapter.closed
+
+@pytest.mark.asyncio
+async def test_bracketed_preamble_does_not_end_stream():
+    """Brackets in an introduction should neither complete the value nor pass as a review"""
+    adapter = StreamingAdapter(["Here is my review of [app/main.py]:\n", '{"summary": "ok"}', "\nThanks"])
+    with patch('app.main.get_adapter', return_value=adapter), \
+         patch('app.main.model_provider', return_value="anthropic"):
+        text = await async_create_message("prompt", "test-model")
+    assert text == 'Here is my review of [app/main.py]:\n{"summary": "ok"}'
+
+    adapter = StreamingAdapter(["Here is my review of [app/main.py]:\n"])
+    with patch('app.main.get_adapter', return_value=adapter), \
+         patch('app.main.model_provider', return_value="anthropic"):
+        with pytest.raises(ResponseParseError, match="no JSON object"):
+            await async_create_message("prompt", "test-model")
+
+@pytest.mark.asyncio
+async def test_merged_review_reduces_in_groups(tmp_path):
+    """Batch reviews beyond the fan-in should be merged level by level"""
+    prompts = []
+
+    async def fake_create_message(prompt, model, system=None, stage=None, on_text=None):
+        prompts.append(prompt)
+        review = json.loads(MockProvider.render(prompt))
+        review["consolidated_summary"] = f"merge {len(prompts)}"
+        return json.dumps(review)
+
+    with patch('app.main.async_create_message', side_effect=fake_create_message), \
+         patch('app.main.Path', side_effect=lambda path: tmp_path / path):
+        merged = await process_merged_review([f'{{"batch": {i}}}' for i in range(9)], "test-model", fan_in=3)
+
+    # 3 merges of 3, then one merge of the 3 results
+    assert len(prompts) == 4
+    assert all(prompt.count("Batch Review ") == 3 for prompt in prompts)
+    assert '"consolidated_summary":"merge 1"' in prompts[-1]
+    assert json.loads(merged)["consolidated_summary"] == "merge 4"
+
+@pytest.mark.asyncio
+async def test_oversized_file_reviewed_in_chunks(tmp_path, monkeypatch):
+    """Files over the chunk budget should get one review reduced from concurrent chunk reviews"""
+    monkeypatch.setenv('FILE_CHUNK_TOKENS', '100')
+    content = "\n\n".join(f"def handler_{i}(request):\n    return request.get('items', [])[{i}]\n" for i in range(20))
+    file = ExtractedFile(path="handlers.py", content=content, language="Python", size=len(content))
+    prompts = []
+
+    async def fake_create_message(prompt, model, system=None, stage=None, on_text=None):
+        prompts.append(prompt)
+        review = json.loads(MockProvider.render("Path: handlers.py\n"))
+        review["file_review"]["quality_scores"]["readability"] = 8 if len(prompts) % 2 else 6
+        review["summary"] = f"Part {len(prompts)}."
+        return json.dumps(review)
+
+    with patch('app.main.async_create_message', side_effect=fake_create_message), \
+         patch('app.main.Path', side_effect=lambda path: tmp_path / path):
+        result = await process_single_file(file, "test-model", get_registry().prompt("initial_review"), "20260101_000000")
+
+    assert len(prompts) > 1
+    assert all(prompt.startswith("FILE TO REVIEW:\nPart: ") for prompt in prompts)
+    review = json.loads(result["review"])
+    assert 6 <= review["file_review"]["quality_scores"]["readability"] <= 8
+    assert review["summary"].startswith("Part 1.")
+
+@pytest.mark.asyncio
+async def test_failed_chunk_does_not_fail_the_file(tmp_path, monkeypatch):
+    """A chunk whose call fails should be left out, with chunk calls capped at the policy's parallelism"""
+    monkeypatch.setenv('FILE_CHUNK_TOKENS', '100')
+    monkeypatch.setenv('FILE_CHUNK_PARALLEL', '2')
+    content = "\n\n".join(f"def handler_{i}(request):\n    return request.get('items', [])[{i}]\n" for i in range(20))
+    file = ExtractedFile(path="handlers.py", content=content, language="Python", size=len(content))
+    calls = []
+    in_flight = peak = 0
+
+    async def fake_create_message(prompt, model, system=None, stage=None, on_text=None):
+        nonlocal in_flight, peak
+        calls.append(prompt)
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if len(calls) == 1:
+            raise RuntimeError("provider unavailable")
+        return MockProvider.render("Path: handlers.py\n")
+
+    with patch('app.main.async_create_message', side_effect=fake_create_message), \
+         patch('app.main.Path', side_effect=lambda path: tmp_path / path):
+        result = await process_single_file(file, "test-model", get_registry().prompt("initial_review"), "20260101_000000")
+
+    assert len(calls) > 2
+    assert peak == 2
+    assert json.loads(result["review"])["file_review"]["file_metadata"]["path"] == "handlers.py"
+
+@pytest.mark.asyncio
+async def test_duplicate_files_reuse_one_review(tmp_path):
+    """Copies of a file should reuse its review instead of being reviewed again"""
+    content = "\n".join(f"def handler_{i}(request):\n    return request.get('items', [])[{i}]\n" for i in range(20))
+    files = [
+        ExtractedFile(path="app/handlers.py", content=content, language="Python", size=len(content)),
+        ExtractedFile(path="vendor/handlers.py", content=content, language="Python", size=len(content)),
+        ExtractedFile(path="old/handlers.py", content=content.replace("handler_3", "handler_three"),
+                      language="Python", size=len(content)),
+    ]
+
+    async def fake_single_file(file, model, initial_prompt, timestamp, cache=None):
+        return {'path': file.path, 'content': file.content, 'language': file.language, 'review': f"review of {file.path}"}
+
+    with patch('app.main.process_single_file', side_effect=fake_single_file) as mock_single, \
+         patch('app.main.Path', side_effect=lambda path: tmp_path / path):
+        file_reviews = await process_initial_reviews(files, "test-model")
+
+    assert [call.args[0].path for call in mock_single.call_args_list] == ["app/handlers.py"]
+    reviews = {review['path']: review for review in file_reviews}
+    assert all(review['review'] == "review of app/handlers.py" for review in reviews.values())
+    assert reviews["vendor/handlers.py"]['duplicate_of'] == "app/handlers.py"
+    assert reviews["vendor/handlers.py"]['similarity'] == 1.0
+    assert 0.9 <= reviews["old/handlers.py"]['similarity'] < 1.0
+    assert batch_section(reviews["vendor/handlers.py"]) == (
+        "File: vendor/handlers.py\nDuplicate of: app/handlers.py (100% similar)"
+    )
+
+@pytest.mark.asyncio
+async def test_streaming_duplicates_wait_for_original(tmp_path):
+    """A streamed copy should reuse the review of the file it duplicates once that completes"""
+    files = [
+        ExtractedFile(path=name, content="print('shared')", language="Python", size=15)
+        for name in ("a.py", "copy/a.py")
+    ]
+
+    async def fake_single_file(file, model, initial_prompt, timestamp, cache=None):
+        await asyncio.sleep(0.05)
+        return {'path': file.path, 'content': file.content, 'review': "ok"}
+
+    with patch('app.main.process_single_file', side_effect=fake_single_file) as mock_single, \
+         patch('app.main.process_single_batch', new_callable=AsyncMock) as mock_batch, \
+         patch('app.main.Path', side_effect=lambda path: tmp_path / path):
+        mock_batch.return_value = "batch"
+        file_reviews, _, _ = await process_streaming_reviews(files, "test-model")
+
+    assert mock_single.call_count == 1
+    assert [(review['path'], review.get('duplicate_of')) for review in file_reviews] == [
+        ("a.py", None), ("copy/a.py", "a.py")
+    ]
@@ -5,3 +5,92 @@
 # - LLM integration
 # - Review result formatting
 # - Review history tracking
+
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+from app.api import repository_review
+from app.api.authentication import get_current_user
+from app.api.server import create_app
+from app.intake.input_validation import ValidationError
+from app.services.review_job_service import ReviewJobQueue
+
+REPO_URL = "https://github.com/user/repo"
+
+
+def user(user_id, subscription_type="free"):
+    return {"user": {"id": user_id, "user_metadata": {"subscription_type": subscription_type}}}
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = ReviewJobQueue(str(tmp_path / "jobs.sqlite3"))
+    with patch.object(repository_review, "get_review_job_queue", return_value=queue):
+        yield queue
+    queue.close()
+
+
+@pytest.fixture
+def app():
+    return create_app()
+
+
+def client_as(app, current_user):
+    app.dependency_overrides[get_current_user] = lambda: current_user
+    return TestClient(app)
+
+
+def test_review_jobs_require_authentication(app, queue):
+    client = TestClient(app)
+    assert client.post("/reviews/jobs", json={"repo_url": REPO_URL}).status_code == 401
+    job = queue.enqueue(REPO_URL, owner_id="user-1")
+    assert client.get(f"/reviews/jobs/{job.job_id}").status_code == 401
+
+
+def test_enqueue_records_owner_and_validates_tier(app, queue):
+    client = client_as(app, user("user-1", "premium"))
+    with patch.object(repository_review.InputValidator, "validate_input") as validate:
+        response = client.post("/reviews/jobs", json={"repo_url": REPO_URL})
+    assert response.status_code == 202
+    assert response.json()["owner_id"] == "user-1"
+    assert response.json()["position"] == 0
+    validate.assert_called_once_with(REPO_URL)
+
+
+@pytest.mark.parametrize("error_type,status_code", [
+    ("subscription_required", 403),
+    ("repo_not_found", 400),
+    ("rate_limit", 429),
+])
+def test_enqueue_rejects_invalid_repositories(app, queue, error_type, status_code):
+    client = client_as(app, user("user-1"))
+    error = ValidationError(error_type, "Invalid input")
+    with patch.object(repository_review.InputValidator, "validate_input", side_effect=error):
+        response = client.post("/reviews/jobs", json={"repo_url": REPO_URL})
+    assert response.status_code == status_code
+    assert queue.list() == []
+
+
+def test_jobs_are_visible_to_their_owner_only(app, queue):
+    job = queue.enqueue(REPO_URL, owner_id="user-1")
+    response = client_as(app, user("user-1")).get(f"/reviews/jobs/{job.job_id}")
+    assert response.status_code == 200
+    assert response.json()["status"] == "Pending"
+    assert client_as(app, user("user-2")).get(f"/reviews/jobs/{job.job_id}").status_code == 404
+
+
+def test_running_job_reports_rate_limit_wait(app, queue):
+    job = queue.enqueue(REPO_URL, owner_id="user-1")
+    client = client_as(app, user("user-1"))
+    assert client.get(f"/reviews/jobs/{job.job_id}").json()["estimated_wait"] is None
+    queue.claim("w1")
+    queue.heartbeat([job.job_id], "w1", rate_limit_wait=30.0)
+    body = client.get(f"/reviews/jobs/{job.job_id}").json()
+    assert (body["status"], body["estimated_wait"]) == ("In Progress", 30.0)
+    assert "rate_limit_wait" not in body
+
+
+def test_review_router_is_mounted():
+    paths = {route.path for route in create_app().routes}
+    assert {"/reviews/jobs", "/reviews/jobs/{job_id}", "/auth/token"} <= paths
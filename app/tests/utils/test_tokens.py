@@ -0,0 +1,19 @@
+from app.utils.tokens import estimate_tokens
+
+class TestTokens:
+    def test_empty_text(self):
+        """Empty text has no tokens."""
+        assert estimate_tokens("") == 0
+
+    def test_words_and_punctuation(self):
+        """Short words and punctuation are one token each; long words split."""
+        assert estimate_tokens("def f(x): return x") == 9
+
+    def test_long_words_are_split(self):
+        """Long identifiers count as several tokens."""
+        assert estimate_tokens("configuration_manager") == 6
+
+    def test_scales_with_size(self):
+        """Estimates grow linearly with repeated content."""
+        line = "result = compute_total(items, tax_rate=0.2)\n"
+        assert estimate_tokens(line * 100) == 100 * estimate_tokens(line)
@@ -0,0 +1,31 @@
+"""
+Local token count estimation for sizing LLM prompts.
+
+Approximates BPE tokenizers without a provider round-trip: words are split
+into roughly four-character pieces and each punctuation mark counts as its
+own token, which tracks real tokenizers closely on source code.
+"""
+import re
+
+_TOKEN_PATTERN = re.compile(r'\w+|[^\w\s]')
+_CHARS_PER_WORD_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens a model will see for the given text.
+    
+    Args:
+        text: Text to measure
+    
+    Returns:
+        int: Estimated token count
+    """
+    if not text:
+        return 0
+    
+    count = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        length = match.end() - match.start()
+        count += -(-length // _CHARS_PER_WORD_TOKEN)
+    return count